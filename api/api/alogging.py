@@ -14,7 +14,7 @@ from aiohttp import web_request
 from aiohttp.abc import AbstractAccessLogger
 from pythonjsonlogger import jsonlogger
 
-from fortishield.core.wlogging import fortishieldLogger
+from fortishield.core.wlogging import FortishieldLogger
 
 # Compile regex when the module is imported so it's not necessary to compile it everytime log.info is called
 request_pattern = re.compile(r'\[.+]|\s+\*\s+')
@@ -21,7 +21,7 @@ import fortishield.rbac.utils as rbac_utils
 from api.constants import SECURITY_CONFIG_PATH
 from api.constants import SECURITY_PATH
 from api.util import raise_if_exc
-from fortishield import fortishieldInternalError
+from fortishield import FortishieldInternalError
 from fortishield.core.cluster.dapi.dapi import DistributedAPI
 from fortishield.core.cluster.utils import read_config
 from fortishield.core.common import fortishield_uid, fortishield_gid
@@ -229,10 +229,9 @@ def check_token(username: str, roles: tuple, token_nbf_time: int, run_as: bool)
             if not am.user_allow_run_as(user['username']) and set(user_roles) != set(roles):
                 return {'valid': False}
             with TokenManager() as tm:
-                for role in user_roles:
-                    if not tm.is_token_valid(role_id=role, user_id=user_id, token_nbf_time=int(token_nbf_time),
-                                             run_as=run_as):
-                        return {'valid': False}
+                if not tm.is_token_valid(role_ids=user_roles, user_id=user_id, token_nbf_time=int(token_nbf_time),
+                                         run_as=run_as):
+                    return {'valid': False}
 
     policies = optimize_resources(roles)
 
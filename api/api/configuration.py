@@ -36,6 +36,7 @@ default_api_configuration = {
     "drop_privileges": True,
     "experimental_features": False,
     "max_upload_size": 10485760,
+    "json_backend": "json",
     "intervals": {
         "request_timeout": 10
     },
@@ -67,6 +68,13 @@ default_api_configuration = {
         "enabled": True,
         "time": 0.750
     },
+    "stats_collector": {
+        "enabled": False,
+        "interval": 5,
+        "size": 720,
+        "max_age": 10,
+        "agents": False
+    },
     "access": {
         "max_login_attempts": 50,
         "block_time": 300,
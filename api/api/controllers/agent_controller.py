@@ -9,7 +9,7 @@ from typing import Union
 from aiohttp import web
 from connexion.lifecycle import ConnexionResponse
 
-from api.encoder import dumps, prettify
+from api.encoder import dumps, prettify, get_export_fields, get_response_serializer, json_response, stream_response
 from api.models.agent_added_model import AgentAddedModel
 from api.models.agent_inserted_model import AgentInsertedModel
 from api.models.base_model_ import Body
@@ -107,7 +107,8 @@ async def get_agents(request, pretty: bool = False, wait_for_complete: bool = Fa
                      offset: int = 0, limit: int = DATABASE_LIMIT, select: str = None, sort: str = None,
                      search: str = None, status: str = None, q: str = None, older_than: str = None, manager: str = None,
                      version: str = None, group: str = None, node_name: str = None, name: str = None, ip: str = None,
-                     group_config_status: str = None, distinct: bool = False) -> web.Response:
+                     group_config_status: str = None, distinct: bool = False,
+                     export: str = None) -> web.StreamResponse:
     """Get information about all agents or a list of them.
 
     Parameters
@@ -153,10 +154,12 @@ async def get_agents(request, pretty: bool = False, wait_for_complete: bool = Fa
         Filter by agent groups configuration sync status.
     distinct : bool
         Look for distinct values.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         Response with all selected agents' information.
     """
     f_kwargs = {'agent_list': agents_list,
@@ -185,17 +188,33 @@ async def get_agents(request, pretty: bool = False, wait_for_complete: bool = Fa
     for field in nested:
         f_kwargs['filters'][field] = request.query.get(field, None)
 
+    if export:
+        for param in ('offset', 'limit', 'sort', 'distinct'):
+            del f_kwargs[param]
+        dapi = DistributedAPI(f=agent.export_agents,
+                              f_kwargs=remove_nones_to_dict(f_kwargs),
+                              request_type='local_master',
+                              is_async=False,
+                              wait_for_complete=wait_for_complete,
+                              logger=logger,
+                              rbac_permissions=request['token_info']['rbac_policies']
+                              )
+        fields = get_export_fields(select, [field for field in agent.Agent.fields if field != 'internal_key'],
+                                   required_fields=['id'])
+        return await stream_response(dapi.stream_function(), export_format=export, fields=fields)
+
     dapi = DistributedAPI(f=agent.get_agents,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='local_master',
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 async def add_agent(request, pretty: bool = False, wait_for_complete: bool = False) -> web.Response:
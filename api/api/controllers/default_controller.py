@@ -11,7 +11,7 @@ from aiohttp import web
 from api.encoder import dumps, prettify
 from api.models.basic_info_model import BasicInfo
 from fortishield.core.common import DATE_FORMAT
-from fortishield.core.results import fortishieldResult
+from fortishield.core.results import FortishieldResult
 from fortishield.core.security import load_spec
 from fortishield.core.utils import get_utc_now
 
@@ -10,7 +10,7 @@ from fortishield.event import send_event_to_analysisd
 
 from api.encoder import dumps, prettify
 from api.models.base_model_ import Body
-from api.models.event_ingest_model import EventIngestModel
+from api.models.event_ingest_model import EventIngestModel, NDJSON_CONTENT_TYPE
 from api.util import raise_if_exc, remove_nones_to_dict
 
 logger = logging.getLogger('fortishield-api')
@@ -33,8 +33,11 @@ async def forward_event(request: web.Request, pretty: bool = False, wait_for_com
     web.Response
         API Response.
     """
-    Body.validate_content_type(request, expected_content_type='application/json')
-    f_kwargs = await EventIngestModel.get_kwargs(request)
+    if request.content_type == NDJSON_CONTENT_TYPE:
+        f_kwargs = await EventIngestModel.get_ndjson_kwargs(request)
+    else:
+        Body.validate_content_type(request, expected_content_type='application/json')
+        f_kwargs = await EventIngestModel.get_kwargs(request)
 
     dapi = DistributedAPI(f=send_event_to_analysisd,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
@@ -12,10 +12,10 @@ import fortishield.rootcheck as rootcheck
 import fortishield.syscheck as syscheck
 import fortishield.syscollector as syscollector
 from api import configuration
-from api.encoder import dumps, prettify
+from api.encoder import dumps, get_export_fields, prettify, stream_response
 from api.util import remove_nones_to_dict, parse_api_param, raise_if_exc, deprecate_endpoint
 from fortishield.core.cluster.dapi.dapi import DistributedAPI
-from fortishield.core.exception import fortishieldResourceNotFound
+from fortishield.core.exception import FortishieldResourceNotFound
 
 logger = logging.getLogger('fortishield-api')
 
@@ -33,6 +33,41 @@ def check_experimental_feature_value(func):
     return wrapper
 
 
+async def export_syscollector_items(request, f_kwargs: dict, export: str,
+                                    wait_for_complete: bool = False) -> web.StreamResponse:
+    """Export the syscollector items of the agents, without pagination nor sorting.
+
+    Parameters
+    ----------
+    request : connexion.request
+    f_kwargs : dict
+        Arguments of the request to the framework function.
+    export : str
+        Format of the exported items. Values: 'ndjson', 'csv'.
+    wait_for_complete : bool
+        Disable timeout response.
+
+    Returns
+    -------
+    web.StreamResponse
+        API response.
+    """
+    for param in ('offset', 'limit', 'sort'):
+        f_kwargs.pop(param, None)
+    fields = get_export_fields(f_kwargs.get('select'),
+                               syscollector.get_valid_fields(syscollector.Type(f_kwargs['element_type']))[1],
+                               required_fields=['agent_id'])
+    dapi = DistributedAPI(f=syscollector.export_item_agent,
+                          f_kwargs=remove_nones_to_dict(f_kwargs),
+                          request_type='distributed_master',
+                          is_async=False,
+                          wait_for_complete=wait_for_complete,
+                          logger=logger,
+                          rbac_permissions=request['token_info']['rbac_policies']
+                          )
+    return await stream_response(dapi.stream_function(), export_format=export, fields=fields)
+
+
 @check_experimental_feature_value
 async def clear_rootcheck_database(request, pretty: bool = False, wait_for_complete: bool = False,
                                    agents_list: list = None) -> web.Response:
@@ -198,7 +233,7 @@ async def get_cis_cat_results(request, pretty: bool = False, wait_for_complete:
 @check_experimental_feature_value
 async def get_hardware_info(request, pretty: bool = False, wait_for_complete: bool = False, agents_list: str = '*',
                             offset: int = 0, limit: int = None, select: str = None, sort: str = None,
-                            search: str = None, board_serial: str = None) -> web.Response:
+                            search: str = None, board_serial: str = None, export: str = None) -> web.StreamResponse:
     """Get hardware info from all agents or a list of them.
 
     Parameters
@@ -223,10 +258,12 @@ async def get_hardware_info(request, pretty: bool = False, wait_for_complete: bo
         Look for elements with the specified string.
     board_serial : str
         Filters by board_serial value.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     filters = {
@@ -246,6 +283,9 @@ async def get_hardware_info(request, pretty: bool = False, wait_for_complete: bo
                 'element_type': 'hardware'
                 }
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
@@ -265,7 +305,8 @@ async def get_hardware_info(request, pretty: bool = False, wait_for_complete: bo
 async def get_network_address_info(request, pretty: bool = False, wait_for_complete: bool = False,
                                    agents_list: str = '*', offset: int = 0, limit: str = None, select: str = None,
                                    sort: str = None, search: str = None, iface_name: str = None, proto: str = None,
-                                   address: str = None, broadcast: str = None, netmask: str = None) -> web.Response:
+                                   address: str = None, broadcast: str = None, netmask: str = None,
+                                   export: str = None) -> web.StreamResponse:
     """Get the IPv4 and IPv6 addresses associated to all network interfaces.
 
     Parameters
@@ -298,10 +339,12 @@ async def get_network_address_info(request, pretty: bool = False, wait_for_compl
         Filters by broadcast address.
     netmask : str
         Filters by netmask.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     f_kwargs = {'agent_list': agents_list,
@@ -320,6 +363,9 @@ async def get_network_address_info(request, pretty: bool = False, wait_for_compl
                 'element_type': 'netaddr'
                 }
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
@@ -339,7 +385,7 @@ async def get_network_address_info(request, pretty: bool = False, wait_for_compl
 async def get_network_interface_info(request, pretty: bool = False, wait_for_complete: bool = False,
                                      agents_list: str = '*', offset: int = 0, limit: int = None, select: str = None,
                                      sort: str = None, search: str = None, adapter: str = None, state: str = None,
-                                     mtu: str = None) -> web.Response:
+                                     mtu: str = None, export: str = None) -> web.StreamResponse:
     """Get all network interfaces from all agents or a list of them.
 
     Parameters
@@ -368,10 +414,12 @@ async def get_network_interface_info(request, pretty: bool = False, wait_for_com
         Filters by state.
     mtu : str
         Filters by mtu.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     filters = {
@@ -395,6 +443,9 @@ async def get_network_interface_info(request, pretty: bool = False, wait_for_com
                 'element_type': 'netiface'
                 }
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
@@ -414,7 +465,7 @@ async def get_network_interface_info(request, pretty: bool = False, wait_for_com
 async def get_network_protocol_info(request, pretty: bool = False, wait_for_complete: bool = False,
                                     agents_list: str = '*', offset: int = 0, limit: int = None, select: str = None,
                                     sort: str = None, search: str = None, iface: str = None, gateway: str = None,
-                                    dhcp: str = None) -> web.Response:
+                                    dhcp: str = None, export: str = None) -> web.StreamResponse:
     """Get network protocol info from all agents or a list of them.
 
     Parameters
@@ -443,10 +494,12 @@ async def get_network_protocol_info(request, pretty: bool = False, wait_for_comp
         Filters by gateway.
     dhcp : str
         Filters by dhcp.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     f_kwargs = {'agent_list': agents_list,
@@ -464,6 +517,9 @@ async def get_network_protocol_info(request, pretty: bool = False, wait_for_comp
                 'element_type': 'netproto'
                 }
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
@@ -483,7 +539,7 @@ async def get_network_protocol_info(request, pretty: bool = False, wait_for_comp
 async def get_os_info(request, pretty: bool = False, wait_for_complete: bool = False, agents_list: str = '*',
                       offset: int = 0, limit: int = None, select: str = None, sort: str = None, search: str = None,
                       os_name: str = None, architecture: str = None, os_version: str = None, version: str = None,
-                      release: str = None) -> web.Response:
+                      release: str = None, export: str = None) -> web.StreamResponse:
     """Get OS info from all agents or a list of them.
 
     Parameters
@@ -516,10 +572,12 @@ async def get_os_info(request, pretty: bool = False, wait_for_complete: bool = F
         Filters by version.
     release : str
         Filters by release.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     f_kwargs = {'agent_list': agents_list,
@@ -538,6 +596,9 @@ async def get_os_info(request, pretty: bool = False, wait_for_complete: bool = F
                 'element_type': 'os'
                 }
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
@@ -557,7 +618,7 @@ async def get_os_info(request, pretty: bool = False, wait_for_complete: bool = F
 async def get_packages_info(request, pretty: bool = False, wait_for_complete: bool = False, agents_list: str = '*',
                             offset: int = 0, limit: int = None, select: str = None, sort: str = None,
                             search: str = None, vendor: str = None, name: str = None, architecture: str = None,
-                            version: str = None) -> web.Response:
+                            version: str = None, export: str = None) -> web.StreamResponse:
     """Get packages info from all agents or a list of them.
 
     Parameters
@@ -588,10 +649,12 @@ async def get_packages_info(request, pretty: bool = False, wait_for_complete: bo
         Filters by architecture.
     version : str
         Filters by version.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     f_kwargs = {'agent_list': agents_list,
@@ -610,6 +673,9 @@ async def get_packages_info(request, pretty: bool = False, wait_for_complete: bo
                 'element_type': 'packages'
                 }
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
@@ -629,7 +695,7 @@ async def get_packages_info(request, pretty: bool = False, wait_for_complete: bo
 async def get_ports_info(request, pretty: bool = False, wait_for_complete: bool = False, agents_list: str = '*',
                          offset: int = 0, limit: int = None, select: str = None, sort: str = None, search: str = None,
                          pid: str = None, protocol: str = None, tx_queue: str = None, state: str = None,
-                         process: str = None) -> web.Response:
+                         process: str = None, export: str = None) -> web.StreamResponse:
     """Get ports info from all agents or a list of them.
 
     Parameters
@@ -662,10 +728,12 @@ async def get_ports_info(request, pretty: bool = False, wait_for_complete: bool
         Filters by state.
     process : str
         Filters by process.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     filters = {
@@ -690,6 +758,9 @@ async def get_ports_info(request, pretty: bool = False, wait_for_complete: bool
                 'element_type': 'ports'
                 }
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
@@ -711,7 +782,8 @@ async def get_processes_info(request, pretty: bool = False, wait_for_complete: b
                              search: str = None, pid: str = None, state: str = None, ppid: str = None,
                              egroup: str = None, euser: str = None, fgroup: str = None, name: str = None,
                              nlwp: str = None, pgrp: str = None, priority: str = None, rgroup: str = None,
-                             ruser: str = None, sgroup: str = None, suser: str = None) -> web.Response:
+                             ruser: str = None, sgroup: str = None, suser: str = None,
+                             export: str = None) -> web.StreamResponse:
     """Get processes info from all agents or a list of them.
 
     Parameters
@@ -762,10 +834,12 @@ async def get_processes_info(request, pretty: bool = False, wait_for_complete: b
         Filters by process sgroup.
     suser : str
         Filters by process suser.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     f_kwargs = {'agent_list': agents_list,
@@ -793,6 +867,9 @@ async def get_processes_info(request, pretty: bool = False, wait_for_complete: b
                 'element_type': 'processes'
                 }
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
@@ -811,7 +888,7 @@ async def get_processes_info(request, pretty: bool = False, wait_for_complete: b
 @check_experimental_feature_value
 async def get_hotfixes_info(request, pretty: bool = False, wait_for_complete: bool = False, agents_list: str = '*',
                             offset: int = 0, limit: int = None, sort: str = None, search: str = None,
-                            select: str = None, hotfix: str = None) -> web.Response:
+                            select: str = None, hotfix: str = None, export: str = None) -> web.StreamResponse:
     """Get hotfixes info from all agents or a list of them.
 
     Parameters
@@ -838,10 +915,12 @@ async def get_hotfixes_info(request, pretty: bool = False, wait_for_complete: bo
         Select which fields to return (separated by comma).
     hotfix : str
         Filters by hotfix in Windows agents.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     filters = {'hotfix': hotfix}
@@ -855,6 +934,9 @@ async def get_hotfixes_info(request, pretty: bool = False, wait_for_complete: bo
                 'filters': filters,
                 'element_type': 'hotfixes'}
 
+    if export:
+        return await export_syscollector_items(request, f_kwargs, export, wait_for_complete=wait_for_complete)
+
     dapi = DistributedAPI(f=syscollector.get_item_agent,
                           f_kwargs=remove_nones_to_dict(f_kwargs),
                           request_type='distributed_master',
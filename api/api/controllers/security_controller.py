@@ -20,7 +20,7 @@ from api.util import (deprecate_endpoint, parse_api_param, raise_if_exc,
 from fortishield import security, __version__
 from fortishield.core.cluster.control import get_system_nodes
 from fortishield.core.cluster.dapi.dapi import DistributedAPI
-from fortishield.core.exception import fortishieldException, FortishieldPermissionError
+from fortishield.core.exception import FortishieldException, FortishieldPermissionError
 from fortishield.core.results import AffectedItemsFortishieldResult, FortishieldResult
 from fortishield.core.security import revoke_tokens
 from fortishield.rbac import preprocessor
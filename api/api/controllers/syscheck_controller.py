@@ -6,10 +6,10 @@ import logging
 
 from aiohttp import web
 
-from api.encoder import dumps, prettify
+from api.encoder import dumps, get_export_fields, prettify, stream_response
 from api.util import remove_nones_to_dict, parse_api_param, raise_if_exc, deprecate_endpoint
 from fortishield.core.cluster.dapi.dapi import DistributedAPI
-from fortishield.syscheck import run, clear, files, last_scan
+from fortishield.syscheck import run, clear, files, last_scan, export_files, FILES_FIELDS, FILES_SUMMARY_FIELDS
 
 logger = logging.getLogger('fortishield-api')
 
@@ -53,7 +53,8 @@ async def put_syscheck(request, agents_list: str = '*', pretty: bool = False,
 async def get_syscheck_agent(request, agent_id: str, pretty: bool = False, wait_for_complete: bool = False,
                              offset: int = 0, limit: int = None, select: str = None, sort: str = None,
                              search: str = None, distinct: bool = False, summary: bool = False, md5: str = None,
-                             sha1: str = None, sha256: str = None, q: str = None, arch: str = None) -> web.Response:
+                             sha1: str = None, sha256: str = None, q: str = None, arch: str = None,
+                             export: str = None) -> web.StreamResponse:
     """Get file integrity monitoring scan result from an agent.
 
     Parameters
@@ -90,10 +91,12 @@ async def get_syscheck_agent(request, agent_id: str, pretty: bool = False, wait_
         Query to filter results by.
     arch : str
         Specify whether the associated entry is 32 or 64 bits. Allowed values: '[x32]' and '[x64]'.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
 
@@ -107,6 +110,21 @@ async def get_syscheck_agent(request, agent_id: str, pretty: bool = False, wait_
     filters = {'type': type_, 'md5': md5, 'sha1': sha1, 'sha256': sha256, 'hash': hash_, 'file': file_, 'arch': arch,
                'value.name': request.query.get('value.name', None), 'value.type': request.query.get('value.type', None)}
 
+    if export:
+        f_kwargs = {'agent_list': [agent_id], 'select': select, 'search': parse_api_param(search, 'search'),
+                    'summary': summary, 'filters': filters, 'q': q}
+
+        dapi = DistributedAPI(f=export_files,
+                              f_kwargs=remove_nones_to_dict(f_kwargs),
+                              request_type='distributed_master',
+                              is_async=False,
+                              wait_for_complete=wait_for_complete,
+                              logger=logger,
+                              rbac_permissions=request['token_info']['rbac_policies']
+                              )
+        fields = get_export_fields(select, FILES_SUMMARY_FIELDS if summary else FILES_FIELDS, required_fields=['file'])
+        return await stream_response(dapi.stream_function(), export_format=export, fields=fields)
+
     f_kwargs = {'agent_list': [agent_id], 'offset': offset, 'limit': limit,
                 'select': select, 'sort': parse_api_param(sort, 'sort'), 'search': parse_api_param(search, 'search'),
                 'summary': summary, 'filters': filters, 'distinct': distinct, 'q': q}
@@ -7,7 +7,7 @@ import logging
 from aiohttp import web
 
 import fortishield.syscollector as syscollector
-from api.encoder import dumps, prettify
+from api.encoder import get_export_fields, get_response_serializer, json_response, stream_response
 from api.util import remove_nones_to_dict, parse_api_param, raise_if_exc, deprecate_endpoint
 from fortishield.core.cluster.dapi.dapi import DistributedAPI
 
@@ -45,11 +45,12 @@ async def get_hardware_info(request, agent_id: str, pretty: bool = False, wait_f
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 @deprecate_endpoint()
@@ -110,11 +111,12 @@ async def get_hotfix_info(request, agent_id: str, pretty: bool = False, wait_for
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 @deprecate_endpoint()
@@ -188,11 +190,12 @@ async def get_network_address_info(request, agent_id: str, pretty: bool = False,
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 @deprecate_endpoint()
@@ -267,11 +270,12 @@ async def get_network_interface_info(request, agent_id: str, pretty: bool = Fals
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 @deprecate_endpoint()
@@ -339,11 +343,12 @@ async def get_network_protocol_info(request, agent_id: str, pretty: bool = False
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 @deprecate_endpoint()
@@ -378,18 +383,20 @@ async def get_os_info(request, agent_id: str, pretty: bool = False, wait_for_com
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 @deprecate_endpoint()
 async def get_packages_info(request, agent_id: str, pretty: bool = False, wait_for_complete: bool = False,
                             offset: int = 0, limit: int = None, select: str = None, sort: str = None,
                             search: str = None, vendor: str = None, name: str = None, architecture: str = None,
-                            version: str = None, q: str = None, distinct: bool = False) -> web.Response:
+                            version: str = None, q: str = None, distinct: bool = False,
+                            export: str = None) -> web.StreamResponse:
     """Get packages info of an agent.
 
     Parameters
@@ -424,10 +431,12 @@ async def get_packages_info(request, agent_id: str, pretty: bool = False, wait_f
         Filters by version.
     distinct : bool
         Look for distinct values.
+    export : str
+        Return every item, without pagination nor sorting, in the specified format. Values: 'ndjson', 'csv'.
 
     Returns
     -------
-    web.Response
+    web.StreamResponse
         API response.
     """
     filters = {'vendor': vendor,
@@ -436,6 +445,25 @@ async def get_packages_info(request, agent_id: str, pretty: bool = False, wait_f
                'format': request.query.get('format', None),
                'version': version}
 
+    if export:
+        f_kwargs = {'agent_list': [agent_id],
+                    'select': select,
+                    'search': parse_api_param(search, 'search'),
+                    'filters': filters,
+                    'element_type': 'packages',
+                    'q': q}
+        dapi = DistributedAPI(f=syscollector.export_item_agent,
+                              f_kwargs=remove_nones_to_dict(f_kwargs),
+                              request_type='distributed_master',
+                              is_async=False,
+                              wait_for_complete=wait_for_complete,
+                              logger=logger,
+                              rbac_permissions=request['token_info']['rbac_policies']
+                              )
+        fields = get_export_fields(select, syscollector.get_valid_fields(syscollector.Type.PACKAGES)[1],
+                                   required_fields=['agent_id'])
+        return await stream_response(dapi.stream_function(), export_format=export, fields=fields)
+
     f_kwargs = {'agent_list': [agent_id],
                 'offset': offset,
                 'limit': limit,
@@ -453,11 +481,12 @@ async def get_packages_info(request, agent_id: str, pretty: bool = False, wait_f
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 @deprecate_endpoint()
@@ -534,11 +563,12 @@ async def get_ports_info(request, agent_id: str, pretty: bool = False, wait_for_
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
 
 
 @deprecate_endpoint()
@@ -641,8 +671,9 @@ async def get_processes_info(request, agent_id: str, pretty: bool = False, wait_
                           is_async=False,
                           wait_for_complete=wait_for_complete,
                           logger=logger,
-                          rbac_permissions=request['token_info']['rbac_policies']
+                          rbac_permissions=request['token_info']['rbac_policies'],
+                          response_serializer=get_response_serializer(pretty)
                           )
     data = raise_if_exc(await dapi.distribute_function())
 
-    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+    return json_response(data, pretty=pretty)
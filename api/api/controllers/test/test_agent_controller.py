@@ -120,13 +120,56 @@ async def test_get_agents(mock_exc, mock_dapi, mock_remove, mock_dfunc, mock_exp
                                       is_async=False,
                                       wait_for_complete=False,
                                       logger=ANY,
-                                      rbac_permissions=mock_request['token_info']['rbac_policies']
+                                      rbac_permissions=mock_request['token_info']['rbac_policies'],
+                                      response_serializer=ANY
                                       )
     mock_exc.assert_called_once_with(mock_dfunc.return_value)
     mock_remove.assert_called_once_with(f_kwargs)
     assert isinstance(result, web_response.Response)
 
 
+@pytest.mark.asyncio
+@patch('api.configuration.api_conf')
+@patch('api.controllers.agent_controller.stream_response', new_callable=AsyncMock)
+@patch('api.controllers.agent_controller.DistributedAPI.stream_function')
+@patch('api.controllers.agent_controller.remove_nones_to_dict')
+@patch('api.controllers.agent_controller.DistributedAPI.__init__', return_value=None)
+async def test_get_agents_export(mock_dapi, mock_remove, mock_sfunc, mock_stream, mock_exp, mock_request=MagicMock()):
+    """Verify 'get_agents' endpoint exports the agents in chunks when the `export` parameter is used."""
+    result = await get_agents(request=mock_request, select=['name'], export='ndjson')
+    f_kwargs = {'agent_list': None,
+                'search': None,
+                'select': ['name'],
+                'filters': {
+                    'status': None,
+                    'older_than': None,
+                    'manager': None,
+                    'version': None,
+                    'group': None,
+                    'node_name': None,
+                    'name': None,
+                    'ip': None,
+                    'registerIP': mock_request.query.get('registerIP', None),
+                    'group_config_status': None
+                },
+                'q': None
+                }
+    nested = ['os.version', 'os.name', 'os.platform']
+    for field in nested:
+        f_kwargs['filters'][field] = mock_request.query.get(field, None)
+    mock_dapi.assert_called_once_with(f=agent.export_agents,
+                                      f_kwargs=mock_remove.return_value,
+                                      request_type='local_master',
+                                      is_async=False,
+                                      wait_for_complete=False,
+                                      logger=ANY,
+                                      rbac_permissions=mock_request['token_info']['rbac_policies']
+                                      )
+    mock_remove.assert_called_once_with(f_kwargs)
+    mock_stream.assert_called_once_with(mock_sfunc.return_value, export_format='ndjson', fields=['id', 'name'])
+    assert result == mock_stream.return_value
+
+
 @pytest.mark.asyncio
 @patch('api.configuration.api_conf')
 @patch('api.controllers.agent_controller.DistributedAPI.distribute_function', return_value=AsyncMock())
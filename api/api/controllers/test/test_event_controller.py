@@ -49,3 +49,24 @@ async def test_forward_event(mock_exc, mock_dapi, mock_remove, mock_dfunc, mock_
             mock_exc.assert_called_once_with(mock_dfunc.return_value)
             mock_remove.assert_called_once_with(mock_getkwargs.return_value)
             assert isinstance(result, web_response.Response)
+
+
+@pytest.mark.asyncio
+@patch('api.configuration.api_conf')
+@patch('api.controllers.event_controller.DistributedAPI.distribute_function', return_value=AsyncMock())
+@patch('api.controllers.event_controller.remove_nones_to_dict')
+@patch('api.controllers.event_controller.DistributedAPI.__init__', return_value=None)
+@patch('api.controllers.event_controller.raise_if_exc', return_value=CustomAffectedItems())
+async def test_forward_event_ndjson(mock_exc, mock_dapi, mock_remove, mock_dfunc, mock_exp, mock_request=MagicMock()):
+    """Verify 'forward_event' endpoint reads the events from NDJSON bodies."""
+    mock_request.content_type = 'application/x-ndjson'
+    with patch('api.controllers.event_controller.Body.validate_content_type') as mock_validate_content_type:
+        with patch(
+            'api.controllers.event_controller.EventIngestModel.get_ndjson_kwargs', return_value=AsyncMock()
+        ) as mock_getkwargs:
+
+            result = await forward_event(request=mock_request)
+            mock_validate_content_type.assert_not_called()
+            mock_getkwargs.assert_called_once_with(mock_request)
+            mock_remove.assert_called_once_with(mock_getkwargs.return_value)
+            assert isinstance(result, web_response.Response)
@@ -8,7 +8,7 @@ from unittest.mock import ANY, AsyncMock, MagicMock, patch
 import pytest
 from aiohttp import web_response
 from api.controllers.test.utils import CustomAffectedItems
-from fortishield.core.exception import fortishieldResourceNotFound
+from fortishield.core.exception import FortishieldResourceNotFound
 
 with patch('khulnasoft.common.fortishield_uid'):
     with patch('khulnasoft.common.fortishield_gid'):
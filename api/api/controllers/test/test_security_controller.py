@@ -26,7 +26,7 @@ with patch('khulnasoft.common.fortishield_uid'):
             set_user_role, update_policy, update_role, update_rule,
             update_user)
         from fortishield import security
-        from fortishield.core.exception import fortishieldException, FortishieldPermissionError
+        from fortishield.core.exception import FortishieldException, FortishieldPermissionError
         from fortishield.core.results import AffectedItemsFortishieldResult
         from fortishield.rbac import preprocessor
         from fortishield.tests.util import RBAC_bypasser
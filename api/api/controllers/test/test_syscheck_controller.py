@@ -93,6 +93,45 @@ async def test_get_syscheck_agent(mock_exc, mock_dapi, mock_remove, mock_dfunc,
     assert isinstance(result, web_response.Response)
 
 
+@pytest.mark.asyncio
+@patch('api.controllers.syscheck_controller.stream_response', new_callable=AsyncMock)
+@patch('api.controllers.syscheck_controller.DistributedAPI.stream_function')
+@patch('api.controllers.syscheck_controller.remove_nones_to_dict')
+@patch('api.controllers.syscheck_controller.DistributedAPI.__init__', return_value=None)
+async def test_get_syscheck_agent_export(mock_dapi, mock_remove, mock_sfunc, mock_stream, mock_request=MagicMock()):
+    """Verify 'get_syscheck_agent' endpoint exports the files in chunks when the `export` parameter is used."""
+    result = await get_syscheck_agent(request=mock_request, agent_id='001', export='csv')
+    filters = {'type': mock_request.query.get('type', None),
+               'md5': None,
+               'sha1': None,
+               'sha256': None,
+               'hash': mock_request.query.get('hash', None),
+               'file': mock_request.query.get('file', None),
+               'arch': None,
+               'value.name': mock_request.query.get('value.name', None),
+               'value.type': mock_request.query.get('value.type', None)
+               }
+    f_kwargs = {'agent_list': ['001'],
+                'select': None,
+                'search': None,
+                'summary': False,
+                'filters': filters,
+                'q': None
+                }
+    mock_dapi.assert_called_once_with(f=syscheck.export_files,
+                                      f_kwargs=mock_remove.return_value,
+                                      request_type='distributed_master',
+                                      is_async=False,
+                                      wait_for_complete=False,
+                                      logger=ANY,
+                                      rbac_permissions=mock_request['token_info']['rbac_policies']
+                                      )
+    mock_remove.assert_called_once_with(f_kwargs)
+    mock_stream.assert_called_once_with(mock_sfunc.return_value, export_format='csv',
+                                        fields=['file'] + [field for field in syscheck.FILES_FIELDS if field != 'file'])
+    assert result == mock_stream.return_value
+
+
 @pytest.mark.asyncio
 @patch('api.controllers.syscheck_controller.DistributedAPI.distribute_function', return_value=AsyncMock())
 @patch('api.controllers.syscheck_controller.remove_nones_to_dict')
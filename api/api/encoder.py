@@ -2,13 +2,29 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import csv
+import io
 import json
+from functools import partial
+from typing import AsyncIterator, Callable, Iterable
 
 import six
+from aiohttp import web
 from connexion.jsonifier import JSONEncoder
 
 from api.models.base_model_ import Model
-from fortishield.core.results import AbstractFortishieldResult
+from api.util import raise_if_exc
+from fortishield.core.exception import FortishieldException
+from fortishield.core.results import AbstractFortishieldResult, SerializedFortishieldResult
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKENDS = ('json', 'orjson')
+json_backend = 'json'
+EXPORT_CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
 
 
 class FortishieldAPIJSONEncoder(JSONEncoder):
@@ -44,6 +60,127 @@ class FortishieldAPIJSONEncoder(JSONEncoder):
         return JSONEncoder.default(self, o)
 
 
+_api_encoder = FortishieldAPIJSONEncoder()
+
+
+def set_json_backend(backend: str):
+    """Set the library used to encode the API responses.
+
+    Parameters
+    ----------
+    backend : str
+        JSON backend name. Values: 'json', 'orjson'.
+
+    Raises
+    ------
+    ValueError
+        If the backend is not supported or its library is not installed.
+    """
+    global json_backend
+
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Unsupported JSON backend '{backend}'")
+    if backend == 'orjson' and orjson is None:
+        raise ValueError("The 'orjson' JSON backend is not installed")
+    json_backend = backend
+
+
+def _orjson_default(o: object) -> object:
+    """Encode the objects not natively supported by orjson the same way FortishieldAPIJSONEncoder does."""
+    return _api_encoder.default(o)
+
+
+def _dumps_bytes(obj: object, pretty: bool = False, backend: str = 'json') -> bytes:
+    """Get a JSON encoded bytes object from an object.
+
+    The orjson backend is only used for compact outputs, as it does not support the indentation used by `prettify`.
+    Objects that orjson cannot encode, like integers bigger than 64 bits, are encoded with the json library.
+
+    Parameters
+    ----------
+    obj : object
+        Object to be encoded.
+    pretty : bool
+        Whether to prettify the output or not.
+    backend : str
+        JSON backend name.
+
+    Returns
+    -------
+    bytes
+        JSON encoded object.
+    """
+    if backend == 'orjson' and not pretty:
+        try:
+            return orjson.dumps(obj, default=_orjson_default,
+                                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            pass
+
+    return json.dumps(obj, cls=FortishieldAPIJSONEncoder, indent=3 if pretty else None).encode()
+
+
+def serialize_response(obj: object, pretty: bool = False, backend: str = 'json') -> SerializedFortishieldResult:
+    """Render an object as the JSON body of an API response.
+
+    Parameters
+    ----------
+    obj : object
+        Object to be encoded.
+    pretty : bool
+        Whether to prettify the output or not.
+    backend : str
+        JSON backend name.
+
+    Returns
+    -------
+    SerializedFortishieldResult
+        JSON encoded object.
+    """
+    return SerializedFortishieldResult(_dumps_bytes(obj, pretty=pretty, backend=backend))
+
+
+def get_response_serializer(pretty: bool = False) -> Callable:
+    """Get a response serializer to be used by the process that runs the framework function.
+
+    The JSON backend is bound to the serializer because the processes of the pools do not share it.
+
+    Parameters
+    ----------
+    pretty : bool
+        Whether to prettify the output or not.
+
+    Returns
+    -------
+    callable
+        Serializer function.
+    """
+    return partial(serialize_response, pretty=pretty, backend=json_backend)
+
+
+def json_response(data: object, pretty: bool = False, status: int = 200) -> web.Response:
+    """Build a JSON API response, sending the results already serialized as they are.
+
+    Parameters
+    ----------
+    data : object
+        Response content.
+    pretty : bool
+        Whether to prettify the output or not.
+    status : int
+        Response status code.
+
+    Returns
+    -------
+    web.Response
+        API response.
+    """
+    if isinstance(data, SerializedFortishieldResult):
+        return web.Response(body=data, status=status, content_type='application/json')
+
+    return web.json_response(data=data, status=status, dumps=prettify if pretty else dumps)
+
+
 def dumps(obj: object) -> str:
     """Get a JSON encoded str from an object.
 
@@ -60,7 +197,10 @@ def dumps(obj: object) -> str:
     -------
     str
     """
-    return json.dumps(obj, cls=FortishieldAPIJSONEncoder)
+    if json_backend == 'json':
+        return json.dumps(obj, cls=FortishieldAPIJSONEncoder)
+
+    return _dumps_bytes(obj, backend=json_backend).decode()
 
 
 def prettify(obj: object) -> str:
@@ -80,3 +220,124 @@ def prettify(obj: object) -> str:
     str
     """
     return json.dumps(obj, cls=FortishieldAPIJSONEncoder, indent=3)
+
+
+def _flatten_item(item: dict, prefix: str = '') -> dict:
+    """Flatten the nested fields of an item, joining their names with the '.' separator."""
+    flat_item = {}
+    for key, value in item.items():
+        if isinstance(value, dict):
+            flat_item.update(_flatten_item(value, prefix=f'{prefix}{key}.'))
+        else:
+            flat_item[f'{prefix}{key}'] = value
+
+    return flat_item
+
+
+def _csv_value(value: object) -> object:
+    """Get the value written in a CSV cell, using the JSON representation of the values that are not scalars."""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    elif isinstance(value, list):
+        return dumps(value)
+
+    return _api_encoder.default(value)
+
+
+def get_export_fields(select: list = None, fields: Iterable = (), required_fields: Iterable = ()) -> list:
+    """Get the columns of a CSV export.
+
+    Parameters
+    ----------
+    select : list
+        Fields selected in the request.
+    fields : Iterable
+        Every field of the exported items, used when none is selected.
+    required_fields : Iterable
+        Fields returned even if they are not selected.
+
+    Returns
+    -------
+    list
+        Names of the columns, with the nested fields joined with the '.' separator.
+    """
+    return list(dict.fromkeys([*required_fields, *(select or fields)]))
+
+
+class ExportResponse(web.StreamResponse):
+    """API response that writes the items of each chunk of an async iterator as they are received, instead of keeping
+    all of them in memory.
+
+    The items are written when aiohttp sends the response, after the handler and the middlewares have set its
+    headers. They are written as NDJSON (a JSON object per line) or as CSV. The columns of CSV responses are the given
+    fields, as the items of a chunk may not have all of them. If they are not given, the fields of the items of the
+    first chunk are used. The nested fields of the items are flattened.
+    """
+
+    def __init__(self, first_chunk: list, chunks: AsyncIterator, export_format: str = 'ndjson', fields: list = None):
+        super().__init__(status=200, headers={'Content-Type': EXPORT_CONTENT_TYPES[export_format]})
+        self.first_chunk = first_chunk
+        self.chunks = chunks
+        self.export_format = export_format
+        self.fields = fields
+        self.csv_writer = None
+        self.csv_buffer = io.StringIO()
+
+    def _encode_chunk(self, chunk: list) -> bytes:
+        if self.export_format != 'csv':
+            return ''.join(f'{dumps(item)}\n' for item in chunk).encode()
+
+        rows = [_flatten_item(item) for item in chunk]
+        if self.csv_writer is None:
+            fieldnames = self.fields or list(dict.fromkeys(field for row in rows for field in row))
+            self.csv_writer = csv.DictWriter(self.csv_buffer, fieldnames=fieldnames, extrasaction='ignore')
+            self.csv_writer.writeheader()
+        self.csv_writer.writerows({field: _csv_value(value) for field, value in row.items()} for row in rows)
+        data = self.csv_buffer.getvalue().encode()
+        self.csv_buffer.seek(0)
+        self.csv_buffer.truncate()
+
+        return data
+
+    async def prepare(self, request: web.BaseRequest):
+        """Send the headers and write the items of every chunk."""
+        if self.prepared:
+            return await super().prepare(request)
+
+        writer = await super().prepare(request)
+        await self.write(self._encode_chunk(self.first_chunk))
+        async for chunk in self.chunks:
+            await self.write(self._encode_chunk(chunk))
+
+        return writer
+
+
+async def stream_response(chunks: AsyncIterator, export_format: str = 'ndjson',
+                          fields: list = None) -> ExportResponse:
+    """Build an API response that writes the items of each chunk as they are received.
+
+    The first chunk is awaited before building the response, so the errors raised until then are returned as the
+    usual error responses.
+
+    Parameters
+    ----------
+    chunks : AsyncIterator
+        Lists of items to write.
+    export_format : str
+        Output format. Values: 'ndjson', 'csv'.
+    fields : list
+        Columns of the CSV output. Default `None`, to use the fields of the items of the first chunk.
+
+    Returns
+    -------
+    ExportResponse
+        API response.
+    """
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = []
+    except FortishieldException as e:
+        raise_if_exc(e)
+
+    return ExportResponse(first_chunk, chunks, export_format=export_format, fields=fields)
@@ -10,7 +10,7 @@ from aiohttp.web_exceptions import HTTPException
 from connexion.exceptions import OAuthProblem, ProblemException, Unauthorized
 from connexion.problem import problem as connexion_problem
 from secure import SecureHeaders
-from fortishield.core.exception import fortishieldPermissionError, FortishieldTooManyRequests
+from fortishield.core.exception import FortishieldPermissionError, FortishieldTooManyRequests
 from fortishield.core.utils import get_utc_now
 
 from api.configuration import api_conf
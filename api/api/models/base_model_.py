@@ -12,7 +12,7 @@ from connexion import ProblemException
 
 from api import util
 from api.util import raise_if_exc, get_invalid_keys
-from fortishield.core.exception import fortishieldError, FortishieldNotAcceptable
+from fortishield.core.exception import FortishieldError, FortishieldNotAcceptable
 
 T = typing.TypeVar('T')
 
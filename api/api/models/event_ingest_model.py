@@ -9,6 +9,8 @@ from connexion import ProblemException
 from api.models.base_model_ import Body
 
 MAX_EVENTS_PER_REQUEST = 100
+MAX_EVENTS_PER_NDJSON_REQUEST = 10000
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
 
 
 class EventIngestModel(Body):
@@ -52,3 +54,36 @@ class EventIngestModel(Body):
             )
 
         self._events = events
+
+    @classmethod
+    async def get_ndjson_kwargs(cls, request) -> dict:
+        """Get the function arguments from a NDJSON body, which contains one event per line.
+
+        Events are not echoed back in the response of NDJSON requests, failed events are identified by their position
+        in the body, not counting empty lines.
+
+        Parameters
+        ----------
+        request : web.Request
+            API Request.
+
+        Raises
+        ------
+        ProblemException
+            If the number of events exceeds the limit.
+
+        Returns
+        -------
+        dict
+            Function arguments.
+        """
+        body = cls.decode_body(await request.read(), unicode_error=1911, attribute_error=1912)
+        events = [line for line in body.splitlines() if line.strip()]
+        if len(events) > MAX_EVENTS_PER_NDJSON_REQUEST:
+            raise ProblemException(
+                status=400,
+                title='Events bulk size exceeded',
+                detail='The size of the events bulk is exceeding the limit'
+            )
+
+        return {'events': events, 'echo_events': False}
@@ -8,7 +8,7 @@ import sys
 from json import JSONDecodeError
 from os import listdir
 from os.path import abspath, dirname, join
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from connexion import ProblemException
@@ -19,7 +19,7 @@ with patch('fortishield.core.common.fortishield_uid'):
         from api.models import base_model_ as bm
         from api.models import event_ingest_model
         from api.util import deserialize_model
-        from fortishield import fortishieldError
+        from fortishield import FortishieldError
 
         del sys.modules['api.authentication']
 
@@ -301,3 +301,19 @@ async def test_event_ingest_model_validation(size, raises):
         assert exc.value.title == 'Events bulk size exceeded'
     else:
         await event_ingest_model.EventIngestModel.get_kwargs(request)
+
+
+@pytest.mark.parametrize('size,raises', ([2, True], [3, False]))
+async def test_event_ingest_model_ndjson(size, raises):
+    """Check the events of a NDJSON body are split by line, skipping empty lines."""
+    request = MagicMock()
+    request.read = AsyncMock(return_value=b'{"foo": 1}\n\nevent 2\r\n{"bar": 2}\n')
+    with patch.object(event_ingest_model, 'MAX_EVENTS_PER_NDJSON_REQUEST', new=size):
+        if raises:
+            with pytest.raises(ProblemException) as exc:
+                await event_ingest_model.EventIngestModel.get_ndjson_kwargs(request)
+
+            assert exc.value.title == 'Events bulk size exceeded'
+        else:
+            assert await event_ingest_model.EventIngestModel.get_ndjson_kwargs(request) == {
+                'events': ['{"foo": 1}', 'event 2', '{"bar": 2}'], 'echo_events': False}
@@ -10,11 +10,13 @@ from typing import AsyncGenerator, Callable
 
 from aiohttp import web
 
+from api.configuration import api_conf
 from api.constants import INSTALLATION_UID_KEY, INSTALLATION_UID_PATH, UPDATE_INFORMATION_KEY
 from fortishield.core import common
 from fortishield.core.cluster.utils import running_in_master_node
 from fortishield.core.configuration import update_check_is_enabled
 from fortishield.core.manager import query_update_check_service
+from fortishield.core.stats_collector import run_collector
 
 
 ONE_DAY_SLEEP = 60*60*24
@@ -90,6 +92,22 @@ async def get_update_information(app: web.Application) -> None:
         await asyncio.sleep(ONE_DAY_SLEEP)
 
 
+@cancel_signal_handler
+async def collect_daemons_stats(app: web.Application) -> None:
+    """Collect the statistics of the daemons periodically, so the daemons stats requests can use the last ones and
+    their evolution can be queried.
+
+    Parameters
+    ----------
+    app : web.Application
+        Application context.
+    """
+    collector_conf = api_conf['stats_collector']
+    logger.info('Starting the daemons statistics collector...')
+    await run_collector(interval=collector_conf['interval'], size=collector_conf['size'],
+                        max_age=collector_conf['max_age'], agents=collector_conf['agents'])
+
+
 async def register_background_tasks(app: web.Application) -> AsyncGenerator:
     """Cleanup context to handle background tasks.
 
@@ -104,6 +122,9 @@ async def register_background_tasks(app: web.Application) -> AsyncGenerator:
         tasks.append(asyncio.create_task(check_installation_uid(app)))
         tasks.append(asyncio.create_task(get_update_information(app)))
 
+    if api_conf['stats_collector']['enabled']:
+        tasks.append(asyncio.create_task(collect_daemons_stats(app)))
+
     yield
 
     for task in tasks:
@@ -13,7 +13,7 @@ from werkzeug.exceptions import Unauthorized
 
 with patch('fortishield.core.common.fortishield_uid'):
     with patch('fortishield.core.common.fortishield_gid'):
-        from fortishield.core.results import fortishieldResult
+        from fortishield.core.results import FortishieldResult
 
 import pytest
 
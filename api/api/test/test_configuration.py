@@ -16,6 +16,7 @@ custom_api_configuration = {
     "drop_privileges": True,
     "experimental_features": False,
     "max_upload_size": 10485760,
+    "json_backend": "json",
     "https": {
         "enabled": True,
         "key": "server.key",
@@ -111,6 +112,7 @@ def test_read_configuration(mock_open, mock_exists, read_config):
     {'drop_privileges': 'invalid_type'},
     {'experimental_features': 'invalid_type'},
     {'max_upload_size': 'invalid_type'},
+    {'json_backend': 'invalid_backend'},
     {'https': {'enabled': 'invalid_type'}},
     {'https': {'key': 12345}},
     {'https': {'cert': 12345}},
@@ -131,6 +133,11 @@ def test_read_configuration(mock_open, mock_exists, read_config):
     {'cache': {'enabled': 'invalid_type'}},
     {'cache': {'time': 'invalid_type'}},
     {'cache': {'invalid_subkey': 'value'}},
+    {'stats_collector': {'enabled': 'invalid_type'}},
+    {'stats_collector': {'interval': 0}},
+    {'stats_collector': {'size': 1}},
+    {'stats_collector': {'max_age': 'invalid_type'}},
+    {'stats_collector': {'invalid_subkey': 'value'}},
     {'access': {'max_login_attempts': 'invalid_type'}},
     {'access': {'block_time': 'invalid_type'}},
     {'access': {'max_request_per_minute': 'invalid_type'}},
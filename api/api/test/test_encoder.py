@@ -2,17 +2,22 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import asyncio
 import json
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
+from aiohttp import web_response
+from connexion import ProblemException
 
 from api.models.configuration_model import HTTPSModel
 
 with patch('khulnasoft.common.fortishield_uid'):
     with patch('khulnasoft.common.fortishield_gid'):
-        from api.encoder import prettify, dumps
-        from fortishield.core.results import fortishieldResult
+        from api.encoder import prettify, dumps, serialize_response, json_response, orjson
+        from fortishield.core.results import FortishieldResult
+        from api.encoder import ExportResponse, get_export_fields, stream_response
+        from fortishield.core.exception import FortishieldError
 
 
 def custom_hook(dct):
@@ -38,3 +43,100 @@ def test_encoder_dumps(o):
 def test_encoder_prettify():
     """Test prettify method from API encoder using FortishieldAPIJSONEncoder."""
     assert prettify({'k1': 'v1'}) == '{\n   "k1": "v1"\n}'
+
+
+@pytest.mark.parametrize('backend', [
+    'json',
+    pytest.param('orjson', marks=pytest.mark.skipif(orjson is None, reason='orjson is not installed'))
+])
+@pytest.mark.parametrize('pretty', [False, True])
+def test_encoder_serialize_response(pretty, backend):
+    """Test serialize_response method from API encoder renders the same content as dumps and prettify."""
+    o = FortishieldResult({'k1': 'v1', 'k2': 2 ** 70}, str_priority='v2')
+    serialized = serialize_response(o, pretty=pretty, backend=backend)
+    assert isinstance(serialized, bytes)
+    assert json.loads(serialized) == json.loads(prettify(o) if pretty else dumps(o))
+    if pretty:
+        assert serialized.decode() == prettify(o)
+
+
+@pytest.mark.parametrize('pretty', [False, True])
+def test_encoder_json_response(pretty):
+    """Test json_response method from API encoder sends the serialized results as they are."""
+    o = FortishieldResult({'k1': 'v1'}, str_priority='v2')
+    serialized = serialize_response(o, pretty=pretty)
+
+    response = json_response(serialized, pretty=pretty)
+    assert isinstance(response, web_response.Response)
+    assert response.body is serialized
+    assert response.content_type == 'application/json'
+
+    response = json_response(o, pretty=pretty)
+    assert response.text == (prettify(o) if pretty else dumps(o))
+
+
+async def async_chunks(*chunks):
+    for chunk in chunks:
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
+
+
+@pytest.mark.parametrize('export_format, expected', [
+    ('ndjson', '{"name": "a", "os": {"name": "b"}}\n{"name": "c", "os": {"name": "d", "arch": "x"}}\n'
+               '{"name": "e", "tags": ["f", "g"]}\n'),
+    ('csv', 'name,os.name,os.arch\r\na,b,\r\nc,d,x\r\ne,,\r\n'),
+])
+def test_encoder_stream_response(export_format, expected):
+    """Test stream_response method from API encoder writes the items of every chunk when the response is sent."""
+    async def send_response():
+        chunks = async_chunks([{'name': 'a', 'os': {'name': 'b'}}, {'name': 'c', 'os': {'name': 'd', 'arch': 'x'}}],
+                              [{'name': 'e', 'tags': ['f', 'g']}])
+        response = await stream_response(chunks, export_format=export_format)
+        assert isinstance(response, ExportResponse)
+        assert response.content_type == ('text/csv' if export_format == 'csv' else 'application/x-ndjson')
+        await response.prepare(None)
+
+    with patch('aiohttp.web.StreamResponse.prepare', new_callable=AsyncMock) as prepare_mock, \
+            patch('aiohttp.web.StreamResponse.write', new_callable=AsyncMock) as write_mock:
+        asyncio.run(send_response())
+
+    prepare_mock.assert_awaited_once()
+    assert b''.join(c.args[0] for c in write_mock.call_args_list).decode() == expected
+
+
+@pytest.mark.parametrize('fields, expected', [
+    (['name', 'os.name', 'os.arch'], 'name,os.name,os.arch\r\na,,\r\nc,d,x\r\n'),
+    (['os.arch', 'name'], 'os.arch,name\r\n,a\r\nx,c\r\n'),
+])
+def test_encoder_stream_response_csv_fields(fields, expected):
+    """Test stream_response method from API encoder uses the given CSV columns, even if the items of the first chunk
+    do not have all of them."""
+    async def send_response():
+        chunks = async_chunks([{'name': 'a'}], [{'name': 'c', 'os': {'name': 'd', 'arch': 'x'}}])
+        response = await stream_response(chunks, export_format='csv', fields=fields)
+        await response.prepare(None)
+
+    with patch('aiohttp.web.StreamResponse.prepare', new_callable=AsyncMock), \
+            patch('aiohttp.web.StreamResponse.write', new_callable=AsyncMock) as write_mock:
+        asyncio.run(send_response())
+
+    assert b''.join(c.args[0] for c in write_mock.call_args_list).decode() == expected
+
+
+@pytest.mark.parametrize('select, fields, required_fields, expected', [
+    (None, ['name', 'os.name', 'id'], ['id'], ['id', 'name', 'os.name']),
+    (['os.name'], ['name', 'os.name', 'id'], ['id'], ['id', 'os.name']),
+    (['os.name', 'name'], ['name', 'os.name'], (), ['os.name', 'name']),
+])
+def test_get_export_fields(select, fields, required_fields, expected):
+    """Test get_export_fields method from API encoder returns the required fields and the selected ones, or every
+    field if none is selected."""
+    assert get_export_fields(select, fields, required_fields=required_fields) == expected
+
+
+def test_encoder_stream_response_ko():
+    """Test stream_response method from API encoder raises the errors of the first chunk before the response starts."""
+    with pytest.raises(ProblemException) as exc_info:
+        asyncio.run(stream_response(async_chunks(FortishieldError(1701))))
+    assert exc_info.value.ext['code'] == 1701
@@ -8,7 +8,7 @@ from unittest.mock import AsyncMock, patch
 
 import pytest
 from freezegun import freeze_time
-from fortishield.core.exception import fortishieldPermissionError, FortishieldTooManyRequests
+from fortishield.core.exception import FortishieldPermissionError, FortishieldTooManyRequests
 
 from api.middlewares import (
     MAX_REQUESTS_EVENTS_DEFAULT,
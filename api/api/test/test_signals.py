@@ -10,6 +10,7 @@ from api.signals import (
     ONE_DAY_SLEEP,
     cancel_signal_handler,
     check_installation_uid,
+    collect_daemons_stats,
     get_update_information,
     register_background_tasks,
 )
@@ -149,14 +150,17 @@ async def test_get_update_information_schedule(
 
 
 @pytest.mark.parametrize(
-    'cluster_config,update_check_config,registered_tasks',
+    'cluster_config,update_check_config,stats_collector_config,registered_tasks',
     [
-        (True, True, 2),
-        (True, False, 0),
-        (False, True, 0),
-        (False, False, 0),
+        (True, True, False, 2),
+        (True, False, False, 0),
+        (False, True, False, 0),
+        (False, False, False, 0),
+        (True, True, True, 3),
+        (False, False, True, 1),
     ],
 )
+@patch('api.signals.collect_daemons_stats')
 @patch('api.signals.check_installation_uid')
 @patch('api.signals.get_update_information')
 @patch('api.signals.update_check_is_enabled')
@@ -167,8 +171,10 @@ async def test_register_background_tasks(
     update_check_mock,
     get_update_information_mock,
     check_installation_uid_mock,
+    collect_daemons_stats_mock,
     cluster_config,
     update_check_config,
+    stats_collector_config,
     registered_tasks,
 ):
     class AwaitableMock(AsyncMock):
@@ -179,7 +185,8 @@ async def test_register_background_tasks(
     running_in_master_node_mock.return_value = cluster_config
     update_check_mock.return_value = update_check_config
 
-    with patch('api.signals.asyncio') as create_task_mock:
+    with patch('api.signals.asyncio') as create_task_mock, \
+            patch.dict('api.signals.api_conf', {'stats_collector': {'enabled': stats_collector_config}}):
         create_task_mock.create_task.return_value = AwaitableMock(spec=asyncio.Task)
         create_task_mock.create_task.return_value.cancel = AsyncMock()
         [_ async for _ in register_background_tasks({})]
@@ -189,3 +196,13 @@ async def test_register_background_tasks(
             create_task_mock.create_task.return_value.cancel.call_count
             == registered_tasks
         )
+
+
+@patch('api.signals.run_collector')
+@pytest.mark.asyncio
+async def test_collect_daemons_stats(run_collector_mock):
+    collector_conf = {'enabled': True, 'interval': 10, 'size': 100, 'max_age': 20, 'agents': True}
+    with patch.dict('api.signals.api_conf', {'stats_collector': collector_conf}):
+        await collect_daemons_stats({})
+
+    run_collector_mock.assert_awaited_once_with(interval=10, size=100, max_age=20, agents=True)
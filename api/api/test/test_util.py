@@ -11,7 +11,7 @@ from connexion import ProblemException
 
 from api import util
 from api.api_exception import APIError
-from fortishield.core.exception import fortishieldError, FortishieldPermissionError, FortishieldResourceNotFound, FortishieldInternalError
+from fortishield.core.exception import FortishieldError, FortishieldPermissionError, FortishieldResourceNotFound, FortishieldInternalError
 
 
 class TestClass:
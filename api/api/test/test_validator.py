@@ -15,7 +15,7 @@ from api.validator import (check_exp, check_xml, _alphanumeric_param, _array_num
                            _symbols_alphanumeric_param, _base64, _group_names, _group_names_or_all, _iso8601_date,
                            _iso8601_date_time, _numbers_or_all, _cdb_filename_path, _xml_filename_path, _xml_filename,
                            check_component_configuration_pair, _active_response_command, _wpk_path)
-from fortishield import fortishieldError
+from fortishield import FortishieldError
 
 test_data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
 
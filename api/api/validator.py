@@ -11,7 +11,7 @@ from defusedxml import ElementTree as ET
 from jsonschema import draft4_format_checker
 
 from fortishield.core import common
-from fortishield.core.exception import fortishieldError
+from fortishield.core.exception import FortishieldError
 
 _alphanumeric_param = re.compile(r'^[\w,\-.+\s:]+$')
 _symbols_alphanumeric_param = re.compile(r'^[\w,*<>!\-.+\s:/()\[\]\'\"|=~#]+$')
@@ -71,6 +71,7 @@ api_config_schema = {
         "drop_privileges": {"type": "boolean"},
         "experimental_features": {"type": "boolean"},
         "max_upload_size": {"type": "integer", "minimum": 0},
+        "json_backend": {"type": "string", "enum": ["json", "orjson"]},
         "intervals": {
             "type": "object",
             "additionalProperties": False,
@@ -141,6 +142,17 @@ api_config_schema = {
                 "time": {"type": "number"},
             },
         },
+        "stats_collector": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "enabled": {"type": "boolean"},
+                "interval": {"type": "number", "minimum": 1},
+                "size": {"type": "integer", "minimum": 2},
+                "max_age": {"type": "number", "minimum": 0},
+                "agents": {"type": "boolean"},
+            },
+        },
         "access": {
             "type": "object",
             "additionalProperties": False,
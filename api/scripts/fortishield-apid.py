@@ -87,6 +87,12 @@ def start():
                 options={"middlewares": [response_postprocessing, security_middleware, request_logging,
                                          set_secure_headers]})
 
+    # Select the library used to encode the API responses
+    try:
+        encoder.set_json_backend(api_conf['json_backend'])
+    except ValueError as e:
+        logger.warning(f"{e}. The 'json' JSON backend will be used")
+
     # Maximum body size that the API can accept (bytes)
     app.app._client_max_size = configuration.api_conf['max_upload_size']
 
@@ -264,6 +270,7 @@ if __name__ == '__main__':
     import uvloop
     from aiohttp_cache import setup_cache
     from api import __path__ as api_path
+    from api import encoder
     # noinspection PyUnresolvedReferences
     from api.constants import CONFIG_FILE_PATH
     from api.middlewares import security_middleware, response_postprocessing, request_logging, set_secure_headers
@@ -3,8 +3,8 @@
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 from fortishield.core import active_response, common
-from fortishield.core.agent import get_agents_info
-from fortishield.core.exception import FortishieldException, FortishieldError, FortishieldResourceNotFound
+from fortishield.core.agent import get_agents_info, get_rbac_filters, FortishieldDBQueryAgents
+from fortishield.core.exception import FortishieldError, FortishieldResourceNotFound
 from fortishield.core.fortishield_queue import FortishieldQueue
 from fortishield.core.results import AffectedItemsFortishieldResult
 from fortishield.rbac.decorators import expose_resources
@@ -40,19 +40,45 @@ def run_command(agent_list: list = None, command: str = '', arguments: list = No
                                       none_msg='AR command was not sent to any agent'
                                       )
     if agent_list:
-        with FortishieldQueue(common.AR_SOCKET) as wq:
-            system_agents = get_agents_info()
-            for agent_id in agent_list:
-                try:
-                    if agent_id not in system_agents:
-                        raise FortishieldResourceNotFound(1701)
-                    if agent_id == "000":
-                        raise FortishieldError(1703)
-                    active_response.send_ar_message(agent_id, wq, command, arguments, alert)
-                    result.affected_items.append(agent_id)
-                    result.total_affected_items += 1
-                except FortishieldException as e:
-                    result.add_failed_item(id_=agent_id, error=e)
-            result.affected_items.sort(key=int)
+        agent_list = set(agent_list)
+
+        # Add agent with ID 000 to failed_items
+        try:
+            agent_list.remove('000')
+            result.add_failed_item('000', FortishieldError(1703))
+        except KeyError:
+            pass
+
+        system_agents = get_agents_info()
+        # Add non existent agents to failed_items
+        for agent_id in agent_list.difference(system_agents):
+            result.add_failed_item(id_=agent_id, error=FortishieldResourceNotFound(1701))
+        agent_list.intersection_update(system_agents)
+
+        if agent_list:
+            rbac_filters = get_rbac_filters(system_resources=system_agents, permitted_resources=list(agent_list))
+            with FortishieldDBQueryAgents(limit=None, select=["id", "status", "version"], **rbac_filters) as db_query:
+                agents_with_data = db_query.run()['items']
+
+            # Add agents without information and non active agents to failed_items
+            for agent_id in agent_list - {agent['id'] for agent in agents_with_data}:
+                result.add_failed_item(id_=agent_id, error=FortishieldResourceNotFound(1701))
+            eligible_agents = list()
+            for agent in agents_with_data:
+                if agent['status'] != 'active':
+                    result.add_failed_item(id_=agent['id'], error=FortishieldError(1707))
+                else:
+                    eligible_agents.append(agent)
+
+            with FortishieldQueue(common.AR_SOCKET) as wq:
+                failed_agents = active_response.send_ar_messages(eligible_agents, wq, command, arguments, alert)
+            for agent in eligible_agents:
+                if agent['id'] in failed_agents:
+                    result.add_failed_item(id_=agent['id'], error=failed_agents[agent['id']])
+                else:
+                    result.affected_items.append(agent['id'])
+
+        result.total_affected_items = len(result.affected_items)
+        result.affected_items.sort(key=int)
 
     return result
@@ -5,25 +5,21 @@
 import hashlib
 import operator
 from os import chmod, path, listdir
-from typing import Union
+from typing import Iterator, Union
 
 from fortishield.core import common, configuration
 from fortishield.core.InputValidator import InputValidator
 from fortishield.core.agent import FortishieldDBQueryAgents, FortishieldDBQueryGroupByAgents, FortishieldDBQueryMultigroups, Agent, \
-    FortishieldDBQueryGroup, create_upgrade_tasks, get_agents_info, get_groups, get_rbac_filters, send_restart_command, \
-    GROUP_FIELDS, GROUP_REQUIRED_FIELDS, GROUP_FILES_FIELDS, GROUP_FILES_REQUIRED_FIELDS
-from fortishield.core.cluster.cluster import get_node
-from fortishield.core.cluster.utils import read_cluster_config
+    FortishieldDBQueryGroup, create_upgrade_tasks, get_agents_aggregations, get_agents_info, get_groups, get_rbac_filters, \
+    send_restart_command, GROUP_FIELDS, GROUP_REQUIRED_FIELDS, GROUP_FILES_FIELDS, GROUP_FILES_REQUIRED_FIELDS
+from fortishield.core.cluster.cluster import get_node_id
 from fortishield.core.exception import FortishieldError, FortishieldInternalError, FortishieldException, FortishieldResourceNotFound
 from fortishield.core.results import FortishieldResult, AffectedItemsFortishieldResult
-from fortishield.core.utils import chmod_r, chown_r, get_hash, mkdir_with_mode, md5, process_array, clear_temporary_caches, \
-    full_copy
+from fortishield.core.utils import chmod_r, chown_r, get_cached_hash, mkdir_with_mode, md5, process_array, \
+    clear_temporary_caches, full_copy, get_fields_to_nest, plain_dict_to_nested_dict
 from fortishield.core.fortishield_queue import FortishieldQueue
 from fortishield.rbac.decorators import expose_resources
 
-cluster_enabled = not read_cluster_config(from_import=True)['disabled']
-node_id = get_node().get('node') if cluster_enabled else None
-
 UPGRADE_CHUNK_SIZE = 500
 UPGRADE_RESULT_CHUNK_SIZE = 97
 
@@ -39,6 +35,10 @@ ERROR_CODES_UPGRADE_SOCKET = [1819, 1820, 1821, 1822]
 # 1823 -> Upgrading an agent to a version higher than the manager requires the force flag
 ERROR_CODES_UPGRADE_SOCKET_BAD_REQUEST = [1823]
 
+# Fields the agents are grouped by in the overview statistics
+AGENTS_OVERVIEW_AGGREGATIONS = {'nodes': ['node_name'], 'agent_os': ['os.name', 'os.platform', 'os.version'],
+                                'agent_version': ['version'], 'agent_status': ['status', 'group_config_status']}
+
 # Error codes generated from upgrade socket error codes that should be excluded in get upgrade results
 # 1813 -> No task in DB
 ERROR_CODES_UPGRADE_SOCKET_GET_UPGRADE_RESULT = [1813]
@@ -93,48 +93,131 @@ def get_distinct_agents(agent_list: list = None, offset: int = 0, limit: int = c
 
 
 @expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"], post_proc_func=None)
-def get_agents_summary_status(agent_list: list[str] = None) -> FortishieldResult:
+def get_agents_summary_status(agent_list: list[str] = None, agents_stats: dict = None) -> FortishieldResult:
     """Count the number of agents by connection and groups configuration synchronization statuses.
 
     Parameters
     ----------
     agent_list : list[str]
        List of agents ID's
+    agents_stats : dict
+        Agents statistics kept by the master node, as returned by `get_agents_stats`. They are used instead of querying
+        the database when the user can read every agent.
 
     Returns
     -------
     FortishieldResult
         FortishieldResult object.
     """
-    connection = {'active': 0, 'disconnected': 0, 'never_connected': 0, 'pending': 0, 'total': 0}
-    sync_configuration = {'synced': 0, 'not synced': 0, 'total': 0}
+    items = []
     if agent_list:
         rbac_filters = get_rbac_filters(system_resources=get_agents_info(), permitted_resources=agent_list)
 
-        # We don't consider agent 000 in order to get the summary
-        with FortishieldDBQueryAgents(limit=None, select=['status', 'group_config_status'], query="id!=000",
-                                **rbac_filters) as db_query:
-            data = db_query.run()
+        if (stats := get_master_agents_stats(agents_stats, rbac_filters)) is not None:
+            items = stats['agent_status']
+        else:
+            # We don't consider agent 000 in order to get the summary
+            items = get_agents_aggregations({'agent_status': AGENTS_OVERVIEW_AGGREGATIONS['agent_status']},
+                                            query="id!=000", **rbac_filters)['agent_status']
+
+    return FortishieldResult({'data': _count_agents_by_status(items)})
+
 
-        items = data['items']
-        for agent in items:
-            connection[agent['status']] += 1
-            sync_configuration[agent['group_config_status']] += 1
+def get_master_agents_stats(agents_stats: Union[dict, None], rbac_filters: dict) -> Union[dict, None]:
+    """Format the agents statistics kept by the master node like the database aggregations.
+
+    They are only used when the user can read every agent, since they are not filtered by RBAC.
+
+    Parameters
+    ----------
+    agents_stats : dict or None
+        Agents statistics kept by the master node, as returned by `get_agents_stats`.
+    rbac_filters : dict
+        RBAC filters of the request, as returned by `get_rbac_filters`.
+
+    Returns
+    -------
+    dict or None
+        Items of each aggregation in AGENTS_OVERVIEW_AGGREGATIONS. None if the statistics can not be used and the
+        database must be queried instead.
+    """
+    if agents_stats is None or not rbac_filters['rbac_negate'] or rbac_filters['filters'].get('rbac_ids'):
+        return None
+
+    result = {}
+    for name, fields in AGENTS_OVERVIEW_AGGREGATIONS.items():
+        fields_to_nest, non_nested = get_fields_to_nest(fields + ['count'], ['os'], '.')
+        result[name] = [plain_dict_to_nested_dict({**dict.fromkeys(fields, 'N/A'), **item}, fields_to_nest,
+                                                  non_nested, ['os'], '.') for item in agents_stats[name]]
+    return result
 
-        connection['total'] = sync_configuration['total'] = len(items)
+
+def _count_agents_by_status(items: list) -> dict:
+    """Sum the agents of each connection and groups configuration synchronization status.
+
+    Parameters
+    ----------
+    items : list
+        Number of agents with each combination of statuses. Format: {"status": "active",
+        "group_config_status": "synced", "count": 1}
+
+    Returns
+    -------
+    dict
+        Number of agents by connection and groups configuration synchronization statuses.
+    """
+    connection = {'active': 0, 'disconnected': 0, 'never_connected': 0, 'pending': 0, 'total': 0}
+    sync_configuration = {'synced': 0, 'not synced': 0, 'total': 0}
+    for item in items:
+        connection[item['status']] += item['count']
+        sync_configuration[item['group_config_status']] += item['count']
+        connection['total'] += item['count']
+        sync_configuration['total'] += item['count']
 
     sync_configuration['not_synced'] = sync_configuration.pop('not synced')
-    return FortishieldResult({'data': {'connection': connection, 'configuration': sync_configuration}})
+    return {'connection': connection, 'configuration': sync_configuration}
 
 
 @expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"], post_proc_func=None)
-def get_agents_summary_os(agent_list: list[str] = None) -> AffectedItemsFortishieldResult:
+def get_agents_overview_stats(agent_list: list[str] = None, agents_stats: dict = None) -> FortishieldResult:
+    """Count the agents by node, OS, version and statuses using a single database request.
+
+    Parameters
+    ----------
+    agent_list : list[str]
+       List of agents ID's
+    agents_stats : dict
+        Agents statistics kept by the master node, as returned by `get_agents_stats`. They are used instead of querying
+        the database when the user can read every agent.
+
+    Returns
+    -------
+    FortishieldResult
+        FortishieldResult object with the distinct nodes, OS and versions and the agents summary status.
+    """
+    stats = dict.fromkeys(AGENTS_OVERVIEW_AGGREGATIONS, [])
+    if agent_list:
+        rbac_filters = get_rbac_filters(system_resources=get_agents_info(), permitted_resources=agent_list)
+
+        # We don't consider agent 000 in order to get the summary
+        stats = get_master_agents_stats(agents_stats, rbac_filters) or \
+            get_agents_aggregations(AGENTS_OVERVIEW_AGGREGATIONS, query="id!=000", **rbac_filters)
+
+    stats['agent_status'] = _count_agents_by_status(stats['agent_status'])
+    return FortishieldResult({'data': stats})
+
+
+@expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"], post_proc_func=None)
+def get_agents_summary_os(agent_list: list[str] = None, agents_stats: dict = None) -> AffectedItemsFortishieldResult:
     """Get a list of available OS.
 
     Parameters
     ----------
     agent_list : list[str]
        List of agents ID's
+    agents_stats : dict
+        Agents statistics kept by the master node, as returned by `get_agents_stats`. They are used instead of querying
+        the database when the user can read every agent.
 
     Returns
     -------
@@ -147,13 +230,16 @@ def get_agents_summary_os(agent_list: list[str] = None) -> AffectedItemsFortishi
     if agent_list:
         rbac_filters = get_rbac_filters(system_resources=get_agents_info(), permitted_resources=agent_list)
 
-        # We don't consider agent 000 in order to get the summary
-        with FortishieldDBQueryAgents(select=['os.platform'], default_sort_field='os_platform', min_select_fields=set(),
-                                distinct=True, query="id!=000", **rbac_filters) as db_query:
-            query_data = db_query.run()
+        if (stats := get_master_agents_stats(agents_stats, rbac_filters)) is not None:
+            platforms = {item['os']['platform'] for item in stats['agent_os']} - {'N/A', ''}
+            result.affected_items = sorted(platforms)[:common.DATABASE_LIMIT]
+        else:
+            # We don't consider agent 000 in order to get the summary
+            with FortishieldDBQueryAgents(select=['os.platform'], default_sort_field='os_platform',
+                                    min_select_fields=set(), distinct=True, query="id!=000", **rbac_filters) as db_query:
+                query_data = db_query.run()
 
-        query_data['items'] = [row['os']['platform'] for row in query_data['items']]
-        result.affected_items = query_data['items']
+            result.affected_items = [row['os']['platform'] for row in query_data['items']]
         result.total_affected_items = len(result.affected_items)
 
     return result
@@ -258,7 +344,7 @@ def restart_agents(agent_list: list = None) -> AffectedItemsFortishieldResult:
     return result
 
 
-@expose_resources(actions=['cluster:read'], resources=[f'node:id:{node_id}'],
+@expose_resources(actions=['cluster:read'], resources=lambda: [f'node:id:{get_node_id()}'],
                   post_proc_kwargs={'exclude_codes': [1701, 1703, 1707], 'force': True})
 def restart_agents_by_node(agent_list: list = None) -> AffectedItemsFortishieldResult:
     """Restart all agents belonging to a node.
@@ -354,6 +440,42 @@ def get_agents(agent_list: list = None, offset: int = 0, limit: int = common.DAT
     return result
 
 
+@expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"], post_proc_func=None)
+def export_agents(agent_list: list = None, search: dict = None, select: dict = None, filters: dict = None,
+                  q: str = None) -> Iterator[list]:
+    """Get the agents in chunks, to export them.
+
+    Unlike `get_agents`, the agents are neither counted nor sorted, and they are read from the global database in
+    chunks paginated by agent ID, so the memory used and the cost of each chunk do not depend on the number of agents.
+    The agents that do not exist are ignored.
+
+    Parameters
+    ----------
+    agent_list : list
+        List of agents IDs.
+    search : dict
+        Look for elements with the specified string. Format: {"fields": ["field1","field2"]}
+    select : dict
+        Select fields to return. Format: {"fields":["field1","field2"]}.
+    filters : dict
+        Defines required field filters. Format: {"field1":"value1", "field2":["value2","value3"]}
+    q : str
+        Query to filter results by.
+
+    Yields
+    ------
+    list
+        Agents of each chunk.
+    """
+    if not agent_list:
+        return
+
+    rbac_filters = get_rbac_filters(system_resources=get_agents_info(), permitted_resources=agent_list,
+                                    filters=filters if filters is not None else dict())
+    with FortishieldDBQueryAgents(limit=None, search=search, select=select, query=q, **rbac_filters) as db_query:
+        yield from db_query.stream()
+
+
 @expose_resources(actions=["group:read"], resources=["group:id:{group_list}"], post_proc_func=None)
 def get_agents_in_group(group_list: list, offset: int = 0, limit: int = common.DATABASE_LIMIT, sort: dict = None,
                         search: dict = None, select: dict = None, filters: dict = None,
@@ -617,11 +739,11 @@ def get_agent_groups(group_list: list = None, offset: int = 0, limit: int = None
                 full_entry = path.join(common.SHARED_PATH, group['name'])
 
                 # merged.mg and agent.conf sum
-                merged_sum = get_hash(path.join(full_entry, "merged.mg"), hash_algorithm)
+                merged_sum = get_cached_hash(path.join(full_entry, "merged.mg"), hash_algorithm)
                 if merged_sum:
                     group['mergedSum'] = merged_sum
 
-                conf_sum = get_hash(path.join(full_entry, "agent.conf"), hash_algorithm)
+                conf_sum = get_cached_hash(path.join(full_entry, "agent.conf"), hash_algorithm)
                 if conf_sum:
                     group['configSum'] = conf_sum
 
@@ -707,12 +829,12 @@ def get_group_files(group_list: list = None, offset: int = 0, limit: int = None,
         for entry in listdir(group_path):
             item = dict()
             item['filename'] = entry
-            item['hash'] = get_hash(path.join(group_path, entry), hash_algorithm)
+            item['hash'] = get_cached_hash(path.join(group_path, entry), hash_algorithm)
             data.append(item)
 
         # ar.conf
         ar_path = path.join(common.SHARED_PATH, 'ar.conf')
-        data.append({'filename': "ar.conf", 'hash': get_hash(ar_path, hash_algorithm)})
+        data.append({'filename': "ar.conf", 'hash': get_cached_hash(ar_path, hash_algorithm)})
         data = process_array(data, search_text=search_text, search_in_fields=search_in_fields,
                              complementary_search=complementary_search, sort_by=sort_by,
                              sort_ascending=sort_ascending, offset=offset, limit=limit, q=q, select=select,
@@ -1481,9 +1603,15 @@ def upload_group_file(group_list: list = None, file_data: str = None, file_name:
     return FortishieldResult({'message': configuration.upload_group_file(group_id, file_data, file_name=file_name)})
 
 
-def get_full_overview() -> FortishieldResult:
+def get_full_overview(agents_stats: dict = None) -> FortishieldResult:
     """Get information about agents.
 
+    Parameters
+    ----------
+    agents_stats : dict
+        Agents statistics kept by the master node, as returned by `get_agents_stats`. They are used instead of querying
+        the database when the user can read every agent.
+
     Returns
     -------
     FortishieldResult
@@ -1492,14 +1620,11 @@ def get_full_overview() -> FortishieldResult:
     # We don't consider agent 000 in order to get the summary
     q = "id!=000"
 
-    # Get information from different methods of Agent class
-    stats_distinct_node = get_distinct_agents(fields=['node_name'], q=q).affected_items
+    # Get information from different methods of Agent class. The nodes, OS, versions and statuses are counted in the
+    # same database request
+    stats = get_agents_overview_stats(agents_stats=agents_stats)
+    stats = stats['data'] if 'data' in stats else dict()
     groups = get_agent_groups().affected_items
-    stats_distinct_os = get_distinct_agents(fields=['os.name',
-                                                    'os.platform', 'os.version'], q=q).affected_items
-    stats_version = get_distinct_agents(fields=['version'], q=q).affected_items
-    agent_summary_status = get_agents_summary_status()
-    summary = agent_summary_status['data'] if 'data' in agent_summary_status else dict()
     try:
         last_registered_agent = [get_agents(limit=1,
                                             sort={'fields': ['dateAdd'], 'order': 'desc'},
@@ -1507,7 +1632,8 @@ def get_full_overview() -> FortishieldResult:
     except IndexError:  # an IndexError could happen if there are not registered agents
         last_registered_agent = []
     # combine results in an unique dictionary
-    result = {'nodes': stats_distinct_node, 'groups': groups, 'agent_os': stats_distinct_os, 'agent_status': summary,
-              'agent_version': stats_version, 'last_registered_agent': last_registered_agent}
+    result = {'nodes': stats.get('nodes', []), 'groups': groups, 'agent_os': stats.get('agent_os', []),
+              'agent_status': stats.get('agent_status', dict()), 'agent_version': stats.get('agent_version', []),
+              'last_registered_agent': last_registered_agent}
 
     return FortishieldResult({'data': result})
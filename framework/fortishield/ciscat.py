@@ -5,8 +5,8 @@
 from fortishield.core import common
 from fortishield.core.agent import get_agents_info
 from fortishield.core.exception import FortishieldResourceNotFound
-from fortishield.core.results import AffectedItemsFortishieldResult, merge
-from fortishield.core.syscollector import FortishieldDBQuerySyscollector
+from fortishield.core.results import AffectedItemsFortishieldResult
+from fortishield.core.syscollector import FortishieldDBQuerySyscollector, get_agents_items
 from fortishield.rbac.decorators import expose_resources
 
 
@@ -59,27 +59,14 @@ def get_ciscat_results(agent_list: list = None, offset: int = 0, limit: int = co
     table = 'ciscat_results'
 
     system_agents = get_agents_info()
-    for agent in agent_list:
-        try:
-            if agent not in system_agents:
-                raise FortishieldResourceNotFound(1701)
-            with FortishieldDBQuerySyscollector(agent_id=agent, offset=offset, limit=limit, select=select,
-                                          search=search,
-                                          sort=sort, filters=filters, fields=valid_select_fields, table=table,
-                                          array=array, nested=nested, query=q) as db_query:
-                data = db_query.run()
 
-            if len(data['items']) > 0:
-                for item in data['items']:
-                    item['agent_id'] = agent
-                    result.affected_items.append(item)
-                result.total_affected_items += data['totalItems']
-        except FortishieldResourceNotFound as e:
-            result.add_failed_item(id_=agent, error=e)
+    def query_agent(agent_id, connection, query_offset, query_limit):
+        if agent_id not in system_agents:
+            raise FortishieldResourceNotFound(1701)
+        with FortishieldDBQuerySyscollector(agent_id=agent_id, offset=query_offset, limit=query_limit, select=select,
+                                      search=search, sort=sort, filters=filters, fields=valid_select_fields,
+                                      table=table, array=array, nested=nested, query=q,
+                                      connection=connection) as db_query:
+            return db_query.run()
 
-    result.affected_items = merge(*[[res] for res in result.affected_items],
-                                  criteria=result.sort_fields,
-                                  ascending=result.sort_ascending,
-                                  types=result.sort_casting)
-
-    return result
+    return get_agents_items(result, agent_list, query_agent, offset=offset, limit=limit)
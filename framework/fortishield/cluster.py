@@ -6,18 +6,15 @@ from typing import Union
 
 from fortishield.core import common
 from fortishield.core.cluster import local_client
-from fortishield.core.cluster.cluster import get_node
+from fortishield.core.cluster.cluster import get_node, get_node_id
 from fortishield.core.cluster.control import get_health, get_nodes, get_node_ruleset_integrity
-from fortishield.core.cluster.utils import get_cluster_status, read_cluster_config, read_config
+from fortishield.core.cluster.utils import get_cluster_status, read_config
 from fortishield.core.exception import FortishieldError, FortishieldResourceNotFound
 from fortishield.core.results import AffectedItemsFortishieldResult, FortishieldResult
 from fortishield.rbac.decorators import expose_resources, async_list_handler
 
-cluster_enabled = not read_cluster_config(from_import=True)['disabled']
-node_id = get_node().get('node') if cluster_enabled else None
 
-
-@expose_resources(actions=['cluster:read'], resources=[f'node:id:{node_id}'])
+@expose_resources(actions=['cluster:read'], resources=lambda: [f'node:id:{get_node_id()}'])
 def read_config_wrapper() -> AffectedItemsFortishieldResult:
     """Wrapper for read_config.
 
@@ -32,13 +29,13 @@ def read_config_wrapper() -> AffectedItemsFortishieldResult:
     try:
         result.affected_items.append(read_config())
     except FortishieldError as e:
-        result.add_failed_item(id_=node_id, error=e)
+        result.add_failed_item(id_=get_node_id(), error=e)
     result.total_affected_items = len(result.affected_items)
 
     return result
 
 
-@expose_resources(actions=['cluster:read'], resources=[f'node:id:{node_id}'])
+@expose_resources(actions=['cluster:read'], resources=lambda: [f'node:id:{get_node_id()}'])
 def get_node_wrapper() -> AffectedItemsFortishieldResult:
     """Wrapper for get_node.
 
@@ -53,7 +50,7 @@ def get_node_wrapper() -> AffectedItemsFortishieldResult:
     try:
         result.affected_items.append(get_node())
     except FortishieldError as e:
-        result.add_failed_item(id_=node_id, error=e)
+        result.add_failed_item(id_=get_node_id(), error=e)
     result.total_affected_items = len(result.affected_items)
 
     return result
@@ -138,7 +135,7 @@ async def get_nodes_info(lc: local_client.LocalClient, filter_node: Union[str, l
     return result
 
 
-@expose_resources(actions=['cluster:read'], resources=[f"node:id:{node_id}"],
+@expose_resources(actions=['cluster:read'], resources=lambda: [f'node:id:{get_node_id()}'],
                   post_proc_func=async_list_handler)
 async def get_ruleset_sync_status(master_md5: dict = None):
     """Compare node's md5 with the master node's to check the custom ruleset synchronization status.
@@ -163,9 +160,9 @@ async def get_ruleset_sync_status(master_md5: dict = None):
         lc = local_client.LocalClient()
         node_ruleset_integrity = await get_node_ruleset_integrity(lc)
     except FortishieldError as e:
-        result.add_failed_item(id_=node_id, error=e)
+        result.add_failed_item(id_=get_node_id(), error=e)
     else:
-        result.affected_items.append({'name': node_id,
+        result.affected_items.append({'name': get_node_id(),
                                       'synced': master_md5 == node_ruleset_integrity})
     result.total_affected_items = len(result.affected_items)
 
@@ -4,15 +4,20 @@
 
 import json
 
+from cachetools import TTLCache
+
 from fortishield.core import common
 from fortishield.core.agent import Agent
 from fortishield.core.cluster.cluster import get_node
 from fortishield.core.cluster.utils import read_cluster_config
-from fortishield.core.exception import FortishieldError
+from fortishield.core.exception import FortishieldError, FortishieldException
 from fortishield.core.utils import FortishieldVersion
 from fortishield.core.fortishield_queue import FortishieldQueue
 from fortishield.core.fortishield_socket import create_fortishield_socket_message
 
+# Active response status of each agent. Key: (agent ID, agent version) - Value: whether active response is disabled
+ar_disabled_cache = TTLCache(maxsize=4500, ttl=60)
+
 
 def get_commands() -> list:
     """Get the available commands.
@@ -294,4 +299,78 @@ def send_ar_message(agent_id: str = '', wq: FortishieldQueue = None, command: st
     wq.send_msg_to_agent(msg=msg_queue, agent_id=agent_id, msg_type=FortishieldQueue.AR_TYPE)
 
 
+def check_ar_enabled(agent_id: str, agent_version: str) -> None:
+    """Check whether active response is enabled in the agent. The agent configuration is cached for each agent ID and
+    version, so it is only requested again after the cache TTL or when the agent is upgraded.
+
+    Parameters
+    ----------
+    agent_id : str
+        ID of the agent.
+    agent_version : str
+        Version of the agent.
+
+    Raises
+    ------
+    FortishieldError(1750)
+        If active response is disabled in the specified agent.
+    """
+    key = (agent_id, agent_version)
+    try:
+        disabled = ar_disabled_cache[key]
+    except KeyError:
+        agent_conf = Agent(agent_id).get_config('com', 'active-response', agent_version)
+        disabled = ar_disabled_cache[key] = agent_conf['active-response']['disabled'] == 'yes'
+
+    if disabled:
+        raise FortishieldError(1750)
+
+
+def send_ar_messages(agents: list, wq: FortishieldQueue = None, command: str = '', arguments: list = None,
+                     alert: dict = None) -> dict:
+    """Send the active response message to several active agents.
+
+    The message is only created once for each message builder. All the messages are created before sending any of them
+    through the queue.
 
+    Parameters
+    ----------
+    agents : list
+        Active agents where the message will be sent to, as dictionaries with their `id` and `version`.
+    wq : FortishieldQueue
+        Used for the active response messages.
+    command : str
+        Command running in the agents. If this value starts with !, then it refers to a script name instead of a
+        command name.
+    arguments : list
+        Command arguments.
+    alert : dict
+        Alert information depending on the AR executed.
+
+    Returns
+    -------
+    dict
+        Exception raised for each agent the message could not be sent to, indexed by agent ID.
+    """
+    failed_agents = dict()
+    builders_messages = dict()
+    messages = list()
+    for agent in agents:
+        try:
+            check_ar_enabled(agent['id'], agent['version'])
+            message_builder = ARMessageBuilder.choose_builder(agent['version'])
+            builder_type = type(message_builder)
+            if builder_type not in builders_messages:
+                builders_messages[builder_type] = message_builder.create_message(command=command, arguments=arguments,
+                                                                                 alert=alert)
+            messages.append((agent['id'], builders_messages[builder_type]))
+        except FortishieldException as e:
+            failed_agents[agent['id']] = e
+
+    for agent_id, msg_queue in messages:
+        try:
+            wq.send_msg_to_agent(msg=msg_queue, agent_id=agent_id, msg_type=FortishieldQueue.AR_TYPE)
+        except FortishieldException as e:
+            failed_agents[agent_id] = e
+
+    return failed_agents
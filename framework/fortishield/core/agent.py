@@ -7,11 +7,14 @@ import json
 import re
 import threading
 from base64 import b64encode
+from collections import defaultdict, deque
+from contextlib import ExitStack
 from datetime import datetime, timezone
 from functools import lru_cache
 from json import dumps, loads
 from os import listdir, path
 from shutil import rmtree
+from typing import Iterator
 
 from fortishield.core import common, configuration, stats
 from fortishield.core.InputValidator import InputValidator
@@ -1277,41 +1280,38 @@ def send_restart_command(agent_id: str = '', agent_version: str = '', wq: Fortis
 
 
 @common.context_cached('system_agents')
-def get_agents_info() -> set:
+def get_agents_info() -> frozenset:
     """Get all agent IDs in the system.
 
     Returns
     -------
-    set
+    frozenset
         IDs of all agents in the system.
     """
     with open(common.CLIENT_KEYS, 'r') as f:
         file_content = f.read()
 
-    result = set(agent_regex.findall(file_content))
-    result.add('000')
-
-    return result
+    return frozenset(agent_regex.findall(file_content)) | {'000'}
 
 
 @common.context_cached('system_groups')
-def get_groups() -> set:
+def get_groups() -> frozenset:
     """Get all groups in the system.
 
     Returns
     -------
-    set
+    frozenset
         Names of all groups in the system.
     """
     groups = set()
     for shared_file in listdir(common.SHARED_PATH):
         path.isdir(path.join(common.SHARED_PATH, shared_file)) and groups.add(shared_file)
 
-    return groups
+    return frozenset(groups)
 
 
 @common.context_cached('system_expanded_groups')
-def expand_group(group_name: str) -> set:
+def expand_group(group_name: str) -> frozenset:
     """Expand a certain group or all (*) of them.
 
     Parameters
@@ -1321,7 +1321,7 @@ def expand_group(group_name: str) -> set:
 
     Returns
     -------
-    set
+    frozenset
         Set of agent IDs.
     """
     agents_ids = []
@@ -1349,7 +1349,7 @@ def expand_group(group_name: str) -> set:
     finally:
         fdb_conn.close()
 
-    return set(agents_ids) & get_agents_info()
+    return get_agents_info().intersection(agents_ids)
 
 
 @lru_cache()
@@ -1399,10 +1399,79 @@ def get_rbac_filters(system_resources: set = None, permitted_resources: list = N
     return {'filters': filters, 'rbac_negate': negate}
 
 
-def create_upgrade_tasks(eligible_agents: list, chunk_size: int, command: str, **kwargs) -> list:
-    """Recursive function used to create the agents upgrade tasks.
+def get_agents_aggregations(aggregations: dict, query: str = '', filters: dict = None,
+                            rbac_negate: bool = True) -> dict:
+    """Count the agents grouped by several sets of fields, sending every aggregation to fortishield-db in a single
+    request.
+
+    Parameters
+    ----------
+    aggregations : dict
+        Fields to group the agents by in each aggregation. Format: {"name": ["field1", "field2"]}.
+    query : str
+        Query to filter the agents by. Format: field operator value.
+    filters : dict
+        Field filters, including the RBAC ones. Format: {"field1": "value1", "rbac_ids": ["001", "002"]}.
+    rbac_negate : bool
+        Whether to use IN or NOT IN on RBAC resources.
 
-    If a task manager communication error is in the response (error with code 4), the chunk size used is split in half.
+    Returns
+    -------
+    dict
+        Groups of each aggregation and the number of agents in them.
+        Format: {"name": [{"field1": "value1", "field2": "value2", "count": 1}]}.
+    """
+    def aggregation_query(fields: list) -> FortishieldDBQueryGroupByAgents:
+        return FortishieldDBQueryGroupByAgents(filter_fields=fields, select=fields, offset=0, limit=None, sort=None,
+                                         search=None, query=query, filters=filters, rbac_negate=rbac_negate,
+                                         min_select_fields=set(), count=True, get_data=True)
+
+    rbac_ids = filters.get('rbac_ids', []) if filters else []
+    # Every aggregation repeats the RBAC filter, so the request must fit in the socket buffer
+    if len(','.join(rbac_ids)) * len(aggregations) < common.MAX_QUERY_FILTERS_RESERVED_SIZE:
+        with ExitStack() as stack:
+            db_queries = {name: stack.enter_context(aggregation_query(fields))
+                          for name, fields in aggregations.items()}
+            subqueries = {name: db_query.get_aggregation_query() for name, db_query in db_queries.items()}
+            columns = sorted(set().union(*(db_query.select for db_query in db_queries.values())) - {'count'})
+            # All the aggregations use the same query and filters, so their request parameters are the same too
+            request = next(iter(db_queries.values())).request
+            union = ' UNION ALL '.join(
+                "SELECT '{0}' AS aggregation,{1},count FROM ({2})".format(
+                    name, ','.join(f'"{column}"' if column in db_queries[name].select else f'NULL AS "{column}"'
+                                   for column in columns), subquery)
+                for name, subquery in subqueries.items())
+
+            try:
+                rows = next(iter(db_queries.values())).backend.execute_single(union, request)
+            except FortishieldInternalError as e:
+                if e.code != 2009:
+                    raise
+            else:
+                aggregated_rows = defaultdict(list)
+                for row in rows:
+                    aggregated_rows[row.pop('aggregation')].append(row)
+
+                result = {}
+                for name, db_query in db_queries.items():
+                    db_query._data = aggregated_rows[name]
+                    result[name] = db_query._format_data_into_dictionary()['items']
+                return result
+
+    # The aggregations are run one by one if they do not fit in a single request or response
+    result = {}
+    for name, fields in aggregations.items():
+        with aggregation_query(fields) as db_query:
+            result[name] = db_query.run()['items']
+    return result
+
+
+def create_upgrade_tasks(eligible_agents: list, chunk_size: int, command: str, **kwargs) -> Iterator[dict]:
+    """Create the agents upgrade tasks, sending the agents to the upgrade socket in chunks.
+
+    The response of each chunk is returned as soon as it is received. If a task manager communication error (error with
+    code 4) is in the response, the agents with that error are sent again before the pending ones and the chunk size
+    used from then on is split in half. The rest of the response is kept.
 
     Parameters
     ----------
@@ -1415,27 +1484,29 @@ def create_upgrade_tasks(eligible_agents: list, chunk_size: int, command: str, *
     **kwargs
         Upgrade procedure extra parameters.
 
-    Returns
-    -------
-    list
-        Upgrade tasks results.
+    Yields
+    ------
+    dict
+        Upgrade tasks results of each chunk.
     """
-    result = []
-    agents_chunks = [eligible_agents[x:x + chunk_size] for x in range(0, len(eligible_agents), chunk_size)]
-    for chunk in agents_chunks:
+    pending_agents = deque(eligible_agents)
+    while pending_agents:
+        chunk = [pending_agents.popleft() for _ in range(min(chunk_size, len(pending_agents)))]
         response = core_upgrade_agents(command=command, agents_chunk=chunk, wpk_repo=kwargs.get('wpk_repo'),
                                        version=kwargs.get('version'), force=kwargs.get('force'),
                                        use_http=kwargs.get('use_http'), file_path=kwargs.get('file_path'),
                                        installer=kwargs.get('installer'), get_result=kwargs.get('get_result'))
 
-        # In case of task manager communication error, try to create the upgrade tasks again with a smaller chunk size
+        # In case of task manager communication error, send the failed agents again with a smaller chunk size
         # If the used chunk size is 1, return the response with the task manager communication error
-        if any(item['error'] == 4 for item in response['data']) and chunk_size != 1:
-            return create_upgrade_tasks(eligible_agents, chunk_size // 2, command, **kwargs)
-
-        result.append(response)
-
-    return result
+        if chunk_size != 1:
+            failed_agents = [item['agent'] for item in response['data'] if item['error'] == 4]
+            if failed_agents:
+                pending_agents.extendleft(reversed(failed_agents))
+                chunk_size //= 2
+                response['data'] = [item for item in response['data'] if item['error'] != 4]
+
+        yield response
 
 
 def core_upgrade_agents(agents_chunk: list, command: str = 'upgrade_result', wpk_repo: str = None, version: str = None,
@@ -3,8 +3,11 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio
+import base64
 import itertools
+import json
 import logging
+import os
 import ssl
 import traceback
 from time import perf_counter
@@ -180,6 +183,36 @@ class AbstractClient(common.Handler):
         except Exception as e:        
             self.logger.error(f"Could not connect to master: {str(e)}.")
             self.transport.close()
+            return
+
+        if self.my_fernet is not None and self.cluster_items['intervals']['communication']['aead_transport']:
+            self.loop.create_task(self.negotiate_transport())
+
+    async def negotiate_transport(self):
+        """Negotiate with the server the AEAD transport and the compression of large payloads to replace Fernet.
+
+        The AEAD cipher is initialized before sending the request, so the response can be decrypted if the server
+        already uses it. Requests are sent with Fernet until the response is received. Servers that do not support
+        this command answer with an error, and Fernet is kept.
+        """
+        salt = os.urandom(16)
+        self.set_aead(salt)
+        request = {'aead': self.aead_algorithm, 'salt': base64.b64encode(salt).decode(), 'compression': ['zlib']}
+        try:
+            response = await self.send_request(command=b'transport', data=json.dumps(request).encode())
+            if isinstance(response, Exception):
+                raise response
+            response = json.loads(response)
+        except Exception as e:
+            self.logger.debug(f"Could not negotiate the cluster transport, Fernet will be used: {e}")
+            return
+
+        if response['aead'] == self.aead_algorithm:
+            if response['compression'] == 'zlib':
+                self.compress_min_size = self.cluster_items['intervals']['communication']['compress_min_size']
+            self.aead_send = True
+            self.logger.debug(f"Using the {self.aead_algorithm} cluster transport"
+                              f"{' with zlib compression' if self.compress_min_size is not None else ''}.")
 
     def connection_made(self, transport):
         """Define process of connecting to the server.
@@ -3,6 +3,7 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import errno
+import hashlib
 import itertools
 import json
 import logging
@@ -10,7 +11,7 @@ import os.path
 import shutil
 import zlib
 from asyncio import wait_for
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from functools import partial
 from operator import eq
 from os import listdir, path, remove, stat, walk
@@ -28,6 +29,10 @@ logger = logging.getLogger('fortishield')
 FILE_SEP = '|@@//@@|'
 PATH_SEP = '|//@@//|'
 
+# Compressed content of the files sent in the sync zips, indexed by the content hash and the compression level.
+compressed_files_cache = OrderedDict()
+compressed_files_cache_size = 0
+
 
 #
 # Cluster
@@ -114,6 +119,55 @@ def check_cluster_status():
     return not read_config()['disabled']
 
 
+def get_node_id(default: str = None) -> str:
+    """Get the name of the current node if the cluster is enabled.
+
+    The cluster configuration is read once per process (see `read_config`), so this function can be used instead of
+    computing the node name when a module is imported.
+
+    Parameters
+    ----------
+    default : str
+        Value returned when the cluster is disabled.
+
+    Returns
+    -------
+    str
+        Name of the node or the default value.
+    """
+    return get_node()['node'] if check_cluster_status() else default
+
+
+def get_node_rbac_actions(action: str) -> list:
+    """Get the RBAC actions required by a node-level framework function, which depend on whether the cluster is
+    enabled. Use it with `functools.partial` as `actions` of `expose_resources`, so they are resolved when the function
+    is called.
+
+    Parameters
+    ----------
+    action : str
+        Action name, without resource type. Example: 'read'.
+
+    Returns
+    -------
+    list
+        'cluster:<action>' if the cluster is enabled and 'manager:<action>' otherwise.
+    """
+    return [f"{'cluster' if check_cluster_status() else 'manager'}:{action}"]
+
+
+def get_node_rbac_resources() -> list:
+    """Get the RBAC resources required by a node-level framework function. Use it as `resources` of
+    `expose_resources`, so they are resolved when the function is called.
+
+    Returns
+    -------
+    list
+        The node resource if the cluster is enabled and the resourceless one otherwise.
+    """
+    return [f"node:id:{get_node()['node']}" if check_cluster_status() else '*:*:*']
+
+
 #
 # Files
 #
@@ -307,6 +361,44 @@ def update_cluster_control(failed_file, ko_files, exists=True):
         pass
 
 
+def get_compressed_content(content, compress_level):
+    """Compress the content of a file, reusing the result if the same content was already compressed.
+
+    The same files are usually sent to every worker node whose integrity check failed. The compressed
+    content is cached by its BLAKE2b hash, so it is only compressed once for all the sync zips built in this
+    process. The cache is limited to 'compress_cache_size' bytes and the least recently used items are discarded.
+
+    Parameters
+    ----------
+    content : bytes
+        Content of the file.
+    compress_level : int
+        Zlib compression level.
+
+    Returns
+    -------
+    bytes
+        Compressed content.
+    """
+    key = (hashlib.blake2b(content).digest(), compress_level)
+    try:
+        compressed_files_cache.move_to_end(key)
+        return compressed_files_cache[key]
+    except KeyError:
+        pass
+
+    global compressed_files_cache_size
+    compressed = zlib.compress(content, level=compress_level)
+    max_cache_size = get_cluster_items()['intervals']['communication']['compress_cache_size']
+    if len(compressed) <= max_cache_size:
+        compressed_files_cache[key] = compressed
+        compressed_files_cache_size += len(compressed)
+        while compressed_files_cache_size > max_cache_size:
+            compressed_files_cache_size -= len(compressed_files_cache.popitem(last=False)[1])
+
+    return compressed
+
+
 def compress_files(name, list_path, cluster_control_json=None, max_zip_size=None):
     """Create a zip with cluster_control.json and the files listed in list_path.
 
@@ -358,7 +450,7 @@ def compress_files(name, list_path, cluster_control_json=None, max_zip_size=None
                         update_cluster_control(file, cluster_control_json)
                         continue
                     # Compress the content of each file and surrounds it with separators.
-                    new_file = f'{file}{PATH_SEP}'.encode() + zlib.compress(new_file, level=compress_level) + \
+                    new_file = f'{file}{PATH_SEP}'.encode() + get_compressed_content(new_file, compress_level) + \
                                FILE_SEP.encode()
 
                 if (len(new_file) + zip_size) <= max_zip_size:
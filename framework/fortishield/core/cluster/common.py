@@ -4,6 +4,7 @@
 
 import asyncio
 import base64
+import codecs
 import contextlib
 import datetime
 import hashlib
@@ -15,11 +16,16 @@ import re
 import struct
 import time
 import traceback
+import zlib
 from importlib import import_module
 from typing import Tuple, Dict, Callable, List, Iterable, Union, Any
 from uuid import uuid4
 
+import cryptography.exceptions
 import cryptography.fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 import fortishield.core.results as wresults
 from fortishield import Fortishield
@@ -78,13 +84,15 @@ class InBuffer:
         self.cmd = ''  # request's command in header
         self.flag_divided = b''  # request's command flag to indicate a msg division
         self.counter = 0  # request's counter in the box
+        self.header_received = False  # whether the request's header has been processed
 
-    def get_info_from_header(self, header: bytes, header_format: str, header_size: int) -> bytes:
+    def get_info_from_header(self, header: Union[bytes, memoryview], header_format: str,
+                             header_size: int) -> Union[bytes, memoryview]:
         """Get information contained in the request's header.
 
         Parameters
         ----------
-        header : bytes
+        header : bytes or memoryview
             Raw header to process.
         header_format : str
             Struct format of the header.
@@ -93,7 +101,7 @@ class InBuffer:
 
         Returns
         -------
-        header : bytes
+        header : bytes or memoryview
             Buffer without the content of the header.
         """
         self.counter, self.total, cmd = struct.unpack(header_format, header[:header_size])
@@ -104,26 +112,295 @@ class InBuffer:
         # Command is the first 11 B of command without dashes (in case they were added)
         self.cmd = cmd[:-1].split(b' ')[0]
         self.payload = bytearray(self.total)
+        self.header_received = True
         return header[header_size:]
 
-    def receive_data(self, data: bytes) -> bytes:
+    def receive_data(self, data: Union[bytes, memoryview]) -> memoryview:
         """Add received data to payload bytearray.
 
+        The data is copied once into its position of the preallocated payload. Slices are taken from a memoryview,
+        so they do not copy the data.
+
         Parameters
         ----------
-        data : bytes
+        data : bytes or memoryview
             Received data.
 
         Returns
         -------
-            Extended data buffer.
+        memoryview
+            Remaining data, not belonging to this payload.
         """
-        len_data = len(data[:self.total - self.received])
-        self.payload[self.received:len_data + self.received] = data[:self.total - self.received]
+        data = memoryview(data)
+        len_data = min(len(data), self.total - self.received)
+        self.payload[self.received:len_data + self.received] = data[:len_data]
         self.received += len_data
         return data[len_data:]
 
 
+class SyncChunksStream:
+    """
+    Parse the chunks of a string sent by SyncFortishielddb while it is being received.
+
+    The string is a JSON object with the command and payload used to update fortishield-db and a list of chunks.
+    The chunks are decoded from the part of the payload received so far, so they can be processed before the whole
+    string arrives and without loading all of them at once. Every received byte is decoded once and the unparsed text
+    is only copied when a token is split between two parts of the payload.
+    """
+
+    def __init__(self, in_buffer: InBuffer):
+        """Class constructor.
+
+        Parameters
+        ----------
+        in_buffer : InBuffer
+            Buffer where the string is being received.
+        """
+        self.in_buffer = in_buffer
+        self.position = 0  # offset of the first byte of the payload that has not been parsed yet
+        self.decoded = 0  # offset of the first byte of the payload that has not been decoded yet
+        self._text = ''  # decoded text, parsed up to `_index`
+        self._index = 0
+        self._pending = []  # decoded text not appended to `_text` yet
+        self._utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.state = 'start'  # next JSON token expected
+        self.header = {}  # keys of the JSON object other than the chunks
+        self.n_chunks = 0  # number of parsed chunks
+        self.last_chunk = None  # last parsed chunk
+        self.data_received = asyncio.Event()  # set every time new data is added to the buffer
+        self._decoder = json.JSONDecoder()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the whole JSON object has been parsed."""
+        return self.state == 'end'
+
+    @property
+    def in_chunks(self) -> bool:
+        """Whether the keys before the list of chunks have been parsed."""
+        return self.state in ('chunk', 'chunk_sep')
+
+    def _decode_received(self):
+        """Decode the part of the payload received since the last call. An incomplete UTF-8 sequence at the end is kept
+        by the decoder until the rest of it is received.
+
+        Raises
+        ------
+        ValueError
+            If the payload is not valid UTF-8 data.
+        """
+        received = self.in_buffer.received
+        if received > self.decoded:
+            try:
+                self._pending.append(self._utf8_decoder.decode(self.in_buffer.payload[self.decoded:received],
+                                                               final=received >= self.in_buffer.total))
+            except UnicodeDecodeError as e:
+                raise ValueError(f'invalid UTF-8 data: {e}')
+            self.decoded = received
+
+    def _advance(self, index: int):
+        """Mark the decoded text as parsed up to the given position.
+
+        Parameters
+        ----------
+        index : int
+            Position of `_text` after the last complete token.
+        """
+        text = self._text
+        self.position += index - self._index if text.isascii() else len(text[self._index:index].encode())
+        self._index = index
+
+    def _next_char(self, text: str, index: int) -> Tuple[str, int]:
+        """Get the next character that is not a whitespace.
+
+        Parameters
+        ----------
+        text : str
+            Text to parse.
+        index : int
+            Position to start from.
+
+        Returns
+        -------
+        str
+            Character found.
+        int
+            Position after the character.
+
+        Raises
+        ------
+        EOFError
+            If the text ends before a character is found.
+        """
+        while index < len(text) and text[index] in ' \t\n\r':
+            index += 1
+        if index == len(text):
+            raise EOFError
+        return text[index], index + 1
+
+    def _decode_value(self, text: str, index: int) -> Tuple[Any, int]:
+        """Decode the JSON value that starts after the whitespaces found in the given position.
+
+        Parameters
+        ----------
+        text : str
+            Text to parse.
+        index : int
+            Position to start from.
+
+        Returns
+        -------
+        Any
+            Decoded value.
+        int
+            Position after the value.
+
+        Raises
+        ------
+        EOFError
+            If the value is not complete.
+        """
+        _, index = self._next_char(text, index)
+        try:
+            return self._decoder.raw_decode(text, index - 1)
+        except json.JSONDecodeError:
+            raise EOFError
+
+    def _expect(self, text: str, index: int, expected: str) -> Tuple[str, int]:
+        """Get the next character that is not a whitespace and check that it is one of the expected ones.
+
+        Parameters
+        ----------
+        text : str
+            Text to parse.
+        index : int
+            Position to start from.
+        expected : str
+            Valid characters.
+
+        Returns
+        -------
+        str
+            Character found.
+        int
+            Position after the character.
+
+        Raises
+        ------
+        ValueError
+            If the character is not one of the expected ones.
+        """
+        char, index = self._next_char(text, index)
+        if char not in expected:
+            raise ValueError(f"expected one of '{expected}' in position {self.position + index - self._index - 1}, "
+                             f"found '{char}'")
+        return char, index
+
+    def parse(self, max_chunks: int = None) -> List[str]:
+        """Parse the chunks received since the last call.
+
+        The position of the last complete token is stored, so the next call continues from there.
+
+        Parameters
+        ----------
+        max_chunks : int
+            Maximum number of chunks to parse. All the available ones are parsed if it is None.
+
+        Returns
+        -------
+        list
+            Parsed chunks.
+
+        Raises
+        ------
+        ValueError
+            If the string is not a JSON object with a list of chunks.
+        """
+        self._decode_received()
+        chunks = []
+        while True:
+            text, index = self._text, self._index
+            try:
+                while self.state != 'end':
+                    if self.state == 'start':
+                        _, index = self._expect(text, index, '{')
+                        self.state = 'key'
+                    elif self.state in ('key', 'key_sep'):
+                        # Keys are only updated when the whole key-value pair is available.
+                        char, new_index = self._expect(text, index, '"}' if self.state == 'key' else ',}')
+                        if char == '}':
+                            index, self.state = new_index, 'end'
+                            continue
+                        key, new_index = self._decode_value(text, index if self.state == 'key' else new_index)
+                        if not isinstance(key, str):
+                            raise ValueError(f'invalid key in position {self.position + index - self._index}')
+                        _, new_index = self._expect(text, new_index, ':')
+                        if key == 'chunks':
+                            _, index = self._expect(text, new_index, '[')
+                            self.state = 'chunk'
+                        else:
+                            value, new_index = self._decode_value(text, new_index)
+                            # Make sure that the value is not a truncated number.
+                            self._next_char(text, new_index)
+                            self.header[key], index = value, new_index
+                            self.state = 'key_sep'
+                    elif self.state in ('chunk', 'chunk_sep'):
+                        char, new_index = self._expect(text, index, '"]' if self.state == 'chunk' else ',]')
+                        if char == ']':
+                            index, self.state = new_index, 'key_sep'
+                        elif max_chunks is not None and len(chunks) >= max_chunks:
+                            break
+                        else:
+                            chunk, new_index = self._decode_value(text, index if self.state == 'chunk' else new_index)
+                            if not isinstance(chunk, str):
+                                raise ValueError(f'invalid chunk in position {self.position + index - self._index}')
+                            chunks.append(chunk)
+                            index = new_index
+                            self.state = 'chunk_sep'
+            except EOFError:
+                if self._pending:
+                    # Only the incomplete token is copied along with the new text
+                    self._advance(index)
+                    self._text = self._text[index:] + ''.join(self._pending)
+                    self._index = 0
+                    self._pending.clear()
+                    continue
+                if self.in_buffer.received >= self.in_buffer.total:
+                    raise ValueError('the received string is not a complete JSON object')
+            break
+
+        self._advance(index)
+        self.n_chunks += len(chunks)
+        if chunks:
+            self.last_chunk = chunks[-1]
+        return chunks
+
+    async def get_chunks(self, max_chunks: int, timeout: float):
+        """Get the chunks as they are received.
+
+        Parameters
+        ----------
+        max_chunks : int
+            Maximum number of chunks to return each time.
+        timeout : float
+            Seconds to wait for new data before raising an exception.
+
+        Yields
+        ------
+        list
+            Parsed chunks.
+        """
+        while True:
+            self.data_received.clear()
+            chunks = self.parse(max_chunks)
+            if chunks:
+                yield chunks
+            elif self.finished:
+                return
+            else:
+                await asyncio.wait_for(self.data_received.wait(), timeout=timeout)
+
+
 class SendStringTask:
     """
     Create an asyncio task that can be identified by a task_id specified in advance.
@@ -298,6 +575,11 @@ class Handler(asyncio.Protocol):
     Define common methods for echo clients and servers.
     """
 
+    aead_algorithm = 'aes-gcm'  # AEAD algorithm that can be negotiated to replace Fernet
+    aead_frame = b'\x01'  # first byte of the AEAD encrypted payloads
+    aead_zlib_frame = b'\x02'  # first byte of the AEAD encrypted payloads whose data is compressed with zlib
+    aead_nonce_len = 12
+
     def __init__(self, fernet_key: str, cluster_items: Dict, logger: logging.Logger = None, tag: str = "Handler"):
         """Class constructor.
 
@@ -338,6 +620,13 @@ class Handler(asyncio.Protocol):
         self.request_chunk = 5242880
         # Object use to encrypt and decrypt requests.
         self.my_fernet = cryptography.fernet.Fernet(base64.b64encode(fernet_key.encode())) if fernet_key else None
+        self.fernet_key = fernet_key
+        # Object used to encrypt and decrypt requests with the AEAD transport, once it is negotiated with the peer.
+        self.my_aead = None
+        # Whether to send requests with the AEAD transport. Received requests are decrypted according to their frame.
+        self.aead_send = False
+        # Minimum payload size to compress before encrypting it with the AEAD transport. None to disable compression.
+        self.compress_min_size = None
         # Logging.Logger object used to write logs.
         self.logger = logging.getLogger('fortishield') if not logger else logger
         # Logging tag.
@@ -375,11 +664,91 @@ class Handler(asyncio.Protocol):
         self.counter = (self.counter + 1) % (2 ** 32)
         return self.counter
 
+    def set_aead(self, salt: bytes):
+        """Initialize the AEAD cipher of the connection.
+
+        The key is derived from the cluster key and a random salt chosen for each connection, so the nonces of
+        different connections do not share the same key.
+
+        Parameters
+        ----------
+        salt : bytes
+            Random salt of the connection.
+        """
+        key = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt,
+                   info=b'fortishield cluster transport').derive(self.fernet_key.encode())
+        self.my_aead = AESGCM(key)
+
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypt a payload with the negotiated transport.
+
+        AEAD payloads are framed as a one byte frame type, the nonce and the encrypted data with its tag. Payloads
+        bigger than `compress_min_size` are compressed first, if that reduces their size.
+
+        Parameters
+        ----------
+        data : bytes
+            Payload to encrypt.
+
+        Returns
+        -------
+        bytes
+            Encrypted payload.
+        """
+        if self.aead_send:
+            frame = self.aead_frame
+            if self.compress_min_size is not None and len(data) >= self.compress_min_size:
+                compressed_data = zlib.compress(
+                    data, self.cluster_items['intervals']['communication']['compress_level'])
+                if len(compressed_data) < len(data):
+                    frame, data = self.aead_zlib_frame, compressed_data
+            nonce = os.urandom(self.aead_nonce_len)
+            return frame + nonce + self.my_aead.encrypt(nonce, data, None)
+
+        return self.my_fernet.encrypt(data) if self.my_fernet is not None else data
+
+    def decrypt(self, payload: Union[bytes, bytearray]) -> bytes:
+        """Decrypt a received payload.
+
+        Payloads encrypted with the AEAD transport are identified by their first byte, as Fernet tokens always start
+        with 'g'. That way, both kinds of payloads can be received while the transport is being negotiated.
+
+        Parameters
+        ----------
+        payload : bytes or bytearray
+            Received payload.
+
+        Returns
+        -------
+        bytes
+            Decrypted payload.
+
+        Raises
+        ------
+        FortishieldClusterError(3025)
+            If the payload could not be decrypted.
+        """
+        if self.my_fernet is None:
+            return bytes(payload)
+
+        try:
+            frame = payload[:1]
+            if self.my_aead is not None and frame in (self.aead_frame, self.aead_zlib_frame):
+                payload_view = memoryview(payload)
+                data = self.my_aead.decrypt(payload_view[1:self.aead_nonce_len + 1],
+                                            payload_view[self.aead_nonce_len + 1:], None)
+                return zlib.decompress(data) if frame == self.aead_zlib_frame else data
+
+            return self.my_fernet.decrypt(bytes(payload))
+        except (cryptography.fernet.InvalidToken, cryptography.exceptions.InvalidTag, zlib.error):
+            raise exception.FortishieldClusterError(3025)
+
     def msg_build(self, command: bytes, counter: int, data: bytes) -> List[bytearray]:
         """Build messages with header + payload.
 
         Each message contains a header in self.header_format format that includes self.counter, the data size and the
         command. The data is also encrypted and added to the bytearray starting from the position self.header_len.
+        Divided messages are filled from a memoryview of the encrypted data, so it is not sliced into copies.
 
         Parameters
         ----------
@@ -402,7 +771,7 @@ class Handler(asyncio.Protocol):
 
         # Adds - to command until it reaches cmd length
         command = command + b' ' + b'-' * (self.cmd_len - cmd_len - 1)
-        encrypted_data = self.my_fernet.encrypt(data) if self.my_fernet is not None else data
+        encrypted_data = self.encrypt(data)
         encrypted_message_size = self.header_len + len(encrypted_data)
 
         # Message size is <= request_chunk, send the message
@@ -419,6 +788,7 @@ class Handler(asyncio.Protocol):
             msg_list = []
             partial_data_size = 0
             data_size = len(encrypted_data)
+            encrypted_view = memoryview(encrypted_data)
             while partial_data_size < data_size:
                 message_size = self.request_chunk \
                     if data_size - partial_data_size + self.header_len >= self.request_chunk \
@@ -431,7 +801,7 @@ class Handler(asyncio.Protocol):
                 msg = bytearray(message_size)
                 msg[:self.header_len] = struct.pack(self.header_format, counter, message_size - self.header_len,
                                                     command)
-                msg[self.header_len:message_size] = encrypted_data[
+                msg[self.header_len:message_size] = encrypted_view[
                                                     partial_data_size:partial_data_size + message_size - self.header_len]
                 partial_data_size += message_size - self.header_len
                 msg_list.append(msg)
@@ -447,15 +817,15 @@ class Handler(asyncio.Protocol):
             Whether a message was parsed or not.
         """
         if self.in_buffer:
-            # Check if a new message was received.
-            if self.in_msg.received == 0 and len(self.in_buffer) >= self.header_len:
+            # Check if a new message was received. The header might be received without any byte of the payload.
+            if not self.in_msg.header_received and len(self.in_buffer) >= self.header_len:
                 # A new message has been received. Both header and payload must be processed.
                 self.in_buffer = self.in_msg.get_info_from_header(header=self.in_buffer,
                                                                   header_format=self.header_format,
                                                                   header_size=self.header_len)
                 self.in_buffer = self.in_msg.receive_data(data=self.in_buffer)
                 return True
-            elif self.in_msg.received != 0:
+            elif self.in_msg.header_received:
                 # The previous message has not been completely received yet. No header to parse, just payload.
                 self.in_buffer = self.in_msg.receive_data(data=self.in_buffer)
                 return True
@@ -475,8 +845,8 @@ class Handler(asyncio.Protocol):
             Last received message command.
         int
             Counter.
-        bytes
-            Payload.
+        bytes or bytearray
+            Payload. The bytearray of the parts of a divided message is not copied.
         bytes
             Flag_divided.
         """
@@ -484,15 +854,11 @@ class Handler(asyncio.Protocol):
 
         while parsed:
             if self.in_msg.received == self.in_msg.total:
-                # Decrypt received message if it is not a part of a divided message
-                try:
-                    decrypted_payload = \
-                        self.my_fernet.decrypt(bytes(self.in_msg.payload)) \
-                            if self.my_fernet is not None and not self.in_msg.flag_divided and \
-                               self.in_msg.counter not in self.div_msg_box \
-                            else bytes(self.in_msg.payload)
-                except cryptography.fernet.InvalidToken:
-                    raise exception.FortishieldClusterError(3025)
+                # Decrypt received message if it is not a part of a divided message. Otherwise, the payload is
+                # returned as it is, so it can be joined in place
+                decrypted_payload = self.decrypt(self.in_msg.payload) \
+                    if not self.in_msg.flag_divided and self.in_msg.counter not in self.div_msg_box \
+                    else self.in_msg.payload
                 yield self.in_msg.cmd, self.in_msg.counter, decrypted_payload, self.in_msg.flag_divided
                 self.in_msg = InBuffer()
             else:
@@ -767,41 +1133,44 @@ class Handler(asyncio.Protocol):
         This method overrides asyncio.protocols.Protocol.data_received. It parses the message received, process
         the response and notify that the corresponding Response object (inside self.box[counter]) is available.
 
+        The received data is parsed through a memoryview, so payloads are copied only once, into their preallocated
+        buffers. Only an incomplete header is kept in self.in_buffer until more data is received.
+
         Parameters
         ----------
         message : bytes
             Received data.
         """
-        self.in_buffer += message
-        for command, counter, payload, flag_divided in self.get_messages():
-            # If the message is a divided one
-            if flag_divided == InBuffer.divide_flag:
-                try:
-                    self.div_msg_box[counter] = self.div_msg_box[counter] + payload
-                except KeyError:
-                    self.div_msg_box[counter] = payload
-            else:
-                # If the message is the last part of a division, join it.
-                if counter in self.div_msg_box:
-                    payload = self.div_msg_box[counter] + payload
-                    del self.div_msg_box[counter]
-                    # Decrypt the joined payload
+        self.in_buffer = memoryview(self.in_buffer + message if self.in_buffer else message)
+        try:
+            for command, counter, payload, flag_divided in self.get_messages():
+                # If the message is a divided one, join it in place
+                if flag_divided == InBuffer.divide_flag:
                     try:
-                        payload = self.my_fernet.decrypt(bytes(payload)) if self.my_fernet is not \
-                                                                            None else bytes(payload)
-                    except cryptography.fernet.InvalidToken:
-                        raise exception.FortishieldClusterError(3025)
-
-                # If the message is the response of a previously sent request.
-                if counter in self.box:
-                    if self.box[counter] is None:
-                        # Delete entry for previously expired request, just in case is received too late.
-                        del self.box[counter]
-                    else:
-                        self.box[counter].write(self.process_response(command, payload))
-                # If the message is not related to any previously sent request.
+                        self.div_msg_box[counter] += payload
+                    except KeyError:
+                        self.div_msg_box[counter] = payload
                 else:
-                    self.dispatch(command, counter, payload)
+                    # If the message is the last part of a division, join it.
+                    if counter in self.div_msg_box:
+                        joined_payload = self.div_msg_box.pop(counter)
+                        joined_payload += payload
+                        # Decrypt the joined payload
+                        payload = self.decrypt(joined_payload)
+
+                    # If the message is the response of a previously sent request.
+                    if counter in self.box:
+                        if self.box[counter] is None:
+                            # Delete entry for previously expired request, just in case is received too late.
+                            del self.box[counter]
+                        else:
+                            self.box[counter].write(self.process_response(command, payload))
+                    # If the message is not related to any previously sent request.
+                    else:
+                        self.dispatch(command, counter, payload)
+        finally:
+            # Do not keep a reference to the received data, only the bytes of an incomplete header
+            self.in_buffer = bytes(self.in_buffer)
 
     def dispatch(self, command: bytes, counter: int, payload: bytes) -> None:
         """Process a received message and send a response.
@@ -969,7 +1338,8 @@ class Handler(asyncio.Protocol):
         bytes
             Response message.
         """
-        name, file_content = data.split(b' ', 1)
+        separator = data.index(b' ')
+        name, file_content = data[:separator], memoryview(data)[separator + 1:]
         self.in_file[name]['fd'].write(file_content)
         self.in_file[name]['checksum'].update(file_content)
         return b"ok", b"File updated"
@@ -1059,8 +1429,8 @@ class Handler(asyncio.Protocol):
         bytes
             String ID.
         """
-        name, str_data = data.split(b' ', 1)
-        self.in_str[name].receive_data(str_data)
+        separator = data.index(b' ')
+        self.in_str[data[:separator]].receive_data(memoryview(data)[separator + 1:])
         return b"ok", b"String updated"
 
     def process_error_str(self, expected_len: bytes) -> Tuple[bytes, bytes]:
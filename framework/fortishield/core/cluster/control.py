@@ -125,6 +125,28 @@ async def get_health(lc: local_client.LocalClient, filter_node=None):
     return result
 
 
+async def get_agents_stats(lc: local_client.LocalClient):
+    """Get the agents statistics kept by the master node.
+
+    Parameters
+    ----------
+    lc : LocalClient object
+        LocalClient with which to send the 'get_agents_stats' request.
+
+    Returns
+    -------
+    result : dict or None
+        Number of agents by node, OS, version, statuses and group. None if the master has not calculated them yet.
+    """
+    response = await lc.execute(command=b'get_agents_stats', data=b'')
+    result = json.loads(response, object_hook=as_fortishield_object)
+
+    if isinstance(result, Exception):
+        raise result
+
+    return result
+
+
 async def get_agents(lc: local_client.LocalClient, filter_node=None, filter_status=None):
     """Get list of agents and which node they are connected to.
 
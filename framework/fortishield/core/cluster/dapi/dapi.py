@@ -4,6 +4,7 @@
 
 import asyncio
 import contextlib
+import contextvars
 import itertools
 import json
 import logging
@@ -15,7 +16,8 @@ from concurrent.futures import process
 from copy import copy, deepcopy
 from functools import reduce, partial
 from operator import or_
-from typing import Callable, Dict, Tuple, List
+from typing import AsyncIterator, Callable, Dict, Tuple, List, Union
+from uuid import uuid4
 
 from sqlalchemy.exc import OperationalError
 
@@ -29,6 +31,7 @@ from fortishield.cluster import get_node_wrapper, get_nodes_info
 from fortishield.core import common, exception
 from fortishield.core.cluster import local_client, common as c_common
 from fortishield.core.cluster.cluster import check_cluster_status
+from fortishield.core.cluster.control import get_agents_stats
 from fortishield.core.exception import FortishieldException, FortishieldClusterError, FortishieldError
 from fortishield.core.fortishield_socket import fortishield_sendsync
 
@@ -36,6 +39,10 @@ pools = common.mp_pools.get()
 
 authentication_funcs = {'check_token', 'check_user_master', 'get_permissions', 'get_security_conf'}
 events_funcs = {"send_event_to_analysisd"}
+# Functions that use the agents statistics kept by the master node, given in their `agents_stats` argument
+agents_stats_funcs = {'get_agents_summary_status', 'get_agents_summary_os', 'get_full_overview'}
+# Streamed requests whose chunks are being pulled by other nodes, and the handles of their expiration timers, by ID
+streams = {}
 
 class DistributedAPI:
     """Represents a distributed API request."""
@@ -45,7 +52,7 @@ class DistributedAPI:
                  wait_for_complete: bool = False, from_cluster: bool = False, is_async: bool = False,
                  broadcasting: bool = False, basic_services: tuple = None, local_client_arg: str = None,
                  rbac_permissions: Dict = None, nodes: list = None, api_timeout: int = None,
-                 remove_denied_nodes: bool = False):
+                 remove_denied_nodes: bool = False, response_serializer: Callable = None, stream_id: str = None):
         """Class constructor.
 
         Parameters
@@ -84,6 +91,11 @@ class DistributedAPI:
             Timeout set in source API for the request
         remove_denied_nodes : bool
             Whether to remove denied (RBAC) nodes from response's failed items or not.
+        response_serializer : callable, optional
+            Default `None`, function used to render the result as the final API response body. It is only applied when
+            the request is executed locally, in the same process that runs `f`, and its result is returned as it is.
+        stream_id : str, optional
+            Default `None`, ID of the streamed request whose next chunk is pulled by another node.
         """
         self.logger = logger
         self.f = f
@@ -111,6 +123,8 @@ class DistributedAPI:
         self.api_request_timeout = max(api_timeout, aconf.api_conf['intervals']['request_timeout']) \
             if api_timeout else aconf.api_conf['intervals']['request_timeout']
         self.remove_denied_nodes = remove_denied_nodes
+        self.response_serializer = response_serializer
+        self.stream_id = stream_id
 
     def debug_log(self, message):
         """Use debug or debug2 depending on the log type.
@@ -142,18 +156,12 @@ class DistributedAPI:
             else:
                 self.debug_log(f"Receiving parameters {self.f_kwargs}")
 
-            is_dapi_enabled = self.cluster_items['distributed_api']['enabled']
-            is_cluster_disabled = self.node == local_client and not check_cluster_status()
+            # Another node is pulling the chunks of a streamed request
+            if self.stream_id is not None:
+                response = await self.next_stream_chunk()
 
             # First case: execute the request locally.
-            # If the distributed api is not enabled
-            # If the cluster is disabled or the request type is local_any
-            # if the request was made in the master node and the request type is local_master
-            # if the request came forwarded from the master node and its type is distributed_master
-            if not is_dapi_enabled or is_cluster_disabled or self.request_type == 'local_any' or \
-                    (self.request_type == 'local_master' and self.node_info['type'] == 'master') or \
-                    (self.request_type == 'distributed_master' and self.from_cluster):
-
+            elif self.is_local_request():
                 response = await self.execute_local_request()
 
             # Second case: forward the request
@@ -173,7 +181,8 @@ class DistributedAPI:
             except json.decoder.JSONDecodeError:
                 response = {'message': response}
 
-            return response if isinstance(response, (wresults.AbstractFortishieldResult, exception.FortishieldException)) \
+            return response if isinstance(response, (wresults.AbstractFortishieldResult, exception.FortishieldException,
+                                                     wresults.SerializedFortishieldResult)) \
                 else wresults.FortishieldResult(response)
 
         except json.decoder.JSONDecodeError:
@@ -200,6 +209,25 @@ class DistributedAPI:
             return exception.FortishieldInternalError(1000,
                                                 dapi_errors=self.get_error_info(e))
 
+    def is_local_request(self) -> bool:
+        """Check whether the request must be solved by this node.
+
+        It is solved locally if the distributed API is not enabled, if the cluster is disabled or the request type is
+        local_any, if the request was made in the master node and its type is local_master or if the request came
+        forwarded from the master node and its type is distributed_master.
+
+        Returns
+        -------
+        bool
+            True if the request must be executed locally, False otherwise.
+        """
+        is_dapi_enabled = self.cluster_items['distributed_api']['enabled']
+        is_cluster_disabled = self.node == local_client and not check_cluster_status()
+
+        return not is_dapi_enabled or is_cluster_disabled or self.request_type == 'local_any' or \
+            (self.request_type == 'local_master' and self.node_info['type'] == 'master') or \
+            (self.request_type == 'distributed_master' and self.from_cluster)
+
     def check_fortishield_status(self):
         """
         There are some services that are required for fortishield to correctly process API requests. If any of those services
@@ -229,8 +257,13 @@ class DistributedAPI:
             raise exception.FortishieldError(1017, extra_message=extra_info)
 
     @staticmethod
-    def run_local(f, f_kwargs, rbac_permissions, broadcasting, nodes, current_user, origin_module):
-        """Run framework SDK function locally in another process."""
+    def run_local(f, f_kwargs, rbac_permissions, broadcasting, nodes, current_user, origin_module,
+                  response_serializer=None):
+        """Run framework SDK function locally in another process.
+
+        If a response serializer is given, the result is rendered in the same process, so it does not need to be
+        decoded and encoded again before sending it to the client.
+        """
         common.rbac.set(rbac_permissions)
         common.broadcast.set(broadcasting)
         common.cluster_nodes.set(nodes)
@@ -238,8 +271,165 @@ class DistributedAPI:
         common.origin_module.set(origin_module)
         data = f(**f_kwargs)
         common.reset_context_cache()
+        if response_serializer is not None and isinstance(data, wresults.AbstractFortishieldResult):
+            data = wresults.SerializedFortishieldResult(response_serializer(data))
         return data
 
+    async def stream_local_request(self) -> AsyncIterator:
+        """Execute locally a framework function that yields its results in chunks, yielding them as they are produced.
+
+        The function runs in a thread of the default executor and each chunk is requested when the previous one has
+        been consumed, so the memory used does not depend on the size of the results.
+
+        Yields
+        ------
+        object
+            Chunks yielded by the framework function.
+        """
+        self.check_fortishield_status()
+        if self.f_kwargs.get('agent_list') == '*':
+            del self.f_kwargs['agent_list']
+
+        def start():
+            common.rbac.set(self.rbac_permissions)
+            common.broadcast.set(self.broadcasting)
+            common.cluster_nodes.set(self.nodes)
+            common.current_user.set(self.current_user)
+            common.origin_module.set(self.origin_module)
+            return iter(self.f(**self.f_kwargs))
+
+        # The context is shared by every step of the function, so the variables set in `start` are kept between them
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(None, context.run, start)
+        try:
+            while (chunk := await loop.run_in_executor(None, context.run, next, chunks, None)) is not None:
+                yield chunk
+        finally:
+            if hasattr(chunks, 'close'):
+                await loop.run_in_executor(None, context.run, chunks.close)
+
+    def stream_function(self) -> AsyncIterator:
+        """Distribute an API call to a framework function that yields its results in chunks.
+
+        The request is routed as in `distribute_function`, but the chunks solved by other nodes are pulled from them
+        one by one, so neither the nodes nor the API keep all of them in memory.
+
+        Returns
+        -------
+        AsyncIterator
+            Chunks yielded by the framework function.
+        """
+        if self.is_local_request():
+            return self.stream_local_request()
+        elif self.request_type == 'distributed_master' and self.node_info['type'] == 'master':
+            return self.stream_forward_request()
+        else:
+            return self.stream_remote_request()
+
+    async def next_stream_chunk(self) -> Dict:
+        """Get the next chunk of a streamed request pulled by another node, starting the request with its first pull.
+
+        The request is kept until its last chunk is pulled. It is closed if the next chunk is not pulled before the
+        cluster DAPI request timeout.
+
+        Returns
+        -------
+        dict
+            Dictionary with the next chunk. The chunk is None when there are no more chunks.
+        """
+        stream, expiration = streams.pop(self.stream_id, (None, None))
+        if stream is None:
+            stream = self.stream_function()
+        else:
+            expiration.cancel()
+
+        try:
+            chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            return {'chunk': None}
+
+        timeout = self.cluster_items['intervals']['communication']['timeout_dapi_request']
+        streams[self.stream_id] = (stream, asyncio.get_running_loop().call_later(timeout, close_stream,
+                                                                                 self.stream_id))
+        return {'chunk': chunk}
+
+    async def stream_remote_request(self, node_name: str = None) -> AsyncIterator:
+        """Pull one by one the chunks of a streamed request from the master node or, if the request is forwarded by
+        the master node, from the given node.
+
+        Parameters
+        ----------
+        node_name : str
+            Name of the node the request is forwarded to. Default `None`, to send it to the master node.
+
+        Raises
+        ------
+        FortishieldException
+            Error returned by the node solving the request.
+
+        Yields
+        ------
+        object
+            Chunks yielded by the framework function in the node.
+        """
+        request = json.dumps({**self.to_dict(), 'stream_id': uuid4().hex}, cls=c_common.FortishieldJSONEncoder)
+        command, data = (b'dapi_fwd', f"{node_name} {request}".encode()) if node_name else (b'dapi', request.encode())
+        client = self.get_client()
+        while True:
+            response = json.loads(await client.execute(command, data), object_hook=c_common.as_fortishield_object)
+            if isinstance(response, Exception):
+                raise response
+            if response['chunk'] is None:
+                break
+            yield response['chunk']
+
+    async def stream_forward_request(self) -> AsyncIterator:
+        """Forward a streamed request to the nodes that can solve it, yielding the chunks of each one in turn.
+
+        This function is called when a distributed_master function is streamed. Only the master node calls this
+        function. As in `forward_request`, the request is solved by the master node for the agents of unknown nodes.
+
+        Yields
+        ------
+        object
+            Chunks yielded by the framework function in each node.
+        """
+        nodes = defaultdict(list)
+        for node_name, agent_list in (await self.get_solver_node()).items():
+            nodes[self.node_info['node'] if node_name in ('unknown', '', None) else node_name].extend(agent_list)
+        self.from_cluster = True
+
+        agent_arg = 'agent_id' if 'agent_id' in self.f_kwargs else 'agent_list' if 'agent_list' in self.f_kwargs \
+            else None
+        f_kwargs = self.f_kwargs
+        for node_name, agent_list in nodes.items():
+            self.f_kwargs = {**f_kwargs, agent_arg: agent_list} if agent_arg else dict(f_kwargs)
+            stream = self.stream_local_request() if node_name == self.node_info['node'] \
+                else self.stream_remote_request(node_name)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            except exception.FortishieldResourceNotFound:
+                # The agents of the other nodes exist, so the ones that do not exist are not an error
+                if len(nodes) == 1:
+                    raise
+
+    async def get_master_agents_stats(self) -> Union[Dict, None]:
+        """Get the agents statistics kept by the master node, so the framework function running in the pool does not
+        need to request them.
+
+        Returns
+        -------
+        dict or None
+            Agents statistics. None if the master has not calculated them yet or they could not be requested.
+        """
+        try:
+            return await get_agents_stats(local_client.LocalClient())
+        except (exception.FortishieldException, OSError) as e:
+            self.debug_log(f"Could not get the agents statistics of the master node: {e}")
+            return None
+
     async def execute_local_request(self) -> str:
         """Execute an API request locally.
 
@@ -256,6 +446,8 @@ class DistributedAPI:
             self.check_fortishield_status()
 
             timeout = self.api_request_timeout if not self.wait_for_complete else None
+            # Results of requests coming from the cluster or forwarded by this node might be merged with others
+            response_serializer = self.response_serializer if not self.from_cluster else None
 
             # LocalClient only for control functions
             if self.local_client_arg is not None:
@@ -267,6 +459,10 @@ class DistributedAPI:
                                           self.nodes, self.current_user, self.origin_module)
 
                 else:
+                    if self.f.__name__ in agents_stats_funcs and check_cluster_status() \
+                            and self.node_info['type'] == 'master':
+                        self.f_kwargs['agents_stats'] = await self.get_master_agents_stats()
+
                     loop = asyncio.get_event_loop()
                     if 'thread_pool' in pools:
                         pool = pools.get('thread_pool')
@@ -279,7 +475,8 @@ class DistributedAPI:
 
                     task = loop.run_in_executor(pool, partial(self.run_local, self.f, self.f_kwargs,
                                                               self.rbac_permissions, self.broadcasting, self.nodes,
-                                                              self.current_user, self.origin_module))
+                                                              self.current_user, self.origin_module,
+                                                              response_serializer))
                 try:
                     self.debug_log("Starting to execute request locally")
                     data = await asyncio.wait_for(task, timeout=timeout)
@@ -634,6 +831,19 @@ class DistributedAPI:
             return node_name
 
 
+def close_stream(stream_id: str):
+    """Close a streamed request whose next chunk was not pulled in time.
+
+    Parameters
+    ----------
+    stream_id : str
+        ID of the streamed request.
+    """
+    stream, _ = streams.pop(stream_id, (None, None))
+    if stream is not None:
+        asyncio.create_task(stream.aclose())
+
+
 class FortishieldRequestQueue:
     """Represents a queue of Fortishield requests"""
 
@@ -3,6 +3,7 @@
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio
+import contextvars
 import json
 import logging
 import os
@@ -29,13 +30,13 @@ with patch('fortishield.common.fortishield_uid'):
         from fortishield.tests.util import RBAC_bypasser
 
         fortishield.rbac.decorators.expose_resources = RBAC_bypasser
-        from fortishield.core.cluster.dapi.dapi import DistributedAPI, APIRequestQueue, SendSyncRequestQueue
+        from fortishield.core.cluster.dapi.dapi import DistributedAPI, APIRequestQueue, SendSyncRequestQueue, streams
         from fortishield.core.manager import get_manager_status
-        from fortishield.core.results import FortishieldResult, AffectedItemsFortishieldResult
+        from fortishield.core.results import FortishieldResult, AffectedItemsFortishieldResult, SerializedFortishieldResult
         from fortishield import agent, cluster, ciscat, manager, FortishieldError, FortishieldInternalError
-        from fortishield.core.exception import FortishieldClusterError
+        from fortishield.core.exception import FortishieldClusterError, FortishieldResourceNotFound
         from api.util import raise_if_exc
-        from fortishield.core.cluster import local_client
+        from fortishield.core.cluster import local_client, common as c_common
 
 logger = logging.getLogger('fortishield')
 loop = asyncio.new_event_loop()
@@ -353,6 +354,220 @@ def test_DistributedAPI_local_request(mock_local_request):
                                                 call(f"{cluster_exc.message}", exc_info=False)])
 
 
+def test_DistributedAPI_run_local_response_serializer():
+    """Check that `run_local` renders the framework results with the given response serializer."""
+    result = AffectedItemsFortishieldResult(all_msg='Test message')
+    serializer = MagicMock(return_value=b'{"data": {}}')
+
+    # run_local sets the context variables of the request, so it runs in a copy of the context of the test
+    context = contextvars.copy_context()
+    data = context.run(DistributedAPI.run_local, MagicMock(return_value=result), {}, {}, False, [], 'fortishield',
+                       'API', response_serializer=serializer)
+    serializer.assert_called_once_with(result)
+    assert isinstance(data, SerializedFortishieldResult)
+    assert data == b'{"data": {}}'
+
+    # Other objects like async tasks are not serialized
+    serializer.reset_mock()
+    assert context.run(DistributedAPI.run_local, MagicMock(return_value='task'), {}, {}, False, [], 'fortishield',
+                       'API', response_serializer=serializer) == 'task'
+    serializer.assert_not_called()
+
+
+@patch('fortishield.core.cluster.dapi.dapi.DistributedAPI.check_fortishield_status', side_effect=None)
+@pytest.mark.parametrize('from_cluster', [False, True])
+def test_DistributedAPI_local_request_response_serializer(mock_check_fortishield_status, from_cluster):
+    """Check that the serialized results are returned as they are and only for requests not coming from the cluster."""
+    serializer = MagicMock()
+    serialized = SerializedFortishieldResult(b'{"data": {}}')
+    dapi = DistributedAPI(f=manager.status, logger=logger, response_serializer=serializer, from_cluster=from_cluster)
+
+    with patch('fortishield.core.cluster.dapi.dapi.DistributedAPI.run_local', return_value=serialized) as run_local_mock, \
+            patch('fortishield.core.cluster.dapi.dapi.pools', {'thread_pool': None}):
+        assert loop.run_until_complete(dapi.distribute_function()) is serialized
+
+    assert run_local_mock.call_args.args[-1] == (None if from_cluster else serializer)
+
+
+@patch('fortishield.core.cluster.dapi.dapi.DistributedAPI.check_fortishield_status', side_effect=None)
+@pytest.mark.parametrize('node_type, cluster_enabled, master_stats, expected_stats', [
+    ('master', True, {'nodes': []}, {'nodes': []}),
+    ('master', True, FortishieldInternalError(3012), None),
+    ('master', True, ConnectionRefusedError(), None),
+    ('master', False, {'nodes': []}, 'missing'),
+    ('worker', True, {'nodes': []}, 'missing')
+])
+def test_DistributedAPI_local_request_agents_stats(mock_check_fortishield_status, node_type, cluster_enabled,
+                                                   master_stats, expected_stats):
+    """Check that the agents statistics of the master are requested before running the functions using them in the
+    pool."""
+    dapi = DistributedAPI(f=agent.get_agents_summary_status, f_kwargs={'agent_list': '*'}, logger=logger)
+    dapi.node_info = {'type': node_type}
+    get_agents_stats_mock = AsyncMock(**({'side_effect': master_stats} if isinstance(master_stats, Exception)
+                                         else {'return_value': master_stats}))
+
+    with patch('fortishield.core.cluster.dapi.dapi.DistributedAPI.run_local', return_value='result') as run_local_mock, \
+            patch('fortishield.core.cluster.dapi.dapi.pools', {'thread_pool': None}), \
+            patch('fortishield.core.cluster.dapi.dapi.check_cluster_status', return_value=cluster_enabled), \
+            patch('fortishield.core.cluster.dapi.dapi.local_client.LocalClient'), \
+            patch('fortishield.core.cluster.dapi.dapi.get_agents_stats', new=get_agents_stats_mock):
+        assert loop.run_until_complete(dapi.execute_local_request()) == 'result'
+
+    f_kwargs = run_local_mock.call_args.args[1]
+    assert f_kwargs.get('agents_stats', 'missing') == expected_stats
+    assert get_agents_stats_mock.mock.call_count == (0 if expected_stats == 'missing' else 1)
+
+
+@patch('fortishield.core.cluster.dapi.dapi.DistributedAPI.check_fortishield_status', side_effect=None)
+def test_DistributedAPI_stream_local_request(mock_check_fortishield_status):
+    """Check that the chunks of the framework function are yielded one by one, with the context of the request."""
+    consumed = []
+
+    def export(agent_list=None):
+        for chunk in (['a', 'b'], ['c']):
+            consumed.append(chunk)
+            yield [common.current_user.get(), agent_list] + chunk
+
+    async def stream(dapi):
+        chunks = []
+        async for chunk in dapi.stream_local_request():
+            # Each chunk is not produced until the previous one is consumed
+            assert consumed[-1] == chunk[2:]
+            chunks.append(chunk)
+        return chunks
+
+    dapi = DistributedAPI(f=export, f_kwargs={'agent_list': '*'}, logger=logger, current_user='fortishield')
+    assert loop.run_until_complete(stream(dapi)) == [['fortishield', None, 'a', 'b'], ['fortishield', None, 'c']]
+
+
+async def consume(chunks):
+    """Get every chunk of an async iterator."""
+    return [chunk async for chunk in chunks]
+
+
+async def stream_chunks(*chunks):
+    """Yield the given chunks, as the streamed requests do."""
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.parametrize('request_type, node_type, from_cluster, cluster_enabled, expected', [
+    ('local_master', 'master', False, True, 'stream_local_request'),
+    ('local_master', 'worker', False, False, 'stream_local_request'),
+    ('distributed_master', 'worker', True, True, 'stream_local_request'),
+    ('distributed_master', 'master', False, True, 'stream_forward_request'),
+    ('local_master', 'worker', False, True, 'stream_remote_request'),
+    ('distributed_master', 'worker', False, True, 'stream_remote_request'),
+])
+def test_DistributedAPI_stream_function(request_type, node_type, from_cluster, cluster_enabled, expected):
+    """Check that the streamed requests are routed as the other requests."""
+    with patch('fortishield.core.cluster.cluster.get_node', return_value={'type': node_type, 'node': 'node01'}):
+        dapi = DistributedAPI(f=agent.export_agents, logger=logger, request_type=request_type,
+                              from_cluster=from_cluster)
+
+    with patch('fortishield.core.cluster.dapi.dapi.check_cluster_status', return_value=cluster_enabled), \
+            patch.object(dapi, expected, return_value=stream_chunks([1], [2])) as stream_mock:
+        assert loop.run_until_complete(consume(dapi.stream_function())) == [[1], [2]]
+        stream_mock.assert_called_once_with()
+
+
+@patch('fortishield.core.cluster.dapi.dapi.check_cluster_status', return_value=True)
+@patch('fortishield.core.cluster.cluster.get_node', return_value={'type': 'master', 'node': 'master-node'})
+def test_DistributedAPI_next_stream_chunk(mock_get_node, mock_check_cluster_status):
+    """Check that the streamed requests pulled by other nodes are kept between their chunks and closed when they end
+    or when their next chunk is not pulled in time."""
+    async def pull(stream_id, timeout=10):
+        dapi = DistributedAPI(f=agent.export_agents, logger=logger, stream_id=stream_id)
+        dapi.cluster_items = {**dapi.cluster_items, 'intervals': {'communication': {'timeout_dapi_request': timeout}}}
+        return (await dapi.distribute_function()).dikt
+
+    async def pull_all():
+        results = [await pull('1'), await pull('2'), await pull('1')]
+        # The stream is kept until its last chunk is pulled
+        assert set(streams) == {'1', '2'}
+        results.append(await pull('1'))
+        assert set(streams) == {'2'}
+        # The stream expires if its next chunk is not pulled in time
+        results.append(await pull('2', timeout=0))
+        await asyncio.sleep(0.01)
+        assert not streams
+        return results
+
+    with patch.object(DistributedAPI, 'stream_local_request', side_effect=lambda: stream_chunks([1], [2])):
+        assert loop.run_until_complete(pull_all()) == [{'chunk': [1]}, {'chunk': [1]}, {'chunk': [2]},
+                                                       {'chunk': None}, {'chunk': [2]}]
+
+
+@pytest.mark.parametrize('node_name, expected_command', [
+    (None, b'dapi'),
+    ('worker1', b'dapi_fwd'),
+])
+@patch('fortishield.core.cluster.cluster.get_node', return_value={'type': 'worker', 'node': 'worker1'})
+def test_DistributedAPI_stream_remote_request(mock_get_node, node_name, expected_command):
+    """Check that the chunks of a streamed request are pulled one by one from the node that solves it."""
+    responses = [json.dumps(FortishieldResult({'chunk': chunk}), cls=c_common.FortishieldJSONEncoder)
+                 for chunk in ([{'id': '001'}], [{'id': '002'}], None)]
+    dapi = DistributedAPI(f=agent.export_agents, logger=logger, f_kwargs={'agent_list': ['001', '002']},
+                          request_type='distributed_master')
+    with patch('fortishield.core.cluster.local_client.LocalClient.execute', side_effect=responses) as execute_mock:
+        assert loop.run_until_complete(consume(dapi.stream_remote_request(node_name))) == [[{'id': '001'}],
+                                                                                           [{'id': '002'}]]
+
+    # Every chunk is pulled with the same request
+    assert execute_mock.call_count == 3
+    command, data = execute_mock.call_args.args
+    assert command == expected_command and all(call.args == (command, data) for call in execute_mock.call_args_list)
+    request = json.loads(data.decode().split(' ', 1)[1] if node_name else data)
+    assert request['f_kwargs'] == {'agent_list': ['001', '002']} and request['stream_id']
+    assert DistributedAPI(**json.loads(json.dumps(request), object_hook=c_common.as_fortishield_object),
+                          logger=logger).stream_id == request['stream_id']
+
+    # The errors of the node solving the request are raised
+    with patch('fortishield.core.cluster.local_client.LocalClient.execute',
+               return_value=json.dumps(FortishieldError(1701), cls=c_common.FortishieldJSONEncoder)):
+        with pytest.raises(FortishieldError, match='.* 1701 .*'):
+            loop.run_until_complete(consume(dapi.stream_remote_request(node_name)))
+
+
+@patch('fortishield.core.cluster.cluster.get_node', return_value={'type': 'master', 'node': 'master-node'})
+@patch('fortishield.core.cluster.dapi.dapi.DistributedAPI.get_solver_node',
+       new=AsyncMock(return_value={'worker1': ['001', '002'], 'master-node': ['000'], 'unknown': ['010']}))
+def test_DistributedAPI_stream_forward_request(mock_get_node):
+    """Check that the streamed requests are forwarded to each node, with the agents of unknown nodes solved by the
+    master node."""
+    f_kwargs = []
+
+    def stream(node_name=None):
+        f_kwargs.append(dapi.f_kwargs)
+        return stream_chunks([node_name or 'master-node'])
+
+    dapi = DistributedAPI(f=agent.export_agents, logger=logger, f_kwargs={'agent_list': ['000', '001', '002', '010'],
+                                                                          'select': ['name']},
+                          request_type='distributed_master')
+    with patch.object(dapi, 'stream_remote_request', side_effect=stream) as remote_mock, \
+            patch.object(dapi, 'stream_local_request', side_effect=stream):
+        assert loop.run_until_complete(consume(dapi.stream_forward_request())) == [['worker1'], ['master-node']]
+
+    remote_mock.assert_called_once_with('worker1')
+    assert dapi.from_cluster
+    assert f_kwargs == [{'agent_list': ['001', '002'], 'select': ['name']},
+                        {'agent_list': ['000', '010'], 'select': ['name']}]
+
+    async def not_found():
+        raise FortishieldResourceNotFound(1701)
+        yield
+
+    # The agents that do not exist are only an error if no other node solves the request
+    dapi.f_kwargs = {'agent_list': ['000', '001', '002', '010']}
+    with patch.object(dapi, 'stream_remote_request', side_effect=stream), \
+            patch.object(dapi, 'stream_local_request', side_effect=not_found):
+        assert loop.run_until_complete(consume(dapi.stream_forward_request())) == [['worker1']]
+
+        with patch.object(dapi, 'get_solver_node', new=AsyncMock(return_value={'unknown': ['010']})):
+            with pytest.raises(FortishieldResourceNotFound, match='.* 1701 .*'):
+                loop.run_until_complete(consume(dapi.stream_forward_request()))
+
+
 @patch("asyncio.get_running_loop")
 def test_DistributedAPI_get_client(loop_mock):
     """Test get_client function from DistributedAPI."""
@@ -269,6 +269,8 @@ class LocalServerHandlerMaster(LocalServerHandler):
                 return b'ok', b'Request forwarded to worker node'
             else:
                 raise FortishieldClusterError(3022)
+        elif command == b'get_agents_stats':
+            return self.get_agents_stats()
         else:
             return super().process_request(command, data)
 
@@ -289,6 +291,18 @@ class LocalServerHandlerMaster(LocalServerHandler):
         """
         return b'ok', json.dumps(self.server.node.get_connected_nodes(**json.loads(arguments.decode()))).encode()
 
+    def get_agents_stats(self) -> Tuple[bytes, bytes]:
+        """Process 'get_agents_stats' request.
+
+        Returns
+        -------
+        bytes
+            Result.
+        bytes
+            JSON-like string containing the agents statistics kept by the master, or null if they are not ready yet.
+        """
+        return b'ok', json.dumps(self.server.node.agents_stats.get_summary()).encode()
+
     def get_health(self, filter_nodes: bytes) -> Tuple[bytes, bytes]:
         """Process 'get_health' request.
 
@@ -9,11 +9,11 @@ import operator
 import os
 import shutil
 from calendar import timegm
-from collections import defaultdict
+from collections import Counter, defaultdict
 from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from time import perf_counter
-from typing import Tuple, Dict, Callable
+from typing import Tuple, Dict, Callable, Optional
 from uuid import uuid4
 
 from fortishield.core import cluster as metadata, common, exception, utils
@@ -23,7 +23,7 @@ from fortishield.core.cluster.dapi import dapi
 from fortishield.core.cluster.utils import context_tag, log_subprocess_execution
 from fortishield.core.common import DECIMALS_DATE_FORMAT
 from fortishield.core.utils import get_utc_now
-from fortishield.core.fdb import AsyncFortishieldDBConnection
+from fortishield.core.fdb import AsyncFortishieldDBConnection, FortishieldDBConnection
 
 DEFAULT_DATE: str = 'n/a'
 
@@ -166,6 +166,153 @@ class SendEntireAgentGroupsTask(c_common.SendStringTask):
         return self.fortishield_common.send_entire_agent_groups_information
 
 
+class AgentsStatistics:
+    """
+    Keep the number of agents by connection and groups configuration status, OS, version, node and group.
+
+    The counters are updated with the agent-info the workers send to the master and they are periodically reconciled
+    with the master's database, which also covers the agents registered, removed, assigned to groups or connected to
+    the master since the last reconciliation.
+    """
+
+    # Database columns of each agent that are counted, in the same order as the values kept for each agent
+    columns = ('connection_status', 'group_config_status', 'os_name', 'os_platform', 'os_version', 'version',
+               'node_name', 'group')
+    # Fields of each aggregation and the position of their value among the agent values
+    aggregations = {'nodes': (('node_name', 6),),
+                    'agent_os': (('os.name', 2), ('os.platform', 3), ('os.version', 4)),
+                    'agent_version': (('version', 5),),
+                    'agent_status': (('status', 0), ('group_config_status', 1))}
+
+    def __init__(self):
+        """Class constructor."""
+        self.agents = {}
+        self.counters = defaultdict(Counter)
+        self.reconciled = False
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def _count(self, values: tuple, increment: int):
+        """Add or subtract an agent to the counters of its values.
+
+        Parameters
+        ----------
+        values : tuple
+            Values of the agent, in the same order as the `columns`.
+        increment : int
+            1 to add the agent to the counters and -1 to subtract it.
+        """
+        keys = [(name, tuple(values[position] for _, position in fields))
+                for name, fields in self.aggregations.items()]
+        if values[7]:
+            keys.extend(('groups', (group,)) for group in values[7].split(','))
+
+        for name, key in keys:
+            counter = self.counters[name]
+            counter[key] += increment
+            if counter[key] <= 0:
+                del counter[key]
+
+    def _set_agent(self, agent_id: int, values: tuple):
+        """Replace the values of an agent, updating the counters.
+
+        Parameters
+        ----------
+        agent_id : int
+            Agent ID.
+        values : tuple
+            New values of the agent, in the same order as the `columns`.
+        """
+        if (previous := self.agents.get(agent_id)) == values:
+            return
+        if previous is not None:
+            self._count(previous, -1)
+        self.agents[agent_id] = values
+        self._count(values, 1)
+
+    def update(self, agents: list):
+        """Update the counters with the agent-info received from a worker.
+
+        The agent-info does not contain the groups of the agents, so the known ones are kept.
+
+        Parameters
+        ----------
+        agents : list
+            Agent-info of each agent, as obtained from fortishield-db.
+        """
+        for agent in agents:
+            if not (agent_id := agent.get('id')):
+                continue
+            previous = self.agents.get(agent_id)
+            self._set_agent(agent_id, tuple(agent.get(column) for column in self.columns[:-1]) +
+                            (agent.get('group', previous[-1] if previous else None),))
+
+    def update_from_chunks(self, chunks: list):
+        """Update the counters with the agent-info chunks received from a worker.
+
+        Parameters
+        ----------
+        chunks : list
+            JSON strings with the agent-info of a list of agents.
+        """
+        for chunk in chunks:
+            try:
+                self.update(json.loads(chunk))
+            except (ValueError, TypeError, AttributeError):
+                continue
+
+    def reconcile(self, agents: list):
+        """Replace the counters with the information of every agent in the master's database.
+
+        Parameters
+        ----------
+        agents : list
+            Information of every agent, as obtained from fortishield-db.
+        """
+        self.agents = {}
+        self.counters = defaultdict(Counter)
+        for agent in agents:
+            self._set_agent(agent['id'], tuple(agent.get(column) for column in self.columns))
+        self.reconciled = True
+
+    def get_summary(self) -> Optional[dict]:
+        """Get the number of agents with each combination of values of every aggregation.
+
+        Returns
+        -------
+        dict or None
+            Number of agents of each aggregation and of each group. Format: {"nodes": [{"node_name": "node01",
+            "count": 3}], "groups": [{"group": "default", "count": 3}], ...}. None if the counters have not been
+            reconciled with the database yet.
+        """
+        if not self.reconciled:
+            return None
+
+        summary = {name: [{**{field: value for (field, _), value in zip(fields, key) if value is not None},
+                           'count': count} for key, count in self.counters[name].items()]
+                   for name, fields in self.aggregations.items()}
+        summary['groups'] = [{'group': key[0], 'count': count} for key, count in self.counters['groups'].items()]
+        return summary
+
+    @classmethod
+    def get_agents_info(cls) -> list:
+        """Get the counted information of every agent in the database, except the manager.
+
+        Returns
+        -------
+        list
+            Information of every agent.
+        """
+        fdb_conn = FortishieldDBConnection()
+        try:
+            return fdb_conn.execute(f"global sql select id,"
+                                    f"{','.join(c if c != 'group' else '`group`' for c in cls.columns)} "
+                                    f"from agent where id != 0")
+        finally:
+            fdb_conn.close()
+
+
 class MasterHandler(server.AbstractServerHandler, c_common.FortishieldCommon):
     """
     Handle incoming requests and sync processes with a worker.
@@ -196,10 +343,14 @@ class MasterHandler(server.AbstractServerHandler, c_common.FortishieldCommon):
                                        'n_synced_chunks': 0}
         self.send_agent_groups_status = {'date_start': DEFAULT_DATE,
                                          'date_end': DEFAULT_DATE,
-                                         'n_synced_chunks': 0}
+                                         'n_chunks': 0,
+                                         'n_synced_chunks': 0,
+                                         'time_to_apply': 0}
         self.send_full_agent_groups_status = {'date_start': DEFAULT_DATE,
                                               'date_end': DEFAULT_DATE,
-                                              'n_synced_chunks': 0}
+                                              'n_chunks': 0,
+                                              'n_synced_chunks': 0,
+                                              'time_to_apply': 0}
 
         # Variables which will be filled when the worker sends the hello request.
         self.version = ""
@@ -267,10 +418,12 @@ class MasterHandler(server.AbstractServerHandler, c_common.FortishieldCommon):
         elif command == b'syn_w_g_e':
             logger = self.task_loggers['Agent-groups send']
             start_time = datetime.strptime(self.send_agent_groups_status['date_start'], DECIMALS_DATE_FORMAT)
+            self.update_agent_groups_status(self.send_agent_groups_status, data.decode())
             return c_common.end_sending_agent_information(logger, start_time, data.decode())
         elif command == b'syn_wgc_e':
             logger = self.task_loggers['Agent-groups send full']
             start_time = datetime.strptime(self.send_full_agent_groups_status['date_start'], DECIMALS_DATE_FORMAT)
+            self.update_agent_groups_status(self.send_full_agent_groups_status, data.decode())
             return c_common.end_sending_agent_information(logger, start_time, data.decode())
         elif command == b'syn_w_g_err':
             logger = self.task_loggers['Agent-groups send']
@@ -484,6 +637,22 @@ class MasterHandler(server.AbstractServerHandler, c_common.FortishieldCommon):
         """
         return b'ok', self.server.get_health(filter_nodes)
 
+    @staticmethod
+    def update_agent_groups_status(status: Dict, response: str):
+        """Store the result of applying the agent-groups information in the worker.
+
+        Parameters
+        ----------
+        status : dict
+            Agent-groups sync status to update.
+        response : str
+            JSON containing the number of chunks updated by the worker and the time it took.
+        """
+        data = json.loads(response)
+        status.update({'date_end': get_utc_now().strftime(DECIMALS_DATE_FORMAT),
+                       'n_synced_chunks': data['updated_chunks'],
+                       'time_to_apply': round(data.get('time_spent', 0), 3)})
+
     def get_permission(self, sync_type: bytes) -> Tuple[bytes, bytes]:
         """Get whether a sync process is in progress or not.
 
@@ -638,6 +807,7 @@ class MasterHandler(server.AbstractServerHandler, c_common.FortishieldCommon):
         data = await self.get_chunks_in_task_id(task_id, b'syn_m_a_err')
         result = await self.update_chunks_fdb(data, 'agent-info', logger, b'syn_m_a_err',
                                               self.cluster_items['intervals']['master']['timeout_agent_info'])
+        self.server.agents_stats.update_from_chunks(data['chunks'])
 
         # Send result to worker.
         response = await self.send_request(command=b'syn_m_a_e', data=json.dumps(result).encode())
@@ -676,7 +846,8 @@ class MasterHandler(server.AbstractServerHandler, c_common.FortishieldCommon):
         # Updates Agent groups full status
         self.send_full_agent_groups_status['date_start'] = start_time.strftime(DECIMALS_DATE_FORMAT)
         self.send_full_agent_groups_status['date_end'] = end_time.strftime(DECIMALS_DATE_FORMAT)
-        self.send_full_agent_groups_status['n_synced_chunks'] = len(local_agent_groups_information)
+        self.send_full_agent_groups_status.update({'n_chunks': len(local_agent_groups_information),
+                                                   'n_synced_chunks': 0, 'time_to_apply': 0})
 
     async def send_agent_groups_information(self, groups_info: list):
         """Send group information to the worker node.
@@ -689,7 +860,9 @@ class MasterHandler(server.AbstractServerHandler, c_common.FortishieldCommon):
         logger = self.task_loggers['Agent-groups send']
         try:
             logger.info("Starting.")
-            self.send_agent_groups_status['date_start'] = get_utc_now().strftime(DECIMALS_DATE_FORMAT)
+            self.send_agent_groups_status.update({'date_start': get_utc_now().strftime(DECIMALS_DATE_FORMAT),
+                                                  'n_chunks': len(groups_info), 'n_synced_chunks': 0,
+                                                  'time_to_apply': 0})
             await self.agent_groups.sync(start_time=self.send_agent_groups_status['date_start'], chunks=groups_info)
         except Exception as e:
             logger.error(f'Error sending agent-groups information to {self.name}: {e}')
@@ -739,12 +912,15 @@ class MasterHandler(server.AbstractServerHandler, c_common.FortishieldCommon):
         logger.debug(f"Received file from worker: '{received_filename}'")
 
         # Dict with metadata of files and path to zipdir (directory with decompressed files).
-        files_metadata, decompressed_files_path = await cluster.async_decompress_files(received_filename)
+        files_metadata, decompressed_files_path = await cluster.run_in_pool(self.loop, self.server.task_pool,
+                                                                            cluster.decompress_files, received_filename,
+                                                                            'files_metadata.json')
         # There are no files inside decompressed_files_path, only files_metadata.json which has already been loaded.
         shutil.rmtree(decompressed_files_path)
 
         # Classify files in shared, missing, extra and extra valid.
-        files_classif = cluster.compare_files(self.server.integrity_control, files_metadata, self.name)
+        files_classif = await cluster.run_in_pool(self.loop, self.server.task_pool, cluster.compare_files,
+                                                  self.server.integrity_control, files_metadata, self.name)
 
         total_time = (utils.get_utc_now() - date_start_master).total_seconds()
         self.extra_valid_requested = False
@@ -1009,7 +1185,9 @@ class Master(server.AbstractServer):
         self.integrity_already_executed = []
         self.dapi = dapi.APIRequestQueue(server=self)
         self.sendsync = dapi.SendSyncRequestQueue(server=self)
-        self.tasks.extend([self.dapi.run, self.sendsync.run, self.file_status_update, self.agent_groups_update])
+        self.agents_stats = AgentsStatistics()
+        self.tasks.extend([self.dapi.run, self.sendsync.run, self.file_status_update, self.agent_groups_update,
+                           self.agents_stats_update])
         # pending API requests waiting for a response
         self.pending_api_requests = {}
 
@@ -1061,6 +1239,24 @@ class Master(server.AbstractServer):
 
             await asyncio.sleep(self.cluster_items['intervals']['master']['sync_agent_groups'])
 
+    async def agents_stats_update(self):
+        """Reconcile the agents statistics with the master's database periodically.
+
+        Between reconciliations, the statistics are updated with the agent-info received from the workers.
+        """
+        logger = self.setup_task_logger('Agents statistics')
+        while True:
+            before = perf_counter()
+            logger.info('Starting.')
+            try:
+                agents = await cluster.run_in_pool(self.loop, self.task_pool, AgentsStatistics.get_agents_info)
+                self.agents_stats.reconcile(agents)
+                logger.info(f'Finished in {(perf_counter() - before):.3f}s. Counted {len(self.agents_stats)} agents.')
+            except Exception as e:
+                logger.error(f'Error counting the agents: {e}')
+
+            await asyncio.sleep(self.cluster_items['intervals']['master']['recalculate_agents_stats'])
+
     async def file_status_update(self):
         """Asynchronous task that obtain files status periodically.
         It updates the local files information every self.cluster_items['intervals']['worker']['sync_integrity']
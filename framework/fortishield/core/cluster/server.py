@@ -3,10 +3,12 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio
+import base64
 import contextlib
 import functools
 import inspect
 import itertools
+import json
 import logging
 import os
 import ssl
@@ -103,6 +105,8 @@ class AbstractServerHandler(c_common.Handler):
             return self.echo_master(data)
         elif command == b'hello':
             return self.hello(data)
+        elif command == b'transport':
+            return self.negotiate_transport(data)
         else:
             return super().process_request(command, data)
 
@@ -152,6 +156,37 @@ class AbstractServerHandler(c_common.Handler):
             self.handler_tasks.append(self.loop.create_task(self.broadcast_reader()))
             return b'ok', f'Client {self.name} added'.encode()
 
+    def negotiate_transport(self, data: bytes) -> Tuple[bytes, bytes]:
+        """Select the transport used with the client among the ones it supports.
+
+        If the AEAD transport is selected, the response is already sent with it, as the client is able to decrypt
+        it before sending the request.
+
+        Parameters
+        ----------
+        data : bytes
+            JSON with the AEAD algorithm, the connection salt and the compression algorithms supported by the client.
+
+        Returns
+        -------
+        bytes
+            Result.
+        bytes
+            JSON with the selected AEAD algorithm and compression algorithm, or null if they are not used.
+        """
+        request = json.loads(data)
+        response = {'aead': None, 'compression': None}
+        if self.my_fernet is not None and self.cluster_items['intervals']['communication']['aead_transport'] \
+                and request.get('aead') == self.aead_algorithm:
+            self.set_aead(base64.b64decode(request['salt']))
+            self.aead_send = True
+            response['aead'] = self.aead_algorithm
+            if 'zlib' in request.get('compression', []):
+                self.compress_min_size = self.cluster_items['intervals']['communication']['compress_min_size']
+                response['compression'] = 'zlib'
+
+        return b'ok', json.dumps(response).encode()
+
     def process_response(self, command: bytes, payload: bytes) -> bytes:
         """Define response commands for servers.
 
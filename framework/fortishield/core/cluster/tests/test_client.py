@@ -3,6 +3,7 @@
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio
+import json
 import logging
 import sys
 import time
@@ -27,7 +28,9 @@ from fortishield.core.exception import FortishieldClusterError
 
 fernet_key = "00000000000000000000000000000000"
 
-cluster_items = {'intervals': {'worker': {'keep_alive': 1, 'max_failed_keepalive_attempts': 0, "connection_retry": 2}}}
+cluster_items = {'intervals': {'worker': {'keep_alive': 1, 'max_failed_keepalive_attempts': 0, "connection_retry": 2},
+                               'communication': {'aead_transport': True, 'compress_min_size': 10,
+                                                 'compress_level': 1}}}
 configuration = {"node_name": "manager", "nodes": [0], "port": 1515}
 
 
@@ -218,13 +221,40 @@ def test_ac_connection_result():
             close_mock.assert_called_once()
 
     # Check second condition
-    with patch.object(logging.getLogger('fortishield'), "info") as logger_mock:
+    with patch.object(logging.getLogger('fortishield'), "info") as logger_mock, \
+            patch.object(abstract_client, 'loop') as loop_mock, \
+            patch.object(abstract_client, 'negotiate_transport', new=MagicMock()) as negotiate_transport_mock:
         abstract_client.transport = CloseMock()
         future = asyncio.Future()
         future.set_result(['OK'])
         abstract_client.connection_result(future)
         logger_mock.assert_called_once_with("Successfully connected to master.")
         assert abstract_client.connected is True
+        loop_mock.create_task.assert_called_once_with(negotiate_transport_mock.return_value)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('response, aead_send, compress_min_size', [
+    (json.dumps({'aead': 'aes-gcm', 'compression': 'zlib'}).encode(), True, 10),
+    (json.dumps({'aead': 'aes-gcm', 'compression': None}).encode(), True, None),
+    (json.dumps({'aead': None, 'compression': None}).encode(), False, None),
+    (FortishieldClusterError(3000), False, None)
+])
+async def test_ac_negotiate_transport(response, aead_send, compress_min_size):
+    """Check that the client only uses the AEAD transport and compression if the server selects them."""
+    test_client = client.AbstractClient(loop=None, on_con_lost=future_mock, name="name", fernet_key=fernet_key,
+                                        logger=None, manager=None, cluster_items=cluster_items)
+
+    with patch.object(test_client, 'send_request', return_value=response) as send_request_mock:
+        await test_client.negotiate_transport()
+
+    request = json.loads(send_request_mock.call_args.kwargs['data'])
+    assert send_request_mock.call_args.kwargs['command'] == b'transport'
+    assert request['aead'] == 'aes-gcm' and request['compression'] == ['zlib'] and request['salt']
+    # The response can be decrypted in any case
+    assert test_client.my_aead is not None
+    assert test_client.aead_send is aead_send
+    assert test_client.compress_min_size == compress_min_size
 
 
 @pytest.mark.asyncio
@@ -7,7 +7,7 @@ import os
 import sys
 import zipfile
 import zlib
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from time import time
 from unittest.mock import MagicMock, mock_open, patch, call, ANY
 
@@ -334,9 +334,10 @@ def test_update_cluster_control(failed_item, exists, expected_result):
 def test_compress_files_ok(mock_path_exists, mock_path_dirname, mock_mkdir_with_mode, mock_get_cluster_items,
                            mock_zlib):
     """Check if the compressing function is working properly."""
-    mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 10000, 'compress_level': 0}}}
+    mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 10000, 'compress_level': 0,
+                                                                           'compress_cache_size': 0}}}
 
-    with patch('builtins.open', mock_open(read_data='test_content')) as open_mock:
+    with patch('builtins.open', mock_open(read_data=b'test_content')) as open_mock:
         assert isinstance(cluster.compress_files('some_name', ['some/path', 'another/path'], {'ko_file': 'file'}),
                           tuple)
         assert open_mock.call_args_list == [call(ANY, 'ab'), call(os.path.join(common.FORTISHIELD_PATH, 'some/path'), 'rb'),
@@ -354,14 +355,15 @@ def test_compress_files_ok(mock_path_exists, mock_path_dirname, mock_mkdir_with_
 @patch('fortishield.core.cluster.cluster.path.exists', return_value=False)
 def test_compress_files_ko(mock_path_exists, mock_path_dirname, mock_mkdir_with_mode, mock_get_cluster_items):
     """Check if the compressing function is raising every exception."""
-    with patch('builtins.open', mock_open(read_data='test_content')):
-        mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 5,'compress_level': 0}}}
+    with patch('builtins.open', mock_open(read_data=b'test_content')):
+        mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 5, 'compress_level': 0,
+                                                                               'compress_cache_size': 0}}}
         _, logs = cluster.compress_files('some_name', ['some/path'], {'missing': {}, 'shared': {}})
         assert logs['warning']['some/path'] == [f'File too large to be synced: '
                                                 f'{os.path.join(common.FORTISHIELD_PATH, "some/path")}']
 
-        mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 15, 'compress_level': 0}}
-                                               }
+        mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 15, 'compress_level': 0,
+                                                                               'compress_cache_size': 0}}}
         with patch('zlib.compress', side_effect=zlib.error):
             with pytest.raises(FortishieldError, match=r'.* 3001 .*'):
                 cluster.compress_files('some_name', ['some/path'], {'ko_file': 'file'})
@@ -381,6 +383,32 @@ def test_compress_files_ko(mock_path_exists, mock_path_dirname, mock_mkdir_with_
                     cluster.compress_files('some_name', ['some/path'], {'ko_file': 'file'})
 
 
+@patch('fortishield.core.cluster.cluster.compressed_files_cache_size', 0)
+@patch('fortishield.core.cluster.cluster.compressed_files_cache', new_callable=OrderedDict)
+@patch('fortishield.core.cluster.cluster.get_cluster_items',
+       return_value={'intervals': {'communication': {'compress_cache_size': 30}}})
+def test_get_compressed_content(mock_get_cluster_items, mock_cache):
+    """Check that the compressed content is reused and the cache size is limited."""
+    with patch('zlib.compress', side_effect=lambda content, level: content.upper()) as zlib_mock:
+        assert cluster.get_compressed_content(b'a' * 10, 1) == b'A' * 10
+        assert cluster.get_compressed_content(b'a' * 10, 1) == b'A' * 10
+        zlib_mock.assert_called_once_with(b'a' * 10, level=1)
+
+        # The same content with another compression level is compressed again.
+        assert cluster.get_compressed_content(b'a' * 10, 2) == b'A' * 10
+        assert zlib_mock.call_count == 2
+
+        # The least recently used content is discarded when the cache is full.
+        cluster.get_compressed_content(b'a' * 10, 1)
+        assert cluster.get_compressed_content(b'b' * 15, 1) == b'B' * 15
+        assert [len(value) for value in mock_cache.values()] == [10, 15]
+        assert cluster.compressed_files_cache_size == 25
+
+        # Content bigger than the cache is not stored.
+        cluster.get_compressed_content(b'c' * 31, 1)
+        assert len(mock_cache) == 2
+
+
 @pytest.mark.asyncio
 @patch('fortishield.core.cluster.cluster.decompress_files', return_value="OK")
 async def test_async_decompress_files(decompress_files_mock):
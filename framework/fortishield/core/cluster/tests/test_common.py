@@ -10,6 +10,7 @@ import hashlib
 import json
 import logging
 import os
+import re
 import sys
 from contextvars import ContextVar
 from datetime import datetime
@@ -140,8 +141,95 @@ def test_inbuffer_receive_data():
     in_buffer.total = 2048
     in_buffer.received = 1024
 
-    assert isinstance(in_buffer.receive_data(b"data"), bytes)
+    remaining_data = in_buffer.receive_data(b"data")
+    assert isinstance(remaining_data, memoryview) and remaining_data == b""
     assert in_buffer.received == 1028
+    assert in_buffer.payload[1024:1028] == b"data"
+
+    # The data that does not belong to the payload is returned without copying it
+    data = bytearray(b"data" * 300)
+    remaining_data = in_buffer.receive_data(data)
+    assert in_buffer.received == in_buffer.total
+    assert remaining_data == data[1020:] and remaining_data.obj is data
+
+
+# Test SyncChunksStream methods
+
+@pytest.mark.parametrize('fragment_size, ensure_ascii', [(1, True), (7, False), (100000, True)])
+def test_sync_chunks_stream_parse(fragment_size, ensure_ascii):
+    """Check that the chunks are parsed as the string is received, whatever the size of its fragments."""
+    chunks = [json.dumps([{'data': [{'id': i, 'groups': ['default', 'grupo-ñ']}], 'hash': str(i)}]) for i in range(5)]
+    header = {'set_data_command': 'global set-agent-groups', 'payload': {'mode': 'override', 'limit': 10}}
+    string = json.dumps({**header, 'chunks': chunks}, ensure_ascii=ensure_ascii).encode()
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+
+    parsed = []
+    for i in range(0, len(string), fragment_size):
+        stream.in_buffer.receive_data(string[i:i + fragment_size])
+        parsed.extend(stream.parse(max_chunks=2))
+        assert not stream.in_chunks or stream.header == header
+    while not stream.finished:
+        parsed.extend(stream.parse(max_chunks=2))
+
+    assert parsed == chunks
+    assert stream.n_chunks == 5 and stream.last_chunk == chunks[-1]
+    assert stream.position == len(string)
+
+
+def test_sync_chunks_stream_parse_decoded_once():
+    """Check that only the text of the incomplete tokens is kept between calls."""
+    chunks = [json.dumps([{'data': [{'id': i, 'groups': ['default']}], 'hash': str(i)}]) for i in range(100)]
+    string = json.dumps({'chunks': chunks}).encode()
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+
+    parsed = []
+    for i in range(0, len(string), 10):
+        stream.in_buffer.receive_data(string[i:i + 10])
+        parsed.extend(stream.parse())
+        assert len(stream._text) - stream._index < max(len(json.dumps(chunk)) for chunk in chunks) + 10
+        assert stream.decoded == stream.in_buffer.received
+
+    assert parsed == chunks and stream.finished
+
+
+@pytest.mark.parametrize('string, error', [
+    (b'["chunks"]', "expected one of '{' in position 0, found '['"),
+    (b'{"chunks": [1]}', "expected one of '\"]' in position 12, found '1'"),
+    (b'{"chunks": ["a", 1]}', 'invalid chunk in position 15'),
+    (b'{"chunks": "a"}', "expected one of '[' in position 11, found '\"'"),
+    (b'{"payload": {"mode": ', 'the received string is not a complete JSON object'),
+])
+def test_sync_chunks_stream_parse_ko(string, error):
+    """Check that an exception is raised if the string does not have the expected format."""
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+    stream.in_buffer.receive_data(string)
+    with pytest.raises(ValueError, match=re.escape(error)):
+        stream.parse()
+
+
+@pytest.mark.asyncio
+async def test_sync_chunks_stream_get_chunks():
+    """Check that the chunks are returned when they are received."""
+    string = json.dumps({'chunks': ['a', 'b', 'c']}).encode()
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+
+    async def receive():
+        for i in range(len(string)):
+            stream.in_buffer.receive_data(string[i:i + 1])
+            stream.data_received.set()
+            await asyncio.sleep(0)
+
+    receive_task = asyncio.create_task(receive())
+    assert [chunks async for chunks in stream.get_chunks(max_chunks=2, timeout=1)] == [['a'], ['b'], ['c']]
+    await receive_task
+
+    # The rest of the string is not received.
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+    stream.in_buffer.receive_data(string[:-4])
+    chunks_generator = stream.get_chunks(max_chunks=5, timeout=0.01)
+    assert await chunks_generator.__anext__() == ['a', 'b']
+    with pytest.raises(asyncio.TimeoutError):
+        await chunks_generator.__anext__()
 
 
 # Test SendStringTask methods
@@ -491,6 +579,53 @@ def test_handler_msg_build_ko():
         handler.msg_build(b"much much longer command", 12345, b"data")
 
 
+@pytest.mark.parametrize('aead_send, compress_min_size, data, expected_frame', [
+    (False, None, b'a' * 100, b'g'),
+    (True, None, b'a' * 100, cluster_common.Handler.aead_frame),
+    (True, 10, b'a' * 100, cluster_common.Handler.aead_zlib_frame),
+    (True, 10, os.urandom(100), cluster_common.Handler.aead_frame),
+    (True, 1000, b'a' * 100, cluster_common.Handler.aead_frame)
+])
+def test_handler_encrypt_decrypt(aead_send, compress_min_size, data, expected_frame):
+    """Test that payloads are encrypted with the negotiated transport and the peer is able to decrypt them."""
+    items = {'intervals': {'communication': {'compress_level': 1}}}
+    sender = cluster_common.Handler(fernet_key, items)
+    receiver = cluster_common.Handler(fernet_key, items)
+    for handler in (sender, receiver):
+        handler.set_aead(b'salt')
+    sender.aead_send = aead_send
+    sender.compress_min_size = compress_min_size
+
+    encrypted_data = sender.encrypt(data)
+    assert encrypted_data[:1] == expected_frame
+    assert receiver.decrypt(bytearray(encrypted_data)) == data
+
+    # Payloads of other connections cannot be decrypted
+    if aead_send:
+        receiver.set_aead(b'other salt')
+        with pytest.raises(exception.FortishieldClusterError, match=r'.* 3025 .*'):
+            receiver.decrypt(encrypted_data)
+
+
+def test_handler_data_received_aead():
+    """Test that divided messages sent with the AEAD transport are joined and decrypted."""
+    items = {'intervals': {'communication': {'compress_level': 1}}}
+    sender = cluster_common.Handler(fernet_key, items)
+    receiver = cluster_common.Handler(fernet_key, items)
+    for handler in (sender, receiver):
+        handler.set_aead(b'salt')
+    sender.aead_send = True
+    sender.compress_min_size = 10
+    sender.request_chunk = 100
+    data = json.dumps([str(i) for i in range(1000)]).encode()
+
+    msgs = sender.msg_build(b'command', 123, data) + sender.msg_build(b'command', 124, b'data')
+    assert len(msgs) > 2
+    with patch('fortishield.core.cluster.common.Handler.dispatch') as dispatch_mock:
+        receiver.data_received(b''.join(msgs))
+    dispatch_mock.assert_has_calls([call(b'command', 123, data), call(b'command', 124, b'data')])
+
+
 def test_handler_msg_parse():
     """Test if an incoming message is being properly parsed."""
     handler = cluster_common.Handler(fernet_key, cluster_items)
@@ -918,6 +1053,24 @@ def test_handler_data_received_ok():
                 dispatch_mock.assert_called_once_with(b"bytes1", 123, b"bytes2")
 
 
+@pytest.mark.parametrize('read_size', [1, 7, 20, 26, 100, 1000])
+def test_handler_data_received_split(read_size):
+    """Test that messages are assembled when they are received in reads of any size, even with only a header."""
+    sender = cluster_common.Handler('', cluster_items)
+    receiver = cluster_common.Handler('', cluster_items)
+    sender.request_chunk = 50
+    data = b''.join(bytes(msg) for payload in (b'a' * 6, b'b' * 120, b'', b'c' * 30)
+                    for msg in sender.msg_build(b'command', sender.next_counter(), payload))
+
+    with patch('fortishield.core.cluster.common.Handler.dispatch') as dispatch_mock:
+        for i in range(0, len(data), read_size):
+            receiver.data_received(data[i:i + read_size])
+            assert isinstance(receiver.in_buffer, bytes)
+
+    assert [args[2] for args, _ in dispatch_mock.call_args_list] == [b'a' * 6, b'b' * 120, b'', b'c' * 30]
+    assert receiver.div_msg_box == {}
+
+
 def test_handler_data_received_ko():
     """Test the 'data_received' function exceptions."""
     handler = cluster_common.Handler(fernet_key, cluster_items)
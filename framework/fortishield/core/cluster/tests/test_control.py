@@ -99,6 +99,23 @@ async def test_get_health():
             await control.get_health(lc=local_client)
 
 
+@pytest.mark.asyncio
+async def test_get_agents_stats():
+    """Verify that get_agents_stats function returns the agents statistics kept by the master."""
+    local_client = LocalClient()
+    with patch('fortishield.core.cluster.local_client.LocalClient.execute',
+               return_value='{"nodes": [{"node_name": "master", "count": 1}]}') as execute_mock:
+        assert await control.get_agents_stats(lc=local_client) == {'nodes': [{'node_name': 'master', 'count': 1}]}
+        execute_mock.assert_called_once_with(command=b'get_agents_stats', data=b'')
+
+    with patch('fortishield.core.cluster.local_client.LocalClient.execute', return_value='null'):
+        assert await control.get_agents_stats(lc=local_client) is None
+
+    with patch('fortishield.core.cluster.local_client.LocalClient.execute', side_effect=FortishieldClusterError(3020)):
+        with pytest.raises(FortishieldClusterError):
+            await control.get_agents_stats(lc=local_client)
+
+
 @pytest.mark.asyncio
 async def test_get_agents():
     """Verify that get_agents function returns the health of the agents connected through the current node."""
@@ -333,6 +333,32 @@ async def test_LocalServerHandlerMaster_get_health(event_loop):
     assert lshm.get_health(filter_nodes=b"{\"get_health\": \"a\"}") == (b'ok', b'{"get_health": {"get_health": "a"}}')
 
 
+@pytest.mark.asyncio
+async def test_LocalServerHandlerMaster_get_agents_stats(event_loop):
+    """Set the behavior of the get_agents_stats function of the LocalServerHandlerMaster class."""
+
+    class AgentsStatisticsMock:
+        def get_summary(self):
+            return {"nodes": [{"node_name": "master", "count": 1}]}
+
+    class NodeMock:
+        def __init__(self):
+            self.agents_stats = AgentsStatisticsMock()
+
+    class ServerMock:
+        def __init__(self):
+            self.node = NodeMock()
+
+    lshm = LocalServerHandlerMaster(server=ServerMock(), loop=event_loop, fernet_key=None, cluster_items={})
+    assert lshm.get_agents_stats() == (b'ok', b'{"nodes": [{"node_name": "master", "count": 1}]}')
+
+    lshm.name = "test1"
+    with patch("fortishield.core.cluster.local_server.context_tag", ContextVar("tag", default="")):
+        with patch.object(lshm, "get_agents_stats") as get_agents_stats_mock:
+            lshm.process_request(command=b"get_agents_stats", data=b"")
+            get_agents_stats_mock.assert_called_once_with()
+
+
 @pytest.mark.asyncio
 async def test_LocalServerHandlerMaster_send_file_request(event_loop):
     """Check that the task for sending files is created."""
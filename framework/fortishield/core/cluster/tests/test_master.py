@@ -274,6 +274,59 @@ def test_rait_done_callback(set_up_coro_mock, super_callback_mock, create_task_m
     assert fortishield_common_mock.sync_agent_info_free is True
 
 
+# Test AgentsStatistics class
+
+def test_agents_statistics():
+    """Check that the agents statistics are reconciled with the database and updated with the agent-info."""
+    agents_stats = master.AgentsStatistics()
+    assert agents_stats.get_summary() is None
+
+    agents_stats.reconcile([
+        {'id': 1, 'connection_status': 'active', 'group_config_status': 'synced', 'os_name': 'Ubuntu',
+         'os_platform': 'ubuntu', 'os_version': '22.04', 'version': 'Fortishield v4.8.0', 'node_name': 'worker1',
+         'group': 'default,group1'},
+        {'id': 2, 'connection_status': 'active', 'group_config_status': 'synced', 'os_name': 'Ubuntu',
+         'os_platform': 'ubuntu', 'os_version': '22.04', 'version': 'Fortishield v4.8.0', 'node_name': 'worker1',
+         'group': 'default'},
+        {'id': 3, 'connection_status': 'never_connected', 'group_config_status': 'not synced', 'node_name': 'unknown'}
+    ])
+    assert len(agents_stats) == 3
+    summary = agents_stats.get_summary()
+    assert summary['nodes'] == [{'node_name': 'worker1', 'count': 2}, {'node_name': 'unknown', 'count': 1}]
+    assert summary['agent_os'] == [{'os.name': 'Ubuntu', 'os.platform': 'ubuntu', 'os.version': '22.04', 'count': 2},
+                                   {'count': 1}]
+    assert summary['agent_status'] == [{'status': 'active', 'group_config_status': 'synced', 'count': 2},
+                                       {'status': 'never_connected', 'group_config_status': 'not synced', 'count': 1}]
+    assert summary['groups'] == [{'group': 'default', 'count': 2}, {'group': 'group1', 'count': 1}]
+
+    # The agent-info does not include the groups, so they are kept. Invalid chunks are ignored
+    agents_stats.update_from_chunks([
+        '[{"id": 1, "connection_status": "disconnected", "group_config_status": "synced", "os_name": "Ubuntu", '
+        '"os_platform": "ubuntu", "os_version": "22.04", "version": "Fortishield v4.8.0", "node_name": "worker2"}]',
+        'invalid', '[{"id": 0, "connection_status": "active"}]'
+    ])
+    summary = agents_stats.get_summary()
+    assert sorted(summary['nodes'], key=str) == [{'node_name': 'unknown', 'count': 1},
+                                                 {'node_name': 'worker1', 'count': 1},
+                                                 {'node_name': 'worker2', 'count': 1}]
+    assert summary['agent_status'] == [{'status': 'active', 'group_config_status': 'synced', 'count': 1},
+                                       {'status': 'never_connected', 'group_config_status': 'not synced', 'count': 1},
+                                       {'status': 'disconnected', 'group_config_status': 'synced', 'count': 1}]
+    assert summary['groups'] == [{'group': 'default', 'count': 2}, {'group': 'group1', 'count': 1}]
+    assert len(agents_stats) == 3
+
+
+@patch('fortishield.core.cluster.master.FortishieldDBConnection')
+def test_agents_statistics_get_agents_info(fdb_conn_mock):
+    """Check that the information of every agent but the manager is obtained from the database."""
+    fdb_conn_mock.return_value.execute.return_value = [{'id': 1}]
+    assert master.AgentsStatistics.get_agents_info() == [{'id': 1}]
+    fdb_conn_mock.return_value.execute.assert_called_once_with(
+        'global sql select id,connection_status,group_config_status,os_name,os_platform,os_version,version,'
+        'node_name,`group` from agent where id != 0')
+    fdb_conn_mock.return_value.close.assert_called_once()
+
+
 # Test MasterHandler class
 
 def test_master_handler_init():
@@ -300,6 +353,9 @@ def test_master_handler_init():
             'date_start_master': DEFAULT_DATE,
             'date_end_master': DEFAULT_DATE,
             'n_synced_chunks': 0}
+        assert master_handler.send_agent_groups_status == master_handler.send_full_agent_groups_status == {
+            'date_start': DEFAULT_DATE, 'date_end': DEFAULT_DATE, 'n_chunks': 0, 'n_synced_chunks': 0,
+            'time_to_apply': 0}
         assert master_handler.version == ""
         assert master_handler.cluster_name == ""
         assert master_handler.node_type == ""
@@ -412,10 +468,13 @@ def test_master_handler_process_request(logger_mock):
         master_handler.task_loggers['Agent-groups send'] = logging.getLogger('Agent-groups send')
         master_handler.send_agent_groups_status['date_start'] = '1970-01-01T00:00:00.0Z'
 
-        assert master_handler.process_request(command=b'syn_w_g_e', data=b"data") == b"ok"
+        response = '{"updated_chunks": 5, "error_messages": [], "time_spent": 1.23456}'
+        assert master_handler.process_request(command=b'syn_w_g_e', data=response.encode()) == b"ok"
         end_sending_agent_information_mock.assert_called_once_with(
             logging.getLogger('Agent-groups send'), 
-            datetime.strptime(master_handler.send_agent_groups_status['date_start'], DECIMALS_DATE_FORMAT), "data")
+            datetime.strptime(master_handler.send_agent_groups_status['date_start'], DECIMALS_DATE_FORMAT), response)
+        assert master_handler.send_agent_groups_status['n_synced_chunks'] == 5
+        assert master_handler.send_agent_groups_status['time_to_apply'] == 1.235
 
     # Test the sixth condition
     with patch("fortishield.core.cluster.common.end_sending_agent_information",
@@ -423,10 +482,13 @@ def test_master_handler_process_request(logger_mock):
         master_handler.task_loggers['Agent-groups send full'] = logging.getLogger('Agent-groups send full')
         master_handler.send_full_agent_groups_status['date_start'] = '1970-01-01T00:00:00.0Z'
 
-        assert master_handler.process_request(command=b'syn_wgc_e', data=b"data") == b"ok"
+        assert master_handler.process_request(command=b'syn_wgc_e', data=response.encode()) == b"ok"
         end_sending_agent_information_mock.assert_called_once_with(
             logging.getLogger('Agent-groups send full'),
-            datetime.strptime(master_handler.send_full_agent_groups_status['date_start'], DECIMALS_DATE_FORMAT), "data")
+            datetime.strptime(master_handler.send_full_agent_groups_status['date_start'], DECIMALS_DATE_FORMAT),
+            response)
+        assert master_handler.send_full_agent_groups_status['n_synced_chunks'] == 5
+        assert master_handler.send_full_agent_groups_status['time_to_apply'] == 1.235
 
     # Test the seventh condition
     with patch("fortishield.core.cluster.common.error_receiving_agent_information",
@@ -895,7 +957,7 @@ def test_master_handler_end_receiving_integrity_checksums(end_receiving_file_moc
 @freeze_time('1970-01-01')
 @patch('fortishield.core.cluster.common.Handler.send_request', return_value='some_data')
 @patch('fortishield.core.cluster.common.Handler.update_chunks_fdb', return_value={'updated_chunks': 1})
-@patch('fortishield.core.cluster.common.Handler.get_chunks_in_task_id', return_value='chunks')
+@patch('fortishield.core.cluster.common.Handler.get_chunks_in_task_id', return_value={'chunks': ['[{"id": 1}]']})
 async def test_master_handler_sync_fortishield_db_info(get_chunks_mock, update_chunks_mock, send_request_mock):
     """Check that the fortishield-db data reception task is created and chunks are obtained and updated in DB."""
     class LoggerMock:
@@ -911,10 +973,12 @@ async def test_master_handler_sync_fortishield_db_info(get_chunks_mock, update_c
     logger = LoggerMock()
     master_handler.task_loggers['Agent-info sync'] = logger
     master_handler.sync_agent_info_status = {'n_synced_chunks': 0}
+    master_handler.server.agents_stats = MagicMock()
 
     assert await master_handler.sync_fortishield_db_info(task_id=b'17', info_type='agent-groups') == 'some_data'
     get_chunks_mock.assert_called_once_with(b'17', b'syn_m_a_err')
-    update_chunks_mock.assert_called_once_with('chunks', 'agent-info', logger, b'syn_m_a_err', 0)
+    update_chunks_mock.assert_called_once_with({'chunks': ['[{"id": 1}]']}, 'agent-info', logger, b'syn_m_a_err', 0)
+    master_handler.server.agents_stats.update_from_chunks.assert_called_once_with(['[{"id": 1}]'])
     send_request_mock.assert_called_once_with(command=b'syn_m_a_e', data=b'{"updated_chunks": 1}')
     assert logger._info == ['Starting.', 'Finished in 0.000s. Updated 1 chunks.']
     assert master_handler.sync_agent_info_status == {'n_synced_chunks': 1,
@@ -985,6 +1049,7 @@ async def test_manager_handler_send_agent_groups_information(AsyncFortishieldDBC
     await master_handler.send_agent_groups_information("test_info")
     master_handler.agent_groups.sync.assert_called_once_with(
         start_time=master_handler.send_agent_groups_status["date_start"], chunks="test_info")
+    assert master_handler.send_agent_groups_status['n_chunks'] == len("test_info")
 
     assert master_handler.task_loggers["Agent-groups send"]._info == ['Starting.']
     assert master_handler.task_loggers["Agent-groups send"]._error == [
@@ -1141,7 +1206,7 @@ async def test_master_handler_integrity_check(decompress_files_mock, send_reques
 
         def __init__(self):
             self.integrity_control = True
-            self.task_pool = ''
+            self.task_pool = None
 
     master_handler = get_master_handler()
     master_handler.server = ServerMock()
@@ -1490,6 +1555,8 @@ def test_master_init(pool_executor_mock, get_running_loop_mock, warning_mock):
     assert master_class.dapi.run in master_class.tasks
     assert master_class.sendsync.run in master_class.tasks
     assert master_class.file_status_update in master_class.tasks
+    assert master_class.agents_stats_update in master_class.tasks
+    assert isinstance(master_class.agents_stats, master.AgentsStatistics)
     assert master_class.pending_api_requests == {}
 
     # Test the exceptions
@@ -1608,6 +1675,29 @@ async def test_agent_groups_update(sleep_mock, perf_counter_mock):
                 assert "No clients connected. Skipping." in logger_mock._info
 
 
+@pytest.mark.asyncio
+@patch('fortishield.core.cluster.master.perf_counter', return_value=0)
+@patch('asyncio.sleep', side_effect=[None, Exception('Stop while true')])
+async def test_master_agents_stats_update(sleep_mock, perf_counter_mock):
+    """Check that the agents statistics are periodically reconciled with the database."""
+    master_class = get_master()
+    master_class.cluster_items['intervals']['master']['recalculate_agents_stats'] = 1
+    logger_mock = MagicMock()
+
+    with patch('fortishield.core.cluster.master.cluster.run_in_pool',
+               side_effect=[[{'id': 1, 'node_name': 'master'}], Exception('Testing')]) as run_in_pool_mock:
+        with patch('fortishield.core.cluster.master.Master.setup_task_logger', return_value=logger_mock):
+            with pytest.raises(Exception, match='Stop while true'):
+                await master_class.agents_stats_update()
+
+    run_in_pool_mock.assert_called_with(master_class.loop, master_class.task_pool,
+                                        master.AgentsStatistics.get_agents_info)
+    logger_mock.info.assert_any_call('Finished in 0.000s. Counted 1 agents.')
+    logger_mock.error.assert_called_once_with('Error counting the agents: Testing')
+    assert master_class.agents_stats.get_summary()['nodes'] == [{'node_name': 'master', 'count': 1}]
+    sleep_mock.assert_called_with(1)
+
+
 @pytest.mark.asyncio
 @freeze_time("2021-11-02")
 @patch('asyncio.sleep')
@@ -81,10 +81,12 @@ def test_AbstractServerHandler_connection_made(event_loop):
 
 
 @pytest.mark.asyncio
+@patch("fortishield.core.cluster.server.AbstractServerHandler.negotiate_transport")
 @patch("fortishield.core.cluster.server.AbstractServerHandler.hello")
 @patch("fortishield.core.cluster.server.AbstractServerHandler.echo_master")
 @patch("fortishield.core.cluster.common.Handler.process_request")
-async def test_AbstractServerHandler_process_request(mock_process_request, mock_echo_master, mock_hello, event_loop):
+async def test_AbstractServerHandler_process_request(mock_process_request, mock_echo_master, mock_hello,
+                                                     mock_negotiate_transport, event_loop):
     """Check the behavior of the process_request function for the different commands that can be sent to it."""
     abstract_server_handler = AbstractServerHandler(server="Test", loop=event_loop, fernet_key=fernet_key,
                                                     cluster_items={"test": "server"})
@@ -95,6 +97,9 @@ async def test_AbstractServerHandler_process_request(mock_process_request, mock_
     abstract_server_handler.process_request(command=b"hello", data=b"hi")
     mock_hello.assert_called_once_with(b"hi")
 
+    abstract_server_handler.process_request(command=b"transport", data=b"{}")
+    mock_negotiate_transport.assert_called_once_with(b"{}")
+
     abstract_server_handler.process_request(command=b"process", data=b"request")
     mock_process_request.assert_called_once_with(b"process", b"request")
 
@@ -146,6 +151,34 @@ def test_AbstractServerHandler_hello(event_loop):
     assert abstract_server_handler.name == ""
 
 
+@pytest.mark.parametrize('request_data, aead_transport, expected_response', [
+    ({'aead': 'aes-gcm', 'compression': ['zlib']}, True, {'aead': 'aes-gcm', 'compression': 'zlib'}),
+    ({'aead': 'aes-gcm', 'compression': []}, True, {'aead': 'aes-gcm', 'compression': None}),
+    ({'aead': 'aes-gcm', 'compression': ['zlib']}, False, {'aead': None, 'compression': None}),
+    ({'aead': 'unknown', 'compression': ['zlib']}, True, {'aead': None, 'compression': None})
+])
+def test_AbstractServerHandler_negotiate_transport(request_data, aead_transport, expected_response, event_loop):
+    """Check that the server selects the transport among the ones supported by the client and starts using it."""
+    cluster_items = {'intervals': {'communication': {'aead_transport': aead_transport, 'compress_min_size': 10,
+                                                     'compress_level': 1}}}
+    abstract_server_handler = AbstractServerHandler(server="Test", loop=event_loop, fernet_key=fernet_key,
+                                                    cluster_items=cluster_items)
+    client_handler = c_common.Handler(fernet_key=fernet_key, cluster_items=cluster_items)
+    salt = b'0' * 16
+    client_handler.set_aead(salt)
+
+    request_data['salt'] = base64.b64encode(salt).decode()
+    command, response = abstract_server_handler.negotiate_transport(json.dumps(request_data).encode())
+    assert command == b'ok'
+    assert json.loads(response) == expected_response
+    assert abstract_server_handler.aead_send is (expected_response['aead'] is not None)
+    assert abstract_server_handler.compress_min_size == (10 if expected_response['compression'] else None)
+
+    # The client is able to decrypt the messages sent by the server
+    data = b'a' * 100
+    assert client_handler.decrypt(abstract_server_handler.encrypt(data)) == data
+
+
 @pytest.mark.asyncio
 @patch("fortishield.core.cluster.common.Handler.process_response")
 async def test_AbstractServerHandler_process_response(process_response_mock, event_loop):
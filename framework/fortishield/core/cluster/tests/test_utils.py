@@ -41,7 +41,8 @@ def test_read_cluster_config():
         with pytest.raises(FortishieldError, match='.* 3006 .*'):
             utils.read_cluster_config()
 
-    with patch('fortishield.core.configuration.load_fortishield_xml', return_value=SystemExit):
+    with patch('fortishield.core.configuration.load_fortishield_xml', return_value=SystemExit), \
+            patch('fortishield.core.configuration.ossec_conf_cache', new={}):
         with pytest.raises(SystemExit) as pytest_wrapped_e:
             utils.read_cluster_config(from_import=True)
         assert pytest_wrapped_e.type == SystemExit
@@ -208,16 +209,19 @@ def test_get_cluster_items():
                                'excluded_extensions': ['~', '.tmp', '.lock', '.swp']},
                      'intervals': {'worker': {'sync_integrity': 9, 'sync_agent_info': 10, 'sync_agent_groups': 30,
                                               'keep_alive': 60, 'connection_retry': 10, 'timeout_agent_groups': 40,
-                                              'max_failed_keepalive_attempts': 2, "agent_groups_mismatch_limit": 5},
+                                              'max_failed_keepalive_attempts': 2, "agent_groups_mismatch_limit": 5,
+                                              'agent_groups_queue_size': 8},
                                    'master': {'timeout_extra_valid': 40, 'recalculate_integrity': 8,
                                               'check_worker_lastkeepalive': 60,
                                               'max_allowed_time_without_keepalive': 120, 'process_pool_size': 2,
                                               'sync_agent_groups': 10, 'timeout_agent_info': 40,
-                                              'max_locked_integrity_time': 1000, 'agent_group_start_delay': 30},
+                                              'max_locked_integrity_time': 1000, 'agent_group_start_delay': 30,
+                                              'recalculate_agents_stats': 60},
                                    'communication': {'timeout_cluster_request': 20, 'timeout_dapi_request': 200,
                                                      'timeout_receiving_file': 120, 'min_zip_size': 31457280,
                                                      'max_zip_size': 1073741824, 'compress_level': 1,
-                                                     'zip_limit_tolerance': 0.2}},
+                                                     'zip_limit_tolerance': 0.2, 'aead_transport': True,
+                                                     'compress_min_size': 65536, 'compress_cache_size': 104857600}},
                      'distributed_api': {'enabled': True}}
 
 
@@ -35,7 +35,7 @@ logger = logging.getLogger("fortishield")
 cluster_items = {'node': 'master-node',
                  'intervals': {'worker': {'connection_retry': 1, "sync_integrity": 2, "timeout_agent_groups": 0,
                                           "sync_agent_info": 5, "sync_agent_groups": 5,
-                                          "agent_groups_mismatch_limit": 5},
+                                          "agent_groups_mismatch_limit": 5, "agent_groups_queue_size": 2},
                                "communication": {"timeout_receiving_file": 1, "max_zip_size": 1000, "min_zip_size": 0,
                                                  "zip_limit_tolerance": 0.2, "timeout_cluster_request": 20}},
                  "files": {"cluster_item_key": {"remove_subdirs_if_empty": True, "permissions": "value"}}}
@@ -698,6 +698,131 @@ async def test_worker_handler_recv_agent_groups_information(get_chunks_in_task_i
     assert 'Finished in 0.000s. Updated 1 chunks.' in logger_c._info
 
 
+def get_agent_groups_string(n_chunks):
+    """Return agent-groups chunks and the string sent by the master with them. This is an auxiliary method."""
+    chunks = [json.dumps([{'data': [{'id': i, 'groups': ['default']}], 'hash': str(i)}]) for i in range(n_chunks)]
+    string = json.dumps({'set_data_command': 'global set-agent-groups', 'payload': {'mode': 'override'},
+                         'chunks': chunks}).encode()
+    return chunks, string
+
+
+@pytest.mark.asyncio
+async def test_worker_handler_str_upd(event_loop):
+    """Check that agent-groups strings start being applied when their first fragment is received."""
+    worker_handler = get_worker_handler(event_loop)
+    _, string = get_agent_groups_string(3)
+
+    with patch('fortishield.core.cluster.worker.WorkerHandler.apply_agent_groups_stream',
+               new=MagicMock(return_value=None)) as apply_mock, \
+            patch('asyncio.create_task', return_value='task') as create_task_mock:
+        worker_handler.in_str[b'1'] = cluster_common.InBuffer(total=len(string))
+        assert worker_handler.str_upd(b'1 ' + string[:120]) == (b'ok', b'String updated')
+        stream, task = worker_handler.agent_groups_streams[b'1']
+        apply_mock.assert_called_once_with(stream, b'1')
+        create_task_mock.assert_called_once()
+        assert task == 'task'
+        assert stream.header == {'set_data_command': 'global set-agent-groups', 'payload': {'mode': 'override'}}
+        assert not stream.data_received.is_set()
+
+        worker_handler.str_upd(b'1 ' + string[120:])
+        assert stream.data_received.is_set()
+        apply_mock.assert_called_once()
+
+        # Other strings are only stored.
+        worker_handler.in_str[b'2'] = cluster_common.InBuffer(total=len(string))
+        worker_handler.str_upd(b'2 ' + b'{"set_data_command": "global sync-agent-info-set", ' + string[120:])
+        worker_handler.in_str[b'3'] = cluster_common.InBuffer(total=7)
+        worker_handler.str_upd(b'3 ' + b'["dapi"]')
+        assert list(worker_handler.agent_groups_streams) == [b'1']
+
+
+@pytest.mark.asyncio
+@freeze_time('1970-01-01')
+@pytest.mark.parametrize('fragment_size', [10, 10000])
+@patch('fortishield.core.cluster.worker.AsyncFortishieldDBConnection')
+async def test_worker_handler_apply_agent_groups_stream(fdb_conn_mock, fragment_size, event_loop):
+    """Check that the agent-groups chunks are sent to fortishield-db while the string is received."""
+    worker_handler = get_worker_handler(event_loop)
+    worker_handler.cluster_items = {'intervals': {'worker': {'timeout_agent_groups': 10,
+                                                             'agent_groups_queue_size': 2}}}
+    chunks, string = get_agent_groups_string(5)
+    fdb_conn_mock.return_value.run_fdb_command = AsyncMock(side_effect=[('ok', ''), exception.FortishieldInternalError(
+        2007), ('ok', ''), ('ok', ''), ('ok', '')])
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+
+    apply_task = asyncio.create_task(worker_handler.apply_agent_groups_stream(stream))
+    for i in range(0, len(string), fragment_size):
+        stream.in_buffer.receive_data(string[i:i + fragment_size])
+        stream.data_received.set()
+        await asyncio.sleep(0)
+    result = await apply_task
+
+    assert result['updated_chunks'] == 4
+    assert result['error_messages'] == {'chunks': [(1, str(exception.FortishieldInternalError(2007)))], 'others': []}
+    assert fdb_conn_mock.return_value.run_fdb_command.call_args_list == [
+        call('global set-agent-groups ' + json.dumps({'mode': 'override', 'data': json.loads(chunk)[0]['data']},
+                                                     separators=(',', ':'))) for chunk in chunks]
+    fdb_conn_mock.return_value.close.assert_called_once()
+    assert worker_handler.sync_agent_groups_from_master['n_synced_chunks'] == 4
+    assert stream.last_chunk == chunks[-1]
+
+
+@pytest.mark.asyncio
+@patch('fortishield.core.cluster.worker.AsyncFortishieldDBConnection')
+async def test_worker_handler_apply_agent_groups_stream_ko(fdb_conn_mock, event_loop):
+    """Check that errors while receiving the agent-groups string are reported."""
+    worker_handler = get_worker_handler(event_loop)
+    worker_handler.cluster_items = {'intervals': {'worker': {'timeout_agent_groups': 0.1,
+                                                             'agent_groups_queue_size': 2}}}
+    _, string = get_agent_groups_string(2)
+    fdb_conn_mock.return_value.run_fdb_command = AsyncMock()
+
+    # The string is not a valid JSON object.
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+    stream.in_buffer.receive_data(string[:-1] + b']')
+    result = await worker_handler.apply_agent_groups_stream(stream)
+    assert result['error_messages']['others'] == [
+        "Error while processing agent-groups chunks: expected one of ',}' in position "
+        f"{len(string) - 1}, found ']'"]
+
+    # The rest of the string is not received. Its stream is discarded.
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+    stream.in_buffer.receive_data(string[:50])
+    worker_handler.agent_groups_streams[b'1'] = (stream, None)
+    result = await worker_handler.apply_agent_groups_stream(stream, b'1')
+    assert result['error_messages']['others'] == ['Timeout while processing agent-groups chunks.']
+    assert worker_handler.agent_groups_streams == {}
+    fdb_conn_mock.return_value.close.assert_called()
+
+
+@pytest.mark.asyncio
+@freeze_time('1970-01-01')
+@patch('fortishield.core.cluster.worker.WorkerHandler.check_agent_groups_checksums')
+@patch('fortishield.core.cluster.common.Handler.send_request', return_value='check')
+@patch('fortishield.core.cluster.common.Handler.get_chunks_in_task_id')
+async def test_worker_handler_recv_agent_groups_information_stream(get_chunks_in_task_id_mock, send_request_mock,
+                                                                   check_agent_groups_checksums_mock, event_loop):
+    """Check that the result of an agent-groups string applied while it was received is sent to the master."""
+    worker_handler = get_worker_handler(event_loop)
+    chunks, string = get_agent_groups_string(2)
+    stream = cluster_common.SyncChunksStream(cluster_common.InBuffer(total=len(string)))
+    stream.in_buffer.receive_data(string)
+    stream.parse()
+
+    async def apply():
+        return {'updated_chunks': 1, 'error_messages': {'chunks': [(0, 'error')], 'others': []}, 'time_spent': 0}
+
+    worker_handler.agent_groups_streams[b'17'] = (stream, asyncio.create_task(apply()))
+    logger = logging.getLogger('Agent-groups recv')
+    assert await worker_handler.recv_agent_groups_information(b'17', 'agent-groups', logger, b'syn_w_g_e',
+                                                              b'syn_w_g_err', 0) == 'check'
+    get_chunks_in_task_id_mock.assert_not_called()
+    send_request_mock.assert_called_once_with(command=b'syn_w_g_e', data=json.dumps(
+        {'updated_chunks': 1, 'error_messages': ['error'], 'time_spent': 0}).encode())
+    check_agent_groups_checksums_mock.assert_called_once_with({'chunks': [chunks[-1]]}, logger)
+    assert worker_handler.agent_groups_streams == {}
+
+
 @freeze_time('1970-01-01')
 @pytest.mark.asyncio
 @patch.object(fortishield.core.cluster.worker.json, "dumps", return_value="")
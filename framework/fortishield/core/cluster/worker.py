@@ -155,6 +155,8 @@ class WorkerHandler(client.AbstractClient, c_common.FortishieldCommon):
         default_date = datetime.utcfromtimestamp(0)
         self.sync_agent_groups_from_master = {'date_start_worker': default_date, 'date_end_worker': default_date,
                                               'n_synced_chunks': 0}
+        # Agent-groups strings that are applied to fortishield-db while they are received. String ID -> (stream, task).
+        self.agent_groups_streams = {}
         self.agent_info_sync_status = {'date_start': 0.0}
         self.integrity_check_status = {'date_start': 0.0}
         self.integrity_sync_status = {'date_start': 0.0}
@@ -191,6 +193,9 @@ class WorkerHandler(client.AbstractClient, c_common.FortishieldCommon):
             by this side of the connection.
         """
         super().connection_lost(exc)
+        for _, apply_task in self.agent_groups_streams.values():
+            apply_task.cancel()
+        self.agent_groups_streams.clear()
 
         # Clean cluster files from previous executions.
         cluster.clean_up(node_name=self.name)
@@ -247,6 +252,107 @@ class WorkerHandler(client.AbstractClient, c_common.FortishieldCommon):
         else:
             return super().process_request(command, data)
 
+    def str_upd(self, data: bytes) -> Tuple[bytes, bytes]:
+        """Update string contents and start applying agent-groups information as soon as it is identified.
+
+        When the first fragment of a string contains the header of the agent-groups information sent by the master,
+        its chunks are parsed and sent to fortishield-db while the rest of the string is received.
+
+        Parameters
+        ----------
+        data : bytes
+            Bytes containing string ID and data separated by ' '.
+
+        Returns
+        -------
+        bytes
+            Result.
+        bytes
+            String ID.
+        """
+        result = super().str_upd(data)
+        separator = data.index(b' ')
+        string_id = data[:separator]
+
+        if string_id in self.agent_groups_streams:
+            self.agent_groups_streams[string_id][0].data_received.set()
+        elif self.in_str[string_id].received == len(data) - separator - 1:
+            stream = c_common.SyncChunksStream(self.in_str[string_id])
+            with contextlib.suppress(ValueError):
+                stream.parse(max_chunks=0)
+            if stream.in_chunks and stream.header.get('set_data_command') == 'global set-agent-groups':
+                self.agent_groups_streams[string_id] = (stream, asyncio.create_task(
+                    self.apply_agent_groups_stream(stream, string_id)))
+
+        return result
+
+    async def apply_agent_groups_stream(self, stream: c_common.SyncChunksStream, string_id: bytes = None) -> Dict:
+        """Send agent-groups chunks to fortishield-db while they are received.
+
+        The chunks are parsed from the stream and put in a bounded queue, from which they are sent to fortishield-db
+        one by one. The parser waits while the queue is full, so only a few decoded chunks are kept in memory.
+
+        Parameters
+        ----------
+        stream : SyncChunksStream
+            Agent-groups string being received.
+        string_id : bytes
+            ID of the string. Its stream is discarded if it can not be processed (a timeout or an invalid string).
+
+        Returns
+        -------
+        result : dict
+            Dict containing number of updated chunks, error messages (if any) and time spent.
+        """
+        result = {'updated_chunks': 0, 'error_messages': {'chunks': [], 'others': []}, 'time_spent': 0}
+        timeout = self.cluster_items['intervals']['worker']['timeout_agent_groups']
+        queue = asyncio.Queue(maxsize=self.cluster_items['intervals']['worker']['agent_groups_queue_size'])
+
+        async def parse_chunks():
+            try:
+                async for chunks in stream.get_chunks(max_chunks=queue.maxsize, timeout=timeout):
+                    for chunk in chunks:
+                        await queue.put(chunk)
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        self.sync_agent_groups_from_master.update({'date_start_worker': get_utc_now(), 'n_synced_chunks': 0})
+        before = perf_counter()
+        parser = asyncio.create_task(parse_chunks())
+        fdb_conn = AsyncFortishieldDBConnection()
+        try:
+            i = 0
+            while (chunk := await queue.get()) is not None:
+                try:
+                    stream.header['payload']['data'] = json.loads(chunk)[0]['data']
+                    await asyncio.wait_for(fdb_conn.run_fdb_command(
+                        f"{stream.header['set_data_command']} "
+                        f"{json.dumps(stream.header['payload'], separators=(',', ':'))}"), timeout=timeout)
+                    result['updated_chunks'] += 1
+                    self.sync_agent_groups_from_master['n_synced_chunks'] = result['updated_chunks']
+                except asyncio.TimeoutError as e:
+                    raise e
+                except Exception as e:
+                    result['error_messages']['chunks'].append((i, str(e)))
+                i += 1
+            await parser
+        except asyncio.TimeoutError:
+            result['error_messages']['others'].append('Timeout while processing agent-groups chunks.')
+        except Exception as e:
+            result['error_messages']['others'].append(f'Error while processing agent-groups chunks: {e}')
+        finally:
+            parser.cancel()
+            fdb_conn.close()
+
+        if result['error_messages']['others'] and string_id is not None:
+            self.agent_groups_streams.pop(string_id, None)
+
+        result['time_spent'] = perf_counter() - before
+        self.sync_agent_groups_from_master['date_end_worker'] = get_utc_now()
+        return result
+
     def get_manager(self):
         """Get the Worker object that created this WorkerHandler. Used in the class FortishieldCommon.
 
@@ -497,8 +603,21 @@ class WorkerHandler(client.AbstractClient, c_common.FortishieldCommon):
         """
         logger.info('Starting.')
         start_time = datetime.utcnow().replace(tzinfo=timezone.utc)
-        data = await super().get_chunks_in_task_id(task_id, error_command)
-        result = await super().update_chunks_fdb(data, info_type, logger, error_command, timeout)
+        if task_id in self.agent_groups_streams:
+            # The chunks have been sent to fortishield-db while the string was received.
+            stream, apply_task = self.agent_groups_streams.pop(task_id)
+            result = await apply_task
+            for error in result['error_messages']['others']:
+                logger.error(error)
+            for i, error in result['error_messages']['chunks']:
+                logger.error(f'Fortishield-db response for chunk {i + 1}/{stream.n_chunks} was not "ok": {error}')
+            logger.debug(f'{result["updated_chunks"]}/{stream.n_chunks} chunks updated in fortishield-db '
+                         f'in {result["time_spent"]:.3f}s.')
+            result['error_messages'] = [error[1] for error in result['error_messages']['chunks']]
+            data = {'chunks': [stream.last_chunk]} if stream.last_chunk else {}
+        else:
+            data = await super().get_chunks_in_task_id(task_id, error_command)
+            result = await super().update_chunks_fdb(data, info_type, logger, error_command, timeout)
         response = await self.send_request(command=command, data=json.dumps(result).encode())
         await self.check_agent_groups_checksums(data, logger)
 
@@ -4,6 +4,7 @@
 
 import json
 import os
+from collections import Counter
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextvars import ContextVar
 from copy import deepcopy
@@ -11,7 +12,8 @@ from functools import lru_cache, wraps
 from grp import getgrnam
 from multiprocessing import Event
 from pwd import getpwnam
-from typing import Any, Dict
+from types import MappingProxyType
+from typing import Any, Dict, Hashable
 
 
 # ===================================================== Functions ======================================================
@@ -70,6 +72,32 @@ def fortishield_gid() -> int:
     return getgrnam(GROUP_NAME).gr_gid if globals()['_FORTISHIELD_GID'] is None else globals()['_FORTISHIELD_GID']
 
 
+def _get_context_cache_key(key: str, args: tuple, kwargs: dict) -> Hashable:
+    """Build the identifier of a context cache entry.
+
+    Parameters
+    ----------
+    key : str
+        Part of the cache entry identifier set in the decorator.
+    args : tuple
+        Positional arguments of the call.
+    kwargs : dict
+        Keyword arguments of the call.
+
+    Returns
+    -------
+    Hashable
+        A tuple with the key and the arguments, or their JSON representation if any argument is not hashable.
+    """
+    cached_key = (key, args, tuple(kwargs.items()))
+    try:
+        hash(cached_key)
+    except TypeError:
+        cached_key = json.dumps({'key': key, 'args': args, 'kwargs': kwargs})
+
+    return cached_key
+
+
 def context_cached(key: str = '') -> Any:
     """Save the result of the decorated function in a cache.
 
@@ -88,19 +116,25 @@ def context_cached(key: str = '') -> Any:
 
     Notes
     -----
-    The returned object will be a deep copy of the cached one.
+    Immutable results (frozenset, tuple, MappingProxyType, str, numbers...) are returned as they are cached. Any other
+    result is returned as a deep copy of the cached one. The hits and misses of each key are counted, see
+    `get_context_cache_stats`.
     """
 
     def decorator(func) -> Any:
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            cached_key = json.dumps({'key': key, 'args': args, 'kwargs': kwargs})
+            cached_key = _get_context_cache_key(key, args, kwargs)
             if cached_key not in _context_cache:
-                _context_cache[cached_key] = ContextVar(cached_key, default=None)
-            if _context_cache[cached_key].get() is None:
+                _context_cache[cached_key] = ContextVar(key, default=None)
+            if (result := _context_cache[cached_key].get()) is None:
+                _context_cache_misses[key] += 1
                 result = func(*args, **kwargs)
                 _context_cache[cached_key].set(result)
-            return deepcopy(_context_cache[cached_key].get())
+            else:
+                _context_cache_hits[key] += 1
+
+            return result if isinstance(result, IMMUTABLE_TYPES) else deepcopy(result)
 
         return wrapper
 
@@ -126,6 +160,18 @@ def get_context_cache() -> dict:
     return _context_cache
 
 
+def get_context_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Get the number of hits and misses of each context cache key since the process started.
+
+    Returns
+    -------
+    dict
+        Dictionary with the hits and misses of each key.
+    """
+    return {key: {'hits': _context_cache_hits[key], 'misses': _context_cache_misses[key]}
+            for key in _context_cache_hits.keys() | _context_cache_misses.keys()}
+
+
 # ================================================= Context variables ==================================================
 rbac: ContextVar[Dict] = ContextVar('rbac', default={'rbac_mode': 'black'})
 current_user: ContextVar[str] = ContextVar('current_user', default='')
@@ -144,6 +190,10 @@ except (FileNotFoundError, PermissionError):
         'thread_pool': ThreadPoolExecutor(max_workers=1)
     })
 _context_cache = dict()
+_context_cache_hits = Counter()
+_context_cache_misses = Counter()
+# Results returned by context_cached without copying them
+IMMUTABLE_TYPES = (frozenset, tuple, MappingProxyType, str, bytes, int, float)
 
 
 # =========================================== Fortishield constants and variables ============================================
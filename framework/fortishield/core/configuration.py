@@ -9,12 +9,15 @@ import re
 import subprocess
 import sys
 import tempfile
+import threading
 from configparser import RawConfigParser, NoOptionError
+from copy import deepcopy
 from io import StringIO
 from os import remove, path as os_path
 from types import MappingProxyType
 from typing import Union, List
 
+from cachetools import LRUCache
 from defusedxml.ElementTree import tostring
 from defusedxml.minidom import parseString
 
@@ -122,6 +125,10 @@ YES_VALUE = 'yes'
 CTI_URL_FIELD = 'cti-url'
 DEFAULT_CTI_URL = 'https://cti-fortishield.khulnasoft.com'
 
+# Parsed ossec.conf files, by path and file metadata
+ossec_conf_cache = LRUCache(maxsize=16)
+ossec_conf_cache_lock = threading.Lock()
+
 
 def _insert(json_dst: dict, section_name: str, option: str, value: str):
     """Insert element (option:value) in a section (json_dst) called section_name.
@@ -639,6 +646,38 @@ def _merged_mg2json(file_path: str) -> List[dict]:
 
 
 # Main functions
+def _get_ossec_conf_data(conf_file: str) -> dict:
+    """Read and parse a ossec.conf file. The parsed configuration is reused until the file is modified or replaced.
+
+    Parameters
+    ----------
+    conf_file : str
+        Path of the configuration file to read.
+
+    Returns
+    -------
+    dict
+        Parsed configuration. It is shared between calls, so it must not be modified.
+    """
+    try:
+        file_stat = os.stat(conf_file)
+        key = (os.path.abspath(conf_file), file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+    except OSError:
+        key = None
+
+    if key is not None:
+        with ossec_conf_cache_lock:
+            if (data := ossec_conf_cache.get(key)) is not None:
+                return data
+
+    data = _ossecconf2json(load_fortishield_xml(conf_file))
+
+    if key is not None:
+        with ossec_conf_cache_lock:
+            ossec_conf_cache[key] = data
+    return data
+
+
 def get_ossec_conf(section: str = None, field: str = None, conf_file: str = common.OSSEC_CONF,
                    from_import: bool = False, distinct: bool = False) -> dict:
     """Return ossec.conf (manager) as dictionary.
@@ -673,11 +712,7 @@ def get_ossec_conf(section: str = None, field: str = None, conf_file: str = comm
         ossec.conf (manager) as dictionary.
     """
     try:
-        # Read XML
-        xml_data = load_fortishield_xml(conf_file)
-
-        # Parse XML to JSON
-        data = _ossecconf2json(xml_data)
+        data = _get_ossec_conf_data(conf_file)
     except Exception as e:
         if not from_import:
             raise FortishieldError(1101, extra_message=str(e))
@@ -711,7 +746,8 @@ def get_ossec_conf(section: str = None, field: str = None, conf_file: str = comm
         except KeyError:
             raise FortishieldError(1103)
 
-    return data
+    # The parsed configuration is shared, so a copy of the requested part is returned
+    return deepcopy(data)
 
 
 def get_agent_conf(group_id: str = None, offset: int = 0, limit: int = common.DATABASE_LIMIT,
@@ -1321,6 +1357,9 @@ def write_ossec_conf(new_conf: str):
             f.writelines(new_conf)
     except Exception:
         raise FortishieldError(1126)
+    finally:
+        with ossec_conf_cache_lock:
+            ossec_conf_cache.clear()
 
 
 def update_check_is_enabled() -> bool:
@@ -187,6 +187,9 @@ class FortishieldException(Exception):
         1309: 'Statistics file damaged',
         1310: {'message': 'Invalid agent ID',
                'remediation': 'This component only exists in real agents'},
+        1311: {'message': 'The statistics collector is not running',
+               'remediation': 'Please, enable the `stats_collector` option in the API configuration'},
+        1312: 'No statistics have been collected from the daemon yet',
 
         # Utils: 1400 - 1499
         1400: 'Invalid offset',
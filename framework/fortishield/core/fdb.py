@@ -9,13 +9,76 @@ import json
 import re
 import socket
 import struct
-from typing import List, Union
+from functools import lru_cache
+from typing import Iterator, List, Union
 
 from fortishield.core import common
 from fortishield.core.common import MAX_SOCKET_BUFFER_SIZE
 from fortishield.core.exception import FortishieldInternalError, FortishieldError
 
 DATE_FORMAT = re.compile(r'\d{4}\/\d{2}\/\d{2} \d{2}:\d{2}:\d{2}')
+QUERY_PARAM_REGEX = re.compile(r':\b(\w+(?:\$\w+)?)')
+QUERY_TEMPLATES_CACHE_SIZE = 512
+# Smaller than any SQLite row ID
+KEYSET_START = -2 ** 63
+
+
+def _render_query_param(value) -> str:
+    """Render a query parameter as a SQL literal.
+
+    Parameters
+    ----------
+    value : list, int, float or str
+        Parameter value. Lists are rendered as comma separated literals, to be used inside `IN (...)` clauses.
+
+    Raises
+    ------
+    TypeError
+        Invalid type for the parameter.
+
+    Returns
+    -------
+    str
+        SQL literal.
+    """
+    if isinstance(value, list):
+        return ','.join(str(element) if isinstance(element, (int, float)) or
+                        (isinstance(element, str) and element.isnumeric()) else f"'{element}'" for element in value)
+    elif isinstance(value, (int, float)):
+        return f"{value}"
+    elif isinstance(value, str):
+        return f"'{value}'"
+    else:
+        raise TypeError(f'Invalid type for request parameters: {type(value)}')
+
+
+def substitute_query_params(query: str, params: dict) -> str:
+    """Replace the `:name` placeholders of a query template with the values of the parameters.
+
+    All the placeholders are replaced in a single pass, so values containing placeholder-like text are not substituted
+    again. Placeholders without parameter are left untouched.
+
+    Parameters
+    ----------
+    query : str
+        Query template.
+    params : dict
+        Parameter values by placeholder name.
+
+    Returns
+    -------
+    str
+        Query with the parameters inlined.
+    """
+    if not params:
+        return query
+
+    rendered = {name: _render_query_param(value) for name, value in params.items()}
+
+    def replace(match):
+        return rendered.get(match.group(1), match.group(0))
+
+    return QUERY_PARAM_REGEX.sub(replace, query)
 
 
 class AsyncFortishieldDBConnection:
@@ -155,7 +218,8 @@ class FortishieldDBConnection:
     def __del__(self):
         self.close()
 
-    def __query_input_validation(self, query: str):
+    @staticmethod
+    def __query_input_validation(query: str):
         """Check input queries have the correct format
 
         Accepted query formats:
@@ -292,8 +356,9 @@ class FortishieldDBConnection:
 
         return data
 
-    def __query_lower(self, query: str) -> str:
-        """Convert a query to lower except the words between "".
+    @staticmethod
+    def __query_lower(query: str) -> str:
+        """Convert a query to lower except the words between ''.
 
         Parameters
         ----------
@@ -306,22 +371,94 @@ class FortishieldDBConnection:
             New query.
         """
 
-        to_lower = True
-        new_query = ""
+        # Odd fragments are the ones between quotes
+        return "'".join(fragment if i % 2 else fragment.lower() for i, fragment in enumerate(query.split("'")))
 
-        for i in query:
-            if to_lower and i != "'":
-                new_query += i.lower()
-            elif to_lower and i == "'":
-                new_query += i
-                to_lower = False
-            elif not to_lower and i != "'":
-                new_query += i
-            elif not to_lower and i == "'":
-                new_query += i
-                to_lower = True
+    @staticmethod
+    @lru_cache(maxsize=QUERY_TEMPLATES_CACHE_SIZE)
+    def _prepare_template(template: str) -> str:
+        """Convert a query template to lower and check its format. The result is cached, so the same template is only
+        processed once regardless of the values of its parameters.
+
+        Parameters
+        ----------
+        template : str
+            Query template with `:name` placeholders.
 
-        return new_query
+        Raises
+        ------
+        FortishieldError(2004)
+            Database query not valid.
+
+        Returns
+        -------
+        str
+            Query template converted to lower.
+        """
+        template_lower = FortishieldDBConnection.__query_lower(template)
+        FortishieldDBConnection.__query_input_validation(template_lower)
+
+        return template_lower
+
+    def execute_keyset(self, query: str, params: dict = None, key: str = 'keyset_id') -> Iterator[list]:
+        """Run a select query in chunks paginated by a unique integer key, yielding the rows of each chunk.
+
+        Each chunk is requested with `WHERE <key> > <last key received> ORDER BY <key> LIMIT <size>`, so fortishield-db
+        neither counts the rows nor skips the ones of the previous chunks, as the offset pagination of `execute` does.
+        The size of the chunks adapts to the maximum socket buffer size like in `execute`.
+
+        Parameters
+        ----------
+        query : str
+            Select query with `:name` placeholders. It must select the key with the `key` alias, for instance
+            "agent 001 sql select rowid as keyset_id, name from sys_programs".
+        params : dict
+            Values of the placeholders.
+        key : str
+            Alias of the key. It is removed from the rows.
+
+        Raises
+        ------
+        FortishieldError(2004)
+            Database query not valid.
+        FortishieldInternalError(2009)
+            A single row is over the maximum socket buffer size.
+
+        Yields
+        ------
+        list
+            Rows of each chunk, sorted by key.
+        """
+        prefix, sql = query.split(' sql ', 1)
+        template = self._prepare_template(f"{prefix} sql select * from ({sql}) where {key} > :keyset_last "
+                                          f"order by {key} limit :keyset_limit")
+        params = {name.lower(): value for name, value in (params or {}).items()}
+        last_key = KEYSET_START
+        step = self.request_slice
+
+        while True:
+            request = substitute_query_params(template, {**params, 'keyset_last': last_key, 'keyset_limit': step})
+            if ';' in request:
+                raise FortishieldError(2004, "Found a not valid symbol in database query: ;")
+            try:
+                response = self._send(request, raw=True)[1]
+            except FortishieldInternalError as e:
+                # The chunk did not fit in the socket buffer, request it again with half of the rows
+                if e.code != 2009 or step == 1:
+                    raise
+                step //= 2
+                continue
+
+            rows = FortishieldDBConnection.loads(response)
+            if rows:
+                last_key = rows[-1][key]
+                for row in rows:
+                    del row[key]
+                yield rows
+            if len(rows) < step:
+                return
+            if len(response) * 2 < MAX_SOCKET_BUFFER_SIZE:
+                step *= 2
 
     def delete_agents_db(self, agents_id: List[str]) -> dict:
         """Delete agents db through fortishield-db service.
@@ -360,9 +497,13 @@ class FortishieldDBConnection:
         """
         return self._send(query, raw)
 
-    def execute(self, query, count=False, delete=False, update=False):
+    def execute(self, query, count=False, delete=False, update=False, params=None):
         """
         Send a SQL query to fdb socket.
+
+        When `params` is specified, `query` is a template with `:name` placeholders. The template is converted to lower
+        and validated once (see `_prepare_template`) and the parameters are inlined afterwards, so their values are
+        neither converted nor scanned again.
         """
 
         def send_request_to_fdb(query_lower, step, off, response):
@@ -384,9 +525,14 @@ class FortishieldDBConnection:
                 # Add step // 2 remaining when the step is odd to avoid losing information
                 return send_request_to_fdb(query_lower, step // 2 + step % 2, step // 2 + off, response)
 
-        query_lower = self.__query_lower(query)
-
-        self.__query_input_validation(query_lower)
+        if params is None:
+            query_lower = self.__query_lower(query)
+            self.__query_input_validation(query_lower)
+        else:
+            query_lower = substitute_query_params(self._prepare_template(query),
+                                                  {name.lower(): value for name, value in params.items()})
+            if ';' in query_lower:
+                raise FortishieldError(2004, "Found a not valid symbol in database query: ;")
 
         # only for delete queries
         if delete:
@@ -2,8 +2,10 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import errno
 import json
 import socket
+from time import sleep
 from typing import Any
 
 from fortishield.core.common import origin_module
@@ -189,14 +191,44 @@ class FortishieldAnalysisdQueue(BaseQueue):
     """
 
     MAX_MSG_SIZE = 65535
+    # Send buffer requested to the kernel, so bulks of events do not block on every message
+    SEND_BUFFER_SIZE = 16 * MAX_MSG_SIZE
+    # Attempts to send a message while the socket buffer is temporarily full
+    MAX_SEND_ATTEMPTS = 5
+    SEND_RETRY_INTERVAL = 0.01
 
     def _connect(self):
         try:
             self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
             self.socket.connect(self.path)
+            if self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) < self.SEND_BUFFER_SIZE:
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.SEND_BUFFER_SIZE)
         except Exception:
             raise FortishieldInternalError(1010, self.path)
 
+    def _send_retrying(self, msg: bytes) -> None:
+        """Send a message through the socket, retrying while the socket buffer is temporarily full.
+
+        Parameters
+        ----------
+        msg : bytes
+            The message to send.
+
+        Raises
+        ------
+        FortishieldInternalError(1011)
+            If there was an error communicating with queue.
+        """
+        for attempt in range(1, self.MAX_SEND_ATTEMPTS + 1):
+            try:
+                if self.socket.send(msg) == 0:
+                    raise FortishieldInternalError(1011, self.path)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.ENOBUFS) or attempt == self.MAX_SEND_ATTEMPTS:
+                    raise FortishieldInternalError(1011, self.path)
+                sleep(self.SEND_RETRY_INTERVAL * attempt)
+
     def send_msg(self, msg_header: str, msg: str):
         """Send message to analysisd.
 
@@ -227,3 +259,44 @@ class FortishieldAnalysisdQueue(BaseQueue):
             self._send(socket_msg)
         except Exception as e:
             raise FortishieldError(1014, extra_message=f': FortishieldAnalysisdQueue socket with path {self.path}. {str(e)}')
+
+    def send_msgs(self, msg_header: str, msgs: list) -> dict:
+        """Send several messages to analysisd.
+
+        The header is encoded once and every message is validated before sending any of them. A failing message does
+        not prevent the rest from being sent.
+
+        Parameters
+        ----------
+        msg_header : str
+            Header message to attach to every message.
+        msgs : list
+            Messages to send.
+
+        Returns
+        -------
+        dict
+            Error of each message that could not be sent, indexed by its position in `msgs`.
+        """
+        header = msg_header.encode()
+        max_msg_size = self.MAX_MSG_SIZE - len(header)
+        failed_msgs = dict()
+        socket_msgs = list()
+        for index, msg in enumerate(msgs):
+            encoded_msg = msg.encode()
+            if len(encoded_msg) > max_msg_size:
+                failed_msgs[index] = FortishieldError(
+                    1012,
+                    f"The event is too large to be sent to analysisd (maximum is {self.MAX_MSG_SIZE}B)"
+                )
+            else:
+                socket_msgs.append((index, header + encoded_msg))
+
+        for index, socket_msg in socket_msgs:
+            try:
+                self._send_retrying(socket_msg)
+            except Exception as e:
+                failed_msgs[index] = FortishieldError(
+                    1014, extra_message=f': FortishieldAnalysisdQueue socket with path {self.path}. {str(e)}')
+
+        return failed_msgs
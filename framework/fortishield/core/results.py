@@ -7,8 +7,9 @@ import collections
 import re
 import sys
 from copy import deepcopy
+from functools import cmp_to_key
 from numbers import Number
-from typing import Union, Iterable
+from typing import Callable, Union, Iterable
 
 import fortishield.core.exception as wexception
 from fortishield.core import utils
@@ -717,6 +718,14 @@ class AffectedItemsFortishieldResult(AbstractFortishieldResult):
                 }
 
 
+class SerializedFortishieldResult(bytes):
+    """
+    Model a result already rendered as the JSON body of an API response. It is built in the process that runs the
+    framework function so the API can send it to the client without decoding and encoding it again.
+    """
+    pass
+
+
 def nested_itemgetter(*expressions):
     """Build a function to get items according to expressions. That getter function receives a dictionary as the only
     positional argument and returns the referenced item.
@@ -848,3 +857,35 @@ def merge(*iterables, criteria: Union[tuple, list] = None, ascending: Union[tupl
         result.append(iterables[selected].pop(0))
 
     return result
+
+
+def get_sort_key(criteria: Union[tuple, list] = None, ascending: Union[tuple, list] = None,
+                 types: Union[tuple, list] = None) -> Callable:
+    """Build a key function to sort items in the same order used by the merge function.
+
+    Parameters
+    ----------
+    criteria : tuple or list
+        List or tuple of expressions accepted by the nested_itemgetter function.
+    ascending : tuple or list
+        List or tuple of booleans. Should have the same length as criteria. True for ascending False otherwise.
+    types : tuple or list
+        List or tuple of strings. Should have the same length as criteria. Must fit a class in builtins
+        (int, float, str, ...).
+
+    Returns
+    -------
+    Callable
+        Key function to be used with sorted, heapq.merge and similar functions.
+    """
+    getters = [lambda x: x] if criteria is None else [nested_itemgetter(criterion) for criterion in criteria]
+    casters = None if types is None else [getattr(builtins, type_) for type_ in types]
+
+    def compare(a, b):
+        if _goes_before_than(a, b, ascending=ascending, casters=casters):
+            return -1
+        return 1 if _goes_before_than(b, a, ascending=ascending, casters=casters) else 0
+
+    compare_key = cmp_to_key(compare)
+
+    return lambda item: compare_key([getter(item) for getter in getters])
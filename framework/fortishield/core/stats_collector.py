@@ -0,0 +1,288 @@
+# Copyright (C) 2015, KhulnaSoft Ltd.
+# Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
+# This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+
+import asyncio
+import logging
+import time
+from array import array
+from bisect import bisect_left
+from typing import Iterator, Union
+
+from fortishield.core import common
+from fortishield.core.exception import FortishieldException
+from fortishield.core.stats import get_daemons_stats_socket
+
+DEFAULT_INTERVAL = 5
+DEFAULT_SIZE = 720
+DEFAULT_MAX_AGE = 10
+# Daemons whose statistics of the agents can be collected
+AGENTS_DAEMONS = ('fortishield-remoted', 'fortishield-analysisd')
+
+logger = logging.getLogger('fortishield')
+
+# Collector running in this process, if any
+_collector = None
+
+
+def get_daemons_sockets() -> dict:
+    """Get the sockets of the daemons whose statistics are collected.
+
+    Returns
+    -------
+    dict
+        Full path of the socket of each daemon.
+    """
+    return {'fortishield-remoted': common.REMOTED_SOCKET,
+            'fortishield-analysisd': common.ANALYSISD_SOCKET,
+            'fortishield-db': common.WDB_SOCKET}
+
+
+def flatten_metrics(stats: dict, prefix: str = '') -> Iterator[tuple]:
+    """Get the numeric values of some statistics, naming the nested ones with the names of their parents joined by
+    dots.
+
+    Parameters
+    ----------
+    stats : dict
+        Statistics of a daemon.
+    prefix : str
+        Prefix of the names of the metrics.
+
+    Yields
+    ------
+    tuple
+        Name and value of each metric.
+    """
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from flatten_metrics(value, prefix=f'{prefix}{key}.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f'{prefix}{key}', value
+
+
+class MetricRingBuffer:
+    """Fixed-size buffer with the last samples of a metric.
+
+    The timestamps and the values are kept in two arrays of floats that are overwritten in a circular way, so the
+    memory used does not grow with the number of samples.
+    """
+
+    def __init__(self, size: int = DEFAULT_SIZE):
+        """Class constructor.
+
+        Parameters
+        ----------
+        size : int
+            Maximum number of samples.
+        """
+        self.size = size
+        self.timestamps = array('d', bytes(8 * size))
+        self.values = array('d', bytes(8 * size))
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+
+    def append(self, timestamp: float, value: Union[int, float]):
+        """Add a sample, overwriting the oldest one when the buffer is full.
+
+        Parameters
+        ----------
+        timestamp : float
+            Time of the sample, in seconds since the epoch.
+        value : int or float
+            Value of the metric.
+        """
+        position = self.count % self.size
+        self.timestamps[position] = timestamp
+        self.values[position] = value
+        self.count += 1
+
+    def _positions(self) -> range:
+        return range(self.count - len(self), self.count)
+
+    def samples(self, since: float = None) -> list:
+        """Get the samples, from the oldest to the newest.
+
+        Parameters
+        ----------
+        since : float
+            Only return the samples taken at this time or later.
+
+        Returns
+        -------
+        list
+            Timestamp and value of each sample.
+        """
+        positions = self._positions()
+        if since is not None:
+            positions = positions[bisect_left(positions, since, key=lambda x: self.timestamps[x % self.size]):]
+
+        return [(self.timestamps[x % self.size], self.values[x % self.size]) for x in positions]
+
+    def delta(self, since: float = None) -> dict:
+        """Get the increase of a counter between its first and its last samples.
+
+        The decreases are considered resets of the counter (after restarting the daemon, for instance), so the value
+        after them is added to the increase instead of their difference.
+
+        Parameters
+        ----------
+        since : float
+            Only use the samples taken at this time or later.
+
+        Returns
+        -------
+        dict
+            Increase, increase per second and timestamps of the first and the last samples used. The increase per
+            second is None when there are less than two samples.
+        """
+        samples = self.samples(since=since)
+        if not samples:
+            return {'delta': None, 'rate': None, 'from': None, 'to': None}
+
+        delta = 0
+        for (_, previous), (_, current) in zip(samples, samples[1:]):
+            delta += current - previous if current >= previous else current
+        elapsed = samples[-1][0] - samples[0][0]
+
+        return {'delta': delta, 'rate': delta / elapsed if elapsed > 0 else None,
+                'from': samples[0][0], 'to': samples[-1][0]}
+
+
+class DaemonsStatsCollector:
+    """Collector of the statistics of the daemons.
+
+    It keeps the last samples of each numeric metric of the daemons in ring buffers, and the last statistics read from
+    them so the requests can be answered without querying the daemons while they are recent enough.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, size: int = DEFAULT_SIZE, max_age: float = DEFAULT_MAX_AGE,
+                 agents: bool = False):
+        """Class constructor.
+
+        Parameters
+        ----------
+        interval : float
+            Seconds between samples.
+        size : int
+            Maximum number of samples of each metric.
+        max_age : float
+            Maximum age, in seconds, of the last statistics to return them instead of querying the daemons.
+        agents : bool
+            Collect the statistics of all the agents from remoted and analysisd too. Only the last ones are kept.
+        """
+        self.interval = interval
+        self.size = size
+        self.max_age = max_age
+        self.agents = agents
+        self.metrics = {}
+        self.latest = {}
+
+    async def _collect_daemon(self, daemon: str, socket: str):
+        try:
+            stats = await get_daemons_stats_socket(socket)
+        except FortishieldException as e:
+            logger.debug(f'Could not collect the statistics of {daemon}: {e}')
+            return
+
+        timestamp = time.time()
+        self.latest[daemon] = timestamp, stats
+        metrics = self.metrics.setdefault(daemon, {})
+        for name, value in flatten_metrics(stats.get('metrics', stats)):
+            if name not in metrics:
+                metrics[name] = MetricRingBuffer(self.size)
+            metrics[name].append(timestamp, value)
+
+    async def _collect_agents(self, daemon: str, socket: str):
+        agents = []
+        try:
+            last_id = 0
+            while True:
+                stats = await get_daemons_stats_socket(socket, agents_list='all', last_id=last_id)
+                agents.extend(stats['data']['agents'])
+                if agents:
+                    last_id = agents[-1]['id']
+                if stats['message'] != 'due':
+                    break
+        except FortishieldException as e:
+            logger.debug(f'Could not collect the statistics of the agents of {daemon}: {e}')
+            return
+
+        stats['data']['agents'] = agents
+        self.latest[daemon, 'agents'] = time.time(), stats['data']
+
+    async def collect(self):
+        """Read the statistics of every daemon at the same time and add them to the buffers. The errors are
+        logged."""
+        tasks = []
+        for daemon, socket in get_daemons_sockets().items():
+            tasks.append(self._collect_daemon(daemon, socket))
+            if self.agents and daemon in AGENTS_DAEMONS:
+                tasks.append(self._collect_agents(daemon, socket))
+
+        await asyncio.gather(*tasks)
+
+    def get_latest(self, daemon: str, agents: bool = False) -> Union[dict, None]:
+        """Get the last statistics of a daemon if they are recent enough.
+
+        The statistics are shared by every request, so they must not be modified.
+
+        Parameters
+        ----------
+        daemon : str
+            Name of the daemon.
+        agents : bool
+            Get the statistics of all the agents instead of the ones of the daemon.
+
+        Returns
+        -------
+        dict or None
+            Statistics, or None if there are none or they are older than the maximum age.
+        """
+        timestamp, stats = self.latest.get((daemon, 'agents') if agents else daemon, (None, None))
+        if timestamp is None or time.time() - timestamp > self.max_age:
+            return None
+
+        return stats
+
+
+def get_collector() -> Union[DaemonsStatsCollector, None]:
+    """Get the statistics collector running in this process.
+
+    Returns
+    -------
+    DaemonsStatsCollector or None
+        Collector, or None if it is not running.
+    """
+    return _collector
+
+
+async def run_collector(interval: float = DEFAULT_INTERVAL, size: int = DEFAULT_SIZE,
+                        max_age: float = DEFAULT_MAX_AGE, agents: bool = False):
+    """Collect the statistics of the daemons periodically until the task is cancelled.
+
+    The collector is available through `get_collector` while it runs.
+
+    Parameters
+    ----------
+    interval : float
+        Seconds between samples.
+    size : int
+        Maximum number of samples of each metric.
+    max_age : float
+        Maximum age, in seconds, of the last statistics to return them instead of querying the daemons.
+    agents : bool
+        Collect the statistics of all the agents from remoted and analysisd too.
+    """
+    global _collector
+    _collector = DaemonsStatsCollector(interval=interval, size=size, max_age=max_age, agents=agents)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            start = loop.time()
+            await _collector.collect()
+            await asyncio.sleep(max(interval - (loop.time() - start), 0))
+    finally:
+        _collector = None
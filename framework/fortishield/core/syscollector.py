@@ -2,11 +2,25 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GP
 
+import contextvars
+import heapq
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from itertools import islice
+from typing import Callable, Iterator
 
+from fortishield.core import common
 from fortishield.core.agent import Agent
+from fortishield.core.exception import FortishieldError, FortishieldResourceNotFound
+from fortishield.core.fdb import FortishieldDBConnection
+from fortishield.core.results import AffectedItemsFortishieldResult, get_sort_key
 from fortishield.core.utils import plain_dict_to_nested_dict, get_fields_to_nest, FortishieldDBQuery, FortishieldDBBackend
 
+# Maximum number of agent databases queried at the same time by multi-agent requests
+MAX_CONCURRENT_AGENT_QUERIES = 8
+
 
 class Type(Enum):
     """Class that enumerates the different types of agent elements."""
@@ -29,7 +43,8 @@ def get_valid_fields(element_type: Type, agent_id: str = None) -> dict:
     element_type : Type
         This is the type of resource we are requesting.
     agent_id : str
-        This parameter allows us to know if the agent is Windows or Linux.
+        This parameter allows us to know if the agent is Windows or Linux. If it is not given, the Linux fields, which
+        include the Windows ones, are returned.
 
     Returns
     -------
@@ -80,12 +95,14 @@ def get_valid_fields(element_type: Type, agent_id: str = None) -> dict:
     }
 
     if element_type == Type.OS:
-        agent_obj = Agent(agent_id)
-        agent_obj.get_basic_information()
+        os_name = ''
+        if agent_id is not None:
+            agent_obj = Agent(agent_id)
+            agent_obj.get_basic_information()
+            os_name = agent_obj.get_agent_os_name()
         valid_select_fields[Type.OS] = list(valid_select_fields[Type.OS])
 
         # The osinfo fields in database are different in Windows and Linux
-        os_name = agent_obj.get_agent_os_name()
         valid_select_fields[Type.OS][1] = valid_select_fields[Type.OS][1]['Windows'] if 'Windows' in os_name else \
             valid_select_fields[Type.OS][1]['Linux']
         valid_select_fields[Type.OS] = tuple(valid_select_fields[Type.OS])
@@ -101,9 +118,9 @@ class FortishieldDBQuerySyscollector(FortishieldDBQuery):
 
     nested_fields = ['scan', 'os', 'ram', 'cpu', 'local', 'remote', 'tx', 'rx']
 
-    def __init__(self, array, nested, agent_id, *args, **kwargs):
-        super().__init__(backend=FortishieldDBBackend(agent_id), default_sort_field='scan_id', get_data=True, count=True,
-                         *args, **kwargs)
+    def __init__(self, array, nested, agent_id, *args, connection=None, **kwargs):
+        super().__init__(backend=FortishieldDBBackend(agent_id, connection=connection), default_sort_field='scan_id',
+                         get_data=True, count=True, *args, **kwargs)
         self.array = array
         self.nested = nested
         self.date_fields = {'scan.time', 'install_time'}
@@ -115,3 +132,155 @@ class FortishieldDBQuerySyscollector(FortishieldDBQuery):
                           self._data]
 
         return super()._format_data_into_dictionary() if self.array else next(iter(self._data), {})
+
+
+def query_agents(agent_list: list, query_agent: Callable,
+                 max_workers: int = MAX_CONCURRENT_AGENT_QUERIES) -> Iterator[tuple]:
+    """Run a query in the database of several agents concurrently.
+
+    At most `max_workers` queries run at the same time, each one with a fortishield-db connection taken from a pool that
+    is closed at the end. The results are yielded in the order of `agent_list` and only a bounded number of them are
+    requested in advance, so the memory used does not depend on the number of agents.
+
+    Parameters
+    ----------
+    agent_list : list
+        IDs of the agents to query.
+    query_agent : Callable
+        Function that receives the ID of an agent and the fortishield-db connection to use, which is None when the
+        function must open its own one, and returns the result of the query.
+    max_workers : int
+        Maximum number of queries running at the same time.
+
+    Yields
+    ------
+    str
+        Agent ID.
+    object
+        Result of the query or the FortishieldResourceNotFound exception raised by it. Any other exception is raised.
+    """
+    def run(agent_id, connection=None):
+        try:
+            return query_agent(agent_id, connection)
+        except FortishieldResourceNotFound as e:
+            return e
+
+    if len(agent_list) <= 1 or max_workers <= 1:
+        for agent in agent_list:
+            yield agent, run(agent)
+        return
+
+    connections = queue.SimpleQueue()
+    opened_connections = []
+
+    def run_with_pool(agent_id):
+        try:
+            connection = connections.get_nowait()
+        except queue.Empty:
+            connection = FortishieldDBConnection()
+            opened_connections.append(connection)
+        try:
+            return run(agent_id, connection)
+        finally:
+            connections.put(connection)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    try:
+        for agent in agent_list:
+            # Each query runs in a copy of the caller context, as the threads do not inherit it
+            pending.append((agent, executor.submit(contextvars.copy_context().run, run_with_pool, agent)))
+            if len(pending) >= 2 * max_workers:
+                agent_id, future = pending.popleft()
+                yield agent_id, future.result()
+        while pending:
+            agent_id, future = pending.popleft()
+            yield agent_id, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        for connection in opened_connections:
+            connection.close()
+
+
+def get_agents_items(result: AffectedItemsFortishieldResult, agent_list: list, query_agent: Callable, offset: int = 0,
+                     limit: int = None, cast_sort_field: bool = False) -> AffectedItemsFortishieldResult:
+    """Fill a result with a page of the items of several agents, sorted by the sort fields of the result.
+
+    The agents are queried concurrently (see `query_agents`) for their first `offset + limit` items, as no other item
+    can be in the page. The items of every agent are merged with the ones kept so far and only the first
+    `offset + limit` are kept, so the memory used does not depend on the number of agents.
+
+    Parameters
+    ----------
+    result : AffectedItemsFortishieldResult
+        Result to fill. Its sort fields, order and casting are used to merge the items of the agents.
+    agent_list : list
+        IDs of the agents to get the items from.
+    query_agent : Callable
+        Function that receives the ID of an agent, the fortishield-db connection to use (None to open a new one), the
+        offset and the limit, and returns a dictionary with the 'items' and 'totalItems' of the agent.
+    offset : int
+        First item to return.
+    limit : int
+        Maximum number of items to return. None to return every item.
+    cast_sort_field : bool
+        Whether to compare the values of the sort field with the type they have in the first item instead of as
+        strings. Only used when there is a single sort field.
+
+    Raises
+    ------
+    FortishieldError(1405)
+        If the limit is greater than the maximum allowed.
+    FortishieldError(1406)
+        If the limit is 0.
+
+    Returns
+    -------
+    AffectedItemsFortishieldResult
+        The same result, with the affected and failed items of the agents.
+    """
+    if limit is not None:
+        if limit > common.MAXIMUM_DATABASE_LIMIT:
+            raise FortishieldError(1405, extra_message=str(limit))
+        elif limit == 0:
+            raise FortishieldError(1406)
+
+    page_end = offset + limit if limit is not None else None
+    # Pages beyond the maximum limit can only be requested without limit
+    query_limit = page_end if page_end is not None and page_end <= common.MAXIMUM_DATABASE_LIMIT else None
+    sort_key = None
+    items = []
+
+    for agent, data in query_agents(agent_list, lambda agent_id, connection: query_agent(agent_id, connection, 0,
+                                                                                         query_limit)):
+        if isinstance(data, FortishieldResourceNotFound):
+            result.add_failed_item(id_=agent, error=data)
+            continue
+
+        for item in data['items']:
+            item['agent_id'] = agent
+        result.total_affected_items += data['totalItems']
+        if not data['items']:
+            continue
+
+        if sort_key is None:
+            if cast_sort_field and len(result.sort_fields) == 1:
+                # Avoid that integer type fields are casted to string, this prevents sort parameter malfunctioning
+                try:
+                    fields = result.sort_fields[0].split('.')
+                    element = data['items'][0][fields.pop(0)]
+                    for field in fields:
+                        element = element[field]
+                    element_type = type(element).__name__
+                    result.sort_casting = [element_type] if element_type not in ['str', 'datetime'] else ['str']
+                except KeyError:
+                    pass
+            sort_key = get_sort_key(criteria=result.sort_fields, ascending=result.sort_ascending,
+                                    types=result.sort_casting)
+
+        # The items of previous agents go first when the sort values are equal, as sorted and heapq.merge are stable
+        items = list(islice(heapq.merge(items, sorted(data['items'], key=sort_key), key=sort_key), page_end))
+
+    result.affected_items = items[offset:]
+
+    return result
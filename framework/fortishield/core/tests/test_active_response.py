@@ -271,3 +271,27 @@ def test_send_ar_message_nok(mock_agent_info, mock_agent_conf, expected_error_co
             active_response.send_ar_message(agent_id=agent_id, wq=mock_wq, command=command, arguments=arguments,
                                             alert=alert)
         assert e.value.code == expected_error_code
+
+
+def test_send_ar_messages():
+    """Check that the message is created once per builder, the configuration is cached and failures are returned."""
+    agents = [{'id': '001', 'version': 'Fortishield v4.0.0'}, {'id': '002', 'version': 'Fortishield v4.0.0'},
+              {'id': '003', 'version': 'Fortishield v4.2.0'}, {'id': '004', 'version': 'Fortishield v4.2.0'}]
+    agents_conf = {'001': 'no', '002': 'no', '003': 'no', '004': 'yes'}
+    mock_wq = MagicMock()
+
+    active_response.ar_disabled_cache.clear()
+    with patch('fortishield.core.active_response.Agent', side_effect=lambda agent_id: MagicMock(
+                **{'get_config.return_value': {'active-response': {'disabled': agents_conf[agent_id]}}})
+               ) as mock_agent, \
+            patch.object(active_response.ARStrMessage, 'create_message', return_value='str') as mock_str_message, \
+            patch.object(active_response.ARJsonMessage, 'create_message', return_value='json') as mock_json_message:
+        failed_agents = active_response.send_ar_messages(agents, mock_wq, command='ls')
+        active_response.send_ar_messages(agents[:1], mock_wq, command='ls')
+
+    assert list(failed_agents) == ['004']
+    assert failed_agents['004'].code == 1750
+    assert mock_agent.call_count == 4
+    assert mock_str_message.call_count == 2
+    mock_json_message.assert_called_once_with(command='ls', arguments=None, alert=None)
+    assert [c.kwargs['agent_id'] for c in mock_wq.send_msg_to_agent.call_args_list] == ['001', '002', '003', '001']
@@ -1351,6 +1351,41 @@ def test_get_rbac_filters(system_resources, permitted_resources, filters, expect
     assert result == expected_result
 
 
+@pytest.mark.parametrize('oversized_response', [False, True])
+@patch('fortishield.core.fdb.FortishieldDBConnection._send', side_effect=send_msg_to_fdb)
+@patch('socket.socket.connect')
+def test_get_agents_aggregations(mock_socket_conn, send_mock, oversized_response):
+    """Check that get_agents_aggregations counts the agents of each aggregation with the RBAC filters applied and falls
+    back to one query per aggregation when the response does not fit in the socket buffer.
+
+    Parameters
+    ----------
+    oversized_response : bool
+        Whether the single request response is over the maximum socket buffer size.
+    """
+    aggregations = {'nodes': ['node_name'], 'versions': ['os.platform', 'version']}
+    rbac_filters = {'filters': {'rbac_ids': ['001', '002']}, 'rbac_negate': False}
+    expected_items = {}
+    for name, fields in aggregations.items():
+        with FortishieldDBQueryGroupByAgents(filter_fields=fields, select=fields, offset=0, limit=None, sort=None,
+                                       search=None, query='', min_select_fields=set(), count=True, get_data=True,
+                                       filters={'rbac_ids': ['001', '002']}, rbac_negate=False) as db_query:
+            expected_items[name] = db_query.run()['items']
+    send_mock.reset_mock()
+
+    with patch('fortishield.core.fdb.FortishieldDBConnection.send',
+               side_effect=FortishieldInternalError(2009) if oversized_response else send_msg_to_fdb) as single_mock:
+        result = get_agents_aggregations(aggregations, **rbac_filters)
+
+    single_mock.assert_called_once()
+    assert 'union all' in single_mock.call_args[0][0].lower()
+    if not oversized_response:
+        send_mock.assert_not_called()
+    # The groups are not sorted in the aggregations
+    assert {name: sorted(items, key=str) for name, items in result.items()} == \
+           {name: sorted(items, key=str) for name, items in expected_items.items()}
+
+
 @pytest.mark.parametrize('eligible_agents, expected_calls, task_manager_error', [
     ([1, 2, 3, 4],
      [
@@ -1368,18 +1403,20 @@ def test_get_rbac_filters(system_resources, permitted_resources, filters, expect
      False),
     ([i for i in range(13)],
      [
-         call(command='test', agents_chunk=[i for i in range(5)], wpk_repo=None, version=None, force=None,
+         call(command='test', agents_chunk=[i for i in range(10)], wpk_repo=None, version=None, force=None,
+              use_http=None, file_path=None, installer=None, get_result=None),
+         call(command='test', agents_chunk=[i for i in range(1, 6)], wpk_repo=None, version=None, force=None,
               use_http=None, file_path=None, installer=None, get_result=None),
-         call(command='test', agents_chunk=[i for i in range(5, 10)], wpk_repo=None, version=None, force=None,
+         call(command='test', agents_chunk=[i for i in range(6, 11)], wpk_repo=None, version=None, force=None,
               use_http=None, file_path=None, installer=None, get_result=None),
-         call(command='test', agents_chunk=[i for i in range(10, 13)], wpk_repo=None, version=None, force=None,
+         call(command='test', agents_chunk=[i for i in range(11, 13)], wpk_repo=None, version=None, force=None,
               use_http=None, file_path=None, installer=None, get_result=None)
      ],
      True)
 ])
 @patch('fortishield.core.agent.core_upgrade_agents')
 def test_create_upgrade_tasks(mock_upgrade, eligible_agents, expected_calls, task_manager_error):
-    """Test that the create_upgrade_tasks function and its recursive behaviour work properly.
+    """Test that the create_upgrade_tasks function and its retry behaviour work properly.
 
     Parameters
     ----------
@@ -1390,7 +1427,15 @@ def test_create_upgrade_tasks(mock_upgrade, eligible_agents, expected_calls, tas
     task_manager_error : bool
         Boolean variable that indicates whether the mocked function returns a task communication error or not.
     """
-    mock_upgrade.side_effect = [{'data': [{'error': 0 if not task_manager_error else 4}]},
-                                {'data': [{'error': 0}]}, {'data': [{'error': 0}]}, {'data': [{'error': 0}]}]
-    create_upgrade_tasks(eligible_agents=eligible_agents, chunk_size=10, command='test')
+    def upgrade_agents(agents_chunk, **kwargs):
+        # Only the first chunk fails, except its first agent when there is a task manager error
+        error = 4 if task_manager_error and mock_upgrade.call_count == 1 else 0
+        return {'data': [{'agent': agent, 'error': error if i else 0} for i, agent in enumerate(agents_chunk)]}
+
+    mock_upgrade.side_effect = upgrade_agents
+    results = list(create_upgrade_tasks(eligible_agents=eligible_agents, chunk_size=10, command='test'))
+    assert len(results) == len(expected_calls)
+    agents_results = [item['agent'] for result in results for item in result['data']]
+    assert all(item['error'] == 0 for result in results for item in result['data'])
+    assert sorted(agents_results) == eligible_agents
     mock_upgrade.assert_has_calls(expected_calls, any_order=False)
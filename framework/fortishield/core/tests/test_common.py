@@ -6,12 +6,13 @@ import json
 from contextvars import ContextVar
 from grp import getgrnam
 from pwd import getpwnam
+from types import MappingProxyType
 from unittest.mock import patch
 
 import pytest
 
 from fortishield.core.common import find_fortishield_path, fortishield_uid, fortishield_gid, context_cached, reset_context_cache, \
-    get_context_cache
+    get_context_cache, get_context_cache_stats
 
 
 @pytest.mark.parametrize('fake_path, expected', [
@@ -52,18 +53,17 @@ def test_context_cached():
     # The result of function 'foo' is being cached and it has been called once
     assert foo() == 'bar' and test_context_cached.calls_to_foo == 1, '"bar" should be returned with 1 call to foo.'
     assert foo() == 'bar' and test_context_cached.calls_to_foo == 1, '"bar" should be returned with 1 call to foo.'
-    assert isinstance(get_context_cache()[json.dumps({"key": "foobar", "args": [], "kwargs": {}})], ContextVar)
+    assert isinstance(get_context_cache()[('foobar', (), ())], ContextVar)
 
     # foo called with an argument
     assert foo('other_arg') == 'other_arg' and test_context_cached.calls_to_foo == 2, '"other_arg" should be ' \
                                                                                       'returned with 2 calls to foo. '
-    assert isinstance(get_context_cache()[json.dumps({"key": "foobar", "args": ['other_arg'], "kwargs": {}})],
-                      ContextVar)
+    assert isinstance(get_context_cache()[('foobar', ('other_arg',), ())], ContextVar)
 
     # foo called with the same argument as default, a new context var is created in the cache
     assert foo('bar') == 'bar' and test_context_cached.calls_to_foo == 3, '"bar" should be returned with 3 calls to ' \
                                                                           'foo. '
-    assert isinstance(get_context_cache()[json.dumps({"key": "foobar", "args": ['bar'], "kwargs": {}})], ContextVar)
+    assert isinstance(get_context_cache()[('foobar', ('bar',), ())], ContextVar)
 
     # Reset cache and calls to foo
     reset_context_cache()
@@ -72,10 +72,36 @@ def test_context_cached():
     # foo called with kwargs, a new context var is created with kwargs not empty
     assert foo(data='bar') == 'bar' and test_context_cached.calls_to_foo == 1, '"bar" should be returned with 1 ' \
                                                                                'calls to foo. '
-    assert isinstance(get_context_cache()[json.dumps({"key": "foobar", "args": [], "kwargs": {"data": "bar"}})],
+    assert isinstance(get_context_cache()[('foobar', (), (('data', 'bar'),))], ContextVar)
+
+    # foo called with a non hashable argument, the JSON representation of the arguments is used as identifier
+    assert foo(['bar']) == ['bar'] and test_context_cached.calls_to_foo == 2
+    assert isinstance(get_context_cache()[json.dumps({"key": "foobar", "args": [['bar']], "kwargs": {}})],
                       ContextVar)
 
 
+@pytest.mark.parametrize('result, copied', [
+    (frozenset({'001', '002'}), False),
+    (('001', '002'), False),
+    (MappingProxyType({'001': 'agent'}), False),
+    ({'001', '002'}, True),
+    ({'001': 'agent'}, True)
+])
+def test_context_cached_immutable(result, copied):
+    """Verify that immutable results are returned without copying them and the rest are deep copied."""
+
+    @context_cached('immutable')
+    def foo():
+        return result
+
+    reset_context_cache()
+    stats = get_context_cache_stats().get('immutable', {'hits': 0, 'misses': 0})
+    first, second = foo(), foo()
+    assert first == second == result
+    assert (second is not result) == copied
+    assert get_context_cache_stats()['immutable'] == {'hits': stats['hits'] + 1, 'misses': stats['misses'] + 1}
+
+
 @patch('fortishield.core.logtest.create_fortishield_socket_message', side_effect=SystemExit)
 def test_origin_module_context_var_framework(mock_create_socket_msg):
     """Test that the origin_module context variable is being set to framework."""
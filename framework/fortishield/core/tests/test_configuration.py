@@ -165,6 +165,7 @@ def test_merged_mg2json():
 
 
 def test_get_ossec_conf():
+    configuration.ossec_conf_cache.clear()
     with patch('fortishield.core.configuration.load_fortishield_xml', return_value=Exception):
         with pytest.raises(FortishieldError, match=".* 1101 .*"):
             configuration.get_ossec_conf()
@@ -219,6 +220,32 @@ def test_get_ossec_conf():
         distinct=True)['ruleset']['rule_dir'] == ['ruleset/rules', 'etc/rules']
 
 
+def test_get_ossec_conf_cache(tmpdir):
+    """Check that ossec.conf is only parsed again when the file changes or a new configuration is written."""
+    conf_file = os.path.join(tmpdir, 'ossec.conf')
+    with open(os.path.join(parent_directory, tmp_path, 'configuration/ossec.conf')) as f:
+        conf_content = f.read()
+    with open(conf_file, 'w') as f:
+        f.write(conf_content)
+
+    with patch('fortishield.core.configuration.load_fortishield_xml',
+               side_effect=configuration.load_fortishield_xml) as load_mock:
+        cluster_conf = configuration.get_ossec_conf(section='cluster', conf_file=conf_file)
+        cluster_conf['cluster']['name'] = 'modified'
+        assert configuration.get_ossec_conf(conf_file=conf_file)['cluster']['name'] == 'fortishield'
+        load_mock.assert_called_once()
+
+        with open(conf_file, 'w') as f:
+            f.write(conf_content.replace('<name>fortishield</name>', '<name>fortishield2</name>'))
+        assert configuration.get_ossec_conf(section='cluster', conf_file=conf_file)['cluster']['name'] == 'fortishield2'
+        assert load_mock.call_count == 2
+
+        with patch('fortishield.core.configuration.open', mock_open()):
+            configuration.write_ossec_conf(new_conf=conf_content)
+        configuration.get_ossec_conf(section='cluster', conf_file=conf_file)
+        assert load_mock.call_count == 3
+
+
 def test_get_agent_conf():
     with pytest.raises(FortishieldError, match=".* 1710 .*"):
         configuration.get_agent_conf(group_id='noexists')
@@ -2,7 +2,8 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
-from unittest.mock import patch
+from unittest.mock import call, patch
+import errno
 import socket
 
 import pytest
@@ -215,3 +216,39 @@ def test_FortishieldAnalysisdQueue_send_msg_ko(mock_send, mock_conn, max_msg_siz
         queue.send_msg(msg_header='1:Head:', msg="{'foo': 1}")
 
     mock_conn.assert_called_once_with('test_path')
+
+
+@patch('fortishield.core.fortishield_queue.socket.socket.connect')
+@patch('fortishield.core.fortishield_queue.FortishieldAnalysisdQueue._send_retrying')
+def test_FortishieldAnalysisdQueue_send_msgs(mock_send, mock_conn):
+    """Test FortishieldAnalysisdQueue.send_msgs function."""
+    queue = FortishieldAnalysisdQueue('test_path')
+    queue.MAX_MSG_SIZE = 20
+    mock_send.side_effect = [None, Exception, None]
+
+    failed_msgs = queue.send_msgs(msg_header='1:Head:', msgs=['foo', 'bar', 'x' * 14, 'baz'])
+
+    assert mock_send.call_args_list == [call(b'1:Head:foo'), call(b'1:Head:bar'), call(b'1:Head:baz')]
+    assert {index: error.code for index, error in failed_msgs.items()} == {1: 1014, 2: 1012}
+
+
+@pytest.mark.parametrize('send_errors, expected_exception', [
+    ([OSError(errno.EAGAIN, ''), OSError(errno.ENOBUFS, ''), 10], None),
+    ([OSError(errno.EAGAIN, '')] * FortishieldAnalysisdQueue.MAX_SEND_ATTEMPTS, 1011),
+    ([OSError(errno.EPIPE, '')], 1011),
+    ([0], 1011),
+])
+@patch('fortishield.core.fortishield_queue.sleep')
+@patch('fortishield.core.fortishield_queue.socket.socket.connect')
+def test_FortishieldAnalysisdQueue_send_retrying(mock_conn, mock_sleep, send_errors, expected_exception):
+    """Test FortishieldAnalysisdQueue._send_retrying function retries while the socket buffer is full."""
+    queue = FortishieldAnalysisdQueue('test_path')
+    with patch.object(queue, 'socket') as mock_socket:
+        mock_socket.send.side_effect = send_errors
+        if expected_exception:
+            with pytest.raises(FortishieldException, match=f'.* {expected_exception} .*'):
+                queue._send_retrying(b'msg')
+        else:
+            queue._send_retrying(b'msg')
+
+    assert mock_socket.send.call_count == len(send_errors)
@@ -10,7 +10,8 @@ import pytest
 
 with patch('fortishield.core.common.fortishield_uid'):
     with patch('fortishield.core.common.fortishield_gid'):
-        from fortishield.core.results import FortishieldResult, AffectedItemsFortishieldResult, _goes_before_than, nested_itemgetter, merge
+        from fortishield.core.results import FortishieldResult, AffectedItemsFortishieldResult, _goes_before_than, nested_itemgetter, merge, \
+            get_sort_key
         from fortishield import FortishieldException, FortishieldError
 
 param_name = ['affected_items', 'total_affected_items', 'sort_fields', 'sort_casting', 'sort_ascending',
@@ -333,3 +334,29 @@ def test_results_merge(iterables, criteria, ascending, types, expected_result):
         Expected results after merge.
     """
     assert merge(*iterables, criteria=criteria, ascending=ascending, types=types) == expected_result
+
+
+@pytest.mark.parametrize('items, criteria, ascending, types', [
+    ([{'a': '10', 'b': 1}, {'a': '9', 'b': 2}, {'a': None, 'b': 3}, {'a': '9', 'b': 0}], ['a'], [True], ['int']),
+    ([{'a': '10', 'b': 1}, {'a': '9', 'b': 2}, {'a': None, 'b': 3}, {'a': '9', 'b': 0}], ['a'], [False], ['str']),
+    ([{'a': {'c': 2}, 'b': 1}, {'a': {'c': 1}, 'b': 2}, {'a': {'c': 1}, 'b': 0}], ['a.c', 'b'], [True, False],
+     ['int', 'int']),
+])
+def test_results_get_sort_key(items, criteria, ascending, types):
+    """Test function `get_sort_key` from module results.
+
+    Sorting with the key must return the items in the same order as `merge` does with one item per iterable.
+
+    Parameters
+    ----------
+    items : list(dict)
+        Items to sort.
+    criteria : list(str) or tuple(str)
+        Expressions accepted by the `nested_itemgetter` function.
+    ascending : list(bool) or tuple(bool)
+        True for ascending, False otherwise.
+    types : list(str) or tuple(str)
+        Must fit a class in builtins.
+    """
+    expected_result = merge(*[[item] for item in items], criteria=criteria, ascending=ascending, types=types)
+    assert sorted(items, key=get_sort_key(criteria=criteria, ascending=ascending, types=types)) == expected_result
@@ -0,0 +1,102 @@
+# Copyright (C) 2015, KhulnaSoft Ltd.
+# Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
+# This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from fortishield.core import stats_collector
+from fortishield.core.exception import FortishieldInternalError
+from fortishield.core.stats_collector import DaemonsStatsCollector, MetricRingBuffer, flatten_metrics
+
+
+def test_flatten_metrics():
+    """Verify that only the numeric values are returned, with the names of their parents."""
+    stats = {'uptime': 'date', 'queue': {'usage': 0.5, 'enabled': True, 'events': {'received': 10}}, 'total': 3}
+    assert list(flatten_metrics(stats)) == [('queue.usage', 0.5), ('queue.events.received', 10), ('total', 3)]
+
+
+def test_metric_ring_buffer():
+    """Verify that the oldest samples are overwritten and the windows are taken from the newest ones."""
+    buffer = MetricRingBuffer(size=4)
+    assert len(buffer) == 0
+    assert buffer.samples() == []
+    assert buffer.delta() == {'delta': None, 'rate': None, 'from': None, 'to': None}
+
+    for timestamp in range(1, 7):
+        buffer.append(timestamp, timestamp * 10)
+
+    assert len(buffer) == 4
+    assert buffer.samples() == [(3, 30), (4, 40), (5, 50), (6, 60)]
+    assert buffer.samples(since=4.5) == [(5, 50), (6, 60)]
+    assert buffer.samples(since=7) == []
+    assert buffer.delta() == {'delta': 30, 'rate': 10, 'from': 3, 'to': 6}
+    assert buffer.delta(since=6) == {'delta': 0, 'rate': None, 'from': 6, 'to': 6}
+
+
+def test_metric_ring_buffer_delta_reset():
+    """Verify that the decreases of the counters are considered resets."""
+    buffer = MetricRingBuffer(size=4)
+    for timestamp, value in enumerate([100, 120, 5, 25]):
+        buffer.append(timestamp, value)
+
+    assert buffer.delta() == {'delta': 45, 'rate': 15, 'from': 0, 'to': 3}
+
+
+@pytest.mark.asyncio
+@patch('fortishield.core.common.REMOTED_SOCKET', 'remote')
+@patch('fortishield.core.common.ANALYSISD_SOCKET', 'analysis')
+@patch('fortishield.core.common.WDB_SOCKET', 'fdb')
+async def test_daemons_stats_collector_collect():
+    """Verify that the metrics of every daemon are added to their buffers and the last statistics are kept."""
+    async def get_daemons_stats_socket(socket, agents_list=None, last_id=None):
+        if socket == 'fdb':
+            raise FortishieldInternalError(1121)
+        if agents_list:
+            return {'data': {'name': socket, 'agents': [{'id': last_id + 1}]},
+                    'message': 'due' if last_id == 0 else 'ok'}
+        return {'name': socket, 'metrics': {'events': {'received': len(socket)}}}
+
+    collector = DaemonsStatsCollector(size=2, agents=True)
+    with patch('fortishield.core.stats_collector.get_daemons_stats_socket', side_effect=get_daemons_stats_socket), \
+            patch('fortishield.core.stats_collector.time.time', side_effect=range(100)):
+        for _ in range(3):
+            await collector.collect()
+
+    assert set(collector.metrics) == {'fortishield-remoted', 'fortishield-analysisd'}
+    assert [value for _, value in collector.metrics['fortishield-remoted']['events.received'].samples()] == [6, 6]
+    assert collector.latest['fortishield-analysisd'][1] == {'name': 'analysis', 'metrics': {'events': {'received': 8}}}
+    assert collector.latest['fortishield-remoted', 'agents'][1] == {'name': 'remote', 'agents': [{'id': 1}, {'id': 2}]}
+    assert 'fortishield-db' not in collector.latest
+
+
+@pytest.mark.parametrize('age, expected', [(5, {'name': 'remote'}), (11, None)])
+def test_daemons_stats_collector_get_latest(age, expected):
+    """Verify that the last statistics are only returned when they are recent enough."""
+    collector = DaemonsStatsCollector(max_age=10)
+    collector.latest['fortishield-remoted'] = 100, {'name': 'remote'}
+
+    with patch('fortishield.core.stats_collector.time.time', return_value=100 + age):
+        assert collector.get_latest('fortishield-remoted') == expected
+        assert collector.get_latest('fortishield-remoted', agents=True) is None
+        assert collector.get_latest('fortishield-db') is None
+
+
+@pytest.mark.asyncio
+async def test_run_collector():
+    """Verify that the collector is available while it runs."""
+    with patch('fortishield.core.stats_collector.DaemonsStatsCollector.collect') as collect_mock:
+        task = asyncio.create_task(stats_collector.run_collector(interval=0.01, size=10, max_age=1))
+        await asyncio.sleep(0.05)
+        collector = stats_collector.get_collector()
+        assert isinstance(collector, DaemonsStatsCollector)
+        assert (collector.interval, collector.size, collector.max_age, collector.agents) == (0.01, 10, 1, False)
+        assert collect_mock.await_count > 1
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert stats_collector.get_collector() is None
@@ -36,6 +36,20 @@ def test_get_valid_fields(mock_info, os_name):
         assert 'sys_osinfo' in response[0], f'"sys_osinfo" not contained in {response}'
 
 
+@patch('fortishield.core.agent.Agent.get_basic_information')
+def test_get_valid_fields_without_agent(mock_info):
+    """Check that get_valid_fields returns the fields of every OS when no agent is given."""
+    with patch('fortishield.core.agent.Agent.get_agent_os_name', return_value='Windows'):
+        windows_fields = get_valid_fields(Type.OS, '0')[1]
+    with patch('fortishield.core.agent.Agent.get_agent_os_name', return_value='Linux'):
+        linux_fields = get_valid_fields(Type.OS, '0')[1]
+    mock_info.reset_mock()
+
+    assert get_valid_fields(Type.OS) == ('sys_osinfo', linux_fields)
+    assert windows_fields.items() <= linux_fields.items()
+    mock_info.assert_not_called()
+
+
 @patch('fortishield.core.utils.path.exists', return_value=True)
 @patch('fortishield.core.agent.Agent.get_basic_information', return_value=None)
 @patch('fortishield.core.agent.Agent.get_agent_os_name', return_value='Linux')
@@ -6,6 +6,8 @@
 import datetime
 import glob
 import os
+import random
+import re
 from collections.abc import KeysView
 from io import StringIO
 from shutil import copyfile, Error
@@ -21,7 +23,7 @@ from freezegun import freeze_time
 with patch('fortishield.core.common.fortishield_uid'):
     with patch('fortishield.core.common.fortishield_gid'):
         from fortishield import FortishieldException
-        from fortishield.core.agent import FortishieldDBQueryAgents
+        from fortishield.core.agent import FortishieldDBQueryAgents, FortishieldDBQueryGroup
         from fortishield.core import utils, exception
         from fortishield.core.common import FORTISHIELD_PATH, AGENT_NAME_LEN_LIMIT
         from fortishield.core.results import FortishieldResult
@@ -590,10 +592,12 @@ def test_md5(mock_iter, mock_open):
         mock_open.assert_called_once_with('test', 'rb')
 
 
+@patch('fortishield.core.utils.os.stat')
 @patch('fortishield.core.utils.open')
 @patch('fortishield.core.utils.iter', return_value=['1', '2'])
-def test_blake2b(mock_iter, mock_open):
+def test_blake2b(mock_iter, mock_open, mock_stat):
     """Test md5 function."""
+    utils.files_hash_cache.clear()
     with patch('fortishield.core.utils.hashlib.blake2b') as blake2b_mock:
         blake2b_mock.return_value.update.side_effect = None
         result = utils.blake2b('test')
@@ -602,6 +606,10 @@ def test_blake2b(mock_iter, mock_open):
         assert isinstance(result.return_value, MagicMock)
         mock_open.assert_called_once_with('test', 'rb')
 
+        # The cached hash is returned while the file does not change
+        assert utils.blake2b('test') == result
+        mock_open.assert_called_once_with('test', 'rb')
+
 
 def test_protected_get_hashing_algorithm_ko():
     """Test _get_hashing_algorithm function exception."""
@@ -639,6 +647,28 @@ def test_get_hash_ko(mock_iter, mock_open):
         mock_open.assert_called_once_with('test_file', 'rb')
 
 
+def test_get_cached_hash(tmp_path):
+    """Test get_cached_hash function only calculates the hash again when the file changes."""
+    utils.files_hash_cache.clear()
+    test_file = tmp_path / 'merged.mg'
+    test_file.write_text('content')
+
+    with patch('fortishield.core.utils.get_hash', wraps=utils.get_hash) as get_hash_mock:
+        expected_hash = utils.get_hash(str(test_file))
+        assert utils.get_cached_hash(str(test_file)) == expected_hash
+        assert utils.get_cached_hash(str(test_file)) == expected_hash
+        assert get_hash_mock.call_count == 2
+
+        assert utils.get_cached_hash(str(test_file), 'sha1') == utils.get_hash(str(test_file), 'sha1')
+        get_hash_mock.reset_mock()
+
+        test_file.write_text('new content')
+        assert utils.get_cached_hash(str(test_file)) == utils.get_hash(str(test_file)) != expected_hash
+        assert get_hash_mock.call_count == 2
+
+    assert utils.get_cached_hash(str(tmp_path / 'missing')) is None
+
+
 def test_get_hash_str():
     """Test get_hash_str function work."""
     result = utils.get_hash_str('test')
@@ -701,6 +731,54 @@ def test_load_fortishield_xml_ko(expected_exception):
     with pytest.raises(FortishieldException, match=f'.* {expected_exception} .*'):
         utils.load_fortishield_xml(file_path)
 
+
+def _legacy_preprocess_fortishield_xml(data):
+    """Multi-pass implementation of the XML preprocessing, used as reference for `_preprocess_fortishield_xml`."""
+    xml_comment = re.compile(r"(<!--(.*?)-->)", flags=re.MULTILINE | re.DOTALL)
+    for comment in xml_comment.finditer(data):
+        good_comment = comment.group(2).replace('--', '..')
+        data = data.replace(comment.group(2), good_comment)
+    data = data.replace('&lt;', '_custom_amp_lt_').replace('&gt;', '_custom_amp_gt_')
+    data = re.sub(r'\\', '&backslash;', data)
+    data = re.sub(r"<(?!/?\w+.+>|!--)", "&lt;", data)
+    data = re.sub(r'^&backslash;<(.*[^>])$', r'&backslash;&lt;\g<1>', data)
+    data = re.sub(r'&backslash;>', '&backslash;&gt;', data)
+    return re.sub("&(?!(amp|lt|gt|apos|quot|backslash);)", "&amp;", data)
+
+
+def test_preprocess_fortishield_xml():
+    """Test that _preprocess_fortishield_xml applies the same fixes as the multi-pass implementation, both to the XML
+    files used in the tests and to random documents built from the characters that must be escaped."""
+    xml_files = glob.glob(os.path.join(test_data_path, '**', '*.xml'), recursive=True) + \
+        glob.glob(os.path.join(test_data_path, '**', '*.conf'), recursive=True)
+    for xml_file in xml_files:
+        with open(xml_file, errors='ignore') as f:
+            data = f.read()
+        assert utils._preprocess_fortishield_xml(data) == _legacy_preprocess_fortishield_xml(data), xml_file
+
+    tokens = ['<', '>', '&', '\\', '-', '!', '/', ';', 'a', ' ', '\n', '&lt;', '&gt;', '&amp;', '&backslash;', '<!--',
+              '-->', '<a>', '</a>', '<!-', '--']
+    rnd = random.Random(0)
+    for _ in range(5000):
+        data = ''.join(rnd.choice(tokens) for _ in range(rnd.randint(0, 40)))
+        # The multi-pass implementation replaces every occurrence of a comment content in the whole document, so
+        # documents where a fixed comment content appears elsewhere are not comparable
+        comments = [m for m in re.finditer(r"<!--(.*?)-->", data, flags=re.DOTALL) if '--' in m.group(1)]
+        if any(data.count(m.group(1)) > 1 or data.find(m.group(1)) != m.start(1) for m in comments):
+            continue
+        assert utils._preprocess_fortishield_xml(data) == _legacy_preprocess_fortishield_xml(data), repr(data)
+
+
+@pytest.mark.parametrize('data, expected_data', [
+    ('<!-- a -- b --><name>1</name>', '<!-- a .. b --><name>1</name>'),
+    ('<name>&lt;b&gt;</name>', '<name>_custom_amp_lt_b_custom_amp_gt_</name>'),
+    ('<name>x < 1 & y \\> 2</name>', '<name>x &lt; 1 &amp; y &backslash;&gt; 2</name>'),
+    ('\\<a>b', '&backslash;&lt;a>b'),
+])
+def test_preprocess_fortishield_xml_escaping(data, expected_data):
+    """Test the fixes applied by _preprocess_fortishield_xml."""
+    assert utils._preprocess_fortishield_xml(data) == expected_data
+
 @pytest.mark.parametrize('version1, version2', [
     ('Fortishield v3.5.0', 'Fortishield v3.5.2'),
     ('Fortishield v3.6.1', 'Fortishield v3.6.3'),
@@ -1359,6 +1437,48 @@ def test_FortishieldDBQuery_substitute_params(mock_socket_conn, mock_conn_db, mo
     mock_conn_db.assert_called_once_with()
 
 
+@pytest.mark.parametrize('ids, expected_ranges, expected_ids', [
+    ([], [], []),
+    (['001', '002'], [], ['001', '002']),
+    (['005', '001', '002', '003', '010', 11, '012', '013'], [(1, 3), (10, 13)], ['005']),
+    (['group1', '001', '002', '003'], [], ['group1', '001', '002', '003'])
+])
+def test_get_id_ranges(ids, expected_ranges, expected_ids):
+    """Test utils.get_id_ranges function."""
+    assert utils.get_id_ranges(ids) == (expected_ranges, expected_ids)
+
+
+@pytest.mark.parametrize('operator, value, expected_query, expected_request', [
+    ('IN', ['001', '002'], 'id IN (:rbac_id)', ['001', '002']),
+    ('IN', ['001', '002', '003', '007'], '(id BETWEEN 1 AND 3 OR id IN (:rbac_id))', ['007']),
+    ('NOT IN', [str(i).zfill(3) for i in range(1, 10000)], 'NOT (id BETWEEN 1 AND 9999 OR id IN (:rbac_id))', [])
+])
+@patch('socket.socket.connect')
+def test_FortishieldDBQuery_protected_process_filter_rbac(mock_socket_conn, operator, value, expected_query,
+                                                    expected_request):
+    """Test utils.FortishieldDBQuery._process_filter function with RBAC filters, sending consecutive IDs as ranges."""
+    query = FortishieldDBQueryAgents(offset=0, limit=None, sort=None, search=None, select={'id'}, query=None,
+                               count=False, get_data=True)
+    query.query = ''
+    query._process_filter('rbac_id', 'rbac_id', {'value': value, 'operator': operator})
+
+    assert query.query == expected_query
+    assert query.request['rbac_id'] == expected_request
+
+
+@patch('socket.socket.connect')
+def test_FortishieldDBQuery_protected_process_filter_rbac_name(mock_socket_conn):
+    """Test utils.FortishieldDBQuery._process_filter function does not send numeric group names as ranges."""
+    groups = ['1', '2', '3', '010']
+    query = FortishieldDBQueryGroup(offset=0, limit=None, sort=None, search=None, select={'name'}, query=None,
+                              count=False, get_data=True)
+    query.query = ''
+    query._process_filter('rbac_name', 'rbac_name', {'value': groups, 'operator': 'IN'})
+
+    assert query.query == 'name IN (:rbac_name)'
+    assert query.request['rbac_name'] == groups
+
+
 @patch('fortishield.core.utils.path.exists', return_value=True)
 @patch('fortishield.core.utils.glob.glob', return_value=True)
 @patch('fortishield.core.utils.FortishieldDBBackend.connect_to_db')
@@ -1431,6 +1551,25 @@ def test_FortishieldDBQuery_protected_filter_date(mock_socket_conn, mock_conn_db
         mock_conn_db.assert_called_once_with()
 
 
+@pytest.mark.parametrize('query_class, expected_run', [
+    (FortishieldDBQueryAgents, 'general_run'),
+    (FortishieldDBQueryGroup, 'oversized_run')
+])
+@patch('socket.socket.connect')
+def test_FortishieldDBQuery_run_rbac_ranges(mock_socket_conn, query_class, expected_run):
+    """Test utils.FortishieldDBQuery.run function only compacts the consecutive agent IDs to choose the run."""
+    rbac_ids = [str(i).zfill(3) for i in range(1, 30000)]
+    query = query_class(offset=0, limit=None, sort=None, search=None, select=None, query=None, count=False,
+                        get_data=True, filters={'rbac_ids': rbac_ids})
+
+    with patch.object(query, 'general_run') as general_run_mock, \
+            patch.object(query, 'oversized_run') as oversized_run_mock:
+        query.run()
+        getattr(query, expected_run).assert_called_once_with()
+
+    assert general_run_mock.call_count + oversized_run_mock.call_count == 1
+
+
 @pytest.mark.parametrize('execute_value, expected_result', [
     ([{'id': 99}, {'id': 100}], {'items': [{'id': '099'}, {'id': '100'}], 'totalItems': 0}),
     ([{'id': 1}], {'items': [{'id': '001'}], 'totalItems': 0}),
@@ -11,7 +11,7 @@ import pytest
 from fortishield.core import common
 from fortishield.core import exception
 from fortishield.core.common import MAX_SOCKET_BUFFER_SIZE
-from fortishield.core.fdb import AsyncFortishieldDBConnection, FortishieldDBConnection
+from fortishield.core.fdb import AsyncFortishieldDBConnection, FortishieldDBConnection, substitute_query_params
 
 
 def format_msg(msg):
@@ -253,6 +253,43 @@ def test_execute(send_mock, socket_send_mock, connect_mock):
         myfdb.execute("agent 000 sql select test from test offset 1 count")
 
 
+@patch("socket.socket.connect")
+def test_execute_params(connect_mock):
+    """Check that query templates are validated once and the parameters are inlined without converting them."""
+    FortishieldDBConnection._prepare_template.cache_clear()
+    myfdb = FortishieldDBConnection()
+    template = "global sql SELECT name FROM agent WHERE (id IN (:rbac_id) AND name = :name$0) LIMIT :limit"
+
+    with patch("fortishield.core.fdb.FortishieldDBConnection._send",
+               side_effect=lambda msg, raw=False: ['ok', '[{"name": "test"}]'] if raw else [{'total': 1}]) as send_mock:
+        for name in ['Agent1', 'Agent2']:
+            myfdb.execute(template, params={'rbac_id': ['001', '002'], 'name$0': name, 'limit': 1})
+
+    assert "where (id in (001,002) and name = 'Agent2') limit 1" in send_mock.call_args_list[-1].args[0]
+    assert FortishieldDBConnection._prepare_template.cache_info().misses == 1
+    assert FortishieldDBConnection._prepare_template.cache_info().hits == 1
+
+    with pytest.raises(exception.FortishieldException, match=".* 2004 .*"):
+        myfdb.execute(template, params={'rbac_id': [], 'name$0': 'test;', 'limit': 1})
+
+
+@pytest.mark.parametrize('query, params, expected_query', [
+    ("select * from agent", {}, "select * from agent"),
+    ("id = :id and name = :name$0", {'id': 1, 'name$0': ':id'}, "id = 1 and name = ':id'"),
+    ("id in (:ids) and id != :id_0", {'ids': ['001', 2, 'name'], 'id_0': 3.5}, "id in (001,2,'name') and id != 3.5"),
+    ("date > :date and id = :id", {'date': '2021-01-01 00:00:00'}, "date > '2021-01-01 00:00:00' and id = :id"),
+])
+def test_substitute_query_params(query, params, expected_query):
+    """Check that the placeholders of a query are replaced by their values in one pass."""
+    assert substitute_query_params(query, params) == expected_query
+
+
+def test_substitute_query_params_ko():
+    """Check that a TypeError is raised for invalid parameter types."""
+    with pytest.raises(TypeError):
+        substitute_query_params("id = :id", {'id': None})
+
+
 @patch("socket.socket.connect")
 @patch("socket.socket.send")
 def test_execute_pagination(socket_send_mock, connect_mock):
@@ -271,6 +308,44 @@ def test_execute_pagination(socket_send_mock, connect_mock):
             myfdb.execute("agent 000 sql select test from test offset 1 limit 1")
 
 
+@patch("socket.socket.connect")
+def test_execute_keyset(connect_mock):
+    """Check that the rows are requested in chunks after the last key received, halving the size of the chunks that do
+    not fit in the socket buffer."""
+    myfdb = FortishieldDBConnection(request_slice=2)
+    responses = [['ok', '[{"keyset_id": 1, "name": "a"}, {"keyset_id": 3, "name": "b"}]'],
+                 exception.FortishieldInternalError(2009),
+                 ['ok', '[{"keyset_id": 7, "name": "c"}]']]
+
+    with patch("fortishield.core.fdb.FortishieldDBConnection._send", side_effect=responses) as send_mock:
+        chunks = list(myfdb.execute_keyset("agent 000 sql select rowid as keyset_id, name from test where name != :name",
+                                           params={'name': 'z'}))
+
+    assert chunks == [[{'name': 'a'}, {'name': 'b'}], [{'name': 'c'}]]
+    requests = [c.args[0] for c in send_mock.call_args_list]
+    assert requests[0] == "agent 000 sql select * from (select rowid as keyset_id, name from test where name != 'z') " \
+                          f"where keyset_id > {-2 ** 63} order by keyset_id limit 2"
+    assert requests[1].endswith("where keyset_id > 3 order by keyset_id limit 4")
+    assert requests[2].endswith("where keyset_id > 3 order by keyset_id limit 2")
+    # The last chunk had less rows than requested
+    assert len(requests) == 3
+
+
+@patch("socket.socket.connect")
+def test_execute_keyset_ko(connect_mock):
+    """Check that the errors of the queries run in chunks are raised."""
+    myfdb = FortishieldDBConnection(request_slice=1)
+
+    with pytest.raises(exception.FortishieldException, match=".* 2004 .*"):
+        next(myfdb.execute_keyset("agent 000 sql select rowid as keyset_id from test where name = :name",
+                                  params={'name': 'test;'}))
+
+    with patch("fortishield.core.fdb.FortishieldDBConnection._send",
+               side_effect=exception.FortishieldInternalError(2009)):
+        with pytest.raises(exception.FortishieldInternalError, match=".* 2009 .*"):
+            next(myfdb.execute_keyset("agent 000 sql select rowid as keyset_id from test"))
+
+
 @pytest.mark.parametrize('error_query, error_type, expected_exception, delete, update', [
     ('agent 000 sql delete test', None, 2004, True, False),
     ('agent 000 sql update test', None, 2004, False, True),
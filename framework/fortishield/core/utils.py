@@ -12,6 +12,7 @@ import re
 import stat
 import sys
 import tempfile
+import threading
 import typing
 from copy import deepcopy
 from datetime import datetime, timedelta, timezone
@@ -22,7 +23,7 @@ from pyexpat import ExpatError
 from shutil import Error, move, copy2
 from signal import signal, alarm, SIGALRM, SIGKILL
 
-from cachetools import cached, TTLCache
+from cachetools import cached, LRUCache, TTLCache
 from defusedxml.ElementTree import fromstring
 from defusedxml.minidom import parseString
 
@@ -30,7 +31,7 @@ import fortishield.core.results as results
 from api import configuration
 from fortishield.core import common
 from fortishield.core.exception import FortishieldError, FortishieldInternalError
-from fortishield.core.fdb import FortishieldDBConnection
+from fortishield.core.fdb import FortishieldDBConnection, substitute_query_params
 
 # Python 2/3 compatibility
 if sys.version_info[0] == 3:
@@ -39,6 +40,10 @@ if sys.version_info[0] == 3:
 # Temporary cache
 t_cache = TTLCache(maxsize=4500, ttl=60)
 
+# Hashes of files, by path, inode, size, modification time and algorithm
+files_hash_cache = LRUCache(maxsize=20000)
+files_hash_cache_lock = threading.Lock()
+
 
 def clean_pid_files(daemon: str):
     """Check the existence of '.pid' files for a specified daemon.
@@ -741,11 +746,45 @@ def md5(fname):
 
 
 def blake2b(fname):
+    # The hash is cached, so the file is only read again when it changes
+    key = _get_files_hash_cache_key(fname, 'blake2b')
+    with files_hash_cache_lock:
+        if (file_hash := files_hash_cache.get(key)) is not None:
+            return file_hash
+
     hash_blake2b = hashlib.blake2b()
     with open(fname, 'rb') as f:
         for chunk in iter(lambda: f.read(4096), b""):
             hash_blake2b.update(chunk)
-    return hash_blake2b.hexdigest()
+    file_hash = hash_blake2b.hexdigest()
+
+    with files_hash_cache_lock:
+        files_hash_cache[key] = file_hash
+    return file_hash
+
+
+def _get_files_hash_cache_key(filename: str, hash_algorithm: str) -> tuple:
+    """Get the key of a file in the hashes cache. It changes when the file is replaced or modified.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the file.
+    hash_algorithm : str
+        Algorithm used to calculate the hash.
+
+    Raises
+    ------
+    OSError
+        The file metadata could not be obtained.
+
+    Returns
+    -------
+    tuple
+        Path, inode, size and modification time of the file, and the hash algorithm.
+    """
+    file_stat = os.stat(filename)
+    return filename, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns, hash_algorithm
 
 
 def _get_hashing_algorithm(hash_algorithm):
@@ -770,6 +809,36 @@ def get_hash(filename, hash_algorithm='md5', return_hex=True):
     return hashing.hexdigest() if return_hex else hashing.digest()
 
 
+def get_cached_hash(filename: str, hash_algorithm: str = 'md5') -> typing.Optional[str]:
+    """Get the hash of a file, reading the file only if it changed since its hash was last calculated.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the file.
+    hash_algorithm : str
+        Algorithm used to calculate the hash.
+
+    Returns
+    -------
+    str or None
+        Hexadecimal hash of the file. None if the file could not be read.
+    """
+    try:
+        key = _get_files_hash_cache_key(filename, hash_algorithm)
+    except OSError:
+        return None
+
+    with files_hash_cache_lock:
+        if (file_hash := files_hash_cache.get(key)) is not None:
+            return file_hash
+
+    if (file_hash := get_hash(filename, hash_algorithm)) is not None:
+        with files_hash_cache_lock:
+            files_hash_cache[key] = file_hash
+    return file_hash
+
+
 def get_hash_str(my_str, hash_algorithm='md5'):
     hashing = _get_hashing_algorithm(hash_algorithm)
     hashing.update(my_str.encode())
@@ -967,51 +1036,90 @@ def check_agents_allow_higher_versions(data: str):
         check_section(auth_section, split_section='</auth>')
 
 
-def load_fortishield_xml(xml_path, data=None):
-    if not data:
-        with open(xml_path) as f:
-            try:
-                data = f.read()
-            except Exception as e:
-                raise FortishieldError(1113, extra_message=str(e))
+# Custom entities allowed in Fortishield XML files
+XML_CUSTOM_ENTITIES = {
+    'backslash': '\\'
+}
+XML_DEFAULT_ENTITIES = ['amp', 'lt', 'gt', 'apos', 'quot']
+XML_ENTITIES_DECLARATION = '<!DOCTYPE xmlfile [\n' + \
+                           '\n'.join([f'<!ENTITY {name} "{value}">' for name, value in XML_CUSTOM_ENTITIES.items()]) + \
+                           '\n]>\n'
+# Tokens that must be rewritten before parsing a Fortishield XML file:
+#   * <!-- and -- -> comment delimiters, -- characters are not allowed inside XML comments.
+#   * &backslash;> -> \> must be written as &backslash;&gt;.
+#   * &lt; and &gt; -> the ones present in the file are replaced by placeholders.
+#   * & -> it must be escaped if it does not represent an &entity;.
+#   * \ and \> -> backslashes are written as &backslash;.
+#   * < -> it must be escaped as &lt; unless it is starting a <tag> (a word and a > later in the same line).
+XML_PREPROCESS_REGEX = re.compile(
+    r"<!--|--|&backslash;>|&[lg]t;|"
+    rf"&(?!(?:{'|'.join(XML_DEFAULT_ENTITIES + list(XML_CUSTOM_ENTITIES))});)|"
+    r"\\>?|<(?!/?(?:\w.|&[lg]t;).*>)"
+)
+XML_BACKSLASH_TAG_REGEX = re.compile(r'^(?:\\|&backslash;)<(.*[^>])$')
+XML_REPLACEMENTS = {
+    '&backslash;>': '&backslash;&gt;',
+    '&lt;': '_custom_amp_lt_',
+    '&gt;': '_custom_amp_gt_',
+    '&': '&amp;',
+    '\\': '&backslash;',
+    '\\>': '&backslash;&gt;',
+    '<': '&lt;'
+}
+
+
+def _preprocess_fortishield_xml(data: str) -> str:
+    """Escape the content of a Fortishield XML file so it can be parsed by a standard XML parser. All the fixes are
+    applied in a single scan of the content.
 
-    # -- characters are not allowed in XML comments
-    xml_comment = re.compile(r"(<!--(.*?)-->)", flags=re.MULTILINE | re.DOTALL)
-    for comment in xml_comment.finditer(data):
-        good_comment = comment.group(2).replace('--', '..')
-        data = data.replace(comment.group(2), good_comment)
+    Parameters
+    ----------
+    data : str
+        Content of the XML file.
 
-    # Replace &lt; and &gt; currently present in the config
-    data = data.replace('&lt;', '_custom_amp_lt_').replace('&gt;', '_custom_amp_gt_')
+    Returns
+    -------
+    str
+        Escaped content.
+    """
+    comment_end = -1
 
-    custom_entities = {
-        'backslash': '\\'
-    }
+    def replace(match):
+        nonlocal comment_end
+        token = match.group()
 
-    # replace every custom entity
-    for character, replacement in custom_entities.items():
-        data = re.sub(replacement.replace('\\', '\\\\'), f'&{character};', data)
+        if token == '<!--':
+            if match.start() >= comment_end:
+                # Start of a comment, whose content ends in the first -->
+                comment_end = data.find('-->', match.end())
+                return token
+            # <!-- inside a comment. Its -- is replaced and the < is not starting a comment anymore
+            return '&lt;!..' if match.end() <= comment_end else token
+        elif token == '--':
+            return '..' if match.end() <= comment_end else token
 
-    # < characters should be escaped as &lt; unless < is starting a <tag> or a comment
-    data = re.sub(r"<(?!/?\w+.+>|!--)", "&lt;", data)
+        return XML_REPLACEMENTS[token]
 
-    # replace \< by &lt, only outside xml tags;
-    data = re.sub(r'^&backslash;<(.*[^>])$', r'&backslash;&lt;\g<1>', data)
+    new_data = XML_PREPROCESS_REGEX.sub(replace, data)
 
-    # replace \> by &gt;
-    data = re.sub(r'&backslash;>', '&backslash;&gt;', data)
+    # Replace \< by &lt; when it is the beginning of a single-line content
+    if new_data.startswith('&backslash;<') and XML_BACKSLASH_TAG_REGEX.match(data):
+        new_data = f"&backslash;&lt;{new_data[len('&backslash;<'):]}"
 
-    # default entities
-    default_entities = ['amp', 'lt', 'gt', 'apos', 'quot']
+    return new_data
 
-    # & characters should be escaped if they don't represent an &entity;
-    data = re.sub(f"&(?!({'|'.join(default_entities + list(custom_entities))});)", "&amp;", data)
 
-    entities = '<!DOCTYPE xmlfile [\n' + \
-               '\n'.join([f'<!ENTITY {name} "{value}">' for name, value in custom_entities.items()]) + \
-               '\n]>\n'
+def load_fortishield_xml(xml_path, data=None):
+    if not data:
+        with open(xml_path) as f:
+            try:
+                data = f.read()
+            except Exception as e:
+                raise FortishieldError(1113, extra_message=str(e))
+
+    data = _preprocess_fortishield_xml(data)
 
-    return fromstring(f"{entities}<root_tag>{data}</root_tag>", forbid_entities=False)
+    return fromstring(f"{XML_ENTITIES_DECLARATION}<root_tag>{data}</root_tag>", forbid_entities=False)
 
 
 class FortishieldVersion:
@@ -1292,6 +1400,41 @@ def filter_array_by_query(q: str, input_array: typing.List) -> typing.List:
     return output_array
 
 
+def get_id_ranges(ids: typing.Iterable, min_range_length: int = 3) -> typing.Tuple[list, list]:
+    """Split a collection of IDs into ranges of consecutive numeric IDs and loose IDs, so they can be filtered with
+    `BETWEEN` clauses instead of listing every ID.
+
+    Parameters
+    ----------
+    ids : Iterable
+        IDs to split. If any of them is not numeric, no ranges are built.
+    min_range_length : int
+        Minimum number of consecutive IDs to build a range.
+
+    Returns
+    -------
+    list
+        Ranges as (first, last) tuples.
+    list
+        IDs not included in any range, as they were given.
+    """
+    ids = list(ids)
+    if not all(isinstance(item, int) or (isinstance(item, str) and item.isdigit()) for item in ids):
+        return [], ids
+
+    ranges = []
+    loose_ids = []
+    numeric_ids = {int(item): item for item in ids}
+    for _, group in groupby(enumerate(sorted(numeric_ids)), key=lambda x: x[1] - x[0]):
+        consecutive_ids = [item for _, item in group]
+        if len(consecutive_ids) >= min_range_length:
+            ranges.append((consecutive_ids[0], consecutive_ids[-1]))
+        else:
+            loose_ids.extend(numeric_ids[item] for item in consecutive_ids)
+
+    return ranges, loose_ids
+
+
 class AbstractDatabaseBackend:
     """
     This class describes an abstract database backend that executes database queries.
@@ -1306,13 +1449,16 @@ class AbstractDatabaseBackend:
     def execute(self, query, request, count=False):
         raise NotImplementedError
 
+    def execute_keyset(self, query, request):
+        raise NotImplementedError
+
 
 class FortishieldDBBackend(AbstractDatabaseBackend):
     """
     This class describes a fortishield db backend that executes database queries.
     """
 
-    def __init__(self, agent_id=None, query_format='agent', request_slice=500):
+    def __init__(self, agent_id=None, query_format='agent', request_slice=500, connection=None):
         if query_format == 'agent' and not path.exists(path.join(common.WDB_PATH, f"{agent_id}.db")):
             raise FortishieldError(2007, extra_message=f"There is no database for agent {agent_id}. "
                                                  "Please check if the agent has connected to the manager")
@@ -1320,39 +1466,24 @@ class FortishieldDBBackend(AbstractDatabaseBackend):
         self.agent_id = agent_id
         self.query_format = query_format
         self.request_slice = request_slice
+        # Connection shared with other backends. It is closed by its owner instead of by this backend
+        self.shared_connection = connection
 
         super().__init__()
 
     def connect_to_db(self):
-        return FortishieldDBConnection(request_slice=self.request_slice)
+        return self.shared_connection or FortishieldDBConnection(request_slice=self.request_slice)
 
     def close_connection(self):
-        self.conn.close()
+        if self.shared_connection is None:
+            self.conn.close()
 
     def _substitute_params(self, query, request):
         """
         Substitute request parameters in query. This is only necessary when the backend is fdb. Sqlite substitutes
         parameters by itself.
         """
-        for k, v in request.items():
-            if isinstance(v, list):
-                values = list()
-                for element in v:
-                    if isinstance(element, (int, float)) or (isinstance(element, str) and element.isnumeric()):
-                        values.append(element)
-                    else:
-                        values.append(f"'{element}'")
-                value = f"{','.join(values)}"
-            elif isinstance(v, (int, float)):
-                value = f"{v}"
-            elif isinstance(v, str):
-                value = f"'{v}'"
-            else:
-                raise TypeError(f'Invalid type for request parameters: {type(v)}')
-            # Escape backslash to avoid re error
-            value = value.replace('\\', '\\\\')
-            query = re.sub(r':\b' + re.escape(str(k)) + r'\b', value, query)
-        return query
+        return substitute_query_params(query, request)
 
     def _render_query(self, query):
         """Render query attending the format."""
@@ -1366,9 +1497,26 @@ class FortishieldDBBackend(AbstractDatabaseBackend):
             return f'agent {self.agent_id} sql {query}'
 
     def execute(self, query, request, count=False):
-        """Execute SQL query through FortishieldDB socket."""
+        """Execute SQL query through FortishieldDB socket. The query template and the request parameters are sent
+        separately, so the connection only validates each template once."""
+        return self.conn.execute(query=self._render_query(query), count=count, params=request)
+
+    def execute_keyset(self, query, request):
+        """Execute SQL query through FortishieldDB socket in chunks paginated by row ID, yielding the rows of each chunk.
+        The query must select the row ID as `keyset_id`."""
+        return self.conn.execute_keyset(query=self._render_query(query), params=request)
+
+    def execute_single(self, query, request):
+        """Execute SQL query through FortishieldDB socket in a single request, without counting nor paginating the
+        results. It must only be used with queries whose result is known to be small, like aggregations.
+
+        Raises
+        ------
+        FortishieldInternalError(2009)
+            The response from fortishield-db was over the maximum socket buffer size.
+        """
         query = self._substitute_params(query, request)
-        return self.conn.execute(query=self._render_query(query), count=count)
+        return self.conn.send(self._render_query(query), raw=False)
 
 
 class FortishieldDBQuery(object):
@@ -1628,8 +1776,18 @@ class FortishieldDBQuery(object):
             # If it matches the same format as DB (timestamp integer), filter directly by value (next if cond).
             self._filter_date(q_filter, field_name)
         elif 'rbac' in field_name:
-            self.query += f"{field_name.lstrip('rbac_')} {q_filter['operator']} (:{field_filter})"
-            self.request[field_filter] = q_filter['value']
+            field = field_name.lstrip('rbac_')
+            # Only the agent IDs are integers, any other RBAC field (such as the group names) is compared as text
+            id_ranges, loose_ids = get_id_ranges(q_filter['value']) if field_name == 'rbac_id' \
+                else ([], q_filter['value'])
+            if id_ranges:
+                # Consecutive IDs are filtered with ranges to keep the query short
+                ranges_filter = ' OR '.join(f"{field} BETWEEN {first} AND {last}" for first, last in id_ranges)
+                self.query += f"{'NOT ' if q_filter['operator'] == 'NOT IN' else ''}" \
+                              f"({ranges_filter} OR {field} IN (:{field_filter}))"
+            else:
+                self.query += f"{field} {q_filter['operator']} (:{field_filter})"
+            self.request[field_filter] = loose_ids
         else:
             if q_filter['value'] is not None:
                 self.request[field_filter] = q_filter['value'] if field_name != "version" else re.sub(
@@ -1730,6 +1888,28 @@ class FortishieldDBQuery(object):
             self._execute_data_query()
             return self._format_data_into_dictionary()
 
+    def stream(self) -> typing.Iterator[list]:
+        """Build the query and run it in chunks paginated by row ID instead of by offset, yielding the formatted items
+        of each chunk.
+
+        The total number of items is not counted and the sort, offset and limit parameters are not used, so the cost
+        of each chunk and the memory used do not depend on the number of items. It is only valid for queries to a
+        single table without distinct.
+
+        Yields
+        ------
+        list
+            Formatted items of each chunk.
+        """
+        self._add_select_to_query()
+        self._add_filters_to_query()
+        self._add_search_to_query()
+        query_with_select_fields = self.query.format(','.join(
+            ['rowid as keyset_id'] + [f"{self.fields[x]} as '{x}'" for x in set(self.select) | self.min_select_fields]))
+
+        for self._data in self.backend.execute_keyset(query_with_select_fields, self.request):
+            yield self._format_data_into_dictionary()['items']
+
     def oversized_run(self) -> dict:
         """Method used when the size of the query exceeds the maximum available in the communication.
         Builds the query and runs it on the database.
@@ -1804,8 +1984,12 @@ class FortishieldDBQuery(object):
         if self.legacy_filters is None:
             return self.general_run()
 
-        rbac_ids = set(self.legacy_filters.get('rbac_ids', set()))
-        return self.general_run() if len(','.join(rbac_ids)) < common.MAX_QUERY_FILTERS_RESERVED_SIZE else \
+        # Consecutive agent IDs are sent as ranges, which take at most ~40 characters each
+        rbac_ids = self.legacy_filters.get('rbac_ids', set())
+        id_ranges, loose_ids = get_id_ranges(rbac_ids) if self.__class__.__name__ == 'FortishieldDBQueryAgents' \
+            else ([], rbac_ids)
+        filters_size = len(','.join(map(str, loose_ids))) + len(id_ranges) * 40
+        return self.general_run() if filters_size < common.MAX_QUERY_FILTERS_RESERVED_SIZE else \
             self.oversized_run()
 
     def reset(self):
@@ -1866,14 +2050,36 @@ class FortishieldDBQueryGroupBy(FortishieldDBQuery):
         FortishieldDBQuery.__init__(self, *args, **kwargs)
         self.filter_fields = filter_fields
 
-    def _get_total_items(self):
-        # take total items without grouping, and add the group by clause just after getting total items
-        FortishieldDBQuery._get_total_items(self)
+    def _add_group_by_to_query(self):
         self.select.add('count')
         self.inverse_fields['COUNT(*)'] = 'count'
         self.fields['count'] = 'COUNT(*)'
         self.query += ' GROUP BY ' + ','.join(map(lambda x: self.fields[x], self.filter_fields['fields']))
 
+    def _get_total_items(self):
+        # take total items without grouping, and add the group by clause just after getting total items
+        FortishieldDBQuery._get_total_items(self)
+        self._add_group_by_to_query()
+
+    def get_aggregation_query(self) -> str:
+        """Build the query counting the items of each group, with the filters, the search and the RBAC restrictions
+        applied, without running it. Sort, offset and limit are ignored since every group is returned.
+
+        The request parameters of the query are stored in `self.request` and the rows obtained with it can be
+        formatted by assigning them to `self._data` and calling `_format_data_into_dictionary`.
+
+        Returns
+        -------
+        str
+            Aggregation query.
+        """
+        self._add_select_to_query()
+        self._add_filters_to_query()
+        self._add_search_to_query()
+        self._add_group_by_to_query()
+        return self.query.format(','.join(map(lambda x: f"{self.fields[x]} as '{x}'",
+                                              self.select | self.min_select_fields)))
+
     def _add_select_to_query(self):
         FortishieldDBQuery._add_select_to_query(self)
         self.filter_fields = self._parse_select_filter(self.filter_fields)
@@ -1885,12 +2091,12 @@ class FortishieldDBQueryGroupBy(FortishieldDBQuery):
 
 
 @common.context_cached('system_rules')
-def expand_rules() -> set:
+def expand_rules() -> frozenset:
     """Return all ruleset rule files in the system.
 
     Returns
     -------
-    set
+    frozenset
         Rule files.
     """
     folders = [common.RULES_PATH, common.USER_RULES_PATH]
@@ -1900,16 +2106,16 @@ def expand_rules() -> set:
             for f in filter(lambda x: x.endswith(common.RULES_EXTENSION), files):
                 rules.add(f)
 
-    return rules
+    return frozenset(rules)
 
 
 @common.context_cached('system_decoders')
-def expand_decoders() -> set:
+def expand_decoders() -> frozenset:
     """Return all ruleset decoder files in the system.
 
     Returns
     -------
-    set
+    frozenset
         Decoder files.
     """
     folders = [common.DECODERS_PATH, common.USER_DECODERS_PATH]
@@ -1919,16 +2125,16 @@ def expand_decoders() -> set:
             for f in filter(lambda x: x.endswith(common.DECODERS_EXTENSION), files):
                 decoders.add(f)
 
-    return decoders
+    return frozenset(decoders)
 
 
 @common.context_cached('system_lists')
-def expand_lists() -> set:
+def expand_lists() -> frozenset:
     """Return all cdb list files in the system.
 
     Returns
     -------
-    set
+    frozenset
         CDB list files.
     """
     folders = [common.LISTS_PATH, common.USER_LISTS_PATH]
@@ -1940,7 +2146,7 @@ def expand_lists() -> set:
                 if '.' not in f:
                     lists.add(f)
 
-    return lists
+    return frozenset(lists)
 
 
 def add_dynamic_detail(detail: str, value: str, attribs: dict, details: dict):
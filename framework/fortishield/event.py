@@ -3,7 +3,6 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 from fortishield.core.common import QUEUE_SOCKET
-from fortishield.core.exception import FortishieldError
 from fortishield.core.results import FortishieldResult, AffectedItemsFortishieldResult
 from fortishield.core.fortishield_queue import FortishieldAnalysisdQueue
 from fortishield.rbac.decorators import expose_resources
@@ -12,13 +11,16 @@ MSG_HEADER = '1:API-Webhook:'
 
 
 @expose_resources(actions=["event:ingest"], resources=["*:*:*"], post_proc_func=None)
-def send_event_to_analysisd(events: list) -> FortishieldResult:
+def send_event_to_analysisd(events: list, echo_events: bool = True) -> FortishieldResult:
     """Send events to analysisd through the socket.
 
     Parameters
     ----------
     events : list
         List of events to send.
+    echo_events : bool
+        Whether to include the events in the result. If False, the affected items are only counted and the failed
+        items are identified by their position in `events`.
 
     Returns
     -------
@@ -32,12 +34,12 @@ def send_event_to_analysisd(events: list) -> FortishieldResult:
     )
 
     with FortishieldAnalysisdQueue(QUEUE_SOCKET) as queue:
-        for event in events:
-            try:
-                queue.send_msg(msg_header=MSG_HEADER, msg=event)
-                result.affected_items.append(event)
-            except FortishieldError as error:
-                result.add_failed_item(event, error=error)
-
-    result.total_affected_items = len(result.affected_items)
+        failed_events = queue.send_msgs(msg_header=MSG_HEADER, msgs=events)
+
+    for index, error in failed_events.items():
+        result.add_failed_item(events[index] if echo_events else index, error=error)
+    if echo_events:
+        result.affected_items = [event for index, event in enumerate(events) if index not in failed_events]
+
+    result.total_affected_items = len(events) - len(failed_events)
     return result
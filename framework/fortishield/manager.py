@@ -2,13 +2,14 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+from functools import partial
 from os import remove
 from os.path import exists
 
 from fortishield import Fortishield
 from fortishield.core import common, configuration
-from fortishield.core.cluster.cluster import get_node
-from fortishield.core.cluster.utils import manager_restart, read_cluster_config
+from fortishield.core.cluster.cluster import get_node_id, get_node_rbac_actions, get_node_rbac_resources
+from fortishield.core.cluster.utils import manager_restart
 from fortishield.core.configuration import get_ossec_conf, write_ossec_conf
 from fortishield.core.exception import FortishieldError, FortishieldInternalError
 from fortishield.core.manager import status, get_api_conf, get_update_information_template, get_ossec_logs, \
@@ -17,12 +18,9 @@ from fortishield.core.results import AffectedItemsFortishieldResult, Fortishield
 from fortishield.core.utils import process_array, safe_move, validate_fortishield_xml, full_copy
 from fortishield.rbac.decorators import expose_resources
 
-cluster_enabled = not read_cluster_config(from_import=True)['disabled']
-node_id = get_node().get('node') if cluster_enabled else 'manager'
 
-
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def get_status() -> AffectedItemsFortishieldResult:
     """Wrapper for status().
 
@@ -31,6 +29,7 @@ def get_status() -> AffectedItemsFortishieldResult:
     AffectedItemsFortishieldResult
         Affected items.
     """
+    node_id = get_node_id('manager')
     result = AffectedItemsFortishieldResult(all_msg=f"Processes status was successfully read"
                                               f"{' in specified node' if node_id != 'manager' else ''}",
                                       some_msg='Could not read basic information in some nodes',
@@ -44,8 +43,8 @@ def get_status() -> AffectedItemsFortishieldResult:
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def ossec_log(level: str = None, tag: str = None, offset: int = 0, limit: int = common.DATABASE_LIMIT,
               sort_by: dict = None, sort_ascending: bool = True, search_text: str = None,
               complementary_search: bool = False, search_in_fields: list = None,
@@ -84,6 +83,7 @@ def ossec_log(level: str = None, tag: str = None, offset: int = 0, limit: int =
     AffectedItemsFortishieldResult
         Affected items.
     """
+    node_id = get_node_id('manager')
     result = AffectedItemsFortishieldResult(all_msg=f"Logs were successfully read"
                                               f"{' in specified node' if node_id != 'manager' else ''}",
                                       some_msg='Could not read logs in some nodes',
@@ -108,8 +108,8 @@ def ossec_log(level: str = None, tag: str = None, offset: int = 0, limit: int =
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def ossec_log_summary() -> AffectedItemsFortishieldResult:
     """Summary of ossec.log.
 
@@ -118,6 +118,7 @@ def ossec_log_summary() -> AffectedItemsFortishieldResult:
     AffectedItemsFortishieldResult
         Affected items.
     """
+    node_id = get_node_id('manager')
     result = AffectedItemsFortishieldResult(all_msg=f"Log was successfully summarized"
                                               f"{' in specified node' if node_id != 'manager' else ''}",
                                       some_msg='Could not summarize the log in some nodes',
@@ -135,17 +136,27 @@ def ossec_log_summary() -> AffectedItemsFortishieldResult:
     return result
 
 
-_get_config_default_result_kwargs = {
-    'all_msg': f"API configuration was successfully read{' in all specified nodes' if node_id != 'manager' else ''}",
-    'some_msg': 'Not all API configurations could be read',
-    'none_msg': f"Could not read API configuration{' in any node' if node_id != 'manager' else ''}",
-    'sort_casting': ['str']
-}
-
+def _get_config_default_result_kwargs() -> dict:
+    """Get the default result messages of reading the API configuration in the current node.
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read_api_config"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'],
-                  post_proc_kwargs={'default_result_kwargs': _get_config_default_result_kwargs})
+    Returns
+    -------
+    dict
+        Keyword arguments for AffectedItemsFortishieldResult.
+    """
+    node_id = get_node_id('manager')
+    return {
+        'all_msg': f"API configuration was successfully read"
+                   f"{' in all specified nodes' if node_id != 'manager' else ''}",
+        'some_msg': 'Not all API configurations could be read',
+        'none_msg': f"Could not read API configuration{' in any node' if node_id != 'manager' else ''}",
+        'sort_casting': ['str']
+    }
+
+
+@expose_resources(actions=partial(get_node_rbac_actions, 'read_api_config'),
+                  resources=get_node_rbac_resources,
+                  post_proc_kwargs=lambda: {'default_result_kwargs': _get_config_default_result_kwargs()})
 def get_api_config() -> AffectedItemsFortishieldResult:
     """Return current API configuration.
 
@@ -154,7 +165,8 @@ def get_api_config() -> AffectedItemsFortishieldResult:
     AffectedItemsFortishieldResult
         Current API configuration of the manager.
     """
-    result = AffectedItemsFortishieldResult(**_get_config_default_result_kwargs)
+    node_id = get_node_id('manager')
+    result = AffectedItemsFortishieldResult(**_get_config_default_result_kwargs())
 
     try:
         api_config = {'node_name': node_id,
@@ -167,27 +179,47 @@ def get_api_config() -> AffectedItemsFortishieldResult:
     return result
 
 
-_update_config_default_result_kwargs = {
-    'all_msg': f"API configuration was successfully updated{' in all specified nodes' if node_id != 'manager' else ''}. "
-               f"Settings require restarting the API to be applied.",
-    'some_msg': 'Not all API configuration could be updated.',
-    'none_msg': f"API configuration could not be updated{' in any node' if node_id != 'manager' else ''}.",
-    'sort_casting': ['str']
-}
+def _update_config_default_result_kwargs() -> dict:
+    """Get the default result messages of updating the API configuration in the current node.
+
+    Returns
+    -------
+    dict
+        Keyword arguments for AffectedItemsFortishieldResult.
+    """
+    node_id = get_node_id('manager')
+    return {
+        'all_msg': f"API configuration was successfully updated"
+                   f"{' in all specified nodes' if node_id != 'manager' else ''}. "
+                   f"Settings require restarting the API to be applied.",
+        'some_msg': 'Not all API configuration could be updated.',
+        'none_msg': f"API configuration could not be updated{' in any node' if node_id != 'manager' else ''}.",
+        'sort_casting': ['str']
+    }
 
-_restart_default_result_kwargs = {
-    'all_msg': f"Restart request sent to {' all specified nodes' if node_id != ' manager' else ''}",
-    'some_msg': "Could not send restart request to some specified nodes",
-    'none_msg': "Could not send restart request to any node",
-    'sort_casting': ['str']
-}
 
+def _restart_default_result_kwargs() -> dict:
+    """Get the default result messages of restarting the manager in the current node.
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:restart"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'],
-                  post_proc_kwargs={'default_result_kwargs': _restart_default_result_kwargs})
+    Returns
+    -------
+    dict
+        Keyword arguments for AffectedItemsFortishieldResult.
+    """
+    node_id = get_node_id('manager')
+    return {
+        'all_msg': f"Restart request sent to {' all specified nodes' if node_id != ' manager' else ''}",
+        'some_msg': "Could not send restart request to some specified nodes",
+        'none_msg': "Could not send restart request to any node",
+        'sort_casting': ['str']
+    }
+
+
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
+@expose_resources(actions=partial(get_node_rbac_actions, 'restart'),
+                  resources=get_node_rbac_resources,
+                  post_proc_kwargs=lambda: {'default_result_kwargs': _restart_default_result_kwargs()})
 def restart() -> AffectedItemsFortishieldResult:
     """Wrapper for 'restart_manager' function due to interdependence with cluster module and permission access.
 
@@ -196,7 +228,8 @@ def restart() -> AffectedItemsFortishieldResult:
     AffectedItemsFortishieldResult
         Affected items.
     """
-    result = AffectedItemsFortishieldResult(**_restart_default_result_kwargs)
+    node_id = get_node_id('manager')
+    result = AffectedItemsFortishieldResult(**_restart_default_result_kwargs())
     try:
         manager_restart()
         result.affected_items.append(node_id)
@@ -207,18 +240,27 @@ def restart() -> AffectedItemsFortishieldResult:
     return result
 
 
-_validation_default_result_kwargs = {
-    'all_msg': f"Validation was successfully checked{' in all nodes' if node_id != 'manager' else ''}",
-    'some_msg': 'Could not check validation in some nodes',
-    'none_msg': f"Could not check validation{' in any node' if node_id != 'manager' else ''}",
-    'sort_fields': ['name'],
-    'sort_casting': ['str'],
-}
+def _validation_default_result_kwargs() -> dict:
+    """Get the default result messages of validating the configuration in the current node.
 
-
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'],
-                  post_proc_kwargs={'default_result_kwargs': _validation_default_result_kwargs})
+    Returns
+    -------
+    dict
+        Keyword arguments for AffectedItemsFortishieldResult.
+    """
+    node_id = get_node_id('manager')
+    return {
+        'all_msg': f"Validation was successfully checked{' in all nodes' if node_id != 'manager' else ''}",
+        'some_msg': 'Could not check validation in some nodes',
+        'none_msg': f"Could not check validation{' in any node' if node_id != 'manager' else ''}",
+        'sort_fields': ['name'],
+        'sort_casting': ['str'],
+    }
+
+
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources,
+                  post_proc_kwargs=lambda: {'default_result_kwargs': _validation_default_result_kwargs()})
 def validation() -> AffectedItemsFortishieldResult:
     """Check if Fortishield configuration is OK.
 
@@ -227,7 +269,8 @@ def validation() -> AffectedItemsFortishieldResult:
     AffectedItemsFortishieldResult
         Affected items.
     """
-    result = AffectedItemsFortishieldResult(**_validation_default_result_kwargs)
+    node_id = get_node_id('manager')
+    result = AffectedItemsFortishieldResult(**_validation_default_result_kwargs())
 
     try:
         response = validate_ossec_conf()
@@ -239,8 +282,8 @@ def validation() -> AffectedItemsFortishieldResult:
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def get_config(component: str = None, config: str = None) -> AffectedItemsFortishieldResult:
     """Wrapper for get_active_configuration.
 
@@ -257,6 +300,7 @@ def get_config(component: str = None, config: str = None) -> AffectedItemsFortis
     AffectedItemsFortishieldResult
         Affected items.
     """
+    node_id = get_node_id('manager')
     result = AffectedItemsFortishieldResult(all_msg=f"Active configuration was successfully read"
                                               f"{' in specified node' if node_id != 'manager' else ''}",
                                       some_msg='Could not read active configuration in some nodes',
@@ -274,8 +318,8 @@ def get_config(component: str = None, config: str = None) -> AffectedItemsFortis
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def read_ossec_conf(section: str = None, field: str = None, raw: bool = False,
                     distinct: bool = False) -> AffectedItemsFortishieldResult:
     """Wrapper for get_ossec_conf.
@@ -296,6 +340,7 @@ def read_ossec_conf(section: str = None, field: str = None, raw: bool = False,
     AffectedItemsFortishieldResult
         Affected items.
     """
+    node_id = get_node_id('manager')
     result = AffectedItemsFortishieldResult(all_msg=f"Configuration was successfully read"
                                               f"{' in specified node' if node_id != 'manager' else ''}",
                                       some_msg='Could not read configuration in some nodes',
@@ -315,8 +360,8 @@ def read_ossec_conf(section: str = None, field: str = None, raw: bool = False,
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def get_basic_info() -> AffectedItemsFortishieldResult:
     """Wrapper for Fortishield().to_dict
 
@@ -325,6 +370,7 @@ def get_basic_info() -> AffectedItemsFortishieldResult:
     AffectedItemsFortishieldResult
         Affected items.
     """
+    node_id = get_node_id('manager')
     result = AffectedItemsFortishieldResult(all_msg=f"Basic information was successfully read"
                                               f"{' in specified node' if node_id != 'manager' else ''}",
                                       some_msg='Could not read basic information in some nodes',
@@ -341,8 +387,8 @@ def get_basic_info() -> AffectedItemsFortishieldResult:
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:update_config"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'update_config'),
+                  resources=get_node_rbac_resources)
 def update_ossec_conf(new_conf: str = None) -> AffectedItemsFortishieldResult:
     """Replace fortishield configuration (ossec.conf) with the provided configuration.
 
@@ -356,6 +402,7 @@ def update_ossec_conf(new_conf: str = None) -> AffectedItemsFortishieldResult:
     AffectedItemsFortishieldResult
         Affected items.
     """
+    node_id = get_node_id('manager')
     result = AffectedItemsFortishieldResult(all_msg=f"Configuration was successfully updated"
                                               f"{' in specified node' if node_id != 'manager' else ''}",
                                       some_msg='Could not update configuration in some nodes',
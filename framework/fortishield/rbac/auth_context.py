@@ -8,6 +8,7 @@ from collections import defaultdict
 from typing import Union
 
 from fortishield.rbac import orm
+from fortishield.rbac.utils import rules_cache
 
 
 class RBAChecker:
@@ -33,6 +34,11 @@ class RBAChecker:
     _functions = ['MATCH', 'MATCH$', 'FIND', 'FIND$']
     _initial_index_for_regex = 2
     _regex_prefix = "r'"
+    # Kinds of compiled nodes
+    _operation_node = 0
+    _function_node = 1
+    _dict_chunk = 0
+    _leaf_chunk = 1
 
     # If we don't pass it the role to check, it will take all of the system.
     def __init__(self, auth_context: Union[dict, str] = None, role: Union[list, orm.Roles] = None, user_id: int = None):
@@ -54,24 +60,26 @@ class RBAChecker:
             self.authorization_context = json.loads(auth_context)
         except TypeError:
             self.authorization_context = auth_context
-
-        if role is None:
-            # All system's roles
-            with orm.RolesManager() as rm:
-                roles_list = list(map(orm.Roles.to_dict, rm.get_roles()))
-        else:
-            roles_list = [role] if not isinstance(role, list) else role
-
-        with orm.RolesManager() as rm:
-            with orm.RulesManager() as rum:
-                processed_roles_list = list()
-                for role in roles_list:
-                    rules = list()
-                    for rule in rm.get_role_id(role_id=role['id'])['rules']:
-                        rules.append(rum.get_rule(rule))
-                    if len(rules) > 0:
-                        processed_roles_list.append(role)
-                        processed_roles_list[-1]['rules'] = rules
+        # Nodes of the authorization context visited by FIND and FIND$, computed the first time they are needed
+        self._find_nodes = None
+        self._sorted_lists = dict()
+
+        with orm.RolesRulesManager() as rrm:
+            if role is None:
+                # All system's roles
+                with orm.RolesManager() as rm:
+                    roles_list = [{'id': role.id, 'name': role.name} for role in rm.get_roles()]
+                roles_rules = rrm.get_rules_from_roles()
+            else:
+                roles_list = [role] if not isinstance(role, list) else role
+                roles_rules = rrm.get_rules_from_roles(role_ids=[role['id'] for role in roles_list])
+
+        processed_roles_list = list()
+        for role in roles_list:
+            rules = (roles_rules or {}).get(role['id'])
+            if rules:
+                processed_roles_list.append(role)
+                processed_roles_list[-1]['rules'] = rules
 
         self.roles_list = processed_roles_list
 
@@ -95,26 +103,153 @@ class RBAChecker:
         """
         return self.roles_list
 
-    @staticmethod
-    def preprocess_to_list(role_chunk: list, auth_chunk: list) -> tuple:
-        """Assign the correct type to authorization context and role chunks.
+    @classmethod
+    def check_regex(cls, expression: str) -> Union[re.Pattern, bool]:
+        """Check if a certain string is a regular expression.
 
         Parameters
         ----------
-        role_chunk : list
-            Role chunk.
-        auth_chunk : list
-            Authorization context chunk.
+        expression : str
+            Regular expression to be checked.
+
+        Returns
+        -------
+        re.Pattern or bool
+            Compiled regex if a valid regex is provided else return False.
+        """
+        if isinstance(expression, str):
+            if not expression.startswith(cls._regex_prefix):
+                return False
+            try:
+                regex = ''.join(expression[cls._initial_index_for_regex:-2])
+                regex = re.compile(regex)
+                return regex
+            except:
+                return False
+        return False
+
+    @classmethod
+    def compile_chunk(cls, role_chunk: Union[list, dict, str]) -> tuple:
+        """Compile a chunk of a MATCH/FIND function, so it can be evaluated without parsing it again.
+
+        Dictionaries are compiled into `(_dict_chunk, [(key, key regex, compiled value), ...], number of keys)` and any
+        other value into `(_leaf_chunk, value, value regex, [(element, element regex), ...] or None)`. Lists are
+        sorted and every regular expression is compiled beforehand.
+
+        Parameters
+        ----------
+        role_chunk : list, dict or str
+            Chunk of one stored rule.
 
         Returns
         -------
         tuple
-            List with role_chunk and auth_chunk processed.
+            Compiled chunk.
+        """
+        if isinstance(role_chunk, dict):
+            return (cls._dict_chunk,
+                    [(key, cls.check_regex(key), cls.compile_chunk(value)) for key, value in role_chunk.items()],
+                    len(role_chunk))
+
+        if isinstance(role_chunk, list):
+            try:
+                role_chunk = sorted(role_chunk)
+            except TypeError:
+                pass
+            elements = [(element, cls.check_regex(element)) for element in role_chunk]
+        elif isinstance(role_chunk, str):
+            elements = [(role_chunk, cls.check_regex(role_chunk))]
+        else:
+            elements = None
+
+        return cls._leaf_chunk, role_chunk, cls.check_regex(role_chunk), elements
+
+    @classmethod
+    def compile_rule(cls, rule: dict) -> Union[list, None]:
+        """Compile a rule into a tree of logical operations and functions.
+
+        Parameters
+        ----------
+        rule : dict
+            Rule to be compiled.
+
+        Returns
+        -------
+        list or None
+            List of compiled operations and functions of the rule, evaluated in order. None if the rule is not valid.
+        """
+        if not isinstance(rule, dict):
+            return None
+
+        compiled_rule = list()
+        for rule_key, rule_value in rule.items():
+            if rule_key in cls._logical_operators:
+                if isinstance(rule_value, list):
+                    children = [cls.compile_rule(element) for element in rule_value]
+                elif isinstance(rule_value, dict):
+                    children = [cls.compile_rule(rule_value)]
+                else:
+                    children = list()
+                length = len(rule_value) if isinstance(rule_value, (list, dict, str)) else 0
+                compiled_rule.append((cls._operation_node, rule_key, children, length))
+            elif rule_key in cls._functions:
+                # FIND -> MATCH | FIND$ -> MATCH$
+                find = rule_key in cls._functions[2:]
+                mode = cls._functions[cls._functions.index(rule_key) - 2] if find else rule_key
+                compiled_rule.append((cls._function_node, find, mode, cls.compile_chunk(rule_value)))
+
+        return compiled_rule
+
+    def get_sorted_list(self, auth_chunk: list) -> list:
+        """Return the sorted version of a list of the authorization context. Each list is only sorted once.
+
+        Parameters
+        ----------
+        auth_chunk : list
+            List inside the authorization context.
+
+        Returns
+        -------
+        list
+            Sorted list or the original one if its elements can not be sorted.
         """
-        role_chunk = sorted(role_chunk) if isinstance(role_chunk, list) else role_chunk
-        auth_chunk = sorted(auth_chunk) if isinstance(auth_chunk, list) else auth_chunk
+        try:
+            return self._sorted_lists[id(auth_chunk)]
+        except KeyError:
+            try:
+                sorted_list = sorted(auth_chunk)
+            except TypeError:
+                sorted_list = auth_chunk
+            self._sorted_lists[id(auth_chunk)] = sorted_list
+            return sorted_list
+
+    def get_find_nodes(self) -> list:
+        """Return every node of the authorization context where FIND and FIND$ look for a match.
 
-        return role_chunk, auth_chunk
+        Those are the authorization context itself, the values of its dictionaries and the dictionaries inside its
+        lists, at any level.
+
+        Returns
+        -------
+        list
+            Flattened authorization context nodes.
+        """
+        if self._find_nodes is None:
+            nodes = [self.authorization_context]
+            pending = [self.authorization_context] if isinstance(self.authorization_context, dict) else []
+            while pending:
+                for value in pending.pop().values():
+                    nodes.append(value)
+                    if isinstance(value, dict):
+                        pending.append(value)
+                    elif isinstance(value, list):
+                        for element in value:
+                            if isinstance(element, dict):
+                                nodes.append(element)
+                                pending.append(element)
+            self._find_nodes = nodes
+
+        return self._find_nodes
 
     def process_lists(self, role_chunk: list, auth_context: list, mode: str) -> int:
         """Process lists of role chunks and authorization context chunks
@@ -122,7 +257,7 @@ class RBAChecker:
         Parameters
         ----------
         role_chunk : list
-            List inside the role.
+            Compiled elements of the list inside the role, as `(element, element regex)` pairs.
         auth_context : list
             List inside the auth_context.
         mode : str
@@ -134,57 +269,36 @@ class RBAChecker:
             1 or 0, 1 if the function is evaluated as True else return False.
         """
         counter = 0
-        for index, value in enumerate(auth_context):
-            for v in role_chunk:
-                regex = self.check_regex(v)
+        role_length = len(role_chunk)
+        auth_length = len(auth_context)
+        for value in auth_context:
+            for v, regex in role_chunk:
                 if regex:
-                    if regex.match(value):
+                    if isinstance(value, str) and regex.match(value):
                         counter += 1
                 else:
                     if value == v:
                         counter += 1
                 if mode == self._functions[0]:  # MATCH
-                    if counter == len(role_chunk):
+                    if counter == role_length:
                         return 1
                 elif mode == self._functions[1]:  # MATCH$
-                    if counter == len(auth_context) and counter == len(role_chunk):
+                    if counter == auth_length and counter == role_length:
                         return 1
 
         return 0
 
-    def set_mode(self, mode: str, role_id: int = None) -> str:
-        """Link the FIND/FIND$ modes with their respective functions (MATCH/MATCH$).
-
-        Parameters
-        ----------
-        mode : str
-            FIND/FIND$.
-        role_id : int
-            Actual role id to be checked.
-
-        Returns
-        -------
-        str
-            mode: FIND -> MATCH | FIND$ -> MATCH$.
-        """
-        if mode == self._functions[2]:  # FIND
-            mode = self._functions[0]  # MATCH
-        elif mode == self._functions[3]:  # FIND$
-            mode = self._functions[1]  # MATCH$
-
-        return mode
-
-    def check_logic_operation(self, rule_key: str, rule_value: dict, validator_counter: int) -> Union[bool, None]:
-        """Evaluate a specified logic operation role-auth_context.
+    def check_logic_operation(self, rule_key: str, rule_value: list, length: int) -> Union[bool, None]:
+        """Evaluate a specified logic operation role-auth_context, stopping as soon as its result is known.
 
         Parameters
         ----------
         rule_key : str
             Possible logic operation.
-        rule_value : dict
-            Clause to be evaluated.
-        validator_counter : int
-            Number of successes within the logical operation.
+        rule_value : list
+            Compiled clauses to be evaluated.
+        length : int
+            Number of successes required by the logical operation.
 
         Returns
         -------
@@ -193,50 +307,35 @@ class RBAChecker:
             Breach, Currently, if this is the case and the unknown role is invalid, it will not cause any problems to
             the system, it will be ignored.
         """
+        if length == len(rule_value):
+            if rule_key == self._logical_operators[0]:  # AND
+                return True if all(map(self.check_rule, rule_value)) else None
+            elif rule_key == self._logical_operators[1]:  # OR
+                return True if any(map(self.check_rule, rule_value)) else None
+            elif rule_key == self._logical_operators[2]:  # NOT
+                return not all(map(self.check_rule, rule_value))
+
+        validator_counter = sum(1 for element in rule_value if self.check_rule(element))
         if rule_key == self._logical_operators[0]:  # AND
-            if validator_counter == len(rule_value):
+            if validator_counter == length:
                 return True
         elif rule_key == self._logical_operators[1]:  # OR
             if validator_counter > 0:
                 return True
         elif rule_key == self._logical_operators[2]:  # NOT
-            return False if validator_counter == len(rule_value) else True
+            return False if validator_counter == length else True
 
         return None
 
-    def check_regex(self, expression: str) -> Union[re.Pattern, bool]:
-        """Check if a certain string is a regular expression.
-
-        Parameters
-        ----------
-        expression : str
-            Regular expression to be checked.
-
-        Returns
-        -------
-        re.Pattern or bool
-            Compiled regex if a valid regex is provided else return False.
-        """
-        if isinstance(expression, str):
-            if not expression.startswith(self._regex_prefix):
-                return False
-            try:
-                regex = ''.join(expression[self._initial_index_for_regex:-2])
-                regex = re.compile(regex)
-                return regex
-            except:
-                return False
-        return False
-
-    def match_item(self, role_chunk: Union[list, dict], auth_context: Union[list, dict] = None,
+    def match_item(self, role_chunk: tuple, auth_context: Union[list, dict] = None,
                    mode: str = 'MATCH') -> Union[int, bool]:
         """This function will go through all authorization contexts and system roles recursively until it finds the
         structure indicated in role_chunk.
 
         Parameters
         ----------
-        role_chunk : list or dict
-            Chunk of one stored role in the class.
+        role_chunk : tuple
+            Compiled chunk of one stored role in the class.
         auth_context : list or dict
             Received authorization context.
         mode : str
@@ -248,115 +347,81 @@ class RBAChecker:
             True or 1 if match else False or 0.
         """
         auth_context = self.authorization_context if auth_context is None else auth_context
-        validator_counter = 0
-        # We're not in the deep end yet.
-        if isinstance(role_chunk, dict) and isinstance(auth_context, dict):
-            for key_rule, value_rule in role_chunk.items():
-                regex = self.check_regex(key_rule)
-                if regex:
+        if role_chunk[0] == self._dict_chunk:
+            _, items, length = role_chunk
+            if not isinstance(auth_context, dict):
+                return length == 0
+
+            validator_counter = 0
+            for key_rule, key_regex, value_rule in items:
+                if key_regex:
                     for key_auth in auth_context.keys():
-                        if regex.match(key_auth):
-                            validator_counter += self.match_item(role_chunk[key_rule], auth_context[key_auth], mode)
-                if key_rule in auth_context.keys():
-                    validator_counter += self.match_item(role_chunk[key_rule], auth_context[key_rule], mode)
+                        if key_regex.match(key_auth):
+                            validator_counter += self.match_item(value_rule, auth_context[key_auth], mode)
+                if key_rule in auth_context:
+                    validator_counter += self.match_item(value_rule, auth_context[key_rule], mode)
+
+            return validator_counter == length
+
         # It's a possible end
-        else:
-            role_chunk, auth_context = self.preprocess_to_list(role_chunk, auth_context)
-            regex = self.check_regex(role_chunk)
-            if regex:
-                if not isinstance(auth_context, list):
-                    auth_context = [auth_context]
-                for context in auth_context:
-                    if regex.match(context):
-                        return 1
-            if role_chunk == auth_context:
-                return 1
-            if isinstance(role_chunk, str):
-                role_chunk = [role_chunk]
-            if isinstance(role_chunk, list) and isinstance(auth_context, list):
-                return self.process_lists(role_chunk, auth_context, mode)
-        if isinstance(role_chunk, dict):
-            if validator_counter == len(role_chunk.keys()):
-                return True
+        _, value, regex, elements = role_chunk
+        if isinstance(auth_context, list):
+            auth_context = self.get_sorted_list(auth_context)
+        if regex:
+            for context in auth_context if isinstance(auth_context, list) else [auth_context]:
+                if isinstance(context, str) and regex.match(context):
+                    return 1
+        if value == auth_context:
+            return 1
+        if elements is not None and isinstance(auth_context, list):
+            return self.process_lists(elements, auth_context, mode)
 
         return False
 
-    def find_item(self, role_chunk: Union[list, dict], auth_context: dict = None, mode: str = 'FIND',
-                  role_id: int = None) -> bool:
-        """This function will use the match function and will launch it recursively on all the authorization context
-        tree, on all the levels.
+    def find_item(self, role_chunk: tuple, mode: str = 'MATCH') -> bool:
+        """This function will use the match function on all the authorization context tree, on all the levels.
 
         Parameters
         ----------
-        role_chunk : list or dict
-            Chunk of one stored role in the class.
-        auth_context : dict
-            Received authorization context.
+        role_chunk : tuple
+            Compiled chunk of one stored role in the class.
         mode : str
-            FIND -> MATCH | FIND$ -> MATCH$.
-        role_id : int
-            ID of the current role.
+            MATCH or MATCH$, used by FIND and FIND$ respectively.
 
         Returns
         -------
         bool
             True if the item was found, false otherwise.
         """
-        auth_context = self.authorization_context if auth_context is None else auth_context
-        mode = self.set_mode(mode, role_id)
-
-        validator_counter = self.match_item(role_chunk, auth_context, mode)
-        if validator_counter:
-            return True
-
-        for key, value in auth_context.items():
-            if self.match_item(role_chunk, value, mode):
-                return True
-            elif isinstance(value, dict):
-                if self.find_item(role_chunk, value, mode=mode):
-                    return True
-            elif isinstance(value, list):
-                for v in value:
-                    if isinstance(v, dict):
-                        if self.find_item(role_chunk, v, mode=mode):
-                            return True
-
-        return False
+        return any(self.match_item(role_chunk, node, mode) for node in self.get_find_nodes())
 
-    def check_rule(self, rule: dict, role_id: int = None) -> Union[bool, int]:
+    def check_rule(self, rule: Union[list, None]) -> Union[bool, int]:
         """This is the controller for the match of the roles with the authorization context,
         this function is the one that will launch the others.
 
         Parameters
         ----------
-        rule : dict
-            The rule of the current role.
-        role_id : int
-            ID of the current role.
+        rule : list or None
+            The compiled rule of the current role.
 
         Returns
         -------
         bool or int
             True or 1 if the authorization context matched the role, or False or 0 otherwise.
         """
-        for rule_key, rule_value in rule.items():
-            if rule_key in self._logical_operators:  # The current key is a logical operator
-                validator_counter = 0
-                if isinstance(rule_value, list):
-                    for element in rule_value:
-                        validator_counter += self.check_rule(element)
-                elif isinstance(rule_value, dict):
-                    validator_counter += self.check_rule(rule_value)
-                result = self.check_logic_operation(rule_key, rule_value, validator_counter)
+        for node in rule or ():
+            if node[0] == self._operation_node:  # The current key is a logical operator
+                _, rule_key, rule_value, length = node
+                result = self.check_logic_operation(rule_key, rule_value, length)
                 if isinstance(result, bool):
                     return result
-            elif rule_key in self._functions:  # The current key is a function
-                if rule_key == self._functions[0] or rule_key == self._functions[1]:  # MATCH, MATCH$
-                    if self.match_item(role_chunk=rule[rule_key], mode=rule_key):
-                        return 1
-                elif rule_key == self._functions[2] or rule_key == self._functions[3]:  # FIND, FIND$
-                    if self.find_item(role_chunk=rule[rule_key], mode=rule_key, role_id=role_id):
+            else:  # The current key is a function
+                _, find, mode, role_chunk = node
+                if find:  # FIND, FIND$
+                    if self.find_item(role_chunk, mode=mode):
                         return 1
+                elif self.match_item(role_chunk, mode=mode):  # MATCH, MATCH$
+                    return 1
 
         return False
 
@@ -372,7 +437,8 @@ class RBAChecker:
         for role in self.roles_list:
             for rule in role['rules']:
                 # fortishield-wui has id 2
-                if (rule['id'] > orm.MAX_ID_RESERVED or self.user_id == 2) and self.check_rule(rule['rule']):
+                if (rule['id'] > orm.MAX_ID_RESERVED or self.user_id == 2) and \
+                        self.check_rule(get_compiled_rule(rule['id'], rule['rule'])):
                     list_roles.append(role['id'])
                     break
 
@@ -469,8 +535,37 @@ def get_policies_from_roles(roles: list = None) -> list:
     """
     policies = list()
     with orm.RolesPoliciesManager() as rpm:
-        for role in roles:
-            for policy in rpm.get_all_policies_from_role(role):
-                policies.append(json.loads(policy.policy))
+        roles_policies = rpm.get_policies_from_roles(role_ids=roles)
+    for role in roles:
+        for policy in roles_policies.get(role, list()):
+            policies.append(json.loads(policy))
 
     return policies
+
+
+def get_compiled_rule(rule_id: int, rule: Union[str, dict]) -> Union[list, None]:
+    """Return the compiled version of a rule. It is only compiled if it is not cached yet or the rule changed.
+
+    Parameters
+    ----------
+    rule_id : int
+        ID of the rule.
+    rule : str or dict
+        Rule as stored in the RBAC database or already loaded.
+
+    Returns
+    -------
+    list or None
+        Compiled rule.
+    """
+    try:
+        cached_rule, compiled_rule = rules_cache[rule_id]
+        if cached_rule == rule:
+            return compiled_rule
+    except KeyError:
+        pass
+
+    compiled_rule = RBAChecker.compile_rule(json.loads(rule) if isinstance(rule, str) else rule)
+    rules_cache[rule_id] = (rule, compiled_rule)
+
+    return compiled_rule
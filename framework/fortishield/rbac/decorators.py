@@ -6,6 +6,7 @@ import asyncio
 import re
 from collections import defaultdict
 from functools import wraps
+from typing import Callable, Union
 
 from fortishield.core.agent import get_agents_info, get_groups, expand_group
 from fortishield.core.common import rbac, broadcast, cluster_nodes
@@ -426,20 +427,21 @@ def list_handler(result: AffectedItemsFortishieldResult, original: dict = None,
     return result
 
 
-def expose_resources(actions: list = None, resources: list = None, post_proc_func: callable = list_handler,
-                     post_proc_kwargs: dict = None):
+def expose_resources(actions: Union[list, Callable] = None, resources: Union[list, Callable] = None,
+                     post_proc_func: callable = list_handler, post_proc_kwargs: Union[dict, Callable] = None):
     """Decorator to apply user permissions on a Fortishield framework function based on exposed action:resource pairs.
 
     Parameters
     ----------
-    actions : list
-        List of actions exposed by the framework function.
-    resources : list
-        List of resources exposed by the framework function.
+    actions : list or callable
+        List of actions exposed by the framework function. If it is a callable, it is called every time the framework
+        function is called to get the list, so it can depend on the current configuration.
+    resources : list or callable
+        List of resources exposed by the framework function. It can be a callable, like `actions`.
     post_proc_func : callable
         Name of the function to use in response post processing.
-    post_proc_kwargs : dict
-        Extra parameters used in post processing.
+    post_proc_kwargs : dict or callable
+        Extra parameters used in post processing. It can be a callable, like `actions`.
 
     Returns
     -------
@@ -452,8 +454,10 @@ def expose_resources(actions: list = None, resources: list = None, post_proc_fun
         @wraps(func)
         def wrapper(*args, **kwargs):
             original_kwargs = dict(kwargs)
+            req_actions = actions() if callable(actions) else actions
+            req_resources = resources() if callable(resources) else resources
             target_params, req_permissions, add_denied = \
-                _get_required_permissions(actions=actions, resources=resources, **kwargs)
+                _get_required_permissions(actions=req_actions, resources=req_resources, **kwargs)
             allow = _match_permissions(req_permissions=req_permissions, rbac_mode=rbac.get()['rbac_mode'])
             skip_execution = False
 
@@ -477,7 +481,7 @@ def expose_resources(actions: list = None, resources: list = None, post_proc_fun
                         raise Exception
                 except Exception:
                     if add_denied:
-                        denied = _get_denied(original_kwargs, allow, target_param, res_id, resources=resources)
+                        denied = _get_denied(original_kwargs, allow, target_param, res_id, resources=req_resources)
                         if res_id in integer_resources:
                             denied = {int(i) if i.isdigit() else i for i in denied}
                         raise FortishieldPermissionError(4000,
@@ -499,7 +503,8 @@ def expose_resources(actions: list = None, resources: list = None, post_proc_fun
                 return result
             else:
                 return post_proc_func(result, original=original_kwargs, allowed=allow, target=target_params,
-                                      add_denied=add_denied, **post_proc_kwargs)
+                                      add_denied=add_denied,
+                                      **(post_proc_kwargs() if callable(post_proc_kwargs) else post_proc_kwargs))
 
         return wrapper
 
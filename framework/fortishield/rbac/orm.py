@@ -6,6 +6,7 @@ import json
 import logging
 import os
 import re
+from contextvars import ContextVar
 from datetime import datetime
 from enum import IntEnum
 from functools import partial
@@ -16,8 +17,8 @@ from typing import Union
 import yaml
 from sqlalchemy import create_engine, UniqueConstraint, Column, DateTime, String, Integer, ForeignKey, Boolean, or_, \
     CheckConstraint
-from sqlalchemy import desc
-from sqlalchemy.dialects.sqlite import TEXT
+from sqlalchemy import desc, event
+from sqlalchemy.dialects.sqlite import TEXT, insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError, InvalidRequestError, OperationalError
 from sqlalchemy.orm import Session, sessionmaker, relationship, declarative_base
 from sqlalchemy.orm.exc import UnmappedInstanceError
@@ -29,7 +30,7 @@ from api.configuration import security_conf
 from api.constants import SECURITY_PATH
 from fortishield.core.common import fortishield_uid, fortishield_gid, DEFAULT_RBAC_RESOURCES
 from fortishield.core.utils import get_utc_now, safe_move
-from fortishield.rbac.utils import clear_cache
+from fortishield.rbac.utils import clear_cache, clear_rules_cache
 
 logger = logging.getLogger("fortishield-api")
 
@@ -44,9 +45,30 @@ DB_FILE = os.path.join(SECURITY_PATH, "rbac.db")
 DB_FILE_TMP = f"{DB_FILE}.tmp"
 CURRENT_ORM_VERSION = 1
 _new_columns = {}
-_engine = create_engine(f"sqlite:///{DB_FILE}", echo=False)
 _Base = declarative_base()
 
+# Shared engine settings. The engine is created lazily, once per process, and reused by every manager
+ENGINE_POOL_SIZE = 10
+ENGINE_MAX_OVERFLOW = 20
+ENGINE_POOL_RECYCLE = 3600
+SQLITE_PRAGMAS = {
+    # Readers do not block the writer and vice versa
+    'journal_mode': 'WAL',
+    # Safe with WAL, fsync only on checkpoints
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    # Negative values are KiB
+    'cache_size': -8192
+}
+_engine = None
+_engine_pid = None
+_session_factory = None
+# Session shared by the nested managers opened within the same context (thread or asyncio task)
+_current_session = ContextVar('rbac_current_session', default=None)
+
+# In-memory copy of the tokens blacklists, reloaded when the 'tokens' resource version changes
+_tokens_blacklists = {'version': None, 'users': dict(), 'roles': dict(), 'run_as': None}
+
 # Required rules for role
 # Key: Role - Value: Rules
 REQUIRED_RULE_FOR_ROLE = {1: [1, 2]}
@@ -571,10 +593,127 @@ class Policies(_Base):
                     'roles': [role.id for role in rpm.get_all_roles_from_policy(policy_id=self.id)]}
 
 
+class ResourcesVersions(_Base):
+    """Class that represents the table containing the version of each RBAC resource cached by the processes.
+    The version is increased after every committed change, so every process can detect its outdated cached entries
+    no matter which process made the change.
+    The information stored is:
+        resource: Name of the resource
+        version: Number of changes of the resource
+    """
+    __tablename__ = "resources_versions"
+
+    resource = Column('resource', String(32), primary_key=True)
+    version = Column('version', Integer, nullable=False, default=0)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply `SQLITE_PRAGMAS` to every new DBAPI connection of the shared engine.
+
+    Parameters
+    ----------
+    dbapi_connection : sqlite3.Connection
+        Raw DBAPI connection.
+    connection_record : _ConnectionRecord
+        Pool record holding the connection.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def get_engine():
+    """Return the RBAC database engine of the current process, creating it if needed.
+
+    A forked process (e.g. a process pool child) never reuses the connections inherited from its parent: they are
+    discarded without being closed and a new engine is built.
+
+    Returns
+    -------
+    Engine
+        SQL Alchemy engine bound to the RBAC database.
+    """
+    global _engine, _engine_pid, _session_factory
+
+    if _engine is None or _engine_pid != os.getpid():
+        if _engine is not None:
+            _engine.dispose(close=False)
+
+        _engine = create_engine(f"sqlite:///{DB_FILE}", echo=False, pool_size=ENGINE_POOL_SIZE,
+                                max_overflow=ENGINE_MAX_OVERFLOW, pool_recycle=ENGINE_POOL_RECYCLE)
+        event.listen(_engine, 'connect', _set_sqlite_pragmas)
+        _session_factory = sessionmaker(bind=_engine)
+        _engine_pid = os.getpid()
+
+    return _engine
+
+
+def dispose_engine():
+    """Close every pooled connection of the shared engine. The next manager will create a new one.
+
+    It must be used whenever the database file is replaced.
+    """
+    global _engine, _engine_pid, _session_factory
+
+    if _engine is not None and _engine_pid == os.getpid():
+        _engine.dispose()
+    _engine = _engine_pid = _session_factory = None
+
+
+def get_resource_version(resource: str) -> Union[int, None]:
+    """Get the current version of an RBAC resource.
+
+    Parameters
+    ----------
+    resource : str
+        Name of the resource.
+
+    Returns
+    -------
+    int or None
+        Version of the resource, or None if it could not be read. The cached entries must not be used in that case.
+    """
+    try:
+        with RBACManager() as manager:
+            return manager.session.scalar(
+                select(ResourcesVersions.version).where(ResourcesVersions.resource == resource)) or 0
+    except OperationalError:
+        return None
+
+
+def update_resource_version(resource: str, session: Session = None):
+    """Increase the version of an RBAC resource so the cached entries depending on it are discarded by every
+    process.
+
+    Parameters
+    ----------
+    resource : str
+        Name of the resource.
+    session : Session
+        SQL Alchemy ORM session used to commit the change of the resource. A new one is used if not specified.
+    """
+    with RBACManager(session=session) as manager:
+        try:
+            manager.session.execute(
+                sqlite_insert(ResourcesVersions).values(resource=resource, version=1).on_conflict_do_update(
+                    index_elements=[ResourcesVersions.resource], set_={'version': ResourcesVersions.version + 1}))
+            manager.session.commit()
+        except (OperationalError, InvalidRequestError) as e:
+            manager.session.rollback()
+            logger.warning(f"The version of the RBAC resource '{resource}' could not be updated: {e}")
+
+
 # Table Managers
 
 class RBACManager:
-    """Generic class used to manage the information from each table."""
+    """Generic class used to manage the information from each table.
+
+    Managers created without an explicit session share the one of the outermost manager opened in the same context,
+    so nested `with` blocks reuse a single session and connection. Only the manager that created the session closes it.
+    """
 
     def __init__(self, session: Session = None):
         """Class constructor.
@@ -584,13 +723,28 @@ class RBACManager:
         session : Session
             SQL Alchemy ORM session.
         """
-        self.session = session or sessionmaker(bind=create_engine(f"sqlite:///{DB_FILE}", echo=False))()
+        self._owns_session = False
+        self._context_token = None
+
+        if session is not None:
+            self.session = session
+        elif (current_session := _current_session.get()) is not None:
+            self.session = current_session
+        else:
+            get_engine()
+            self.session = _session_factory()
+            self._owns_session = True
 
     def __enter__(self):
+        if self._owns_session:
+            self._context_token = _current_session.set(self.session)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.session.close()
+        if self._owns_session:
+            self._context_token is not None and _current_session.reset(self._context_token)
+            self._context_token = None
+            self.session.close()
 
 
 class TokenManager(RBACManager):
@@ -599,7 +753,7 @@ class TokenManager(RBACManager):
     """
 
     def is_token_valid(self, token_nbf_time: int, user_id: int = None, role_id: int = None,
-                       run_as: bool = False) -> bool:
+                       run_as: bool = False, role_ids: list = None) -> bool:
         """Check if the specified token is valid.
 
         Parameters
@@ -612,21 +766,45 @@ class TokenManager(RBACManager):
             Token's issue timestamp.
         run_as : bool
             Indicate if the token has been granted through run_as endpoint.
+        role_ids : list
+            Current token's role ids, checked at once. If specified, `role_id` is ignored.
 
         Returns
         -------
         bool
             True if the token is valid, False otherwise.
         """
-        try:
-            user_rule = self.session.scalars(select(UsersTokenBlacklist).filter_by(user_id=user_id).limit(1)).first()
-            role_rule = self.session.scalars(select(RolesTokenBlacklist).filter_by(role_id=role_id).limit(1)).first()
-            runas_rule = self.session.query(RunAsTokenBlacklist).first()
-            return (not user_rule or (token_nbf_time > user_rule.nbf_invalid_until)) and \
-                   (not role_rule or (token_nbf_time > role_rule.nbf_invalid_until)) and \
-                   (not run_as or (not runas_rule or (token_nbf_time > runas_rule.nbf_invalid_until)))
-        except IntegrityError:
-            return True
+        blacklists = self.get_blacklists()
+        users_rules, roles_rules, runas_rule = blacklists['users'], blacklists['roles'], blacklists['run_as']
+        if role_ids is None:
+            role_ids = [role_id]
+
+        return (user_id not in users_rules or token_nbf_time > users_rules[user_id]) and \
+            all(role not in roles_rules or token_nbf_time > roles_rules[role] for role in role_ids) and \
+            (not run_as or runas_rule is None or token_nbf_time > runas_rule)
+
+    def get_blacklists(self) -> dict:
+        """Get the nbf_invalid_until value of every rule. The rules are only read from the database when they changed
+        since the last time they were loaded by the current process.
+
+        Returns
+        -------
+        dict
+            Dictionary with the rules of the users and roles, indexed by their ID, and the run_as rule (None if there is
+            no run_as rule).
+        """
+        # The version is read before the rules so a concurrent change is never cached as up to date
+        version = get_resource_version('tokens')
+        if version is None or _tokens_blacklists['version'] != version:
+            rules = self.get_all_rules()
+            if not isinstance(rules, tuple):
+                return {'users': dict(), 'roles': dict(), 'run_as': None}
+
+            users_rules, roles_rules, runas_rule = rules
+            _tokens_blacklists.update(version=version, users=users_rules, roles=roles_rules,
+                                      run_as=runas_rule.get('run_as'))
+
+        return _tokens_blacklists
 
     def get_all_rules(self) -> Union[tuple, int]:
         """Return two dictionaries where the keys are the role IDs and user IDs of each rule and the values are the
@@ -699,6 +877,8 @@ class TokenManager(RBACManager):
         except IntegrityError:
             self.session.rollback()
             return SecurityError.ALREADY_EXIST
+        finally:
+            update_resource_version('tokens', self.session)
 
     def delete_rule(self, user_id: int = None, role_id: int = None, run_as: bool = False) -> Union[bool, int]:
         """Remove the rule for the specified role and user.
@@ -724,6 +904,7 @@ class TokenManager(RBACManager):
                 run_as_rule = self.session.query(RunAsTokenBlacklist).first()
                 run_as_rule and self.session.delete(run_as_rule)
             self.session.commit()
+            update_resource_version('tokens', self.session)
 
             return True
         except IntegrityError:
@@ -747,6 +928,7 @@ class TokenManager(RBACManager):
                 if token_rule.first() and current_time > token_rule.first().is_valid_until:
                     token_rule.delete()
                     self.session.commit()
+                    update_resource_version('tokens', self.session)
                     list_users.append(user_token.user_id)
             roles_tokens_in_blacklist = self.session.scalars(select(RolesTokenBlacklist)).all()
             for role_token in roles_tokens_in_blacklist:
@@ -754,11 +936,13 @@ class TokenManager(RBACManager):
                 if token_rule.first() and current_time > token_rule.first().is_valid_until:
                     token_rule.delete()
                     self.session.commit()
+                    update_resource_version('tokens', self.session)
                     list_roles.append(role_token.role_id)
             runas_token_in_blacklist = self.session.query(RunAsTokenBlacklist).first()
             if runas_token_in_blacklist and runas_token_in_blacklist.to_dict()['is_valid_until'] < current_time:
                 self.session.delete(runas_token_in_blacklist)
                 self.session.commit()
+                update_resource_version('tokens', self.session)
 
             return list_users, list_roles
         except IntegrityError:
@@ -792,7 +976,9 @@ class TokenManager(RBACManager):
                 self.session.delete(runas_rule)
                 clean = True
 
-            clean and self.session.commit()
+            if clean:
+                self.session.commit()
+                update_resource_version('tokens', self.session)
             return list_users, list_roles
         except IntegrityError:
             self.session.rollback()
@@ -1156,6 +1342,7 @@ class RolesManager(RBACManager):
                     return False
                 self.session.delete(role)
                 self.session.commit()
+                update_resource_version('policies', self.session)
                 return True
             return SecurityError.ADMIN_RESOURCES
         except IntegrityError:
@@ -1201,6 +1388,7 @@ class RolesManager(RBACManager):
                 if int(role.id) > MAX_ID_RESERVED:
                     self.session.delete(self.session.scalars(select(Roles).filter_by(id=role.id).limit(1)).first())
                     self.session.commit()
+                    update_resource_version('policies', self.session)
                     list_roles.append(int(role.id))
             return list_roles
         except IntegrityError:
@@ -1358,6 +1546,7 @@ class RulesManager(RBACManager):
                     return False
                 self.session.delete(rule)
                 self.session.commit()
+                clear_rules_cache(rule_id)
                 return True
             return SecurityError.ADMIN_RESOURCES
         except IntegrityError:
@@ -1404,6 +1593,7 @@ class RulesManager(RBACManager):
                 if int(rule.id) > MAX_ID_RESERVED:
                     self.session.delete(self.session.scalars(select(Rules).filter_by(id=rule.id).limit(1)).first())
                     self.session.commit()
+                    clear_rules_cache(rule.id)
                     list_rules.append(int(rule.id))
             return list_rules
         except IntegrityError:
@@ -1440,6 +1630,7 @@ class RulesManager(RBACManager):
                     if rule is not None:
                         rule_to_update.rule = json.dumps(rule)
                     self.session.commit()
+                    clear_rules_cache(rule_id)
                     return True
                 return SecurityError.ADMIN_RESOURCES
             return SecurityError.RULE_NOT_EXIST
@@ -1598,6 +1789,7 @@ class PoliciesManager(RBACManager):
                     return False
                 self.session.delete(policy)
                 self.session.commit()
+                update_resource_version('policies', self.session)
                 return True
             return SecurityError.ADMIN_RESOURCES
         except IntegrityError:
@@ -1644,6 +1836,7 @@ class PoliciesManager(RBACManager):
                 if int(policy.id) > MAX_ID_RESERVED:
                     self.session.delete(self.session.scalars(select(Policies).filter_by(id=policy.id).limit(1)).first())
                     self.session.commit()
+                    update_resource_version('policies', self.session)
                     list_policies.append(int(policy.id))
             return list_policies
         except IntegrityError:
@@ -1689,6 +1882,7 @@ class PoliciesManager(RBACManager):
                                 return SecurityError.INVALID
                         policy_to_update.policy = json.dumps(policy)
                     self.session.commit()
+                    update_resource_version('policies', self.session)
                     return True
                 return SecurityError.ADMIN_RESOURCES
             return SecurityError.POLICY_NOT_EXIST
@@ -2121,7 +2315,9 @@ class RolesPoliciesManager(RBACManager):
                     role_policy.level = position
                     role_policy.created_at = created_at or get_utc_now()
 
-                    atomic and self.session.commit()
+                    if atomic:
+                        self.session.commit()
+                        update_resource_version('policies', self.session)
                     return True
                 else:
                     return SecurityError.ALREADY_EXIST
@@ -2184,6 +2380,32 @@ class RolesPoliciesManager(RBACManager):
             self.session.rollback()
             return False
 
+    def get_policies_from_roles(self, role_ids: list) -> Union[dict, bool]:
+        """Get the policies related to each of the specified roles using a single query.
+
+        Parameters
+        ----------
+        role_ids : list
+            IDs of the roles.
+
+        Returns
+        -------
+        Union[dict, bool]
+            Dictionary with the role IDs as keys and the list of their raw policies, sorted by level, as values or False
+            if the operation failed. Roles without policies are not included.
+        """
+        try:
+            query = select(RolesPolicies.role_id, Policies.policy).join(
+                Policies, Policies.id == RolesPolicies.policy_id).filter(RolesPolicies.role_id.in_(role_ids))
+
+            roles_policies = dict()
+            for role_id, policy in self.session.execute(query.order_by(RolesPolicies.level, RolesPolicies.id)):
+                roles_policies.setdefault(role_id, list()).append(policy)
+            return roles_policies
+        except (IntegrityError, AttributeError):
+            self.session.rollback()
+            return False
+
     def get_all_roles_from_policy(self, policy_id: int) -> Union[list, bool]:
         """Get all the roles containing a specified policy.
 
@@ -2296,7 +2518,9 @@ class RolesPoliciesManager(RBACManager):
                     for relation in relationships_to_update:
                         relation.level -= 1
 
-                    atomic and self.session.commit()
+                    if atomic:
+                        self.session.commit()
+                        update_resource_version('policies', self.session)
                     return True
                 else:
                     return SecurityError.INVALID
@@ -2345,6 +2569,7 @@ class RolesPoliciesManager(RBACManager):
                     if self.remove_policy_in_role(role_id=role_id, policy_id=policy.id, atomic=False) is not True:
                         return SecurityError.RELATIONSHIP_ERROR
                 self.session.commit()
+                update_resource_version('policies', self.session)
                 return True
         except (IntegrityError, TypeError):
             self.session.rollback()
@@ -2369,6 +2594,7 @@ class RolesPoliciesManager(RBACManager):
                 for rol in roles:
                     self.remove_policy_in_role(role_id=rol.id, policy_id=policy_id, atomic=False)
                 self.session.commit()
+                update_resource_version('policies', self.session)
                 return True
         except (IntegrityError, TypeError):
             self.session.rollback()
@@ -2398,6 +2624,7 @@ class RolesPoliciesManager(RBACManager):
                     self.add_policy_to_role(role_id=role_id, policy_id=new_policy_id, atomic=False) is not True:
                 return SecurityError.RELATIONSHIP_ERROR
             self.session.commit()
+            update_resource_version('policies', self.session)
             return True
 
         return False
@@ -2481,6 +2708,33 @@ class RolesRulesManager(RBACManager):
             self.session.rollback()
             return False
 
+    def get_rules_from_roles(self, role_ids: list = None) -> Union[dict, bool]:
+        """Get the rules related to each of the specified roles using a single query.
+
+        Parameters
+        ----------
+        role_ids : list
+            IDs of the roles. All the roles in the system are used if not specified.
+
+        Returns
+        -------
+        Union[dict, bool]
+            Dictionary with the role IDs as keys and the list of their rule rows (`id` and raw `rule`) as values or
+            False if the operation failed. Roles without rules are not included.
+        """
+        try:
+            query = select(RolesRules.role_id, Rules.id, Rules.rule).join(Rules, Rules.id == RolesRules.rule_id)
+            if role_ids is not None:
+                query = query.filter(RolesRules.role_id.in_(role_ids))
+
+            roles_rules = dict()
+            for role_id, rule_id, rule in self.session.execute(query.order_by(RolesRules.id)):
+                roles_rules.setdefault(role_id, list()).append({'id': rule_id, 'rule': rule})
+            return roles_rules
+        except (IntegrityError, AttributeError):
+            self.session.rollback()
+            return False
+
     def get_all_roles_from_rule(self, rule_id: int) -> Union[list, bool]:
         """Get all the roles related to the specified rule.
 
@@ -3120,8 +3374,11 @@ def check_database_integrity():
         database : str
             Path to the database which permissions are going to be changed.
         """
-        chown(database, fortishield_uid(), fortishield_gid())
-        os.chmod(database, 0o640)
+        # WAL mode creates these files next to the database, every process must be able to use them
+        for path in (database, f'{database}-wal', f'{database}-shm'):
+            if path == database or os.path.exists(path):
+                chown(path, fortishield_uid(), fortishield_gid())
+                os.chmod(path, 0o640)
 
     try:
         logger.info("Checking RBAC database integrity...")
@@ -3134,6 +3391,9 @@ def check_database_integrity():
             current_version = int(db_manager.get_database_version(DB_FILE))
             expected_version = CURRENT_ORM_VERSION
 
+            # Tables added without changing the version (such as the resources versions) are created if missing
+            db_manager.create_database(DB_FILE)
+
             # Check if an upgrade is required
             if current_version < expected_version:
                 logger.info("RBAC database migration required. "
@@ -3158,6 +3418,7 @@ def check_database_integrity():
                 # Apply changes and replace database
                 db_manager.set_database_version(DB_FILE_TMP, expected_version)
                 db_manager.close_sessions()
+                dispose_engine()
                 safe_move(DB_FILE_TMP, DB_FILE,
                           ownership=(fortishield_uid(), fortishield_gid()),
                           permissions=0o640)
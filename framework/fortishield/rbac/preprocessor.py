@@ -2,13 +2,18 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import json
 import re
 from typing import Union
 
 from fortishield.core.exception import FortishieldError, FortishieldPermissionError
 from fortishield.core.results import FortishieldResult
-from fortishield.rbac.auth_context import RBAChecker, get_policies_from_roles
-from fortishield.rbac.orm import AuthenticationManager
+from fortishield.rbac.auth_context import RBAChecker
+from fortishield.rbac.orm import AuthenticationManager, RolesPoliciesManager, get_resource_version
+
+# Optimized policies of each role. Key: role ID - Value: optimized policies dictionary
+roles_policies_cache = dict()
+_roles_policies_version = None
 
 
 class PreProcessor:
@@ -96,13 +101,67 @@ class PreProcessor:
                 self.remove_previous_elements(resource, action)
                 self.odict[action]['&'.join(resource)] = policy['effect']
 
+    def combine_optimized_dict(self, optimized_dict: dict):
+        """Apply an already optimized dictionary over the current one.
+
+        The result is the same as processing again the policies the optimized dictionary was built from, as each of its
+        resources is applied in the same order.
+
+        Parameters
+        ----------
+        optimized_dict : dict
+            Optimized policies dictionary, as returned by `get_optimize_dict`.
+        """
+        for action, resources in optimized_dict.items():
+            if action not in self.odict.keys():
+                self.odict[action] = dict()
+            for resource, effect in resources.items():
+                self.remove_previous_elements(resource.split('&'), action)
+                self.odict[action][resource] = effect
+
     def get_optimize_dict(self):
         return self.odict
 
 
+def get_roles_optimized_policies(roles: list) -> dict:
+    """Get the optimized policies of each role, processing only those not cached since the last policies change.
+
+    Parameters
+    ----------
+    roles : list
+        IDs of the roles.
+
+    Returns
+    -------
+    dict
+        Dictionary with the role IDs as keys and their optimized policies as values.
+    """
+    global _roles_policies_version
+
+    # The version is read before the policies so a concurrent change is never cached as up to date
+    version = get_resource_version('policies')
+    if version is None or version != _roles_policies_version:
+        roles_policies_cache.clear()
+        _roles_policies_version = version
+
+    missing_roles = [role for role in roles if role not in roles_policies_cache]
+    if missing_roles:
+        with RolesPoliciesManager() as rpm:
+            roles_policies = rpm.get_policies_from_roles(role_ids=missing_roles)
+        for role in missing_roles:
+            preprocessor = PreProcessor()
+            for policy in roles_policies.get(role, list()):
+                preprocessor.process_policy(json.loads(policy))
+            roles_policies_cache[role] = preprocessor.get_optimize_dict()
+
+    return {role: roles_policies_cache[role] for role in roles}
+
+
 def optimize_resources(roles: list = None) -> dict:
     """Preprocess the policies of the user for a more easy treatment in the decorator of the RBAC.
 
+    The optimized policies of each role are cached and combined following the order of the roles.
+
     Parameters
     ----------
     roles : list
@@ -113,11 +172,11 @@ def optimize_resources(roles: list = None) -> dict:
     dict
         Final dictionary.
     """
-    policies = get_policies_from_roles(roles=roles)
+    roles_policies = get_roles_optimized_policies(roles)
 
     preprocessor = PreProcessor()
-    for policy in policies:
-        preprocessor.process_policy(policy)
+    for role in roles:
+        preprocessor.combine_optimized_dict(roles_policies[role])
 
     return preprocessor.get_optimize_dict()
 
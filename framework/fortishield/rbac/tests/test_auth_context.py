@@ -88,19 +88,59 @@ def test_auth_roles(db_setup):
     authorization_contexts, roles, results = values()
     for index, auth in enumerate(authorization_contexts):
         for role in roles:
-            with patch('fortishield.rbac.orm.RolesManager.get_role_id') as _role_rules:
-                with patch('fortishield.rbac.orm.RulesManager.get_rule') as _rule:
-                    list_rules = [{'rule': role.rules[i]} for i, _ in enumerate(role.rules)]
-                    role.rules = list_rules
-                    _role_rules.return_value = {'rules': list_rules}
-                    _rule.side_effect = role.rules
-                    initial_index = 100
-                    for rule in role['rules']:
-                        rule['id'] = initial_index
-                        initial_index += 1
-                    test = db_setup(json.dumps(auth.auth), role)
-                    if role.name in results[index].roles:
-                        assert test.get_user_roles()[0] == role.id
-                    else:
-                        assert len(test.get_user_roles()) == 0
+            with patch('fortishield.rbac.orm.RolesRulesManager.get_rules_from_roles') as _roles_rules:
+                list_rules = [{'id': 100 + i, 'rule': json.dumps(rule)} for i, rule in enumerate(role.rules)]
+                _roles_rules.return_value = {role.id: list_rules}
+                test = db_setup(json.dumps(auth.auth), role)
+                _roles_rules.assert_called_once_with(role_ids=[role.id])
+                if role.name in results[index].roles:
+                    assert test.get_user_roles()[0] == role.id
+                else:
+                    assert len(test.get_user_roles()) == 0
         roles = values()[1]
+
+
+def test_get_compiled_rule(db_setup):
+    """Check that rules are only compiled again when they change or are removed from the cache."""
+    from fortishield.rbac.auth_context import get_compiled_rule
+    from fortishield.rbac.utils import clear_rules_cache, rules_cache
+
+    rule = json.dumps({'FIND': {'name': "r'^Bill'"}})
+    with patch.object(db_setup, 'compile_rule', wraps=db_setup.compile_rule) as compile_mock:
+        compiled_rule = get_compiled_rule(100, rule)
+        assert get_compiled_rule(100, rule) is compiled_rule
+        compile_mock.assert_called_once_with(json.loads(rule))
+
+        # The rule was modified
+        new_rule = json.dumps({'FIND': {'name': 'Bill'}})
+        assert get_compiled_rule(100, new_rule) is not compiled_rule
+        assert rules_cache[100][0] == new_rule
+
+        clear_rules_cache(100)
+        assert 100 not in rules_cache
+        get_compiled_rule(100, new_rule)
+        assert compile_mock.call_count == 3
+
+    clear_rules_cache()
+    assert not rules_cache
+
+
+@pytest.mark.parametrize('auth_context, rule, expected', [
+    ({'name': 'Bill', 'office': '20'}, {'MATCH': {'name': 'Bill'}}, True),
+    ({'user': {'name': 'Bill'}}, {'MATCH': {'name': 'Bill'}}, False),
+    ({'user': {'name': 'Bill'}}, {'FIND': {'name': 'Bill'}}, True),
+    ({'users': [{'name': 'Bill'}, {'name': 'Ana'}]}, {'FIND': {'name': 'Ana'}}, True),
+    ({'groups': ['a', 'b', 'c']}, {'MATCH': {'groups': ['c', 'a']}}, True),
+    ({'groups': ['a', 'b', 'c']}, {'MATCH$': {'groups': ['c', 'a']}}, False),
+    ({'groups': ['b']}, {'MATCH$': {'groups': ["r'^[ab]$'"]}}, True),
+    ({'authLevel': 'admin'}, {"FIND": {"r'^auth[a-zA-Z]+$'": "admin"}}, True),
+    ({'name': 'Bill'}, {'AND': [{'MATCH': {'name': 'Bill'}}, {'MATCH': {'office': '20'}}]}, False),
+    ({'name': 'Bill'}, {'OR': [{'MATCH': {'name': 'Bill'}}, {'MATCH': {'office': '20'}}]}, True),
+    ({'name': 'Bill'}, {'NOT': {'MATCH': {'office': '20'}}}, True),
+    ({'name': 'Bill'}, {'NOT': [{'MATCH': {'name': 'Bill'}}]}, False),
+])
+def test_check_rule(db_setup, auth_context, rule, expected):
+    """Check the evaluation of compiled rules against an authorization context."""
+    with patch('fortishield.rbac.orm.RolesRulesManager.get_rules_from_roles', return_value={}):
+        checker = db_setup(json.dumps(auth_context), role=[])
+    assert bool(checker.check_rule(db_setup.compile_rule(rule))) is expected
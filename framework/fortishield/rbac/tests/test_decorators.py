@@ -128,3 +128,28 @@ def test_expose_resourcesless(db_setup, decorator_params, rbac, allowed, mode):
         except FortishieldError as e:
             assert (not allowed)
             assert (e.code == 4000)
+
+
+@pytest.mark.parametrize('cluster_enabled, allowed', [
+    (True, True),
+    (False, False)
+])
+def test_expose_resources_callable(db_setup, cluster_enabled, allowed):
+    """Check that callable actions and resources are resolved when the decorated function is called."""
+    db_setup.rbac.set({'rbac_mode': 'white', 'cluster:read': {'node:id:master-node': 'allow'},
+                       'manager:read': {'*:*:*': 'deny'}})
+
+    with patch('fortishield.rbac.decorators._expand_resource', return_value={'master-node'}):
+        @db_setup.expose_resources(
+            actions=lambda: [f"{'cluster' if cluster_enabled else 'manager'}:read"],
+            resources=lambda: ['node:id:master-node' if cluster_enabled else '*:*:*'],
+            post_proc_func=None)
+        def framework_dummy():
+            return True
+
+        try:
+            assert framework_dummy()
+            assert allowed
+        except FortishieldError as e:
+            assert not allowed
+            assert e.code == 4000
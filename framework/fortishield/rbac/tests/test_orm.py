@@ -63,6 +63,60 @@ def test_database_init(db_setup):
     with db_setup.RolesManager() as rm:
         assert rm.get_role('fortishield') != db_setup.SecurityError.ROLE_NOT_EXIST
 
+
+def test_nested_managers_share_session(db_setup):
+    """Check that nested managers reuse the session of the outermost one and only the owner closes it."""
+    with db_setup.AuthenticationManager() as am:
+        with db_setup.UserRolesManager() as urm:
+            with db_setup.TokenManager() as tm:
+                assert am.session is urm.session is tm.session
+            assert urm.session is am.session
+        with patch.object(am.session, 'close') as close_mock:
+            with db_setup.RolesManager() as rm:
+                assert rm.session is am.session
+            close_mock.assert_not_called()
+
+    # Once the outermost manager is closed, a new session is created
+    with db_setup.RolesManager() as rm:
+        assert rm.session is not am.session
+
+
+def test_manager_explicit_session_not_closed(db_setup):
+    """Check that a session given to a manager is neither closed by it nor shared with nested managers."""
+    session = MagicMock()
+    with db_setup.RolesManager(session=session) as rm:
+        assert rm.session is session
+        with db_setup.RolesManager() as nested_rm:
+            assert nested_rm.session is not session
+    session.close.assert_not_called()
+
+
+def test_get_engine(db_setup):
+    """Check that the engine is shared by the process and rebuilt in forked processes."""
+    db_setup.dispose_engine()
+    engine = db_setup.get_engine()
+    assert db_setup.get_engine() is engine
+
+    with patch('fortishield.rbac.orm.os.getpid', return_value=-1), \
+            patch('fortishield.rbac.orm.create_engine') as create_engine_mock, \
+            patch('fortishield.rbac.orm.event.listen') as listen_mock:
+        with patch.object(engine, 'dispose') as dispose_mock:
+            assert db_setup.get_engine() is create_engine_mock.return_value
+            dispose_mock.assert_called_once_with(close=False)
+        listen_mock.assert_called_once_with(create_engine_mock.return_value, 'connect', db_setup._set_sqlite_pragmas)
+
+    db_setup.dispose_engine()
+
+
+def test_set_sqlite_pragmas(db_setup):
+    """Check that every configured pragma is applied to new connections."""
+    connection = MagicMock()
+    db_setup._set_sqlite_pragmas(connection, None)
+    connection.cursor.return_value.execute.assert_has_calls(
+        [call(f"PRAGMA {pragma}={value}") for pragma, value in db_setup.SQLITE_PRAGMAS.items()])
+    connection.cursor.return_value.close.assert_called_once()
+
+
 def add_token(db_setup):
     """Store a new token rule in the database"""
     with db_setup.TokenManager() as tm:
@@ -107,6 +161,47 @@ def test_nbf_invalid(db_setup):
             assert not tm.is_token_valid(user_id=user, token_nbf_time=current_timestamp)
         for role in roles:
             assert not tm.is_token_valid(role_id=role, token_nbf_time=current_timestamp)
+        assert not tm.is_token_valid(role_ids=[MAX_ID_RESERVED + 1000, roles[0]], token_nbf_time=current_timestamp)
+        assert tm.is_token_valid(role_ids=[MAX_ID_RESERVED + 1000], user_id=MAX_ID_RESERVED + 1000,
+                                 token_nbf_time=current_timestamp)
+        assert tm.is_token_valid(user_id=users[0], role_ids=roles, token_nbf_time=current_timestamp + 10)
+
+
+def test_get_blacklists(db_setup):
+    """Check the tokens blacklists are only read from the database after they change"""
+    users, roles = add_token(db_setup)
+    with db_setup.TokenManager() as tm:
+        with patch.object(tm, 'get_all_rules', wraps=tm.get_all_rules) as get_all_rules_mock:
+            blacklists = tm.get_blacklists()
+            assert set(blacklists['users']) == set(users)
+            assert set(blacklists['roles']) == set(roles)
+            assert blacklists['run_as'] is None
+            tm.get_blacklists()
+            get_all_rules_mock.assert_called_once()
+
+            tm.add_user_roles_rules(run_as=True)
+            assert tm.get_blacklists()['run_as'] is not None
+            assert get_all_rules_mock.call_count == 2
+
+            # Changes made by other processes are only seen through the version stored in the database
+            tm.session.execute(text("UPDATE resources_versions SET version = version + 1 WHERE resource = 'tokens'"))
+            tm.session.commit()
+            tm.get_blacklists()
+            assert get_all_rules_mock.call_count == 3
+
+
+def test_resource_version(db_setup):
+    """Check the versions of the resources are stored in the database and can not be trusted if they are missing"""
+    version = db_setup.get_resource_version('policies')
+    db_setup.update_resource_version('policies')
+    db_setup.update_resource_version('policies')
+    assert db_setup.get_resource_version('policies') == version + 2
+    assert db_setup.get_resource_version('unknown') == 0
+
+    with db_setup.RBACManager() as manager:
+        manager.session.execute(text('DROP TABLE resources_versions'))
+        assert db_setup.get_resource_version('policies') is None
+        db_setup.update_resource_version('policies')
 
 
 def test_delete_all_rules(db_setup):
@@ -280,7 +375,9 @@ def test_delete_rules(db_setup):
                 assert rum.delete_rule(rule.id) == db_setup.SecurityError.ADMIN_RESOURCES
             # Other rules
             else:
-                assert rum.delete_rule(rule.id)
+                with patch('fortishield.rbac.orm.clear_rules_cache') as clear_rules_cache_mock:
+                    assert rum.delete_rule(rule.id)
+                    clear_rules_cache_mock.assert_called_once_with(rule.id)
 
 
 def test_delete_all_security_rules(db_setup):
@@ -366,7 +463,9 @@ def test_update_rule(db_setup):
         tname = 'toUpdate'
         rum.add_rule(name=tname, rule={'Unittest': 'Rule'})
         tid = rum.get_rule_by_name(rule_name=tname)['id']
-        rum.update_rule(rule_id=tid, name='updatedName', rule={'Unittest1': 'Rule'})
+        with patch('fortishield.rbac.orm.clear_rules_cache') as clear_rules_cache_mock:
+            rum.update_rule(rule_id=tid, name='updatedName', rule={'Unittest1': 'Rule'})
+            clear_rules_cache_mock.assert_called_once_with(tid)
         assert rum.get_rule_by_name(rule_name=tname) == db_setup.SecurityError.RULE_NOT_EXIST
         assert tid == rum.get_rule_by_name(rule_name='updatedName')['id']
         assert rum.get_rule(rule_id=tid)['name'] == 'updatedName'
@@ -723,6 +822,18 @@ def test_get_all_roles_from_rule(db_setup):
                 assert rule.id in rule_ids
 
 
+def test_get_rules_from_roles(db_setup):
+    """Check the rules of several roles are retrieved with their raw body"""
+    with db_setup.RolesRulesManager() as rrum:
+        role_ids, rule_ids = add_role_rule(db_setup)
+        roles_rules = rrum.get_rules_from_roles(role_ids=role_ids[:1])
+        assert list(roles_rules.keys()) == role_ids[:1]
+        assert [rule['id'] for rule in roles_rules[role_ids[0]]] == rule_ids
+        assert json.loads(roles_rules[role_ids[0]][0]['rule']) == {'rule': ['testing']}
+
+        assert set(role_ids) <= set(rrum.get_rules_from_roles().keys())
+
+
 def test_get_all_users_from_role(db_setup):
     """Check all roles in one user in the database"""
     with db_setup.UserRolesManager() as urm:
@@ -743,6 +854,16 @@ def test_get_all_policy_from_role(db_setup):
                 assert policy.id == policies_ids[index]
 
 
+def test_get_policies_from_roles(db_setup):
+    """Check the policies of several roles are retrieved sorted by level with their raw body"""
+    with db_setup.RolesPoliciesManager() as rpm:
+        policies_ids, roles_ids = add_role_policy(db_setup)
+        roles_policies = rpm.get_policies_from_roles(role_ids=roles_ids)
+        assert set(roles_policies.keys()) == set(roles_ids)
+        for role in roles_ids:
+            assert roles_policies[role] == [policy.policy for policy in rpm.get_all_policies_from_role(role_id=role)]
+
+
 def test_get_all_role_from_policy(db_setup):
     """Check all policies in one role in the database"""
     with db_setup.RolesPoliciesManager() as rpm:
@@ -828,8 +949,10 @@ def test_remove_policy_from_role(db_setup):
     """Remove specified policy in role in the database"""
     with db_setup.RolesPoliciesManager() as rpm:
         policies_ids, roles_ids = add_role_policy(db_setup)
-        for policy in policies_ids:
-            rpm.remove_policy_in_role(role_id=roles_ids[0], policy_id=policy)
+        with patch('fortishield.rbac.orm.update_resource_version') as update_resource_version_mock:
+            for policy in policies_ids:
+                rpm.remove_policy_in_role(role_id=roles_ids[0], policy_id=policy)
+            assert update_resource_version_mock.call_args_list == [call('policies', rpm.session)] * len(policies_ids)
         for policy in policies_ids:
             assert not rpm.exist_role_policy(role_id=roles_ids[0], policy_id=policy)
 
@@ -838,8 +961,10 @@ def test_remove_role_from_policy(db_setup):
     """Remove specified role in policy in the database"""
     with db_setup.RolesPoliciesManager() as rpm:
         policies_ids, roles_ids = add_role_policy(db_setup)
-        for policy in policies_ids:
-            rpm.remove_policy_in_role(role_id=roles_ids[0], policy_id=policy)
+        with patch('fortishield.rbac.orm.update_resource_version') as update_resource_version_mock:
+            for policy in policies_ids:
+                rpm.remove_policy_in_role(role_id=roles_ids[0], policy_id=policy)
+            assert update_resource_version_mock.call_args_list == [call('policies', rpm.session)] * len(policies_ids)
         for policy in policies_ids:
             assert not rpm.exist_role_policy(role_id=roles_ids[0], policy_id=policy)
 
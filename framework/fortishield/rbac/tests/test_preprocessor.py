@@ -4,7 +4,7 @@
 
 import json
 import os
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import pytest
 from sqlalchemy import create_engine
@@ -44,3 +44,49 @@ def test_expose_resources(db_setup, input_, output):
         preprocessor.process_policy(policy)
     preprocessed_policies = preprocessor.get_optimize_dict()
     assert preprocessed_policies == output
+
+
+@pytest.mark.parametrize('input_, output', zip(inputs, outputs))
+def test_combine_optimized_dict(db_setup, input_, output):
+    """Check combining the optimized policies of several roles is equivalent to processing all their policies."""
+    preprocessor = db_setup()
+    for index in range(len(input_)):
+        role_preprocessor = db_setup()
+        role_preprocessor.process_policy(input_[index])
+        preprocessor.combine_optimized_dict(role_preprocessor.get_optimize_dict())
+    assert preprocessor.get_optimize_dict() == output
+
+
+def test_optimize_resources_cache(db_setup):
+    """Check the optimized policies of each role are cached until the policies version changes."""
+    from fortishield.rbac import preprocessor
+
+    policy = {'actions': ['agent:read'], 'resources': ['agent:id:*'], 'effect': 'allow'}
+    rpm_mock = MagicMock()
+    rpm_mock.return_value.__enter__.return_value.get_policies_from_roles.return_value = {1: [json.dumps(policy)]}
+    preprocessor.roles_policies_cache.clear()
+    with patch('fortishield.rbac.preprocessor.RolesPoliciesManager', new=rpm_mock), \
+            patch('fortishield.rbac.preprocessor.get_resource_version', side_effect=[0, 0, 1]):
+        expected = {'agent:read': {'agent:id:*': 'allow'}}
+        assert preprocessor.optimize_resources([1, 2]) == expected
+        assert preprocessor.optimize_resources([1, 2]) == expected
+        rpm_mock.return_value.__enter__.return_value.get_policies_from_roles.assert_called_once_with(role_ids=[1, 2])
+
+        # Returned dictionaries are not shared with the cache
+        preprocessor.optimize_resources([1])['agent:read']['agent:id:*'] = 'deny'
+        assert rpm_mock.return_value.__enter__.return_value.get_policies_from_roles.call_count == 2
+        assert preprocessor.roles_policies_cache[1] == expected
+
+
+def test_optimize_resources_cache_unknown_version(db_setup):
+    """Check the cached optimized policies are not used while the policies version can not be read."""
+    from fortishield.rbac import preprocessor
+
+    rpm_mock = MagicMock()
+    rpm_mock.return_value.__enter__.return_value.get_policies_from_roles.return_value = {}
+    preprocessor.roles_policies_cache.clear()
+    with patch('fortishield.rbac.preprocessor.RolesPoliciesManager', new=rpm_mock), \
+            patch('fortishield.rbac.preprocessor.get_resource_version', return_value=None):
+        preprocessor.optimize_resources([1])
+        preprocessor.optimize_resources([1])
+        assert rpm_mock.return_value.__enter__.return_value.get_policies_from_roles.call_count == 2
@@ -12,12 +12,32 @@ from api.configuration import security_conf
 # Tokens cache
 tokens_cache = TTLCache(maxsize=4500, ttl=security_conf['auth_token_exp_timeout'])
 
+# Compiled authorization context rules. Key: rule ID - Value: (raw rule, compiled rule)
+rules_cache = dict()
+
 
 def clear_cache():
     """This function clear the authorization tokens cache."""
     cache_event.set()
 
 
+def clear_rules_cache(rule_id: int = None):
+    """Remove a rule from the compiled rules cache.
+
+    Entries are also checked against the stored rule before being used, so other processes never use outdated
+    compiled rules.
+
+    Parameters
+    ----------
+    rule_id : int
+        ID of the rule to remove. The whole cache is cleared if not specified.
+    """
+    if rule_id is None:
+        rules_cache.clear()
+    else:
+        rules_cache.pop(rule_id, None)
+
+
 def token_cache(cache: TTLCache):
     """Apply cache depending on whether the request comes from the master node or from a worker node.
 
@@ -11,8 +11,6 @@ import xmltodict
 
 import fortishield.core.configuration as configuration
 from fortishield.core import common
-from fortishield.core.cluster.cluster import get_node
-from fortishield.core.cluster.utils import read_cluster_config
 from fortishield.core.exception import FortishieldError
 from fortishield.core.results import AffectedItemsFortishieldResult
 from fortishield.core.rule import check_status, load_rules_from_file, format_rule_decoder_file, REQUIRED_FIELDS, \
@@ -22,9 +20,6 @@ from fortishield.core.utils import process_array, safe_move, \
 from fortishield.core.logtest import validate_dummy_logtest
 from fortishield.rbac.decorators import expose_resources
 
-cluster_enabled = not read_cluster_config(from_import=True)['disabled']
-node_id = get_node().get('node') if cluster_enabled else 'manager'
-
 
 def get_rules(rule_ids: list = None, status: str = None, group: str = None, pci_dss: str = None, gpg13: str = None,
               gdpr: str = None, hipaa: str = None, nist_800_53: str = None, tsc: str = None, mitre: str = None,
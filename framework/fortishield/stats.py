@@ -2,25 +2,38 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import asyncio
 import contextlib
 import datetime
+import time
+from functools import partial
+from itertools import chain
+from operator import itemgetter
+from typing import Iterator
 
 from fortishield.core import common
 from fortishield.core import exception
 from fortishield.core.agent import Agent, get_agents_info, get_rbac_filters, FortishieldDBQueryAgents
-from fortishield.core.cluster.cluster import get_node
-from fortishield.core.cluster.utils import read_cluster_config
+from fortishield.core.cluster.cluster import get_node_rbac_actions, get_node_rbac_resources
 from fortishield.core.exception import FortishieldException
 from fortishield.core.results import AffectedItemsFortishieldResult
 from fortishield.core.stats import get_daemons_stats_, get_daemons_stats_socket, hourly_, totals_, weekly_
+from fortishield.core.stats_collector import get_collector, get_daemons_sockets
+from fortishield.core.utils import get_date_from_timestamp
 from fortishield.rbac.decorators import expose_resources
 
-cluster_enabled = not read_cluster_config(from_import=True)['disabled']
-node_id = get_node().get('node') if cluster_enabled else None
+# Maximum number of agents of the first getagentsstats request sent to each daemon
+AGENTS_STATS_CHUNK_SIZE = 74
+# Maximum number of getagentsstats requests sent at the same time, which is also the number of open connections
+MAX_CONCURRENT_STATS_REQUESTS = 8
+# Error returned by the daemons when a request includes more agents than the ones they accept
+TOO_MANY_AGENTS_ERROR = 11
+# Number of agents per request accepted by the daemon of each socket
+_agents_stats_chunk_sizes = {}
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def totals(date: datetime.date) -> AffectedItemsFortishieldResult:
     """Retrieve statistical information for the current or specified date.
 
@@ -45,8 +58,8 @@ def totals(date: datetime.date) -> AffectedItemsFortishieldResult:
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def hourly() -> AffectedItemsFortishieldResult:
     """Compute hourly averages.
 
@@ -65,8 +78,8 @@ def hourly() -> AffectedItemsFortishieldResult:
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def weekly() -> AffectedItemsFortishieldResult:
     """Compute weekly averages.
 
@@ -85,6 +98,135 @@ def weekly() -> AffectedItemsFortishieldResult:
     return result
 
 
+async def _get_agents_stats_chunk(socket: str, agents: list, semaphore: asyncio.Semaphore) -> list:
+    """Get the statistics of a chunk of agents from a daemon, splitting it in halves while the daemon reports that
+    it includes too many agents.
+
+    Parameters
+    ----------
+    socket : str
+        Full path of the socket of the daemon.
+    agents : list
+        IDs of the agents.
+    semaphore : asyncio.Semaphore
+        Semaphore that bounds the number of requests sent at the same time.
+
+    Returns
+    -------
+    list
+        Responses of the daemon.
+    """
+    async with semaphore:
+        try:
+            return [await get_daemons_stats_socket(socket, agents_list=agents)]
+        except FortishieldException as e:
+            if e.code != TOO_MANY_AGENTS_ERROR or len(agents) == 1:
+                raise
+
+    half = (len(agents) + 1) // 2
+    _agents_stats_chunk_sizes[socket] = min(_agents_stats_chunk_sizes.get(socket, AGENTS_STATS_CHUNK_SIZE), half)
+    first_half, second_half = await asyncio.gather(_get_agents_stats_chunk(socket, agents[:half], semaphore),
+                                                   _get_agents_stats_chunk(socket, agents[half:], semaphore))
+
+    return first_half + second_half
+
+
+async def _get_daemon_agents_stats(socket: str, agents: list, semaphore: asyncio.Semaphore) -> tuple:
+    """Get the statistics of a list of agents from a daemon, requesting them in chunks.
+
+    The first chunk is requested alone to find out the number of agents per request accepted by the daemon, which is
+    kept for the next calls. The rest of chunks are requested at the same time.
+
+    Parameters
+    ----------
+    socket : str
+        Full path of the socket of the daemon.
+    agents : list
+        IDs of the agents.
+    semaphore : asyncio.Semaphore
+        Semaphore that bounds the number of requests sent at the same time.
+
+    Returns
+    -------
+    tuple
+        Statistics of the daemon with the ones of every agent sorted by ID, or None if no chunk could be read, and
+        list of errors of the chunks.
+    """
+    if not agents:
+        return None, []
+
+    first_chunk_size = _agents_stats_chunk_sizes.get(socket, AGENTS_STATS_CHUNK_SIZE)
+    try:
+        responses = await _get_agents_stats_chunk(socket, agents[:first_chunk_size], semaphore)
+    except FortishieldException as e:
+        return None, [e]
+
+    errors = []
+    chunk_size = _agents_stats_chunk_sizes.get(socket, first_chunk_size)
+    chunks = [agents[x:x + chunk_size] for x in range(first_chunk_size, len(agents), chunk_size)]
+    for chunk_responses in await asyncio.gather(*(_get_agents_stats_chunk(socket, chunk, semaphore)
+                                                  for chunk in chunks), return_exceptions=True):
+        if isinstance(chunk_responses, FortishieldException):
+            errors.append(chunk_responses)
+        elif isinstance(chunk_responses, BaseException):
+            raise chunk_responses
+        else:
+            responses.extend(chunk_responses)
+
+    daemon_result = responses[0]
+    daemon_result['agents'] = sorted(chain.from_iterable(response['agents'] for response in responses),
+                                     key=itemgetter('id'))
+
+    return daemon_result, errors
+
+
+async def _get_daemon_all_agents_stats(daemon: str, socket: str) -> tuple:
+    """Get the statistics of all the agents from a daemon, requesting the pages it returns until it has no more.
+
+    The last statistics collected by the statistics collector are used instead if they are recent enough.
+
+    Parameters
+    ----------
+    daemon : str
+        Name of the daemon.
+    socket : str
+        Full path of the socket of the daemon.
+
+    Returns
+    -------
+    tuple
+        Statistics of the daemon with the ones of every agent sorted by ID, or None if no page could be read, and list
+        of errors.
+    """
+    collector = get_collector()
+    if collector and (daemon_result := collector.get_latest(daemon, agents=True)):
+        return daemon_result, []
+
+    daemon_result = None
+    agents = []
+    errors = []
+    try:
+        last_id = 0
+        while True:
+            stats = await get_daemons_stats_socket(socket, agents_list='all', last_id=last_id)
+            if daemon_result is None:
+                daemon_result = stats['data']
+            agents.extend(stats['data']['agents'])
+
+            if len(stats['data']['agents']) > 0:
+                last_id = stats['data']['agents'][-1]['id']
+            if stats['message'] != 'due':
+                break
+    except FortishieldException as e:
+        errors.append(e)
+
+    # The daemons return the agents sorted by ID
+    if daemon_result is not None:
+        daemon_result['agents'] = agents
+
+    return daemon_result, errors
+
+
 @expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"],
                   post_proc_kwargs={'exclude_codes': [1701, 1703, 1707]})
 async def get_daemons_stats_agents(daemons_list: list = None, agent_list: list = None):
@@ -141,68 +283,33 @@ async def get_daemons_stats_agents(daemons_list: list = None, agent_list: list =
 
             # Transform the format of the agent ids to the general format
             eligible_agents = [int(agent) for agent in eligible_agents]
-
-            # To avoid the socket error 'Error 11 - Too many agents', we must use chunks of less than 75 agents
-            agents_chunks = [eligible_agents[x:x + 74] for x in range(0, len(eligible_agents), 74)]
-
-            for daemon in daemons_list or daemon_socket_mapping.keys():
-                daemon_results = []
-                for chunk in agents_chunks:
-                    try:
-                        for partial_daemon_result in daemon_results:
-                            if partial_daemon_result['name'] == daemon:
-                                res = await get_daemons_stats_socket(daemon_socket_mapping[daemon],
-                                                                     agents_list=chunk)
-                                partial_daemon_result['agents'].extend(res['agents'])
-                                break
-                        else:
-                            res = await get_daemons_stats_socket(daemon_socket_mapping[daemon],
-                                                                 agents_list=chunk)
-                            daemon_results.append(res)
-                    except exception.FortishieldException as e:
-                        result.add_failed_item(id_=daemon, error=e)
-                result.affected_items.extend(daemon_results)
-
-            # Sort list of affected agents
-            for affected_item in result.affected_items:
-                affected_item['agents'].sort(key=lambda d: d['id'])
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_STATS_REQUESTS)
+            daemons = list(daemons_list or daemon_socket_mapping.keys())
+            daemon_results = await asyncio.gather(*(
+                _get_daemon_agents_stats(daemon_socket_mapping[daemon], eligible_agents, semaphore)
+                for daemon in daemons))
 
         else:  # 'all' in agent_list
-            for daemon in daemons_list or daemon_socket_mapping.keys():
-                daemon_results = []
-                try:
-                    last_id = 0
-                    while True:
-                        stats = await get_daemons_stats_socket(
-                                        daemon_socket_mapping[daemon],
-                                        agents_list='all',
-                                        last_id=last_id)
-                        for partial_daemon_result in daemon_results:
-                            if partial_daemon_result['name'] == daemon:
-                                partial_daemon_result['agents'].extend(stats['data']['agents'])
-                                break
-                        else:
-                            daemon_results.append(stats['data'])
-
-                        if len(stats['data']['agents']) > 0:
-                            last_id = stats['data']['agents'][-1]['id']
-                        if stats['message'] != 'due':
-                            break
-
-                except exception.FortishieldException as e:
-                    result.add_failed_item(id_=daemon, error=e)
-                result.affected_items.extend(daemon_results)
-            # The affected agents are sorted, no need to sort here
+            daemons = list(daemons_list or daemon_socket_mapping.keys())
+            daemon_results = await asyncio.gather(*(_get_daemon_all_agents_stats(daemon, daemon_socket_mapping[daemon])
+                                                    for daemon in daemons))
+
+        for daemon, (daemon_result, errors) in zip(daemons, daemon_results):
+            if daemon_result:
+                result.affected_items.append(daemon_result)
+            for error in errors:
+                result.add_failed_item(id_=daemon, error=error)
 
     result.total_affected_items = len(result.affected_items)
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 async def get_daemons_stats(daemons_list: list = None) -> AffectedItemsFortishieldResult:
     """Get statistical information from the specified daemons.
     If the list is empty, the stats from all daemons will be retrieved.
+    The last stats read by the statistics collector are returned if they are recent enough.
 
     Parameters
     ----------
@@ -214,16 +321,17 @@ async def get_daemons_stats(daemons_list: list = None) -> AffectedItemsFortishie
     AffectedItemsFortishieldResult
         Dictionary with the stats of the input file.
     """
-    daemon_socket_mapping = {'fortishield-remoted': common.REMOTED_SOCKET,
-                             'fortishield-analysisd': common.ANALYSISD_SOCKET,
-                             'fortishield-db': common.WDB_SOCKET}
+    daemon_socket_mapping = get_daemons_sockets()
     result = AffectedItemsFortishieldResult(all_msg='Statistical information for each daemon was successfully read',
                                       some_msg='Could not read statistical information for some daemons',
                                       none_msg='Could not read statistical information for any daemon')
 
+    collector = get_collector()
     for daemon in daemons_list or daemon_socket_mapping.keys():
         try:
-            res = await get_daemons_stats_socket(daemon_socket_mapping[daemon])
+            # Use the last statistics collected if they are recent enough
+            res = collector and collector.get_latest(daemon) or \
+                await get_daemons_stats_socket(daemon_socket_mapping[daemon])
             result.affected_items.append(res)
         except FortishieldException as e:
             result.add_failed_item(id_=daemon, error=e)
@@ -232,8 +340,124 @@ async def get_daemons_stats(daemons_list: list = None) -> AffectedItemsFortishie
     return result
 
 
-@expose_resources(actions=[f"{'cluster' if cluster_enabled else 'manager'}:read"],
-                  resources=[f'node:id:{node_id}' if cluster_enabled else '*:*:*'])
+def _get_collected_metrics(daemons_list: list, metrics: list, result: AffectedItemsFortishieldResult) -> Iterator:
+    """Get the buffers of the metrics collected from each daemon, adding the daemons without them to the failed items
+    of the result.
+
+    Raises
+    ------
+    FortishieldError(1311)
+        The statistics collector is not running.
+
+    Yields
+    ------
+    tuple
+        Name of the daemon and buffer of each requested metric.
+    """
+    collector = get_collector()
+    if collector is None:
+        raise exception.FortishieldError(1311)
+
+    for daemon in daemons_list or get_daemons_sockets().keys():
+        daemon_metrics = collector.metrics.get(daemon)
+        if not daemon_metrics:
+            result.add_failed_item(id_=daemon, error=exception.FortishieldError(1312))
+            continue
+        yield daemon, {name: buffer for name, buffer in daemon_metrics.items() if not metrics or name in metrics}
+
+
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
+async def get_daemons_stats_history(daemons_list: list = None, metrics: list = None,
+                                    seconds: int = None) -> AffectedItemsFortishieldResult:
+    """Get the samples of the statistics of the daemons taken by the statistics collector.
+    If the daemons list is empty, the samples of all daemons will be retrieved.
+
+    Parameters
+    ----------
+    daemons_list : list
+        List of the daemons to get the samples from.
+    metrics : list
+        Names of the metrics to get, with the names of their parents joined by dots (`events.processed`, for
+        instance). All of them are returned if it is empty.
+    seconds : int
+        Only return the samples taken in the last seconds.
+
+    Raises
+    ------
+    FortishieldError(1311)
+        The statistics collector is not running.
+
+    Returns
+    -------
+    AffectedItemsFortishieldResult
+        Samples of each metric of each daemon, from the oldest to the newest.
+    """
+    result = AffectedItemsFortishieldResult(all_msg='Statistical information for each daemon was successfully read',
+                                      some_msg='Could not read statistical information for some daemons',
+                                      none_msg='Could not read statistical information for any daemon')
+    since = time.time() - seconds if seconds else None
+
+    for daemon, buffers in _get_collected_metrics(daemons_list, metrics, result):
+        result.affected_items.append({
+            'name': daemon,
+            'metrics': {name: [{'timestamp': get_date_from_timestamp(timestamp), 'value': value}
+                               for timestamp, value in buffer.samples(since=since)]
+                        for name, buffer in buffers.items()}
+        })
+
+    result.total_affected_items = len(result.affected_items)
+    return result
+
+
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
+async def get_daemons_stats_rates(daemons_list: list = None, metrics: list = None,
+                                  seconds: int = None) -> AffectedItemsFortishieldResult:
+    """Get the increase and the increase per second of the statistics of the daemons, computed with the samples taken
+    by the statistics collector.
+    If the daemons list is empty, the rates of all daemons will be retrieved.
+
+    Parameters
+    ----------
+    daemons_list : list
+        List of the daemons to get the rates from.
+    metrics : list
+        Names of the metrics to get, with the names of their parents joined by dots (`events.processed`, for
+        instance). All of them are returned if it is empty.
+    seconds : int
+        Only use the samples taken in the last seconds.
+
+    Raises
+    ------
+    FortishieldError(1311)
+        The statistics collector is not running.
+
+    Returns
+    -------
+    AffectedItemsFortishieldResult
+        Increase, increase per second and dates of the first and the last samples of each metric of each daemon.
+    """
+    result = AffectedItemsFortishieldResult(all_msg='Statistical information for each daemon was successfully read',
+                                      some_msg='Could not read statistical information for some daemons',
+                                      none_msg='Could not read statistical information for any daemon')
+    since = time.time() - seconds if seconds else None
+
+    for daemon, buffers in _get_collected_metrics(daemons_list, metrics, result):
+        daemon_rates = {}
+        for name, buffer in buffers.items():
+            daemon_rates[name] = rates = buffer.delta(since=since)
+            for field in ('from', 'to'):
+                if rates[field] is not None:
+                    rates[field] = get_date_from_timestamp(rates[field])
+        result.affected_items.append({'name': daemon, 'metrics': daemon_rates})
+
+    result.total_affected_items = len(result.affected_items)
+    return result
+
+
+@expose_resources(actions=partial(get_node_rbac_actions, 'read'),
+                  resources=get_node_rbac_resources)
 def deprecated_get_daemons_stats(filename):
     """Get daemons stats from an input file.
 
@@ -3,7 +3,7 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 from glob import glob
-from typing import Union
+from typing import Iterator, Union
 
 from fortishield.core import common
 from fortishield.core.agent import Agent, get_agents_info, get_rbac_filters, FortishieldDBQueryAgents
@@ -15,6 +15,14 @@ from fortishield.core.fortishield_queue import FortishieldQueue
 from fortishield.core.fdb import FortishieldDBConnection
 from fortishield.rbac.decorators import expose_resources
 
+# Fields of the FIM findings, and the ones returned in their summary
+FILES_FIELDS = {"date": "date", "arch": "arch", "value.type": "value_type", "value.name": "value_name",
+                "mtime": "mtime", "file": "file", "size": "size", "perm": "perm",
+                "uname": "uname", "gname": "gname", "md5": "md5", "sha1": "sha1", "sha256": "sha256",
+                "inode": "inode", "gid": "gid", "uid": "uid", "type": "type", "changes": "changes",
+                "attributes": "attributes"}
+FILES_SUMMARY_FIELDS = {"date": "date", "mtime": "mtime", "file": "file"}
+
 
 @expose_resources(actions=["syscheck:run"], resources=["agent:id:{agent_list}"],
                   post_proc_kwargs={'exclude_codes': [1701, 1707]})
@@ -205,24 +213,13 @@ def files(agent_list: list = None, offset: int = 0, limit: int = common.DATABASE
     AffectedItemsFortishieldResult
         Confirmation/Error message.
     """
-    if filters is None:
-        filters = {}
-    parameters = {"date": "date", "arch": "arch", "value.type": "value_type", "value.name": "value_name",
-                  "mtime": "mtime", "file": "file", "size": "size", "perm": "perm",
-                  "uname": "uname", "gname": "gname", "md5": "md5", "sha1": "sha1", "sha256": "sha256",
-                  "inode": "inode", "gid": "gid", "uid": "uid", "type": "type", "changes": "changes",
-                  "attributes": "attributes"}
-    summary_parameters = {"date": "date", "mtime": "mtime", "file": "file"}
+    filters, q = _parse_hash_filter(filters, q)
     result = AffectedItemsFortishieldResult(all_msg='FIM findings of the agent were returned',
                                       none_msg='No FIM information was returned')
 
-    if 'hash' in filters:
-        q = f'(md5={filters["hash"]},sha1={filters["hash"]},sha256={filters["hash"]})' + ('' if not q else ';' + q)
-        del filters['hash']
-
     with FortishieldDBQuerySyscheck(agent_id=agent_list[0], offset=offset, limit=limit, sort=sort, search=search,
                               filters=filters, nested=nested, query=q, select=select, table='fim_entry',
-                              distinct=distinct, fields=summary_parameters if summary else parameters,
+                              distinct=distinct, fields=FILES_SUMMARY_FIELDS if summary else FILES_FIELDS,
                               min_select_fields={'file'}) as db_query:
         db_query = db_query.run()
 
@@ -230,3 +227,74 @@ def files(agent_list: list = None, offset: int = 0, limit: int = common.DATABASE
     result.total_affected_items = db_query['totalItems']
 
     return result
+
+
+@expose_resources(actions=["syscheck:read"], resources=["agent:id:{agent_list}"], post_proc_func=None)
+def export_files(agent_list: list = None, search: dict = None, select: list = None, filters: dict = None,
+                 q: str = '', nested: bool = True, summary: bool = False) -> Iterator[list]:
+    """Get the files of the syscheck database of the specified agent in chunks, to export them.
+
+    Unlike `files`, the items are neither counted nor sorted, and they are read from the database in chunks paginated
+    by row ID, so the memory used and the cost of each chunk do not depend on the number of items.
+
+    Parameters
+    ----------
+    agent_list : list
+        List containing the agent ID.
+    search : dict
+        Looks for items with the specified string. Format: {"fields": ["field1","field2"]}
+    select : list[str]
+        Select fields to return. Format: ["field1","field2"].
+    filters : dict
+        Fields to filter by.
+    q : str
+        Query to filter by.
+    nested : bool
+        Specify whether there are nested fields or not.
+    summary : bool
+        Return a summary of each file.
+
+    Raises
+    ------
+    FortishieldResourceNotFound(1701)
+        The agent does not exist.
+
+    Yields
+    ------
+    list
+        Items of each chunk.
+    """
+    if not agent_list:
+        return
+    if agent_list[0] not in get_agents_info():
+        raise FortishieldResourceNotFound(1701)
+
+    filters, q = _parse_hash_filter(filters, q)
+    with FortishieldDBQuerySyscheck(agent_id=agent_list[0], offset=0, limit=None, sort=None, search=search,
+                              filters=filters, nested=nested, query=q, select=select, table='fim_entry',
+                              fields=FILES_SUMMARY_FIELDS if summary else FILES_FIELDS,
+                              min_select_fields={'file'}) as db_query:
+        yield from db_query.stream()
+
+
+def _parse_hash_filter(filters: Union[dict, None], q: str) -> tuple:
+    """Replace the `hash` filter by a query that matches any of the hashes of the files.
+
+    Parameters
+    ----------
+    filters : dict or None
+        Fields to filter by.
+    q : str
+        Query to filter by.
+
+    Returns
+    -------
+    tuple
+        Filters without the `hash` one and query.
+    """
+    filters = dict(filters) if filters else {}
+    if 'hash' in filters:
+        q = f'(md5={filters["hash"]},sha1={filters["hash"]},sha256={filters["hash"]})' + ('' if not q else ';' + q)
+        del filters['hash']
+
+    return filters, q
@@ -2,11 +2,13 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+from typing import Iterator
+
 from fortishield.core import common
 from fortishield.core.agent import get_agents_info
 from fortishield.core.exception import FortishieldResourceNotFound
-from fortishield.core.results import AffectedItemsFortishieldResult, merge
-from fortishield.core.syscollector import FortishieldDBQuerySyscollector, get_valid_fields, Type
+from fortishield.core.results import AffectedItemsFortishieldResult
+from fortishield.core.syscollector import FortishieldDBQuerySyscollector, get_agents_items, get_valid_fields, Type
 from fortishield.rbac.decorators import expose_resources
 
 
@@ -58,39 +60,68 @@ def get_item_agent(agent_list: list, offset: int = 0, limit: int = common.DATABA
     )
 
     system_agents = get_agents_info()
-    for agent in agent_list:
-        try:
-            if agent not in system_agents:
-                raise FortishieldResourceNotFound(1701)
-            table, valid_select_fields = get_valid_fields(Type(element_type), agent_id=agent)
-            with FortishieldDBQuerySyscollector(agent_id=agent, offset=offset, limit=limit, select=select,
-                                          search=search,
-                                          sort=sort, filters=filters, fields=valid_select_fields, table=table,
-                                          array=array, nested=nested, query=q, distinct=distinct) as db_query:
-                data = db_query.run()
-
-            for item in data['items']:
-                item['agent_id'] = agent
-                result.affected_items.append(item)
-            result.total_affected_items += data['totalItems']
-        except FortishieldResourceNotFound as e:
-            result.add_failed_item(id_=agent, error=e)
-
-    # Avoid that integer type fields are casted to string, this prevents sort parameter malfunctioning
-    try:
-        if len(result.affected_items) and sort and len(sort['fields']) == 1:
-            fields = sort['fields'][0].split('.')
-            element = result.affected_items[0][fields.pop(0)]
-            for field in fields:
-                element = element[field]
-            element_type = type(element).__name__
-            result.sort_casting = [element_type] if element_type not in ['str', 'datetime'] else ['str']
-    except KeyError:
-        pass
-
-    result.affected_items = merge(*[[res] for res in result.affected_items],
-                                  criteria=result.sort_fields,
-                                  ascending=result.sort_ascending,
-                                  types=result.sort_casting)
-
-    return result
+
+    def query_agent(agent_id, connection, query_offset, query_limit):
+        if agent_id not in system_agents:
+            raise FortishieldResourceNotFound(1701)
+        table, valid_select_fields = get_valid_fields(Type(element_type), agent_id=agent_id)
+        with FortishieldDBQuerySyscollector(agent_id=agent_id, offset=query_offset, limit=query_limit, select=select,
+                                      search=search, sort=sort, filters=filters, fields=valid_select_fields,
+                                      table=table, array=array, nested=nested, query=q, distinct=distinct,
+                                      connection=connection) as db_query:
+            return db_query.run()
+
+    return get_agents_items(result, agent_list, query_agent, offset=offset, limit=limit,
+                            cast_sort_field=sort is not None)
+
+
+@expose_resources(actions=['syscollector:read'], resources=['agent:id:{agent_list}'], post_proc_func=None)
+def export_item_agent(agent_list: list, select: dict = None, search: dict = None, filters: dict = None, q: str = '',
+                      nested: bool = True, element_type: str = 'os') -> Iterator[list]:
+    """Get the syscollector information of a list of agents in chunks, to export it.
+
+    Unlike `get_item_agent`, the items are neither counted nor sorted, and they are read from the database of each
+    agent in chunks paginated by row ID, so the memory used and the cost of each chunk do not depend on the number of
+    items.
+
+    Parameters
+    ----------
+    agent_list : list
+        List of agent IDs.
+    select : dict
+        Select fields to return. Format: {"fields":["field1","field2"]}.
+    search : dict
+        Looks for items with the specified string. Format: {"fields": ["field1","field2"]}
+    filters : dict
+        Fields to filter by.
+    q : str
+        Query to filter by.
+    nested : bool
+        Specify whether there are nested fields or not.
+    element_type : str
+        Type of element to get syscollector information from. Default: 'os'
+
+    Raises
+    ------
+    FortishieldResourceNotFound(1701)
+        None of the agents exists.
+
+    Yields
+    ------
+    list
+        Items of each chunk, with the ID of their agent.
+    """
+    system_agents = get_agents_info()
+    agents = [agent for agent in agent_list if agent in system_agents]
+    if agent_list and not agents:
+        raise FortishieldResourceNotFound(1701)
+
+    for agent in agents:
+        table, valid_select_fields = get_valid_fields(Type(element_type), agent_id=agent)
+        with FortishieldDBQuerySyscollector(agent_id=agent, offset=0, limit=None, select=select, search=search,
+                                      sort=None, filters=filters, fields=valid_select_fields, table=table,
+                                      array=True, nested=nested, query=q) as db_query:
+            for items in db_query.stream():
+                for item in items:
+                    item['agent_id'] = agent
+                yield items
@@ -19,6 +19,7 @@ with patch('fortishield.core.common.fortishield_uid'):
         fortishield.rbac.decorators.expose_resources = RBAC_bypasser
 
         from fortishield.active_response import run_command
+        from fortishield.core import active_response
         from fortishield.core.tests.test_active_response import agent_config, agent_info_exception_and_version
 
 test_data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'etc', 'shared', 'ar.conf')
@@ -45,7 +46,7 @@ full_agent_list = ['000', '001', '002', '003', '004', '005', '006', '007', '008'
 @patch("fortishield.syscheck.FortishieldQueue._send", return_value='1')
 @patch("fortishield.core.fortishield_queue.FortishieldQueue.close")
 @patch('fortishield.core.common.AR_CONF', new=test_data_path)
-@patch('fortishield.active_response.get_agents_info', return_value=full_agent_list)
+@patch('fortishield.active_response.get_agents_info', return_value=set(full_agent_list))
 def test_run_command(mock_get_agents_info, mock_close, mock_send, mock_conn, message_exception,
                      send_exception, agent_id, command, arguments, alert, version):
     """Verify the proper operation of active_response module.
@@ -67,8 +68,11 @@ def test_run_command(mock_get_agents_info, mock_close, mock_send, mock_conn, mes
     version : list
         List with the agent version to test whether the message sent was the correct one or not.
     """
-    with patch('fortishield.core.agent.Agent.get_basic_information',
-               return_value=agent_info_exception_and_version(send_exception, version)):
+    agents_info = [{'id': agent, **agent_info_exception_and_version(send_exception, version)}
+                   for agent in agent_id if agent in full_agent_list and agent != '000']
+    active_response.ar_disabled_cache.clear()
+    with patch('fortishield.active_response.FortishieldDBQueryAgents') as mock_db_query:
+        mock_db_query.return_value.__enter__.return_value.run.return_value = {'items': agents_info}
         with patch('fortishield.core.agent.Agent.get_config', return_value=agent_config(send_exception)):
             if message_exception:
                 ret = run_command(agent_list=agent_id, command=command, arguments=arguments, alert=alert)
@@ -80,3 +84,34 @@ def test_run_command(mock_get_agents_info, mock_close, mock_send, mock_conn, mes
                     assert ret.render()['data']['failed_items'][0]['error']['code'] == send_exception
                 else:
                     assert ret.render()['message'] == 'AR command was sent to all agents'
+
+
+@patch("fortishield.core.fortishield_queue.FortishieldQueue._connect")
+@patch("fortishield.core.fortishield_queue.FortishieldQueue._send")
+@patch("fortishield.core.fortishield_queue.FortishieldQueue.close")
+@patch('fortishield.core.common.AR_CONF', new=test_data_path)
+@patch('fortishield.active_response.get_agents_info', return_value=set(full_agent_list))
+def test_run_command_bulk(mock_get_agents_info, mock_close, mock_send, mock_conn):
+    """Verify that the agents information is obtained with a single query and each agent is reported as expected."""
+    agents_info = [{'id': '001', 'status': 'active', 'version': 'Fortishield v4.0.0'},
+                   {'id': '002', 'status': 'disconnected', 'version': 'Fortishield v4.0.0'},
+                   {'id': '003', 'status': 'active', 'version': 'Fortishield v4.2.0'},
+                   {'id': '004', 'status': 'active', 'version': 'Fortishield v4.2.0'}]
+    active_response.ar_disabled_cache.clear()
+    with patch('fortishield.active_response.FortishieldDBQueryAgents') as mock_db_query, \
+            patch('fortishield.core.agent.Agent.get_config', return_value=agent_config(None)) as mock_get_config:
+        mock_db_query.return_value.__enter__.return_value.run.return_value = {'items': agents_info}
+        ret = run_command(agent_list=['000', '001', '002', '003', '004', '005', '999'],
+                          command='restart-fortishield0', arguments=[])
+        mock_db_query.assert_called_once()
+
+        # The active response configuration is cached for each agent and version
+        assert mock_get_config.call_count == 3
+        run_command(agent_list=['001', '003', '004'], command='restart-fortishield0', arguments=[])
+        assert mock_get_config.call_count == 3
+
+    assert ret.affected_items == ['001', '003', '004']
+    failed_items = {code: ids for code, ids in
+                    ((error.code, sorted(ids)) for error, ids in ret.failed_items.items())}
+    assert failed_items == {1703: ['000'], 1707: ['002'], 1701: ['005', '999']}
+    assert mock_send.call_count == 6
@@ -25,10 +25,10 @@ with patch('fortishield.core.common.fortishield_uid'):
         fortishield.rbac.decorators.expose_resources = RBAC_bypasser
 
         from fortishield.agent import add_agent, assign_agents_to_group, create_group, delete_agents, delete_groups, \
-            get_agent_conf, get_agent_config, get_agent_groups, get_agents, get_agents_in_group, \
-            get_agents_keys, get_agents_summary_os, get_agents_summary_status, get_agents_sync_group, \
-            get_distinct_agents, get_file_conf, get_full_overview, get_group_files, get_outdated_agents, \
-            get_upgrade_result, remove_agent_from_group, remove_agent_from_groups, remove_agents_from_group, \
+            export_agents, get_agent_conf, get_agent_config, get_agent_groups, get_agents, get_agents_in_group, \
+            get_agents_keys, get_agents_overview_stats, get_agents_summary_os, get_agents_summary_status, \
+            get_agents_sync_group, get_distinct_agents, get_file_conf, get_full_overview, get_group_files, \
+            get_outdated_agents, get_upgrade_result, remove_agent_from_group, remove_agent_from_groups, remove_agents_from_group, \
             restart_agents, upgrade_agents, upload_group_file, restart_agents_by_node, reconnect_agents, \
             ERROR_CODES_UPGRADE_SOCKET_BAD_REQUEST, ERROR_CODES_UPGRADE_SOCKET
         from fortishield.core.agent import Agent
@@ -181,6 +181,69 @@ def test_agent_get_agents_summary_status(socket_mock, send_mock):
         'The agents connection or configuration status counts are not the expected ones'
 
 
+@patch('fortishield.core.fdb.FortishieldDBConnection._send', side_effect=send_msg_to_fdb)
+@patch('socket.socket.connect')
+def test_agent_get_agents_overview_stats(socket_mock, send_mock):
+    """Test `get_agents_overview_stats` returns the same items as the separate queries using a single request."""
+    stats = get_agents_overview_stats(short_agent_list)
+    assert isinstance(stats, FortishieldResult), 'The returned object is not an "FortishieldResult" instance.'
+    send_mock.assert_called_once()
+
+    def sort_items(items):
+        return sorted(items, key=lambda item: dumps(item, sort_keys=True))
+
+    for name, fields in [('nodes', ['node_name']), ('agent_os', ['os.name', 'os.platform', 'os.version']),
+                         ('agent_version', ['version'])]:
+        distinct = get_distinct_agents(short_agent_list, fields=fields, q='id!=000').affected_items
+        assert sort_items(stats['data'][name]) == sort_items(distinct)
+    assert stats['data']['agent_status'] == get_agents_summary_status(short_agent_list)['data']
+
+
+@pytest.mark.parametrize('agent_list, master_stats, cached', [
+    (full_agent_list, {'nodes': [{'node_name': 'master', 'count': 2}],
+                       'agent_os': [{'os.name': 'Ubuntu', 'os.platform': 'ubuntu', 'count': 1}, {'count': 1}],
+                       'agent_version': [{'version': 'Fortishield v4.8.0', 'count': 2}],
+                       'agent_status': [{'status': 'active', 'group_config_status': 'synced', 'count': 2}],
+                       'groups': [{'group': 'default', 'count': 2}]}, True),
+    (full_agent_list, None, False),
+    (short_agent_list, {}, False)
+])
+@patch('fortishield.agent.get_agents_info', return_value=set(full_agent_list))
+@patch('fortishield.core.fdb.FortishieldDBConnection._send', side_effect=send_msg_to_fdb)
+@patch('socket.socket.connect')
+def test_agent_get_master_agents_stats(socket_mock, send_mock, agents_info_mock, agent_list, master_stats, cached):
+    """Test that the agents summaries use the statistics kept by the master when every agent can be read.
+
+    Parameters
+    ----------
+    agent_list : list
+        List of agents the user can read.
+    master_stats : dict
+        Statistics returned by the master. None if they are not ready yet.
+    cached : bool
+        Whether the statistics of the master are expected to be used.
+    """
+    status = get_agents_summary_status(agent_list, agents_stats=master_stats)['data']
+    platforms = get_agents_summary_os(agent_list, agents_stats=master_stats).affected_items
+    stats = get_agents_overview_stats(agent_list, agents_stats=master_stats)['data']
+
+    if not cached:
+        # The database is queried instead
+        assert 'ubuntu' in platforms
+        assert send_mock.called
+        return
+
+    expected_status = {'connection': {'active': 2, 'disconnected': 0, 'never_connected': 0, 'pending': 0, 'total': 2},
+                       'configuration': {'synced': 2, 'not_synced': 0, 'total': 2}}
+    assert status == stats['agent_status'] == expected_status
+    assert platforms == ['ubuntu']
+    assert stats['nodes'] == [{'node_name': 'master', 'count': 2}]
+    assert stats['agent_os'] == [{'os': {'name': 'Ubuntu', 'platform': 'ubuntu', 'version': 'N/A'}, 'count': 1},
+                                 {'os': {'name': 'N/A', 'platform': 'N/A', 'version': 'N/A'}, 'count': 1}]
+    assert stats['agent_version'] == [{'version': 'Fortishield v4.8.0', 'count': 2}]
+    send_mock.assert_not_called()
+
+
 @patch('fortishield.core.fdb.FortishieldDBConnection._send', side_effect=send_msg_to_fdb)
 @patch('socket.socket.connect')
 def test_agent_get_agents_summary_os(connect_mock, send_mock):
@@ -304,6 +367,34 @@ def test_agent_get_agents(socket_mock, send_mock, agent_list, expected_items):
         assert (failed_item.message == 'Agent does not exist' for failed_item in result.failed_items.keys())
 
 
+@pytest.mark.parametrize('agent_list, select, q', [
+    (full_agent_list, None, None),
+    (['001', '400', '002', '500'], ['name', 'os.platform'], None),
+    (full_agent_list, ['name'], 'status=active'),
+    ([], None, None)
+])
+@patch('fortishield.core.common.CLIENT_KEYS', new=os.path.join(test_agent_path, 'client.keys'))
+@patch('fortishield.core.fdb.FortishieldDBConnection._send', side_effect=send_msg_to_fdb)
+@patch('socket.socket.connect')
+def test_agent_export_agents(socket_mock, send_mock, agent_list, select, q):
+    """Test that `export_agents` yields the same agents returned by `get_agents`, in chunks.
+
+    Parameters
+    ----------
+    agent_list : List of str
+        List of agent ID's.
+    select : list
+        Fields to return.
+    q : str
+        Query to filter the agents by.
+    """
+    expected = get_agents(agent_list=agent_list, select=select, q=q, limit=None).affected_items
+    chunks = list(export_agents(agent_list=agent_list, select=select, q=q))
+
+    assert all(chunks)
+    assert [agent for chunk in chunks for agent in chunk] == expected
+
+
 @pytest.mark.parametrize('group, group_exists, expected_agents', [
     ('default', True, ['001', '002', '005']),
     ('not_exists_group', False, None)
@@ -1429,14 +1520,13 @@ def test_agent_upload_group_file(mock_upload, group_list):
     (full_agent_list, ['group-1'], True, None)
 ])
 @patch('fortishield.core.common.SHARED_PATH', new=test_shared_path)
-@patch('fortishield.agent.get_distinct_agents')
+@patch('fortishield.agent.get_agents_overview_stats')
 @patch('fortishield.agent.get_agent_groups')
-@patch('fortishield.agent.get_agents_summary_status')
 @patch('fortishield.agent.get_agents')
 @patch('fortishield.core.fdb.FortishieldDBConnection._send', side_effect=send_msg_to_fdb)
 @patch('socket.socket.connect')
-def test_agent_get_full_overview(socket_mock, send_mock, get_mock, summary_mock, group_mock, distinct_mock, agent_list,
-                                 group_list, index_error, last_agent):
+def test_agent_get_full_overview(socket_mock, send_mock, get_mock, group_mock, stats_mock, agent_list, group_list,
+                                 index_error, last_agent):
     """Test `get_full_overview` function from agent module.
 
     Parameters
@@ -1452,24 +1542,20 @@ def test_agent_get_full_overview(socket_mock, send_mock, get_mock, summary_mock,
     """
     expected_fields = ['nodes', 'groups', 'agent_os', 'agent_status', 'agent_version', 'last_registered_agent']
 
-    def mocked_get_distinct_agents(fields, q):
-        return get_distinct_agents(agent_list=agent_list, fields=fields, q=q)
+    def mocked_get_agents_overview_stats(agents_stats):
+        return get_agents_overview_stats(agent_list=agent_list, agents_stats=agents_stats)
 
     def mocked_get_agent_groups():
         return get_agent_groups(group_list=group_list)
 
-    def mocked_get_agents_summary_status():
-        return get_agents_summary_status(agent_list=agent_list)
-
     def mocked_get_agents(limit, sort, q):
         if index_error:
             raise IndexError()
         else:
             return get_agents(agent_list=agent_list, limit=limit, sort=sort, q=q)
 
-    distinct_mock.side_effect = mocked_get_distinct_agents
+    stats_mock.side_effect = mocked_get_agents_overview_stats
     group_mock.side_effect = mocked_get_agent_groups
-    summary_mock.side_effect = mocked_get_agents_summary_status
     get_mock.side_effect = mocked_get_agents
     result = get_full_overview()
     assert isinstance(result, FortishieldResult), 'The returned object is not an "FortishieldResult" instance.'
@@ -103,9 +103,9 @@ async def test_get_nodes_info():
     True,
     False
 ])
-@patch("fortishield.cluster.node_id", new="testing_node")
+@patch("fortishield.cluster.get_node_id", return_value="testing_node")
 @pytest.mark.asyncio
-async def test_get_ruleset_sync_status(ruleset_integrity):
+async def test_get_ruleset_sync_status(get_node_id_mock, ruleset_integrity):
     """Verify that `get_ruleset_sync_status` function correctly returns node ruleset synchronization status."""
     master_md5 = {'key1': 'value1'}
     with patch("fortishield.cluster.get_node_ruleset_integrity",
@@ -117,9 +117,9 @@ async def test_get_ruleset_sync_status(ruleset_integrity):
         assert result.affected_items[0]['synced'] is ruleset_integrity
 
 
-@patch("fortishield.cluster.node_id", new="testing_node")
+@patch("fortishield.cluster.get_node_id", return_value="testing_node")
 @pytest.mark.asyncio
-async def test_get_ruleset_sync_status_ko():
+async def test_get_ruleset_sync_status_ko(get_node_id_mock):
     """Verify proper exceptions behavior with `get_ruleset_sync_status`."""
     exc = FortishieldError(1000)
     with patch("fortishield.cluster.get_node_ruleset_integrity", side_effect=exc):
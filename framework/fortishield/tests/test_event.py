@@ -24,22 +24,25 @@ with patch('fortishield.core.common.fortishield_uid'):
         from fortishield.event import MSG_HEADER, send_event_to_analysisd
 
 
-@pytest.mark.parametrize('events,side_effects,message', [
-    (['{"foo": 1}'], (None,), 'All events were forwarded to analisysd'),
-    (['{"foo": 1}', '{"bar": 2}'], (None, None), 'All events were forwarded to analisysd'),
-    (['{"foo": 1}', '{"bar": 2}'], (FortishieldError(1014), None), 'Some events were forwarded to analisysd'),
-    (['{"foo": 1}', '{"bar": 2}'], (FortishieldError(1014), FortishieldError(1014)), 'No events were forwarded to analisysd'),
+@pytest.mark.parametrize('events,failed_events,message', [
+    (['{"foo": 1}'], {}, 'All events were forwarded to analisysd'),
+    (['{"foo": 1}', '{"bar": 2}'], {}, 'All events were forwarded to analisysd'),
+    (['{"foo": 1}', '{"bar": 2}'], {0: FortishieldError(1014)}, 'Some events were forwarded to analisysd'),
+    (['{"foo": 1}', '{"bar": 2}'], {0: FortishieldError(1014), 1: FortishieldError(1014)},
+     'No events were forwarded to analisysd'),
 ])
-@patch('fortishield.event.FortishieldAnalysisdQueue.send_msg')
+@pytest.mark.parametrize('echo_events', [True, False])
+@patch('fortishield.event.FortishieldAnalysisdQueue.send_msgs')
 @patch('socket.socket.connect')
-def test_send_event_to_analysisd(socket_mock, send_msg_mock, events, side_effects, message):
-    send_msg_mock.side_effect = side_effects
-    ret_val = send_event_to_analysisd(events=events)
+def test_send_event_to_analysisd(socket_mock, send_msgs_mock, echo_events, events, failed_events, message):
+    send_msgs_mock.return_value = failed_events
+    ret_val = send_event_to_analysisd(events=events, echo_events=echo_events)
 
-    assert send_msg_mock.call_count == len(events)
-    for i, event in enumerate(events):
-        assert send_msg_mock.call_args_list[i].kwargs['msg_header'] == MSG_HEADER
-        assert send_msg_mock.call_args_list[i].kwargs['msg'] == event
+    send_msgs_mock.assert_called_once_with(msg_header=MSG_HEADER, msgs=events)
 
-    assert ret_val.affected_items == [events[i] for i, v in enumerate(side_effects) if v is None]
+    sent_events = [event for i, event in enumerate(events) if i not in failed_events]
+    assert ret_val.affected_items == (sent_events if echo_events else [])
+    assert ret_val.total_affected_items == len(sent_events)
+    failed_ids = {id_ for ids in ret_val.failed_items.values() for id_ in ids}
+    assert failed_ids == ({events[i] for i in failed_events} if echo_events else set(failed_events))
     assert ret_val.message == message
@@ -2,6 +2,7 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import asyncio
 import sys
 from datetime import date
 from json import dumps
@@ -19,6 +20,8 @@ with patch('fortishield.core.common.fortishield_uid'):
         fortishield.rbac.decorators.expose_resources = RBAC_bypasser
 
         import fortishield.stats as stats
+        from fortishield.core.exception import FortishieldError, FortishieldException
+        from fortishield.core.stats_collector import DaemonsStatsCollector, MetricRingBuffer
         from fortishield.core.results import AffectedItemsFortishieldResult
         from api.util import remove_nones_to_dict
         from fortishield.core.tests.test_agent import InitAgent
@@ -89,6 +92,51 @@ async def test_get_daemons_stats_ko():
         'Expected error code was not returned'
 
 
+
+@pytest.mark.asyncio
+@patch('fortishield.core.common.REMOTED_SOCKET', '/var/ossec/queue/sockets/remote')
+@patch('fortishield.stats.get_daemons_stats_socket', return_value={'name': 'fortishield-remoted'})
+async def test_get_daemons_stats_collected(mock_get_daemons_stats_socket):
+    """Makes sure get_daemons_stats() returns the last statistics collected when they are recent enough."""
+    collector = MagicMock()
+    collector.get_latest.side_effect = lambda daemon: {'name': daemon} if daemon == 'fortishield-analysisd' else None
+    with patch('fortishield.stats.get_collector', return_value=collector):
+        response = await stats.get_daemons_stats(['fortishield-remoted', 'fortishield-analysisd'])
+
+    mock_get_daemons_stats_socket.assert_called_once_with('/var/ossec/queue/sockets/remote')
+    assert response.affected_items == [{'name': 'fortishield-remoted'}, {'name': 'fortishield-analysisd'}]
+
+
+@pytest.mark.asyncio
+async def test_get_daemons_stats_history_and_rates():
+    """Makes sure get_daemons_stats_history() and get_daemons_stats_rates() use the samples of the collector."""
+    collector = DaemonsStatsCollector(size=10)
+    collector.metrics['fortishield-analysisd'] = {'events.received': MetricRingBuffer(10),
+                                                  'events.processed': MetricRingBuffer(10)}
+    for timestamp, value in [(1000, 10), (1010, 30), (1020, 60)]:
+        for buffer in collector.metrics['fortishield-analysisd'].values():
+            buffer.append(timestamp, value)
+
+    with patch('fortishield.stats.get_collector', return_value=collector), \
+            patch('fortishield.stats.time.time', return_value=1025):
+        history = await stats.get_daemons_stats_history(['fortishield-analysisd', 'fortishield-remoted'],
+                                                        metrics=['events.received'], seconds=20)
+        rates = await stats.get_daemons_stats_rates(['fortishield-analysisd'], metrics=['events.received'])
+
+    assert [item['name'] for item in history.affected_items] == ['fortishield-analysisd']
+    assert [sample['value'] for sample in history.affected_items[0]['metrics']['events.received']] == [30, 60]
+    assert list(history.affected_items[0]['metrics']) == ['events.received']
+    assert [error.code for error in history.failed_items] == [1312]
+
+    metric_rates = rates.affected_items[0]['metrics']['events.received']
+    assert (metric_rates['delta'], metric_rates['rate']) == (50, 2.5)
+    assert metric_rates['from'].timestamp() == 1000 and metric_rates['to'].timestamp() == 1020
+
+    with patch('fortishield.stats.get_collector', return_value=None):
+        with pytest.raises(FortishieldError, match='.* 1311 .*'):
+            await stats.get_daemons_stats_rates()
+
+
 def side_effect_test_get_daemons_stats(daemon_path, agents_list):
     return {'name': SOCKET_PATH_DAEMONS_MAPPING[daemon_path], 'agents': [{'id': a} for a in agents_list]}
 
@@ -134,6 +182,56 @@ async def test_get_daemons_stats_agents(mock_get_daemons_stats_socket, mock_get_
         'The result is not an AffectedItemsFortishieldResult object'
 
 
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('daemon_limit, expected_chunk_size, expected_rejected', [
+    (100, 74, 0),
+    (40, 37, 1),
+    (10, 9, 7)
+])
+@patch.dict('fortishield.stats._agents_stats_chunk_sizes', clear=True)
+async def test_get_daemon_agents_stats_chunks(daemon_limit, expected_chunk_size, expected_rejected):
+    """Check that the chunks are requested at the same time, up to the limit, with the number of agents accepted by
+    the daemon."""
+    running = []
+    max_running = 0
+
+    async def get_daemons_stats_socket(socket, agents_list):
+        nonlocal max_running
+        if len(agents_list) > daemon_limit:
+            raise FortishieldException(11, 'Too many agents', cmd_error=True)
+        running.append(agents_list)
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0)
+        running.remove(agents_list)
+        return {'name': 'fortishield-remoted', 'agents': [{'id': agent} for agent in agents_list]}
+
+    with patch('fortishield.stats.get_daemons_stats_socket', side_effect=get_daemons_stats_socket) as socket_mock:
+        daemon_result, errors = await stats._get_daemon_agents_stats('/var/ossec/queue/sockets/remote',
+                                                                     list(range(400, 0, -1)), asyncio.Semaphore(3))
+
+    assert daemon_result == {'name': 'fortishield-remoted', 'agents': [{'id': agent} for agent in range(1, 401)]}
+    assert errors == []
+    assert max_running == 3
+    assert stats._agents_stats_chunk_sizes.get('/var/ossec/queue/sockets/remote', 74) == expected_chunk_size
+
+    # Only the first chunk is split while finding out the number of agents accepted by the daemon
+    chunk_sizes = [len(c.kwargs['agents_list']) for c in socket_mock.call_args_list]
+    assert len([size for size in chunk_sizes if size > daemon_limit]) == expected_rejected
+    assert all(size == expected_chunk_size for size in chunk_sizes[-5:-1])
+
+
+@pytest.mark.asyncio
+@patch('fortishield.stats.get_daemons_stats_socket', side_effect=FortishieldException(1121))
+async def test_get_daemon_agents_stats_ko(socket_mock):
+    """Check that no more chunks are requested when the first one fails."""
+    assert await stats._get_daemon_agents_stats('/var/ossec/queue/sockets/remote', list(range(200)),
+                                                asyncio.Semaphore(3)) == (None, [socket_mock.side_effect])
+    socket_mock.assert_called_once()
+    assert await stats._get_daemon_agents_stats('/var/ossec/queue/sockets/remote', [],
+                                                asyncio.Semaphore(3)) == (None, [])
+
+
 def side_effect_test_get_daemons_stats_all(daemon_path, agents_list, last_id):
     # side_effect used to return a response with 10 items and 'due' the first time that get_daemons_stats_socket is
     # called, and a response with 10 items and 'ok' the second time
@@ -164,7 +262,7 @@ async def test_get_daemons_stats_all_agents(mock_get_daemons_stats_socket,
     for daemon in expected_daemons_list:
         calls.extend((call(DAEMON_SOCKET_PATHS_MAPPING[daemon], agents_list='all', last_id=0),
                       call(DAEMON_SOCKET_PATHS_MAPPING[daemon], agents_list='all', last_id=9)))
-    mock_get_daemons_stats_socket.assert_has_calls(calls)
+    mock_get_daemons_stats_socket.assert_has_calls(calls, any_order=True)
 
     # Check affected_items
     expected_affected_items = [{'name': daemon, 'agents': [{'id': i} for i in range(0, 20)]}
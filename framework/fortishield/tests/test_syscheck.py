@@ -22,9 +22,10 @@ with patch('fortishield.core.common.fortishield_uid'):
         from fortishield.tests.util import RBAC_bypasser
 
         fortishield.rbac.decorators.expose_resources = RBAC_bypasser
-        from fortishield.syscheck import run, clear, last_scan, files
+        from fortishield.syscheck import run, clear, last_scan, files, export_files
         from fortishield.syscheck import AffectedItemsFortishieldResult
         from fortishield import FortishieldError, FortishieldInternalError
+        from fortishield.core.exception import FortishieldResourceNotFound
         from fortishield.core import common
 
 callable_list = list()
@@ -270,3 +271,37 @@ def test_syscheck_files(socket_mock, exists_mock, agent_id, select, filters, dis
         if filters:
             for key, value in filters.items():
                 assert (item[key] == value for item in result.affected_items)
+
+
+@pytest.mark.parametrize('select, filters, summary', [
+    (None, None, False),
+    (['file', 'size', 'value.name'], None, False),
+    (None, {'type': 'registry_key'}, False),
+    (['file', 'size'], {'hash': '15470536'}, False),
+    (None, None, True),
+])
+@patch('fortishield.core.utils.path.exists', return_value=True)
+@patch('fortishield.syscheck.get_agents_info', return_value=['000', '001'])
+def test_syscheck_export_files(agents_info_mock, exists_mock, select, filters, summary):
+    """Check that the items exported in chunks by `export_files` are the same ones returned by `files`.
+
+    Parameters
+    ----------
+    select : list
+        Fields to be returned.
+    filters : dict
+        Dict to filter out the result.
+    summary : bool
+        Return a summary of each file.
+    """
+    with patch('fortishield.core.utils.FortishieldDBConnection', new=lambda *args, **kwargs: InitWDBSocketMock(
+            sql_schema_file='schema_syscheck_test.sql')):
+        expected = files(['001'], select=select, filters=filters, summary=summary, limit=None).affected_items
+        chunks = list(export_files(['001'], select=select, filters=filters, summary=summary))
+
+    assert all(len(chunk) <= 2 for chunk in chunks)
+    assert sorted((item for chunk in chunks for item in chunk), key=lambda item: item['file']) == \
+           sorted(expected, key=lambda item: item['file'])
+
+    with pytest.raises(FortishieldResourceNotFound, match='.* 1701 .*'):
+        next(export_files(['002']))
@@ -60,6 +60,73 @@ def test_get_item_agent(mock_agent_attr, mock_basic_info, mock_agents_info, mock
                 assert search['value'] in result['os']['name'], f'{search["value"]} not in result.'
 
 
+@pytest.mark.parametrize("offset, limit, order", [
+    (0, 3, 'asc'),
+    (1, 3, 'desc'),
+    (2, None, 'asc'),
+])
+@patch('fortishield.core.utils.path.exists', return_value=True)
+@patch('fortishield.syscollector.get_agents_info', return_value=['000', '001'])
+def test_get_item_agent_multiple_agents(mock_agents_info, mock_exists, offset, limit, order):
+    """Check that the items of several agents are merged in a single page, sorted as requested.
+
+    Parameters
+    ----------
+    offset : int
+        First item to return.
+    limit : int
+        Maximum number of items to return.
+    order : str
+        Sort order.
+    """
+    sort = {'fields': ['name'], 'order': order}
+    with patch('fortishield.core.utils.FortishieldDBConnection') as mock_fdb:
+        mock_fdb.return_value = InitWDBSocketMock(sql_schema_file='schema_syscollector_000.sql')
+        agent_items = syscollector.get_item_agent(agent_list=['000'], element_type='packages', sort=sort,
+                                                  limit=None).affected_items
+
+    with patch('fortishield.core.utils.FortishieldDBConnection', new=lambda *args, **kwargs: InitWDBSocketMock(
+            sql_schema_file='schema_syscollector_000.sql')) as mock_fdb, \
+            patch('fortishield.core.syscollector.FortishieldDBConnection', new=mock_fdb):
+        result = syscollector.get_item_agent(agent_list=['000', '001', '002'], element_type='packages', sort=sort,
+                                             offset=offset, limit=limit)
+
+    # Both agents have the same items, so the ones of the first agent go first when the names are equal
+    expected = [(item['name'], agent_id) for item in agent_items for agent_id in ('000', '001')]
+    expected = expected[offset:offset + limit if limit else None]
+    assert [(item['name'], item['agent_id']) for item in result.affected_items] == expected
+    assert result.total_affected_items == 2 * len(agent_items)
+    assert result.total_failed_items == 1 and result.render()['data']['failed_items'][0]['id'] == ['002']
+
+
+@pytest.mark.parametrize("select", [None, ['name', 'version']])
+@patch('fortishield.core.utils.path.exists', return_value=True)
+@patch('fortishield.syscollector.get_agents_info', return_value=['000', '001'])
+def test_export_item_agent(mock_agents_info, mock_exists, select):
+    """Check that the items exported in chunks are the same ones returned by get_item_agent.
+
+    Parameters
+    ----------
+    select : list
+        Fields to be returned.
+    """
+    with patch('fortishield.core.utils.FortishieldDBConnection', new=lambda *args, **kwargs: InitWDBSocketMock(
+            sql_schema_file='schema_syscollector_000.sql')):
+        expected = syscollector.get_item_agent(agent_list=['000'], element_type='packages', select=select,
+                                               limit=None).affected_items
+        chunks = list(syscollector.export_item_agent(agent_list=['000', '001', '002'], element_type='packages',
+                                                     select=select))
+
+    # The exported items are not sorted
+    assert all(len(chunk) <= 2 for chunk in chunks)
+    items = sorted((item for chunk in chunks for item in chunk), key=lambda item: (item['agent_id'], item['name']))
+    assert items == [{**item, 'agent_id': agent_id} for agent_id in ('000', '001')
+                     for item in sorted(expected, key=lambda item: item['name'])]
+
+    with pytest.raises(syscollector.FortishieldResourceNotFound, match='.* 1701 .*'):
+        next(syscollector.export_item_agent(agent_list=['002'], element_type='packages'))
+
+
 @pytest.mark.parametrize("agent_list, expected_exception", [
     (['010'], 1701),
 ])
@@ -7,6 +7,8 @@ import re
 import sqlite3
 from functools import wraps
 
+from fortishield.core.fdb import QUERY_PARAM_REGEX
+
 test_data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
 
 
@@ -19,7 +21,8 @@ class InitWDBSocketMock:
         pass
 
     def init_db(self):
-        sys_db = sqlite3.connect(':memory:')
+        # The connection can be used by the threads that query several agents concurrently
+        sys_db = sqlite3.connect(':memory:', check_same_thread=False)
         cur = sys_db.cursor()
         with open(os.path.join(test_data_path, self.sql_schema_file)) as f:
             cur.executescript(f.read())
@@ -27,10 +30,25 @@ class InitWDBSocketMock:
 
         return sys_db
 
-    def execute(self, query, count=False):
+    @staticmethod
+    def bind_params(query, params):
+        """Replace the named placeholders of the query with positional ones, as sqlite does not support the names nor
+        the list values used by the framework."""
+        values = []
+
+        def replace(match):
+            value = params[match.group(1)]
+            value = value if isinstance(value, list) else [value]
+            values.extend(int(v) if isinstance(v, str) and v.isnumeric() else v for v in value)
+            return ','.join('?' * len(value))
+
+        return QUERY_PARAM_REGEX.sub(replace, query), values
+
+    def execute(self, query, count=False, params=None):
         query = re.search(r'^(?:mitre|task|global|agent \d{3}) sql (.+)$', query).group(1)
-        self.__conn.execute(query)
-        rows = self.__conn.execute(query).fetchall()
+        query, values = self.bind_params(query, params or {})
+        self.__conn.execute(query, values)
+        rows = self.__conn.execute(query, values).fetchall()
         if len(rows) > 0 and 'COUNT(*)' in rows[0]:
             return rows[0]['COUNT(*)']
         elif len(rows) > 0 and 'COUNT(DISTINCT id)' in rows[0]:
@@ -39,6 +57,14 @@ class InitWDBSocketMock:
             return next(iter(rows[0].values()))
         return rows
 
+    def execute_keyset(self, query, params=None, key='keyset_id', step=2):
+        rows = sorted(self.execute(query, params=params), key=lambda row: row[key])
+        for i in range(0, len(rows), step):
+            chunk = rows[i:i + step]
+            for row in chunk:
+                del row[key]
+            yield chunk
+
 
 def get_fake_database_data(sql_file):
     """Create a fake database."""
@@ -207,7 +207,9 @@ async def print_health(config: dict, more: bool, filter_node: Union[str, list]):
                     f"({node_info['status']['last_sync_agentgroup']['date_start']} - " \
                     f"{node_info['status']['last_sync_agentgroup']['date_end']}).\n"
             msg2 += f"                Number of synchronized chunks: " \
-                    f"{node_info['status']['last_sync_agentgroup']['n_synced_chunks']}.\n"
+                    f"{node_info['status']['last_sync_agentgroup']['n_synced_chunks']}/" \
+                    f"{node_info['status']['last_sync_agentgroup']['n_chunks']} " \
+                    f"(applied in {node_info['status']['last_sync_agentgroup']['time_to_apply']}s).\n"
 
             # Agent groups full
             total = calculate_seconds(node_info['status']['last_sync_full_agentgroup']['date_start'],
@@ -217,7 +219,9 @@ async def print_health(config: dict, more: bool, filter_node: Union[str, list]):
                     f"({node_info['status']['last_sync_full_agentgroup']['date_start']} - " \
                     f"{node_info['status']['last_sync_full_agentgroup']['date_end']}).\n"
             msg2 += f"                Number of synchronized chunks: " \
-                    f"{node_info['status']['last_sync_full_agentgroup']['n_synced_chunks']}.\n"
+                    f"{node_info['status']['last_sync_full_agentgroup']['n_synced_chunks']}/" \
+                    f"{node_info['status']['last_sync_full_agentgroup']['n_chunks']} " \
+                    f"(applied in {node_info['status']['last_sync_full_agentgroup']['time_to_apply']}s).\n"
     print(msg1)
     more and print(msg2)
 
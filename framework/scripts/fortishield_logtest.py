@@ -14,7 +14,12 @@ import struct
 import subprocess
 import sys
 import textwrap
-from typing import Union
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from time import perf_counter
+from typing import TextIO, Union
 
 from fortishield.core import common
 from fortishield.core.common import LOGTEST_SOCKET
@@ -62,6 +67,23 @@ def init_argparse() -> argparse.Namespace:
         dest='verbose',
         action='store_true'
     )
+    parser.add_argument(
+        '-f', help='Batch mode. Process every log of a file ("-" for stdin) and write the results as NDJSON',
+        metavar='file',
+        dest='batch'
+    )
+    parser.add_argument(
+        '-j', help='Number of concurrent sessions used in batch mode. Default 4',
+        default=4,
+        metavar='sessions',
+        dest='sessions',
+        type=int
+    )
+    parser.add_argument(
+        '-o', help='Batch mode results file. Default stdout',
+        metavar='output',
+        dest='output'
+    )
     return parser
 
 
@@ -88,6 +110,10 @@ def main():
     if args.verbose:
         options['rules_debug'] = True
 
+    # Handle batch request
+    if args.batch:
+        sys.exit(run_batch(args, options))
+
     # Initialize fortishield-logtest component
     w_logtest = FortishieldLogtest(location=args.location)
     logging.info('Starting fortishield-logtest %s', Fortishield.get_version_str())
@@ -228,15 +254,19 @@ class FortishieldDeamonProtocol:
 class FortishieldSocket:
     """Encapsulate fortishield-socket communication (header with message size)."""
 
-    def __init__(self, file: str):
+    def __init__(self, file: str, persistent: bool = False):
         """Class constructor.
 
         Parameters
         ----------
         file : str
             Socket path.
+        persistent : bool
+            Keep the connection open between messages while the other side does not close it. Default: False
         """
         self.file = file
+        self.persistent = persistent
+        self.connection = None
 
     def send(self, msg: str) -> bytes:
         """Send and receive data to fortishield-socket (header with message size).
@@ -251,6 +281,9 @@ class FortishieldSocket:
         bytes
             Received data.
         """
+        if self.persistent:
+            return self.send_persistent(msg)
+
         try:
             wlogtest_conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
             wlogtest_conn.connect(self.file)
@@ -263,11 +296,63 @@ class FortishieldSocket:
         except Exception:
             raise ConnectionError
 
+    def send_persistent(self, msg: str) -> bytes:
+        """Send and receive data to fortishield-socket reusing the current connection.
+
+        A new connection is opened if there is no connection or the other side closed it. A message that could not be
+        sent through a reused connection is sent again through a new one.
+
+        Parameters
+        ----------
+        msg : str
+            Data to send.
+
+        Returns
+        -------
+        bytes
+            Received data.
+        """
+        encoded_msg = msg.encode('utf-8')
+        packet = struct.pack("<I", len(encoded_msg)) + encoded_msg
+        for reused in (self.connection is not None, False):
+            try:
+                if self.connection is None:
+                    self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    self.connection.connect(self.file)
+                self.connection.sendall(packet)
+                header = self.connection.recv(4, socket.MSG_WAITALL)
+                if len(header) < 4:
+                    raise ConnectionResetError
+                size = struct.unpack("<I", header)[0]
+                recv_msg = self.connection.recv(size, socket.MSG_WAITALL)
+                break
+            except Exception:
+                self.close()
+                if not reused:
+                    raise ConnectionError
+
+        # Do not reuse connections the other side closes after replying
+        try:
+            if not self.connection.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT):
+                self.close()
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.close()
+
+        return recv_msg
+
+    def close(self):
+        """Close the persistent connection, if any."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
 
 class FortishieldLogtest:
     """Top level class to interact with fortishield-logtest feature, part of fortishield-analysisd."""
 
-    def __init__(self, location: str = "stdin", log_format: str = "syslog"):
+    def __init__(self, location: str = "stdin", log_format: str = "syslog", persistent: bool = False):
         """Class constructor.
 
         Parameters
@@ -276,9 +361,11 @@ class FortishieldLogtest:
             Log origin. Default: "master->/var/log/syslog"
         log_format : str
             Type of log. Default: "syslog"
+        persistent : bool
+            Reuse the connection with fortishield-analysisd between requests. Default: False
         """
         self.protocol = FortishieldDeamonProtocol()
-        self.socket = FortishieldSocket(LOGTEST_SOCKET)
+        self.socket = FortishieldSocket(LOGTEST_SOCKET, persistent=persistent)
         self.fixed_fields = dict()
         self.fixed_fields['location'] = location
         self.fixed_fields['log_format'] = log_format
@@ -491,6 +578,187 @@ class FortishieldLogtest:
             logging.info('Unit test FAIL. Expected %s , Result %s', ut, self.get_last_ut())
 
 
+class FortishieldLogtestBatch:
+    """Process a stream of logs through several concurrent fortishield-logtest sessions."""
+
+    # Number of lines read and processed at once, so the results are written in order with a bounded memory usage
+    WINDOW_SIZE = 1000
+
+    def __init__(self, location: str = "stdin", sessions: int = 4, options: dict = None):
+        """Class constructor.
+
+        Parameters
+        ----------
+        location : str
+            Log origin. Default: "stdin"
+        sessions : int
+            Number of concurrent sessions. Logs are spread over them, so stateful rules (frequency, if_matched_sid...)
+            only correlate the logs of the same session. Default: 4
+        options : dict
+            Options sent with every log. Default: None
+        """
+        self.location = location
+        self.sessions = max(1, sessions)
+        self.options = options
+        self.local = threading.local()
+        self.logtests = list()
+        self.rules = Counter()
+        self.decoders = Counter()
+        self.errors = 0
+        self.latencies = list()
+
+    def get_logtest(self) -> FortishieldLogtest:
+        """Get the fortishield-logtest session of the current thread, creating it the first time.
+
+        Returns
+        -------
+        FortishieldLogtest
+            Session of the current thread.
+        """
+        try:
+            return self.local.logtest
+        except AttributeError:
+            self.local.logtest = FortishieldLogtest(location=self.location, persistent=True)
+            self.logtests.append(self.local.logtest)
+            return self.local.logtest
+
+    def process_line(self, line_number: int, log: str) -> tuple:
+        """Process a log in the session of the current thread.
+
+        Parameters
+        ----------
+        line_number : int
+            Number of the line of the log in the input.
+        log : str
+            Event log to process.
+
+        Returns
+        -------
+        tuple
+            Result of the log and processing time in seconds, None if the log could not be processed.
+        """
+        logtest = self.get_logtest()
+        start = perf_counter()
+        try:
+            reply = logtest.process_log(log, logtest.last_token, self.options)
+        except ValueError as error:
+            return {'line': line_number, 'error': str(error)}, None
+        except ConnectionError:
+            return {'line': line_number, 'error': 'Error when connecting with fortishield-analysisd'}, None
+
+        return {'line': line_number, 'token': reply['token'], 'alert': reply['alert'],
+                'output': reply['output']}, perf_counter() - start
+
+    def run(self, input_stream: TextIO, output_stream: TextIO):
+        """Process every non-empty line of the input and write the result of each one as a JSON line.
+
+        Parameters
+        ----------
+        input_stream : TextIO
+            Logs to process, one per line.
+        output_stream : TextIO
+            Stream where the results are written.
+        """
+        lines = ((number, line.rstrip('\r\n')) for number, line in enumerate(input_stream, start=1)
+                 if line.strip())
+        with ThreadPoolExecutor(max_workers=self.sessions) as executor:
+            while window := list(islice(lines, self.WINDOW_SIZE)):
+                for result, latency in executor.map(lambda item: self.process_line(*item), window):
+                    self.add_result(result, latency)
+                    output_stream.write(json.dumps(result) + '\n')
+        output_stream.flush()
+
+    def add_result(self, result: dict, latency: Union[float, None]):
+        """Add the result of a log to the summary.
+
+        Parameters
+        ----------
+        result : dict
+            Result of the log.
+        latency : float or None
+            Processing time in seconds, None if the log could not be processed.
+        """
+        if latency is None:
+            self.errors += 1
+            return
+
+        self.latencies.append(latency)
+        output = result['output']
+        if 'rule' in output:
+            self.rules[output['rule']['id']] += 1
+        if output.get('decoder'):
+            self.decoders[output['decoder']['name']] += 1
+
+    @staticmethod
+    def get_percentile(latencies: list, percentile: float) -> float:
+        """Get a percentile of the processing times, in milliseconds.
+
+        Parameters
+        ----------
+        latencies : list
+            Sorted processing times, in seconds.
+        percentile : float
+            Percentile to get, between 0 and 100.
+
+        Returns
+        -------
+        float
+            Processing time of the percentile.
+        """
+        if not latencies:
+            return 0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))] * 1000
+
+    def show_summary(self):
+        """Display the number of processed logs, rule and decoder matches and processing times."""
+        latencies = sorted(self.latencies)
+        logging.info('Processed logs: %d', len(latencies))
+        logging.info('Errors: %d', self.errors)
+        logging.info('Latency (ms): p50 %.3f, p90 %.3f, p99 %.3f, max %.3f',
+                     *(self.get_percentile(latencies, percentile) for percentile in (50, 90, 99, 100)))
+        logging.info('Rule matches:')
+        for rule_id, count in self.rules.most_common():
+            logging.info('\t%s: %d', rule_id, count)
+        logging.info('Decoder matches:')
+        for decoder, count in self.decoders.most_common():
+            logging.info('\t%s: %d', decoder, count)
+
+    def remove_sessions(self):
+        """Remove every session and close its connection."""
+        for logtest in self.logtests:
+            logtest.remove_last_session()
+            logtest.socket.close()
+
+
+def run_batch(args: argparse.Namespace, options: dict) -> int:
+    """Run fortishield-logtest in batch mode.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments passed to the script.
+    options : dict
+        Options sent with every log.
+
+    Returns
+    -------
+    int
+        Exit code. 1 if any log could not be processed, 0 otherwise.
+    """
+    batch = FortishieldLogtestBatch(location=args.location, sessions=args.sessions, options=options)
+    input_stream = sys.stdin if args.batch == '-' else open(args.batch)
+    output_stream = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        batch.run(input_stream, output_stream)
+    finally:
+        batch.remove_sessions()
+        input_stream is not sys.stdin and input_stream.close()
+        output_stream is not sys.stdout and output_stream.close()
+
+    batch.show_summary()
+    return 1 if batch.errors else 0
+
+
 class Fortishield:
     def get_install_path() -> str:
         """Get Fortishield installation path, obtained relative to the path of this file.
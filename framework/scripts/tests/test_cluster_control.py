@@ -103,9 +103,11 @@ async def test_print_nodes(local_client_mock, get_agents_mock, print_table_mock,
                                     'last_sync_agentinfo': {'date_start_master': '0', 'date_end_master': '0',
                                                             'n_synced_chunks': 0},
                                     'last_sync_agentgroup': {'date_start': 0, 'date_end': 0,
-                                                             'n_synced_chunks': 0},
+                                                             'n_chunks': 0, 'n_synced_chunks': 0,
+                                                             'time_to_apply': 0},
                                     'last_sync_full_agentgroup': {'date_start': 0, 'date_end': 0,
-                                                                  'n_synced_chunks': 0},
+                                                                  'n_chunks': 0, 'n_synced_chunks': 0,
+                                                                  'time_to_apply': 0},
                                     'sync_agent_info_free': 'True'}}}})
 async def test_print_health(get_health_mock, get_nodes_mock, local_client_mock, get_utc_strptime_mock, print_mock):
     """Test if the current status of the cluster is properly printed."""
@@ -165,13 +167,17 @@ async def test_print_health(get_health_mock, get_nodes_mock, local_client_mock,
                                           f"({worker_status['last_sync_agentgroup']['date_start']} - "
                                           f"{worker_status['last_sync_agentgroup']['date_end']}).\n"
                                           f"                Number of synchronized chunks: "
-                                          f"{worker_status['last_sync_agentgroup']['n_synced_chunks']}.\n"
+                                          f"{worker_status['last_sync_agentgroup']['n_synced_chunks']}/"
+                                          f"{worker_status['last_sync_agentgroup']['n_chunks']} "
+                                          f"(applied in {worker_status['last_sync_agentgroup']['time_to_apply']}s).\n"
                                           "            Agents-groups full:\n"
                                           f"                Last synchronization: 0.001s "
                                           f"({worker_status['last_sync_full_agentgroup']['date_start']} - "
                                           f"{worker_status['last_sync_full_agentgroup']['date_end']}).\n"
                                           f"                Number of synchronized chunks: "
-                                          f"{worker_status['last_sync_full_agentgroup']['n_synced_chunks']}.\n"
+                                          f"{worker_status['last_sync_full_agentgroup']['n_synced_chunks']}/"
+                                          f"{worker_status['last_sync_full_agentgroup']['n_chunks']} "
+                                          f"(applied in {worker_status['last_sync_full_agentgroup']['time_to_apply']}s).\n"
                                           )])
 
         # Common assertions
@@ -4,6 +4,8 @@
 # Created by KhulnaSoft, Ltd. <info@khulnasoft.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import io
+import json
 import logging
 import socket
 import sys
@@ -65,28 +67,38 @@ def test_init_argparse(argument_parser_mock):
             self.dest = []
             self.metavar = []
             self.default = []
+            self.type = []
 
-        def add_argument(self, flag, help='', action='', dest='', metavar='', default=''):
+        def add_argument(self, flag, help='', action='', dest='', metavar='', default='', type=None):
             self.flag.append(flag)
             self.help.append(help)
             self.action.append(action)
             self.dest.append(dest)
             self.metavar.append(metavar)
             self.default.append(default)
+            self.type.append(type)
 
     argument_parser_mock.return_value = ArgumentParserMock()
     fortishield_logtest.init_argparse()
 
     argument_parser_mock.assert_called_once_with(description='Tool for developing, tuning, and debugging rules.')
-    assert argument_parser_mock.return_value.flag == ['-V', '-d', '-U', '-l', '-q', '-v']
+    assert argument_parser_mock.return_value.flag == ['-V', '-d', '-U', '-l', '-q', '-v', '-f', '-j', '-o']
     assert argument_parser_mock.return_value.help == ['Version and license message', 'Execute in debug mode',
                                                       'Unit test. Refer to ruleset/testing/runtests.py',
                                                       'Use custom location. Default "stdin"',
-                                                      'Quiet execution', 'Verbose (full) output/rule debugging']
-    assert argument_parser_mock.return_value.action == ['store_true', 'store_true', '', '', 'store_true', 'store_true']
-    assert argument_parser_mock.return_value.dest == ['version', 'debug', 'ut', 'location', 'quiet', 'verbose']
-    assert argument_parser_mock.return_value.metavar == ['', '', 'rule:alert:decoder', 'location', '', '']
-    assert argument_parser_mock.return_value.default == ['', '', '', 'stdin', '', '']
+                                                      'Quiet execution', 'Verbose (full) output/rule debugging',
+                                                      'Batch mode. Process every log of a file ("-" for stdin) and '
+                                                      'write the results as NDJSON',
+                                                      'Number of concurrent sessions used in batch mode. Default 4',
+                                                      'Batch mode results file. Default stdout']
+    assert argument_parser_mock.return_value.action == ['store_true', 'store_true', '', '', 'store_true', 'store_true',
+                                                        '', '', '']
+    assert argument_parser_mock.return_value.dest == ['version', 'debug', 'ut', 'location', 'quiet', 'verbose',
+                                                      'batch', 'sessions', 'output']
+    assert argument_parser_mock.return_value.metavar == ['', '', 'rule:alert:decoder', 'location', '', '', 'file',
+                                                         'sessions', 'output']
+    assert argument_parser_mock.return_value.default == ['', '', '', 'stdin', '', '', '', 4, '']
+    assert argument_parser_mock.return_value.type == [None, None, None, None, None, None, None, int, None]
 
 
 @patch('sys.exit')
@@ -110,6 +122,7 @@ def test_main(input_mock, argparse_mock, fortishield_logtest_class_mock, init_lo
             self.version = "1.0.0"
             self.location = "World"
             self.verbose = True
+            self.batch = None
 
     class ParserMock:
         """Auxiliary class."""
@@ -361,6 +374,38 @@ def test_ws_sent(unpack_mock, pack_mock, msg_waitall_mock, stream_mock, unix_moc
         ws.send(file)
 
 
+@patch('socket.socket')
+def test_ws_send_persistent(socket_socket_mock):
+    """Test the connection is reused between messages and opened again when the other side closes it."""
+    reply = b'{"reply": 1}'
+    conn_mock = socket_socket_mock.return_value
+    conn_mock.recv.side_effect = [len(reply).to_bytes(4, 'little'), reply, BlockingIOError(),
+                                  len(reply).to_bytes(4, 'little'), reply, b'',
+                                  len(reply).to_bytes(4, 'little'), reply, BlockingIOError(),
+                                  b'', len(reply).to_bytes(4, 'little'), reply, BlockingIOError()]
+    ws = fortishield_logtest.FortishieldSocket(file='test_path', persistent=True)
+
+    # First message opens the connection, which is kept open
+    assert ws.send('msg') == reply
+    assert ws.connection is conn_mock
+    # The other side closes the connection after the second reply
+    assert ws.send('msg') == reply
+    assert ws.connection is None
+    # A fresh connection is used for the third message, after the second one was closed
+    assert ws.send('msg') == reply
+    # A message that fails through a reused connection is sent again through a new one
+    assert ws.send('msg') == reply
+    assert ws.connection is conn_mock
+    # It is only retried once
+    conn_mock.recv.side_effect = [b'', b'']
+    ws.connection = conn_mock
+    with pytest.raises(ConnectionError):
+        ws.send('msg')
+
+    assert socket_socket_mock.call_count == 4
+    conn_mock.sendall.assert_called_with(b'\x03\x00\x00\x00msg')
+
+
 # Test FortishieldLogtest class methods
 
 @patch('scripts.fortishield_logtest.FortishieldSocket', return_value=FortishieldSocketMock())
@@ -521,6 +566,72 @@ def test_wl_show_last_result(get_last_ut_mock, info_mock):
     assert get_last_ut_mock.call_count == 2
 
 
+# Test FortishieldLogtestBatch class methods
+
+@patch('scripts.fortishield_logtest.FortishieldLogtest')
+def test_wlb_run(fortishield_logtest_mock):
+    """Test the logs are processed in order and the summary is calculated."""
+    def process_log(log, token, options):
+        if log == 'error':
+            raise ValueError('-1: error')
+        return {'token': 'token', 'alert': False,
+                'output': {'rule': {'id': log[0]}, 'decoder': {'name': 'dec'}} if log[0] != 'c' else {'decoder': {}}}
+
+    fortishield_logtest_mock.return_value.process_log.side_effect = process_log
+    batch = fortishield_logtest.FortishieldLogtestBatch(sessions=2, options={'rules_debug': True})
+    batch.WINDOW_SIZE = 2
+    output = io.StringIO()
+
+    batch.run(io.StringIO('a1\n\nb2\nerror\na3\nc4\n'), output)
+
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [result['line'] for result in results] == [1, 3, 4, 5, 6]
+    assert results[2] == {'line': 4, 'error': '-1: error'}
+    assert batch.rules == {'a': 2, 'b': 1}
+    assert batch.decoders == {'dec': 3}
+    assert batch.errors == 1
+    assert len(batch.latencies) == 4
+    assert fortishield_logtest_mock.call_count == len(batch.logtests) <= 2
+    fortishield_logtest_mock.assert_called_with(location='stdin', persistent=True)
+    assert all(c.args[2] == {'rules_debug': True}
+               for c in fortishield_logtest_mock.return_value.process_log.call_args_list)
+
+    batch.remove_sessions()
+    assert fortishield_logtest_mock.return_value.remove_last_session.call_count == len(batch.logtests)
+
+
+@pytest.mark.parametrize('latencies, expected', [
+    ([], [0, 0, 0]),
+    ([0.001, 0.002, 0.003, 0.004], [3, 4, 4]),
+])
+def test_wlb_get_percentile(latencies, expected):
+    """Test the percentiles of the processing times."""
+    assert [fortishield_logtest.FortishieldLogtestBatch.get_percentile(latencies, percentile)
+            for percentile in (50, 90, 100)] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('errors, expected_code', [(0, 0), (1, 1)])
+@patch('builtins.open')
+@patch('scripts.fortishield_logtest.FortishieldLogtestBatch')
+def test_run_batch(batch_mock, open_mock, errors, expected_code):
+    """Test the batch mode opens the input and output files and removes the sessions."""
+    class ArgsMock:
+        """Auxiliary class."""
+        batch = 'input.log'
+        output = 'output.json'
+        sessions = 2
+        location = 'stdin'
+
+    batch_mock.return_value.errors = errors
+    assert fortishield_logtest.run_batch(ArgsMock(), {}) == expected_code
+    batch_mock.assert_called_once_with(location='stdin', sessions=2, options={})
+    assert open_mock.call_args_list == [call('input.log'), call('output.json', 'w')]
+    batch_mock.return_value.run.assert_called_once_with(open_mock.return_value, open_mock.return_value)
+    batch_mock.return_value.remove_sessions.assert_called_once_with()
+    batch_mock.return_value.show_summary.assert_called_once_with()
+    assert open_mock.return_value.close.call_count == 2
+
+
 # Test Fortishield class
 
 def create_fortishield_class():